@@ -33,6 +33,14 @@ def get_url():
     return settings.SQLALCHEMY_DATABASE_URI
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    # Monthly partitions of goal_progress are created and archived by
+    # app.services.partitions, not by migrations
+    if type_ == "table" and reflected and compare_to is None and name.startswith("goal_progress_"):
+        return False
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -49,6 +57,7 @@ def run_migrations_offline():
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -74,7 +83,9 @@ def run_migrations_online():
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,291 @@
+"""Initial schema
+
+Only a database whose tables were created with ``Base.metadata.create_all()``
+from the models of this revision matches it and can be marked with
+``alembic stamp 0001`` before upgrading. One created by older code lacks
+columns this revision creates and later ones rely on, such as
+``updated_at``, ``sync_version`` and ``time_range`` on events, and stamping
+it would skip them: create a fresh database with ``alembic upgrade head``
+and copy the data over instead.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Change tracking for delta sync as of this revision; see app.models.sync
+SYNCED_TABLES = ("goals", "goal_progress", "teams", "user_team", "events", "user_event")
+
+SYNC_TOUCH = """
+CREATE OR REPLACE FUNCTION sync_touch() RETURNS trigger AS $$
+BEGIN
+    NEW.sync_version := pg_current_xact_id()::text::bigint;
+    IF TG_OP = 'UPDATE' THEN
+        NEW.updated_at := now();
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+SYNC_TOMBSTONE = """
+CREATE OR REPLACE FUNCTION sync_tombstone() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'goals' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES (TG_TABLE_NAME, OLD.id, NULL, OLD.user_id, OLD.team_id, pg_current_xact_id()::text::bigint);
+    END IF;
+    IF TG_TABLE_NAME = 'goal_progress' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES (TG_TABLE_NAME, OLD.id, OLD.goal_id, (SELECT user_id FROM goals WHERE id = OLD.goal_id), (SELECT team_id FROM goals WHERE id = OLD.goal_id), pg_current_xact_id()::text::bigint);
+    END IF;
+    IF TG_TABLE_NAME = 'teams' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES (TG_TABLE_NAME, OLD.id, NULL, NULL, OLD.id, pg_current_xact_id()::text::bigint);
+    END IF;
+    IF TG_TABLE_NAME = 'user_team' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES (TG_TABLE_NAME, OLD.team_id, OLD.user_id, OLD.user_id, OLD.team_id, pg_current_xact_id()::text::bigint);
+    END IF;
+    IF TG_TABLE_NAME = 'events' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES (TG_TABLE_NAME, OLD.id, NULL, OLD.organizer_id, OLD.team_id, pg_current_xact_id()::text::bigint);
+    END IF;
+    IF TG_TABLE_NAME = 'user_event' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES (TG_TABLE_NAME, OLD.event_id, OLD.user_id, OLD.user_id, NULL, pg_current_xact_id()::text::bigint);
+    END IF;
+    RETURN OLD;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def _sync_columns():
+    return [
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()")),
+        sa.Column("sync_version", sa.BigInteger()),
+    ]
+
+
+def _install_sync_triggers(table: str) -> None:
+    op.execute(
+        f"CREATE TRIGGER sync_touch BEFORE INSERT OR UPDATE ON {table} "
+        f"FOR EACH ROW EXECUTE FUNCTION sync_touch()"
+    )
+    op.execute(
+        f"CREATE TRIGGER sync_tombstone AFTER DELETE ON {table} "
+        f"FOR EACH ROW EXECUTE FUNCTION sync_tombstone()"
+    )
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("full_name", sa.String()),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("is_superuser", sa.Boolean()),
+        sa.Column("avatar", sa.String()),
+        sa.Column("current_streak", sa.Integer()),
+        sa.Column("longest_streak", sa.Integer()),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+    op.create_index("ix_users_full_name", "users", ["full_name"])
+
+    op.create_table(
+        "teams",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()")),
+        *_sync_columns(),
+        sa.Column("created_by_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("cycle_name", sa.String()),
+        sa.Column("cycle_start_date", sa.DateTime(timezone=True)),
+        sa.Column("cycle_end_date", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_teams_id", "teams", ["id"])
+    op.create_index("ix_teams_name", "teams", ["name"])
+    op.create_index("ix_teams_sync_version", "teams", ["sync_version"])
+
+    op.create_table(
+        "user_team",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("team_id", sa.Integer(), sa.ForeignKey("teams.id"), primary_key=True),
+        *_sync_columns(),
+    )
+    op.create_index("ix_user_team_sync_version", "user_team", ["sync_version"])
+
+    op.create_table(
+        "goals",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("team_id", sa.Integer(), sa.ForeignKey("teams.id")),
+        sa.Column("target_value", sa.Float(), nullable=False),
+        sa.Column("current_value", sa.Float()),
+        sa.Column("unit", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()")),
+        sa.Column("target_date", sa.DateTime(timezone=True)),
+        sa.Column("completed_at", sa.DateTime(timezone=True)),
+        sa.Column("is_completed", sa.Boolean()),
+        *_sync_columns(),
+        sa.Column("is_recurring", sa.Boolean()),
+        sa.Column("frequency", sa.String()),
+    )
+    op.create_index("ix_goals_id", "goals", ["id"])
+    op.create_index("ix_goals_title", "goals", ["title"])
+    op.create_index("ix_goals_sync_version", "goals", ["sync_version"])
+
+    op.create_table(
+        "goal_progress",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("goal_id", sa.Integer(), sa.ForeignKey("goals.id"), nullable=False),
+        sa.Column("value", sa.Float(), nullable=False),
+        sa.Column("notes", sa.Text()),
+        sa.Column("logged_at", sa.DateTime(timezone=True), server_default=sa.text("now()")),
+        *_sync_columns(),
+    )
+    op.create_index("ix_goal_progress_id", "goal_progress", ["id"])
+    op.create_index("ix_goal_progress_sync_version", "goal_progress", ["sync_version"])
+
+    op.create_table(
+        "events",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("start_time", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("end_time", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()")),
+        *_sync_columns(),
+        sa.Column("organizer_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("team_id", sa.Integer(), sa.ForeignKey("teams.id")),
+        sa.Column("event_type", sa.String(), nullable=False),
+        sa.Column("location", sa.String()),
+        sa.Column("meeting_link", sa.String()),
+        sa.Column("recurrence_rule", sa.String()),
+        sa.Column("recurrence_end", sa.DateTime(timezone=True)),
+        sa.Column(
+            "time_range",
+            postgresql.TSTZRANGE(),
+            sa.Computed(
+                "tstzrange(start_time, CASE WHEN recurrence_rule IS NULL THEN end_time "
+                "ELSE recurrence_end END, CASE WHEN recurrence_rule IS NULL AND end_time = start_time "
+                "THEN '[]' ELSE '[)' END)",
+                persisted=True,
+            ),
+        ),
+        sa.CheckConstraint("end_time >= start_time", name="ck_events_end_after_start"),
+    )
+    op.create_index("ix_events_id", "events", ["id"])
+    op.create_index("ix_events_title", "events", ["title"])
+    op.create_index("ix_events_sync_version", "events", ["sync_version"])
+    op.create_index("ix_events_time_range", "events", ["time_range"], postgresql_using="gist")
+
+    op.create_table(
+        "user_event",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("event_id", sa.Integer(), sa.ForeignKey("events.id"), primary_key=True),
+        *_sync_columns(),
+    )
+    op.create_index("ix_user_event_sync_version", "user_event", ["sync_version"])
+
+    op.create_table(
+        "event_exceptions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("event_id", sa.Integer(), sa.ForeignKey("events.id"), nullable=False),
+        sa.Column("original_start", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("is_cancelled", sa.Boolean(), nullable=False),
+        sa.Column("title", sa.String()),
+        sa.Column("description", sa.Text()),
+        sa.Column("start_time", sa.DateTime(timezone=True)),
+        sa.Column("end_time", sa.DateTime(timezone=True)),
+        sa.Column("location", sa.String()),
+        sa.Column("meeting_link", sa.String()),
+        sa.UniqueConstraint("event_id", "original_start"),
+    )
+    op.create_index("ix_event_exceptions_id", "event_exceptions", ["id"])
+    op.create_index("ix_event_exceptions_event_id", "event_exceptions", ["event_id"])
+
+    op.create_table(
+        "sync_tombstones",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("table_name", sa.String(), nullable=False),
+        sa.Column("row_id", sa.Integer(), nullable=False),
+        sa.Column("parent_id", sa.Integer()),
+        sa.Column("user_id", sa.Integer()),
+        sa.Column("team_id", sa.Integer()),
+        sa.Column("deleted_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("sync_version", sa.BigInteger(), nullable=False),
+    )
+    op.create_index("ix_sync_tombstones_user_id", "sync_tombstones", ["user_id"])
+    op.create_index("ix_sync_tombstones_team_id", "sync_tombstones", ["team_id"])
+    op.create_index("ix_sync_tombstones_sync_version", "sync_tombstones", ["sync_version"])
+
+    op.create_table(
+        "sync_state",
+        sa.Column("key", sa.String(), primary_key=True),
+        sa.Column("value", sa.BigInteger(), nullable=False),
+    )
+
+    op.create_table(
+        "team_leaderboard",
+        sa.Column("team_id", sa.Integer(), sa.ForeignKey("teams.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("goal_count", sa.Integer(), nullable=False),
+        sa.Column("completed_goals", sa.Integer(), nullable=False),
+        sa.Column("ratio_sum", sa.Float(), nullable=False),
+        sa.Column("completion", sa.Float(), nullable=False),
+        sa.Column("progress_total", sa.Float(), nullable=False),
+        sa.Column("streak", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()")),
+    )
+    op.create_index(
+        "ix_team_leaderboard_rank",
+        "team_leaderboard",
+        ["team_id", sa.text("completion DESC"), sa.text("progress_total DESC"), sa.text("streak DESC"), "user_id"],
+    )
+
+    op.create_table(
+        "goal_forecasts",
+        sa.Column("goal_id", sa.Integer(), sa.ForeignKey("goals.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("rate_per_day", sa.Float()),
+        sa.Column("projected_completion", sa.DateTime(timezone=True)),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("sample_count", sa.Integer(), nullable=False),
+        sa.Column("computed_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+    )
+
+    op.execute(SYNC_TOUCH)
+    op.execute(SYNC_TOMBSTONE)
+    for table in SYNCED_TABLES:
+        _install_sync_triggers(table)
+
+
+def downgrade() -> None:
+    for table in (
+        "goal_forecasts", "team_leaderboard", "sync_state", "sync_tombstones", "event_exceptions",
+        "user_event", "events", "goal_progress", "goals", "user_team", "teams", "users",
+    ):
+        op.drop_table(table)
+    op.execute("DROP FUNCTION IF EXISTS sync_touch() CASCADE")
+    op.execute("DROP FUNCTION IF EXISTS sync_tombstone() CASCADE")
@@ -0,0 +1,143 @@
+"""Partition goal_progress by month
+
+Rebuilds goal_progress as a table partitioned by range of logged_at, with
+monthly partitions from the oldest row to a few months ahead and a default
+partition, copies the rows over and adds goal_progress_daily for archived
+months. Rows keep their ids; the id sequence moves to the new table.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 09:30:00.000000
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = ("goal_progress_pkey", "ix_goal_progress_id", "ix_goal_progress_sync_version")
+COLUMNS = "id, goal_id, value, notes, logged_at, updated_at, sync_version"
+# Months created past the current one; maintenance keeps adding them
+PARTITIONS_AHEAD = 3
+
+
+def _month_start(moment: datetime) -> datetime:
+    moment = moment.astimezone(timezone.utc) if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def _create_partitions(start: datetime, end: datetime) -> None:
+    # Same names and bounds as app.services.partitions
+    month = _month_start(start)
+    while month <= end:
+        op.execute(
+            f"CREATE TABLE goal_progress_y{month.year:04d}m{month.month:02d} PARTITION OF goal_progress "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+        )
+        month = _add_months(month, 1)
+
+
+def _install_sync_triggers() -> None:
+    # The trigger functions were created in 0001
+    op.execute(
+        "CREATE TRIGGER sync_touch BEFORE INSERT OR UPDATE ON goal_progress "
+        "FOR EACH ROW EXECUTE FUNCTION sync_touch()"
+    )
+    op.execute(
+        "CREATE TRIGGER sync_tombstone AFTER DELETE ON goal_progress "
+        "FOR EACH ROW EXECUTE FUNCTION sync_tombstone()"
+    )
+
+
+def _rename_old(new_name: str) -> None:
+    # Free the table, index and sequence names for the replacement
+    op.execute(f"ALTER TABLE goal_progress RENAME TO {new_name}")
+    for index in INDEXES:
+        op.execute(f"ALTER INDEX IF EXISTS {index} RENAME TO {index.replace('goal_progress', new_name, 1)}")
+    op.execute(f"ALTER TABLE {new_name} ALTER COLUMN id DROP DEFAULT")
+    op.execute("ALTER SEQUENCE goal_progress_id_seq OWNED BY NONE")
+
+
+def _columns(partitioned: bool):
+    return [
+        sa.Column(
+            "id",
+            sa.Integer(),
+            server_default=sa.text("nextval('goal_progress_id_seq')"),
+            nullable=False,
+            primary_key=not partitioned,
+        ),
+        sa.Column("goal_id", sa.Integer(), sa.ForeignKey("goals.id"), nullable=False),
+        sa.Column("value", sa.Float(), nullable=False),
+        sa.Column("notes", sa.Text()),
+        sa.Column("logged_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=not partitioned),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()")),
+        sa.Column("sync_version", sa.BigInteger()),
+    ]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    _rename_old("goal_progress_unpartitioned")
+
+    op.create_table(
+        "goal_progress",
+        *_columns(partitioned=True),
+        sa.PrimaryKeyConstraint("id", "logged_at", name="goal_progress_pkey"),
+        postgresql_partition_by="RANGE (logged_at)",
+    )
+    op.execute("ALTER SEQUENCE goal_progress_id_seq OWNED BY goal_progress.id")
+    op.create_index("ix_goal_progress_id", "goal_progress", ["id"])
+    op.create_index("ix_goal_progress_sync_version", "goal_progress", ["sync_version"])
+    op.create_index("ix_goal_progress_goal_id_logged_at", "goal_progress", ["goal_id", "logged_at"])
+
+    now = datetime.now(timezone.utc)
+    oldest = bind.execute(sa.text("SELECT min(logged_at) FROM goal_progress_unpartitioned")).scalar()
+    op.execute("CREATE TABLE goal_progress_default PARTITION OF goal_progress DEFAULT")
+    _create_partitions(oldest or now, _add_months(_month_start(now), PARTITIONS_AHEAD))
+
+    op.execute(
+        f"INSERT INTO goal_progress ({COLUMNS}) "
+        f"SELECT id, goal_id, value, notes, COALESCE(logged_at, now()), updated_at, sync_version "
+        f"FROM goal_progress_unpartitioned"
+    )
+    op.drop_table("goal_progress_unpartitioned")
+
+    op.create_table(
+        "goal_progress_daily",
+        sa.Column("goal_id", sa.Integer(), sa.ForeignKey("goals.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("total", sa.Float(), nullable=False),
+        sa.Column("entries", sa.Integer(), nullable=False),
+    )
+
+    _install_sync_triggers()
+
+
+def downgrade() -> None:
+    # Archived partitions are left in the archive schema; their daily
+    # totals are dropped with goal_progress_daily
+    op.drop_table("goal_progress_daily")
+    _rename_old("goal_progress_partitioned")
+
+    op.create_table("goal_progress", *_columns(partitioned=False))
+    op.execute("ALTER SEQUENCE goal_progress_id_seq OWNED BY goal_progress.id")
+    op.create_index("ix_goal_progress_id", "goal_progress", ["id"])
+    op.create_index("ix_goal_progress_sync_version", "goal_progress", ["sync_version"])
+
+    op.execute(f"INSERT INTO goal_progress ({COLUMNS}) SELECT {COLUMNS} FROM goal_progress_partitioned")
+    op.execute("DROP TABLE goal_progress_partitioned CASCADE")
+
+    _install_sync_triggers()
@@ -0,0 +1,100 @@
+"""Cascading foreign keys and deletion jobs
+
+Deleting a goal cascades to its progress and deleting an event to its
+exceptions and attendance; deleting a team removes its memberships and sets
+team_id to NULL on its goals and events. Adds indexes on the referencing
+columns the cascades look up, and deletion_jobs for batched deletions.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, column, referenced table, ON DELETE)
+FOREIGN_KEYS = [
+    ("goal_progress", "goal_id", "goals", "CASCADE"),
+    ("goals", "team_id", "teams", "SET NULL"),
+    ("events", "team_id", "teams", "SET NULL"),
+    ("event_exceptions", "event_id", "events", "CASCADE"),
+    ("user_team", "user_id", "users", "CASCADE"),
+    ("user_team", "team_id", "teams", "CASCADE"),
+    ("user_event", "user_id", "users", "CASCADE"),
+    ("user_event", "event_id", "events", "CASCADE"),
+]
+INDEXES = [
+    ("ix_goals_team_id", "goals", "team_id"),
+    ("ix_events_team_id", "events", "team_id"),
+    ("ix_user_team_team_id", "user_team", "team_id"),
+    ("ix_user_event_event_id", "user_event", "event_id"),
+]
+# Partitioned tables cannot take NOT VALID foreign keys
+PARTITIONED = {"goal_progress"}
+
+
+def _replace_foreign_keys(with_ondelete: bool) -> None:
+    for table, column, referenced, ondelete in FOREIGN_KEYS:
+        name = f"{table}_{column}_fkey"
+        op.drop_constraint(name, table, type_="foreignkey")
+        # NOT VALID skips checking the existing rows, so the constraint is
+        # swapped under a brief lock; _validate_foreign_keys() checks them
+        # afterwards
+        op.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({column}) REFERENCES {referenced} (id)"
+            + (f" ON DELETE {ondelete}" if with_ondelete else "")
+            + ("" if table in PARTITIONED else " NOT VALID")
+        )
+
+
+def _validate_foreign_keys() -> None:
+    # VALIDATE itself only takes a SHARE UPDATE EXCLUSIVE lock, which lets
+    # writes through, but in the migration's transaction the scan would run
+    # while the locks taken to swap the constraints are still held. Commit
+    # first, then validate each constraint in a transaction of its own
+    with op.get_context().autocommit_block():
+        for table, column, _, _ in FOREIGN_KEYS:
+            if table not in PARTITIONED:
+                op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {table}_{column}_fkey")
+
+
+def upgrade() -> None:
+    _replace_foreign_keys(with_ondelete=True)
+    _validate_foreign_keys()
+    for name, table, column in INDEXES:
+        op.create_index(name, table, [column])
+
+    op.create_table(
+        "deletion_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("target_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "requested_by_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+        ),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("processed", sa.Integer(), nullable=False),
+        sa.Column("error", sa.Text()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("finished_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_deletion_jobs_id", "deletion_jobs", ["id"])
+    op.create_index("ix_deletion_jobs_target_id", "deletion_jobs", ["target_id"])
+    op.create_index("ix_deletion_jobs_requested_by_id", "deletion_jobs", ["requested_by_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("deletion_jobs")
+    for name, table, column in INDEXES:
+        op.drop_index(name, table)
+    _replace_foreign_keys(with_ondelete=False)
+    _validate_foreign_keys()
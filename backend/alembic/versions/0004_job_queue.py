@@ -0,0 +1,63 @@
+"""Background job queue
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 10:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "jobs",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("payload", postgresql.JSONB(), server_default=sa.text("'{}'::jsonb"), nullable=False),
+        sa.Column("priority", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("dedup_key", sa.String()),
+        sa.Column("run_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("max_attempts", sa.Integer(), nullable=False),
+        sa.Column("locked_by", sa.String()),
+        sa.Column("started_at", sa.DateTime(timezone=True)),
+        sa.Column("timeout_seconds", sa.Float(), nullable=False),
+        sa.Column("timeout_at", sa.DateTime(timezone=True)),
+        sa.Column("finished_at", sa.DateTime(timezone=True)),
+        sa.Column("last_error", sa.Text()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+    )
+    op.create_index(
+        "ix_jobs_ready",
+        "jobs",
+        [sa.text("priority DESC"), "run_at", "id"],
+        postgresql_where=sa.text("status = 'queued'"),
+    )
+    op.create_index(
+        "ix_jobs_dedup_key", "jobs", ["dedup_key"], unique=True, postgresql_where=sa.text("status = 'queued'")
+    )
+    op.create_index("ix_jobs_running", "jobs", ["timeout_at"], postgresql_where=sa.text("status = 'running'"))
+    op.create_index("ix_jobs_finished_at", "jobs", ["finished_at"])
+
+    op.create_table(
+        "job_schedules",
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("rule", sa.String(), nullable=False),
+        sa.Column("next_run_at", sa.DateTime(timezone=True), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("job_schedules")
+    op.drop_table("jobs")
@@ -0,0 +1,56 @@
+"""Reminder scanner marks and indexes
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "reminder_marks",
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("mark", sa.DateTime(timezone=True), nullable=False),
+    )
+    # goals and events may be large; build the indexes without blocking writes
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_goals_due",
+            "goals",
+            ["target_date", "id"],
+            postgresql_where=sa.text("is_completed IS NOT TRUE AND target_date IS NOT NULL"),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_events_upcoming",
+            "events",
+            ["start_time", "id"],
+            postgresql_where=sa.text("recurrence_rule IS NULL"),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_events_series_time_range",
+            "events",
+            ["time_range"],
+            postgresql_using="gist",
+            postgresql_where=sa.text("recurrence_rule IS NOT NULL"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_events_series_time_range", table_name="events")
+    op.drop_index("ix_events_upcoming", table_name="events")
+    op.drop_index("ix_goals_due", table_name="goals")
+    op.drop_table("reminder_marks")
@@ -0,0 +1,28 @@
+"""Dashboard cache version per user
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A constant default: no table rewrite
+    op.add_column(
+        "users", sa.Column("dashboard_version", sa.BigInteger(), nullable=False, server_default="0")
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "dashboard_version")
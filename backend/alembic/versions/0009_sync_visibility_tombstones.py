@@ -0,0 +1,159 @@
+"""Tombstones for every user who loses a row
+
+Deletions and rows that stop being visible (team membership ends, a team is
+deleted, goals and events leave a team, attendance is cancelled) now record
+tombstones for each user who could see them, and progress deleted along with
+its goal keeps the goal's owner and team.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SYNC_TOMBSTONE = """
+CREATE OR REPLACE FUNCTION sync_tombstone() RETURNS trigger AS $$
+DECLARE
+    version bigint := pg_current_xact_id()::text::bigint;
+BEGIN
+    IF TG_TABLE_NAME = 'goals' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES ('goals', OLD.id, NULL, OLD.user_id, OLD.team_id, version);
+    ELSIF TG_TABLE_NAME = 'goal_progress' THEN
+        -- Progress deleted along with its goal was recorded by sync_goal_deleting()
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        SELECT 'goal_progress', OLD.id, OLD.goal_id, g.user_id, g.team_id, version FROM goals g WHERE g.id = OLD.goal_id;
+    ELSIF TG_TABLE_NAME = 'teams' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES ('teams', OLD.id, NULL, NULL, OLD.id, version);
+    ELSIF TG_TABLE_NAME = 'user_team' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES ('user_team', OLD.team_id, OLD.user_id, OLD.user_id, OLD.team_id, version);
+        -- The member loses the team, its memberships, and the goals and
+        -- events they saw through it
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES ('teams', OLD.team_id, NULL, OLD.user_id, NULL, version);
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        SELECT 'user_team', m.team_id, m.user_id, OLD.user_id, NULL, version FROM user_team m WHERE m.team_id = OLD.team_id;
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        SELECT 'goals', g.id, NULL, OLD.user_id, NULL, version FROM goals g WHERE g.team_id = OLD.team_id AND g.user_id <> OLD.user_id;
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        SELECT 'events', e.id, NULL, OLD.user_id, NULL, version FROM events e WHERE e.team_id = OLD.team_id AND NOT (
+            e.organizer_id = OLD.user_id
+            OR EXISTS (SELECT 1 FROM user_event a WHERE a.event_id = e.id AND a.user_id = OLD.user_id)
+            OR EXISTS (SELECT 1 FROM user_team t WHERE t.team_id = e.team_id AND t.user_id = OLD.user_id)
+        );
+    ELSIF TG_TABLE_NAME = 'events' THEN
+        -- Attendees hear through their user_event rows, deleted first
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES ('events', OLD.id, NULL, OLD.organizer_id, OLD.team_id, version);
+    ELSIF TG_TABLE_NAME = 'user_event' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES ('user_event', OLD.event_id, OLD.user_id, OLD.user_id, NULL, version);
+        IF NOT EXISTS (SELECT 1 FROM events e WHERE e.id = OLD.event_id AND (
+            e.organizer_id = OLD.user_id
+            OR EXISTS (SELECT 1 FROM user_event a WHERE a.event_id = e.id AND a.user_id = OLD.user_id)
+            OR EXISTS (SELECT 1 FROM user_team t WHERE t.team_id = e.team_id AND t.user_id = OLD.user_id)
+        )) THEN
+            INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+            VALUES ('events', OLD.event_id, NULL, OLD.user_id, NULL, version);
+        END IF;
+    END IF;
+    RETURN OLD;
+END
+$$ LANGUAGE plpgsql
+"""
+
+SYNC_GOAL_DELETING = """
+CREATE OR REPLACE FUNCTION sync_goal_deleting() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+    SELECT 'goal_progress', p.id, p.goal_id, OLD.user_id, OLD.team_id, pg_current_xact_id()::text::bigint FROM goal_progress p WHERE p.goal_id = OLD.id;
+    RETURN OLD;
+END
+$$ LANGUAGE plpgsql
+"""
+
+SYNC_TEAM_UNLINKED = """
+CREATE OR REPLACE FUNCTION sync_team_unlinked() RETURNS trigger AS $$
+DECLARE
+    version bigint := pg_current_xact_id()::text::bigint;
+BEGIN
+    IF TG_TABLE_NAME = 'goals' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        SELECT 'goals', OLD.id, NULL, m.user_id, NULL, version FROM user_team m WHERE m.team_id = OLD.team_id AND m.user_id <> NEW.user_id AND NOT EXISTS (SELECT 1 FROM user_team n WHERE n.team_id = NEW.team_id AND n.user_id = m.user_id);
+    ELSE
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        SELECT 'events', e.id, NULL, m.user_id, NULL, version FROM user_team m JOIN events e ON e.id = NEW.id WHERE m.team_id = OLD.team_id AND NOT (
+            e.organizer_id = m.user_id
+            OR EXISTS (SELECT 1 FROM user_event a WHERE a.event_id = e.id AND a.user_id = m.user_id)
+            OR EXISTS (SELECT 1 FROM user_team t WHERE t.team_id = e.team_id AND t.user_id = m.user_id)
+        );
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+PREVIOUS_SYNC_TOMBSTONE = """
+CREATE OR REPLACE FUNCTION sync_tombstone() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'goals' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES (TG_TABLE_NAME, OLD.id, NULL, OLD.user_id, OLD.team_id, pg_current_xact_id()::text::bigint);
+    END IF;
+    IF TG_TABLE_NAME = 'goal_progress' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES (TG_TABLE_NAME, OLD.id, OLD.goal_id, (SELECT user_id FROM goals WHERE id = OLD.goal_id), (SELECT team_id FROM goals WHERE id = OLD.goal_id), pg_current_xact_id()::text::bigint);
+    END IF;
+    IF TG_TABLE_NAME = 'teams' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES (TG_TABLE_NAME, OLD.id, NULL, NULL, OLD.id, pg_current_xact_id()::text::bigint);
+    END IF;
+    IF TG_TABLE_NAME = 'user_team' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES (TG_TABLE_NAME, OLD.team_id, OLD.user_id, OLD.user_id, OLD.team_id, pg_current_xact_id()::text::bigint);
+    END IF;
+    IF TG_TABLE_NAME = 'events' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES (TG_TABLE_NAME, OLD.id, NULL, OLD.organizer_id, OLD.team_id, pg_current_xact_id()::text::bigint);
+    END IF;
+    IF TG_TABLE_NAME = 'user_event' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES (TG_TABLE_NAME, OLD.event_id, OLD.user_id, OLD.user_id, NULL, pg_current_xact_id()::text::bigint);
+    END IF;
+    RETURN OLD;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    op.execute(SYNC_TOMBSTONE)
+    op.execute(SYNC_GOAL_DELETING)
+    op.execute(
+        "CREATE TRIGGER sync_goal_deleting BEFORE DELETE ON goals "
+        "FOR EACH ROW EXECUTE FUNCTION sync_goal_deleting()"
+    )
+    op.execute(SYNC_TEAM_UNLINKED)
+    for table in ("goals", "events"):
+        op.execute(
+            f"CREATE TRIGGER sync_team_unlinked AFTER UPDATE OF team_id ON {table} FOR EACH ROW "
+            f"WHEN (OLD.team_id IS NOT NULL AND OLD.team_id IS DISTINCT FROM NEW.team_id) "
+            f"EXECUTE FUNCTION sync_team_unlinked()"
+        )
+
+
+def downgrade() -> None:
+    op.execute("DROP FUNCTION IF EXISTS sync_team_unlinked() CASCADE")
+    op.execute("DROP FUNCTION IF EXISTS sync_goal_deleting() CASCADE")
+    op.execute(PREVIOUS_SYNC_TOMBSTONE)
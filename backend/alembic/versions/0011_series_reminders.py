@@ -0,0 +1,49 @@
+"""Next occurrence of each recurring event for the reminder scanner
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0011"
+down_revision: Union[str, None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "series_reminders",
+        sa.Column("event_id", sa.Integer(), sa.ForeignKey("events.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("next_start", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_series_reminders_next_start", "series_reminders", ["next_start", "event_id"])
+    # Due now: the next scan expands each live series once and moves it to
+    # its real next occurrence
+    op.execute(
+        "INSERT INTO series_reminders (event_id, next_start) "
+        "SELECT id, now() FROM events "
+        "WHERE recurrence_rule IS NOT NULL AND (recurrence_end IS NULL OR recurrence_end > now())"
+    )
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_events_series_time_range", table_name="events", postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_events_series_time_range",
+            "events",
+            ["time_range"],
+            postgresql_using="gist",
+            postgresql_where=sa.text("recurrence_rule IS NOT NULL"),
+            postgresql_concurrently=True,
+        )
+    op.drop_index("ix_series_reminders_next_start", table_name="series_reminders")
+    op.drop_table("series_reminders")
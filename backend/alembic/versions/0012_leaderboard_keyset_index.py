@@ -0,0 +1,44 @@
+"""Descending user_id in the leaderboard rank index for keyset pages
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0012"
+down_revision: Union[str, None] = "0011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _replace_rank_index(user_id_order: str) -> None:
+    # Built next to the old one, so pages keep an index while it builds
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_team_leaderboard_rank_new",
+            "team_leaderboard",
+            [
+                "team_id",
+                sa.text("completion DESC"),
+                sa.text("progress_total DESC"),
+                sa.text("streak DESC"),
+                sa.text(f"user_id {user_id_order}"),
+            ],
+            postgresql_concurrently=True,
+        )
+        op.drop_index("ix_team_leaderboard_rank", table_name="team_leaderboard", postgresql_concurrently=True)
+    op.execute("ALTER INDEX ix_team_leaderboard_rank_new RENAME TO ix_team_leaderboard_rank")
+
+
+def upgrade() -> None:
+    _replace_rank_index("DESC")
+
+
+def downgrade() -> None:
+    _replace_rank_index("ASC")
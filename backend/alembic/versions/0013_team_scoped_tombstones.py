@@ -0,0 +1,155 @@
+"""One tombstone per membership or team link instead of one per member
+
+A member leaving a team, or a team being deleted, recorded tombstones for
+every other membership, goal and event of the team, and a goal or event
+leaving a team recorded one per member, so team deletes grew with the square
+of the team size. Now each records a single tombstone, and /sync works out
+what the user can no longer see.
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0013"
+down_revision: Union[str, None] = "0012"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SYNC_TOMBSTONE = """
+CREATE OR REPLACE FUNCTION sync_tombstone() RETURNS trigger AS $$
+DECLARE
+    version bigint := pg_current_xact_id()::text::bigint;
+BEGIN
+    IF TG_TABLE_NAME = 'goals' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES ('goals', OLD.id, NULL, OLD.user_id, OLD.team_id, version);
+    ELSIF TG_TABLE_NAME = 'goal_progress' THEN
+        -- Progress deleted along with its goal was recorded by sync_goal_deleting()
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        SELECT 'goal_progress', OLD.id, OLD.goal_id, g.user_id, g.team_id, version FROM goals g WHERE g.id = OLD.goal_id;
+    ELSIF TG_TABLE_NAME = 'teams' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES ('teams', OLD.id, NULL, NULL, OLD.id, version);
+    ELSIF TG_TABLE_NAME = 'user_team' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES ('user_team', OLD.team_id, OLD.user_id, OLD.user_id, OLD.team_id, version);
+    ELSIF TG_TABLE_NAME = 'events' THEN
+        -- Attendees hear through their user_event rows, deleted first
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES ('events', OLD.id, NULL, OLD.organizer_id, OLD.team_id, version);
+    ELSIF TG_TABLE_NAME = 'user_event' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES ('user_event', OLD.event_id, OLD.user_id, OLD.user_id, NULL, version);
+        IF NOT EXISTS (SELECT 1 FROM events e WHERE e.id = OLD.event_id AND (
+            e.organizer_id = OLD.user_id
+            OR EXISTS (SELECT 1 FROM user_event a WHERE a.event_id = e.id AND a.user_id = OLD.user_id)
+            OR EXISTS (SELECT 1 FROM user_team t WHERE t.team_id = e.team_id AND t.user_id = OLD.user_id)
+        )) THEN
+            INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+            VALUES ('events', OLD.event_id, NULL, OLD.user_id, NULL, version);
+        END IF;
+    END IF;
+    RETURN OLD;
+END
+$$ LANGUAGE plpgsql
+"""
+
+SYNC_TEAM_UNLINKED = """
+CREATE OR REPLACE FUNCTION sync_team_unlinked() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+    VALUES (TG_TABLE_NAME, OLD.id, NULL, NULL, OLD.team_id, pg_current_xact_id()::text::bigint);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+PREVIOUS_SYNC_TOMBSTONE = """
+CREATE OR REPLACE FUNCTION sync_tombstone() RETURNS trigger AS $$
+DECLARE
+    version bigint := pg_current_xact_id()::text::bigint;
+BEGIN
+    IF TG_TABLE_NAME = 'goals' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES ('goals', OLD.id, NULL, OLD.user_id, OLD.team_id, version);
+    ELSIF TG_TABLE_NAME = 'goal_progress' THEN
+        -- Progress deleted along with its goal was recorded by sync_goal_deleting()
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        SELECT 'goal_progress', OLD.id, OLD.goal_id, g.user_id, g.team_id, version FROM goals g WHERE g.id = OLD.goal_id;
+    ELSIF TG_TABLE_NAME = 'teams' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES ('teams', OLD.id, NULL, NULL, OLD.id, version);
+    ELSIF TG_TABLE_NAME = 'user_team' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES ('user_team', OLD.team_id, OLD.user_id, OLD.user_id, OLD.team_id, version);
+        -- The member loses the team, its memberships, and the goals and
+        -- events they saw through it
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES ('teams', OLD.team_id, NULL, OLD.user_id, NULL, version);
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        SELECT 'user_team', m.team_id, m.user_id, OLD.user_id, NULL, version FROM user_team m WHERE m.team_id = OLD.team_id;
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        SELECT 'goals', g.id, NULL, OLD.user_id, NULL, version FROM goals g WHERE g.team_id = OLD.team_id AND g.user_id <> OLD.user_id;
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        SELECT 'events', e.id, NULL, OLD.user_id, NULL, version FROM events e WHERE e.team_id = OLD.team_id AND NOT (
+            e.organizer_id = OLD.user_id
+            OR EXISTS (SELECT 1 FROM user_event a WHERE a.event_id = e.id AND a.user_id = OLD.user_id)
+            OR EXISTS (SELECT 1 FROM user_team t WHERE t.team_id = e.team_id AND t.user_id = OLD.user_id)
+        );
+    ELSIF TG_TABLE_NAME = 'events' THEN
+        -- Attendees hear through their user_event rows, deleted first
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES ('events', OLD.id, NULL, OLD.organizer_id, OLD.team_id, version);
+    ELSIF TG_TABLE_NAME = 'user_event' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        VALUES ('user_event', OLD.event_id, OLD.user_id, OLD.user_id, NULL, version);
+        IF NOT EXISTS (SELECT 1 FROM events e WHERE e.id = OLD.event_id AND (
+            e.organizer_id = OLD.user_id
+            OR EXISTS (SELECT 1 FROM user_event a WHERE a.event_id = e.id AND a.user_id = OLD.user_id)
+            OR EXISTS (SELECT 1 FROM user_team t WHERE t.team_id = e.team_id AND t.user_id = OLD.user_id)
+        )) THEN
+            INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+            VALUES ('events', OLD.event_id, NULL, OLD.user_id, NULL, version);
+        END IF;
+    END IF;
+    RETURN OLD;
+END
+$$ LANGUAGE plpgsql
+"""
+
+PREVIOUS_SYNC_TEAM_UNLINKED = """
+CREATE OR REPLACE FUNCTION sync_team_unlinked() RETURNS trigger AS $$
+DECLARE
+    version bigint := pg_current_xact_id()::text::bigint;
+BEGIN
+    IF TG_TABLE_NAME = 'goals' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        SELECT 'goals', OLD.id, NULL, m.user_id, NULL, version FROM user_team m WHERE m.team_id = OLD.team_id AND m.user_id <> NEW.user_id AND NOT EXISTS (SELECT 1 FROM user_team n WHERE n.team_id = NEW.team_id AND n.user_id = m.user_id);
+    ELSE
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)
+        SELECT 'events', e.id, NULL, m.user_id, NULL, version FROM user_team m JOIN events e ON e.id = NEW.id WHERE m.team_id = OLD.team_id AND NOT (
+            e.organizer_id = m.user_id
+            OR EXISTS (SELECT 1 FROM user_event a WHERE a.event_id = e.id AND a.user_id = m.user_id)
+            OR EXISTS (SELECT 1 FROM user_team t WHERE t.team_id = e.team_id AND t.user_id = m.user_id)
+        );
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    op.execute(SYNC_TOMBSTONE)
+    op.execute(SYNC_TEAM_UNLINKED)
+
+
+def downgrade() -> None:
+    op.execute(PREVIOUS_SYNC_TEAM_UNLINKED)
+    op.execute(PREVIOUS_SYNC_TOMBSTONE)
@@ -1,10 +1,15 @@
 from fastapi import APIRouter
 
-from app.api.endpoints import auth, users, goals, teams, events
+from app.api.endpoints import admin, auth, dashboard, deletions, users, goals, teams, events, feeds, sync
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["authentication"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(goals.router, prefix="/goals", tags=["goals"])
 api_router.include_router(teams.router, prefix="/teams", tags=["teams"])
-api_router.include_router(events.router, prefix="/events", tags=["events"])
\ No newline at end of file
+api_router.include_router(events.router, prefix="/events", tags=["events"])
+api_router.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"])
+api_router.include_router(feeds.router, prefix="/feeds", tags=["feeds"])
+api_router.include_router(sync.router, prefix="/sync", tags=["sync"])
+api_router.include_router(deletions.router, prefix="/deletions", tags=["deletions"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
\ No newline at end of file
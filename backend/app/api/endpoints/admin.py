@@ -0,0 +1,73 @@
+import os
+import time
+from typing import Any, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+
+from app.core.deadlines import DeadlineRoute
+from app.core.deps import get_current_active_superuser
+from app.core.profiler import ProfilerBusy, profiler
+from app.models.user import User
+
+router = APIRouter(route_class=DeadlineRoute)
+
+
+@router.post("/profile", response_class=PlainTextResponse)
+def profile_worker(
+    *,
+    request: Request,
+    seconds: float = Query(10.0, gt=0, le=300),
+    interval_ms: float = Query(10.0, ge=1, le=1000),
+    route: Optional[str] = Query(
+        None, description='Route template, e.g. "/api/v1/teams/{team_id}" or "GET /api/v1/events/calendar/month"'
+    ),
+    header: Optional[str] = Query(
+        None, description='Only sample requests carrying this header, e.g. "X-Profile" or "X-Profile: 1"'
+    ),
+    current_user: User = Depends(get_current_active_superuser),
+) -> Any:
+    """
+    Sample the worker serving this request and return collapsed stacks
+    (flamegraph.pl / speedscope format). Admin only.
+    """
+    routes = None
+    if route:
+        method, _, path = route.strip().rpartition(" ")
+        routes = [
+            r
+            for r in request.app.routes
+            if getattr(r, "path", None) == path
+            and (not method or method.upper() in getattr(r, "methods", ()))
+        ]
+        if not routes:
+            raise HTTPException(status_code=400, detail=f"No route matches {route!r}")
+
+    header_filter = None
+    if header:
+        name, _, value = header.partition(":")
+        header_filter = (
+            name.strip().lower().encode("latin-1"),
+            value.strip().encode("latin-1") if value.strip() else None,
+        )
+
+    try:
+        session = profiler.profile(
+            request.app,
+            seconds,
+            interval_ms / 1000,
+            routes=routes,
+            header=header_filter,
+        )
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    filename = f"profile-{os.getpid()}-{int(time.time())}.collapsed"
+    return PlainTextResponse(
+        session.collapsed(),
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Profile-Pid": str(os.getpid()),
+            "X-Profile-Samples": str(session.sample_count),
+        },
+    )
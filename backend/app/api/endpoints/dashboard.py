@@ -0,0 +1,201 @@
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy import func
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core import deadlines
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.deadlines import DeadlineRoute
+from app.core.deps import get_current_active_user
+from app.core.metrics import DASHBOARD_SECTION_FAILURES
+from app.db.base import SessionLocal, replicas
+from app.db.session import reads_from_primary
+from app.models.goal import Goal, GoalProgress
+from app.models.team import Team
+from app.models.user import User, user_team
+from app.schemas.dashboard import Dashboard, DashboardGoal, Streak
+from app.schemas.event import Event as EventSchema
+from app.schemas.team import Team as TeamSchema
+from app.services.calendar import events_in_window
+from app.services.recurrence import as_utc
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(route_class=DeadlineRoute)
+
+UPCOMING_DAYS = 7
+UPCOMING_LIMIT = 10
+
+# Shared by all requests so a burst of dashboard loads cannot open an
+# unbounded number of connections
+_executor = ThreadPoolExecutor(max_workers=settings.DASHBOARD_WORKERS, thread_name_prefix="dashboard")
+
+
+def _goals(db: Session, user_id: int, today: datetime) -> Any:
+    week_start = today - timedelta(days=today.weekday())
+    week_progress = (
+        db.query(GoalProgress.goal_id, func.sum(GoalProgress.value).label("total"))
+        .join(Goal, Goal.id == GoalProgress.goal_id)
+        .filter(Goal.user_id == user_id, GoalProgress.logged_at >= week_start)
+        .group_by(GoalProgress.goal_id)
+        .subquery()
+    )
+    rows = (
+        db.query(Goal, func.coalesce(week_progress.c.total, 0.0))
+        .outerjoin(week_progress, week_progress.c.goal_id == Goal.id)
+        .filter(Goal.user_id == user_id, Goal.is_completed.is_(False))
+        .order_by(Goal.target_date.asc().nullslast(), Goal.id)
+        .all()
+    )
+    goals = []
+    for goal, total in rows:
+        item = DashboardGoal.from_orm(goal)
+        item.week_progress = total
+        goals.append(item)
+    completed = db.query(func.count(Goal.id)).filter(Goal.user_id == user_id, Goal.is_completed.is_(True)).scalar()
+    return {"goals": goals, "completed_goals": completed}
+
+
+def _teams(db: Session, user_id: int, today: datetime) -> Any:
+    teams = (
+        db.query(Team)
+        .join(user_team, user_team.c.team_id == Team.id)
+        .filter(user_team.c.user_id == user_id)
+        .order_by(Team.name)
+        .all()
+    )
+    return [TeamSchema.from_orm(team) for team in teams]
+
+
+def _event(event: Any) -> EventSchema:
+    return EventSchema(**event) if isinstance(event, dict) else EventSchema.from_orm(event)
+
+
+def _events(db: Session, user_id: int, today: datetime) -> Any:
+    tomorrow = today + timedelta(days=1)
+    events = events_in_window(db, user_id, today, tomorrow + timedelta(days=UPCOMING_DAYS))
+    return {
+        "today_events": [_event(e) for e in events if _start(e) < tomorrow],
+        "upcoming_events": [_event(e) for e in events if _start(e) >= tomorrow][:UPCOMING_LIMIT],
+    }
+
+
+def _start(event: Any) -> datetime:
+    return as_utc(event["start_time"] if isinstance(event, dict) else event.start_time)
+
+
+def _streak(db: Session, user_id: int, today: datetime) -> Any:
+    current, longest, last_logged_at = (
+        db.query(User.current_streak, User.longest_streak, func.max(GoalProgress.logged_at))
+        .outerjoin(Goal, Goal.user_id == User.id)
+        .outerjoin(GoalProgress, GoalProgress.goal_id == Goal.id)
+        .filter(User.id == user_id)
+        .group_by(User.id)
+        .one()
+    )
+    return Streak(
+        current_streak=current or 0,
+        longest_streak=longest or 0,
+        last_logged_at=last_logged_at,
+        logged_today=last_logged_at is not None and as_utc(last_logged_at) >= today,
+    )
+
+
+SECTIONS: Dict[str, Callable[[Session, int, datetime], Any]] = {
+    "goals": _goals,
+    "teams": _teams,
+    "events": _events,
+    "streak": _streak,
+}
+
+_caches = {
+    name: LRUCache(f"dashboard_{name}", settings.DASHBOARD_CACHE_SIZE, ttl=settings.DASHBOARD_CACHE_SECONDS.get(name))
+    for name in SECTIONS
+}
+
+
+def _load_section(
+    name: str, user_id: int, version: int, today: datetime, expires_at: float, replica: Optional[Engine]
+) -> Any:
+    """
+    Run one section on its own session, reading from ``replica`` or, when
+    None, the primary. Cached under the user's dashboard version, which
+    committed writes bump (see app.services.dashboard).
+    """
+    key = (user_id, version, today)
+    cached = _caches[name].get(key)
+    if cached is not None:
+        return cached
+    db = SessionLocal()
+    try:
+        db.replica = replica
+        db.use_primary = replica is None
+        # Once the request stops waiting for the section, its next statement
+        # fails instead of keeping a pool thread and a connection busy
+        with deadlines.limit(expires_at - time.monotonic()):
+            value = SECTIONS[name](db, user_id, today)
+    finally:
+        db.close()
+    _caches[name].set(key, value)
+    return value
+
+
+@router.get("/", response_model=Dashboard)
+def read_dashboard(
+    request: Request,
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Everything the dashboard screen shows, in one request. Days and weeks
+    are in UTC.
+
+    Sections are queried concurrently. One that fails or takes longer than
+    DASHBOARD_SECTION_TIMEOUT_SECONDS is returned as null and named in
+    errors instead of failing the whole response. Sections are cached per
+    user until something they show changes. All of them read from the same
+    replica, so they agree with each other.
+    """
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    version = current_user.dashboard_version
+    expires_at = time.monotonic() + settings.DASHBOARD_SECTION_TIMEOUT_SECONDS
+    replica = None if reads_from_primary(request) else replicas.choose()
+
+    futures = {
+        _executor.submit(
+            contextvars.copy_context().run, _load_section, name, current_user.id, version, today, expires_at, replica
+        ): name
+        for name in SECTIONS
+    }
+    done, _ = wait(futures, timeout=settings.DASHBOARD_SECTION_TIMEOUT_SECONDS)
+
+    dashboard = {"user": current_user, "errors": {}}
+    for future, name in futures.items():
+        if future not in done:
+            future.cancel()
+            DASHBOARD_SECTION_FAILURES.labels(name, "timeout").inc()
+            dashboard["errors"][name] = "timed out"
+            continue
+        try:
+            value = future.result()
+        except deadlines.DeadlineExceeded:
+            DASHBOARD_SECTION_FAILURES.labels(name, "timeout").inc()
+            dashboard["errors"][name] = "timed out"
+            continue
+        except Exception:
+            logger.exception("Dashboard section %s failed", name)
+            DASHBOARD_SECTION_FAILURES.labels(name, "error").inc()
+            dashboard["errors"][name] = "unavailable"
+            continue
+        if name in ("goals", "events"):
+            dashboard.update(value)
+        else:
+            dashboard[name] = value
+    return dashboard
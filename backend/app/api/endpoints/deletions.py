@@ -0,0 +1,33 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.core.deadlines import DeadlineRoute
+from app.core.deps import get_current_active_user
+from app.db.session import get_db
+from app.models.deletion import DeletionJob
+from app.models.user import User
+from app.schemas.deletion import DeletionJob as DeletionJobSchema
+
+router = APIRouter(route_class=DeadlineRoute)
+
+
+@router.get("/{job_id}", response_model=DeletionJobSchema)
+def read_deletion(
+    *,
+    db: Session = Depends(get_db),
+    job_id: int,
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Progress of a background deletion started by the current user.
+    """
+    # Written moments ago by the request that started it
+    db.use_primary = True
+    job = db.query(DeletionJob).filter(
+        DeletionJob.id == job_id, DeletionJob.requested_by_id == current_user.id
+    ).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Deletion not found")
+    return job
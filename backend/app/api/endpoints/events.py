@@ -1,22 +1,156 @@
-from typing import Any, List
+from typing import Any, List, Optional
 from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
+from app.api.fieldsets import FIELDS_DESCRIPTION, INCLUDE_DESCRIPTION, FieldSet
+from app.core.deadlines import DeadlineRoute, deadline
 from app.core.deps import get_current_active_user
 from app.db.session import get_db
+from app.db.writes import insert_returning, set_loaded, update_returning
 from app.models.user import User
-from app.models.event import Event
+from app.models.team import Team
+from app.models.event import Event, EventException, overlaps_window, user_event
 from app.schemas.event import (
     Event as EventSchema,
     EventCreate,
     EventUpdate,
     EventWithAttendees,
-    EventComplete
+    EventComplete,
+    EventConflict,
+    EventException as EventExceptionSchema,
+    EventExceptionCreate
 )
+from app.schemas.team import TeamBase
+from app.schemas.user import UserBase
+from app.services import dashboard, idempotency, outbox, reminders, team_stats
+from app.services.calendar import attach_exceptions, events_in_window, visible_to
+from app.services.recurrence import as_utc, expand_series, is_occurrence, series_end
 
-router = APIRouter()
+router = APIRouter(route_class=DeadlineRoute)
+
+EVENT_FIELDS = FieldSet(
+    Event,
+    EventSchema,
+    relationships={"organizer": UserBase, "team": TeamBase, "attendees": UserBase},
+    computed={
+        "attendee_count": lambda: select(func.count())
+        .where(user_event.c.event_id == Event.id)
+        .correlate(Event)
+        .scalar_subquery(),
+    },
+)
+
+
+def _load_attendees(db: Session, event_id: int) -> List[User]:
+    return (
+        db.query(User)
+        .join(user_event, user_event.c.user_id == User.id)
+        .filter(user_event.c.event_id == event_id)
+        .all()
+    )
+
+
+def _replace_attendees(
+    db: Session, event_id: int, organizer: User, attendee_ids: Optional[List[int]]
+) -> List[User]:
+    """
+    Set the attendees of an event to the organizer plus the existing users in
+    attendee_ids, using one lookup and one multi-row insert.
+    """
+    attendees = [organizer]
+    other_ids = set(attendee_ids or []) - {organizer.id}
+    if other_ids:
+        attendees += db.query(User).filter(User.id.in_(other_ids)).all()
+    db.execute(
+        insert(user_event),
+        [{"user_id": attendee.id, "event_id": event_id} for attendee in attendees],
+    )
+    return attendees
+
+
+def _touch(db: Session, event_id: int) -> None:
+    # Exceptions are part of the event as far as feeds are concerned
+    db.execute(update(Event).where(Event.id == event_id).values(updated_at=func.now()))
+
+
+def _recurrence_end(rule: Optional[str], start_time: datetime, end_time: datetime) -> Optional[datetime]:
+    if not rule:
+        return None
+    try:
+        return series_end(rule, start_time, end_time)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _check_times(start_time: Optional[datetime], end_time: Optional[datetime]) -> None:
+    # Checked before writing: ck_events_end_after_start and the NOT NULL
+    # constraints would turn these into a 500
+    if start_time is None or end_time is None:
+        raise HTTPException(status_code=400, detail="start_time and end_time cannot be null")
+    if as_utc(end_time) < as_utc(start_time):
+        raise HTTPException(status_code=400, detail="end_time must not be before start_time")
+
+
+def _find_conflicts(
+    db: Session,
+    start: datetime,
+    end: datetime,
+    attendee_ids,
+    exclude_event_id: Optional[int] = None,
+) -> List[dict]:
+    """
+    Events any of the given users attends that overlap [start, end), one row
+    per (event, user). attendee_ids may be a collection or a SELECT of ids.
+    """
+    query = (
+        db.query(Event, user_event.c.user_id)
+        .join(user_event, user_event.c.event_id == Event.id)
+        .filter(user_event.c.user_id.in_(attendee_ids), overlaps_window(start, end))
+    )
+    if exclude_event_id is not None:
+        query = query.filter(Event.id != exclude_event_id)
+    rows = query.all()
+    
+    conflicts = [
+        {"event_id": e.id, "user_id": user_id, "title": e.title, "start_time": e.start_time, "end_time": e.end_time}
+        for e, user_id in rows
+        if not e.recurrence_rule
+    ]
+    # A series matches on its whole lifetime; keep it only if an actual
+    # occurrence overlaps the slot
+    series = list({e.id: e for e, _ in rows if e.recurrence_rule}.values())
+    attach_exceptions(db, series)
+    occurrences = {}
+    for occurrence in expand_series(series, start, end, overlap=True):
+        occurrences.setdefault(occurrence["id"], occurrence)
+    conflicts += [
+        {
+            "event_id": e.id,
+            "user_id": user_id,
+            "title": occurrences[e.id]["title"],
+            "start_time": occurrences[e.id]["start_time"],
+            "end_time": occurrences[e.id]["end_time"],
+        }
+        for e, user_id in rows
+        if e.id in occurrences
+    ]
+    return conflicts
+
+
+def _raise_on_conflicts(conflicts: List[dict]) -> None:
+    if conflicts:
+        raise HTTPException(
+            status_code=409,
+            detail={
+                "message": "Attendees already have events at this time",
+                "conflicts": [EventConflict(**c).dict() for c in conflicts],
+            },
+        )
 
 
 @router.get("/", response_model=List[EventSchema])
@@ -30,7 +164,13 @@ def read_events(
 ) -> Any:
     """
     Retrieve events.
+
+    When both start_date and end_date are given, recurring events are
+    expanded into their occurrences within that range.
     """
+    if start_date and end_date:
+        return events_in_window(db, current_user.id, start_date, end_date)[skip : skip + limit]
+    
     query = db.query(Event).filter(
         (Event.organizer_id == current_user.id) |  # Events organized by the user
         (Event.attendees.any(id=current_user.id))  # Events the user is attending
@@ -45,42 +185,93 @@ def read_events(
     return events
 
 
+@router.get("/overlapping", response_model=List[EventSchema])
+def read_overlapping_events(
+    db: Session = Depends(get_db),
+    start: datetime = Query(...),
+    end: datetime = Query(...),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Get the events of the current user that overlap [start, end), including
+    occurrences of recurring events and events that started earlier.
+    """
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    return events_in_window(db, current_user.id, start, end)
+
+
 @router.post("/", response_model=EventComplete)
 def create_event(
     *,
     db: Session = Depends(get_db),
     event_in: EventCreate,
+    check_conflicts: bool = False,
     current_user: User = Depends(get_current_active_user),
+    idempotent: Optional[idempotency.IdempotentRequest] = Depends(idempotency.idempotency_key),
 ) -> Any:
     """
     Create new event.
+
+    With check_conflicts, responds 409 listing the clashing events if any
+    attendee already has an event overlapping this one. For recurring events
+    only the first occurrence is checked.
+
+    A retry with the same Idempotency-Key header returns the first response
+    instead of creating the event again.
     """
+    replay = idempotency.begin(db, current_user.id, idempotent)
+    if replay is not None:
+        return replay
+    
+    recurrence_end = _recurrence_end(event_in.recurrence_rule, event_in.start_time, event_in.end_time)
+    
+    if check_conflicts:
+        attendee_ids = {current_user.id, *(event_in.attendee_ids or [])}
+        _raise_on_conflicts(_find_conflicts(db, event_in.start_time, event_in.end_time, attendee_ids))
+    
     # Create the event
-    event = Event(
-        title=event_in.title,
-        description=event_in.description,
-        start_time=event_in.start_time,
-        end_time=event_in.end_time,
-        event_type=event_in.event_type,
-        location=event_in.location,
-        meeting_link=event_in.meeting_link,
-        team_id=event_in.team_id,
-        organizer_id=current_user.id
+    event = insert_returning(
+        db,
+        Event,
+        {
+            "title": event_in.title,
+            "description": event_in.description,
+            "start_time": event_in.start_time,
+            "end_time": event_in.end_time,
+            "event_type": event_in.event_type,
+            "location": event_in.location,
+            "meeting_link": event_in.meeting_link,
+            "recurrence_rule": event_in.recurrence_rule,
+            "recurrence_end": recurrence_end,
+            "team_id": event_in.team_id,
+            "organizer_id": current_user.id,
+        },
     )
     
-    # Add the organizer as an attendee
-    event.attendees.append(current_user)
-    
-    # Add other attendees if provided
-    if event_in.attendee_ids:
-        for attendee_id in event_in.attendee_ids:
-            attendee = db.query(User).filter(User.id == attendee_id).first()
-            if attendee:
-                event.attendees.append(attendee)
+    # Add the organizer and other attendees if provided
+    attendees = _replace_attendees(db, event.id, current_user, event_in.attendee_ids)
     
-    db.add(event)
+    team = db.get(Team, event.team_id) if event.team_id else None
+    set_loaded(event, organizer=current_user, team=team, attendees=attendees)
+    if event.team_id is not None:
+        outbox.add(
+            db,
+            "event_created",
+            {
+                "event_id": event.id,
+                "title": event.title,
+                "organizer": current_user.full_name or current_user.username,
+                "start_time": event.start_time.isoformat(),
+            },
+            team_id=event.team_id,
+            actor_id=current_user.id,
+        )
+    reminders.queue_event(db, event)
+    dashboard.invalidate(db, [attendee.id for attendee in attendees])
+    idempotency.save(db, current_user.id, idempotent, EventComplete, event)
     db.commit()
-    db.refresh(event)
+    team_stats.invalidate(event.team_id)
     return event
 
 
@@ -90,39 +281,66 @@ def update_event(
     db: Session = Depends(get_db),
     event_id: int,
     event_in: EventUpdate,
+    check_conflicts: bool = False,
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
     Update an event.
+
+    With check_conflicts, responds 409 if the updated time overlaps another
+    event of any attendee (see create_event).
     """
-    event = db.query(Event).filter(Event.id == event_id).first()
+    # Update event fields; only the organizer of the event may do so
+    update_data = event_in.dict(exclude_unset=True, exclude={"attendee_ids"})
+    criteria = [Event.id == event_id, Event.organizer_id == current_user.id]
+    if update_data.keys() & {"start_time", "end_time"}:
+        # A patch may set only one of them; check it against the stored
+        # other one, locked so a concurrent patch cannot change it meanwhile
+        current = db.execute(select(Event.start_time, Event.end_time).where(*criteria).with_for_update()).first()
+        if current is not None:
+            _check_times(
+                update_data.get("start_time", current.start_time),
+                update_data.get("end_time", current.end_time),
+            )
+    event = update_returning(db, Event, criteria, update_data)
     if not event:
-        raise HTTPException(status_code=404, detail="Event not found")
-    
-    # Check if user is the organizer of the event
-    if event.organizer_id != current_user.id:
+        if db.query(Event.id).filter(Event.id == event_id).first() is None:
+            raise HTTPException(status_code=404, detail="Event not found")
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    # Update event fields
-    update_data = event_in.dict(exclude_unset=True, exclude={"attendee_ids"})
-    for field, value in update_data.items():
-        setattr(event, field, value)
+    if update_data.keys() & {"recurrence_rule", "start_time", "end_time"}:
+        event.recurrence_end = _recurrence_end(event.recurrence_rule, event.start_time, event.end_time)
+    
+    if check_conflicts:
+        if event_in.attendee_ids is not None:
+            attendee_ids = {current_user.id, *event_in.attendee_ids}
+        else:
+            attendee_ids = select(user_event.c.user_id).where(user_event.c.event_id == event_id)
+        conflicts = _find_conflicts(db, event.start_time, event.end_time, attendee_ids, exclude_event_id=event_id)
+        if conflicts:
+            db.rollback()
+            _raise_on_conflicts(conflicts)
     
-    # Update attendees if provided
+    # Update attendees if provided, keeping the organizer; whoever attended
+    # before or after sees the change
+    dashboard.invalidate(db, dashboard.event_attendees(event_id))
     if event_in.attendee_ids is not None:
-        # Clear current attendees (except organizer)
-        event.attendees = [current_user]  # Keep organizer
-        
-        # Add new attendees
-        for attendee_id in event_in.attendee_ids:
-            if attendee_id != current_user.id:  # Skip organizer (already added)
-                attendee = db.query(User).filter(User.id == attendee_id).first()
-                if attendee:
-                    event.attendees.append(attendee)
+        db.execute(delete(user_event).where(user_event.c.event_id == event_id))
+        attendees = _replace_attendees(db, event_id, current_user, event_in.attendee_ids)
+        dashboard.invalidate(db, [attendee.id for attendee in attendees])
+    else:
+        attendees = _load_attendees(db, event_id)
     
-    db.add(event)
+    team = db.get(Team, event.team_id) if event.team_id else None
+    set_loaded(event, organizer=current_user, team=team, attendees=attendees)
+    if update_data.keys() & {"recurrence_rule", "start_time"} or event_in.attendee_ids is not None:
+        reminders.queue_event(db, event)
     db.commit()
-    db.refresh(event)
+    if "team_id" in update_data:
+        # The previous team is not known here
+        team_stats.invalidate()
+    else:
+        team_stats.invalidate(event.team_id)
     return event
 
 
@@ -131,11 +349,27 @@ def read_event(
     *,
     db: Session = Depends(get_db),
     event_id: int,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
     Get event by ID.
+
+    With fields/include only the requested columns, relationships
+    (organizer, team, attendees) and attendee_count are queried.
     """
+    selection = EVENT_FIELDS.select(fields, include)
+    if selection:
+        event = EVENT_FIELDS.first(
+            db.query(Event).filter(Event.id == event_id, visible_to(current_user.id)), selection
+        )
+        if event is None:
+            if db.query(Event.id).filter(Event.id == event_id).first() is None:
+                raise HTTPException(status_code=404, detail="Event not found")
+            raise HTTPException(status_code=403, detail="Not enough permissions")
+        return JSONResponse(event)
+    
     event = db.query(Event).filter(Event.id == event_id).first()
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
@@ -165,8 +399,11 @@ def delete_event(
     if event.organizer_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
+    # Before the attendance goes with the cascade
+    dashboard.invalidate(db, dashboard.event_attendees(event_id))
     db.delete(event)
     db.commit()
+    team_stats.invalidate(event.team_id)
     return event
 
 
@@ -184,13 +421,20 @@ def attend_event(
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     
-    if current_user in event.attendees:
+    added = db.execute(
+        pg_insert(user_event)
+        .values(user_id=current_user.id, event_id=event_id)
+        .on_conflict_do_nothing()
+        .returning(user_event.c.user_id)
+    ).first()
+    if added is None:
         raise HTTPException(status_code=400, detail="Already attending this event")
     
-    event.attendees.append(current_user)
-    db.add(event)
+    set_loaded(event, attendees=_load_attendees(db, event_id))
+    reminders.queue_event(db, event)
+    dashboard.invalidate(db, [current_user.id])
     db.commit()
-    db.refresh(event)
+    team_stats.invalidate(event.team_id)
     return event
 
 
@@ -217,7 +461,9 @@ def cancel_attendance(
     
     event.attendees.remove(current_user)
     db.add(event)
+    dashboard.invalidate(db, [current_user.id])
     db.commit()
+    team_stats.invalidate(event.team_id)
     db.refresh(event)
     return event
 
@@ -241,16 +487,13 @@ def get_events_for_week(
     end_of_week = start_of_week + timedelta(days=7)
     
     # Query events for the week
-    events = db.query(Event).filter(
-        ((Event.organizer_id == current_user.id) | (Event.attendees.any(id=current_user.id))),
-        Event.start_time >= start_of_week,
-        Event.start_time < end_of_week
-    ).all()
+    events = events_in_window(db, current_user.id, start_of_week, end_of_week)
     
     return events
 
 
 @router.get("/calendar/month", response_model=List[EventSchema])
+@deadline(5.0)
 def get_events_for_month(
     *,
     db: Session = Depends(get_db),
@@ -274,11 +517,7 @@ def get_events_for_month(
         end_of_month = datetime(year, month + 1, 1, 0, 0, 0)
     
     # Query events for the month
-    events = db.query(Event).filter(
-        ((Event.organizer_id == current_user.id) | (Event.attendees.any(id=current_user.id))),
-        Event.start_time >= start_of_month,
-        Event.start_time < end_of_month
-    ).all()
+    events = events_in_window(db, current_user.id, start_of_month, end_of_month)
     
     return events
 
@@ -301,10 +540,74 @@ def get_events_for_day(
     end_of_day = start_of_day + timedelta(days=1)
     
     # Query events for the day
-    events = db.query(Event).filter(
-        ((Event.organizer_id == current_user.id) | (Event.attendees.any(id=current_user.id))),
-        Event.start_time >= start_of_day,
-        Event.start_time < end_of_day
-    ).all()
+    events = events_in_window(db, current_user.id, start_of_day, end_of_day)
+    
+    return events
+
+
+@router.post("/{event_id}/exceptions", response_model=EventExceptionSchema)
+def set_event_exception(
+    *,
+    db: Session = Depends(get_db),
+    event_id: int,
+    exception_in: EventExceptionCreate,
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Cancel or modify one occurrence of a recurring event.
+    """
+    event = db.query(Event).filter(Event.id == event_id).first()
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
     
-    return events
\ No newline at end of file
+    # Check if user is the organizer of the event
+    if event.organizer_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    if not event.recurrence_rule or not is_occurrence(event, exception_in.original_start):
+        raise HTTPException(status_code=400, detail="No occurrence starts at original_start")
+    
+    values = exception_in.dict()
+    values["original_start"] = as_utc(exception_in.original_start)
+    stmt = pg_insert(EventException).values(event_id=event_id, **values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[EventException.event_id, EventException.original_start],
+        set_={key: stmt.excluded[key] for key in values if key != "original_start"},
+    ).returning(EventException)
+    exception = db.scalars(stmt).one()
+    _touch(db, event_id)
+    reminders.queue_event(db, event)
+    dashboard.invalidate(db, dashboard.event_attendees(event_id))
+    db.commit()
+    return exception
+
+
+@router.delete("/{event_id}/exceptions/{exception_id}", response_model=EventExceptionSchema)
+def delete_event_exception(
+    *,
+    db: Session = Depends(get_db),
+    event_id: int,
+    exception_id: int,
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Restore an occurrence of a recurring event to what the rule says.
+    """
+    exception = (
+        db.query(EventException)
+        .join(Event, Event.id == EventException.event_id)
+        .filter(
+            EventException.id == exception_id,
+            EventException.event_id == event_id,
+            Event.organizer_id == current_user.id,
+        )
+        .first()
+    )
+    if not exception:
+        raise HTTPException(status_code=404, detail="Exception not found")
+    db.delete(exception)
+    _touch(db, event_id)
+    reminders.queue_event(db, db.get(Event, event_id))
+    dashboard.invalidate(db, dashboard.event_attendees(event_id))
+    db.commit()
+    return exception
\ No newline at end of file
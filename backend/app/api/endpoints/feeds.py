@@ -0,0 +1,153 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import Any, Dict, List
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.deadlines import DeadlineRoute
+from app.core.deps import get_current_active_user, get_feed_user
+from app.core.security import create_feed_token
+from app.db.session import get_db
+from app.models.event import Event, EventException, overlaps_window
+from app.models.team import Team
+from app.models.user import User, user_team
+from app.schemas.user import FeedToken
+from app.services.calendar import visible_to
+from app.services.ical import render_feed
+
+router = APIRouter(route_class=DeadlineRoute)
+
+# Bump when the rendered output changes so clients refetch
+FEED_VERSION = 1
+CALENDAR_MEDIA_TYPE = "text/calendar; charset=utf-8"
+
+
+def _window_start() -> datetime:
+    # Moves once a day so the feed and its ETag stay stable in between
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - timedelta(days=settings.ICAL_FEED_PAST_DAYS)
+
+
+def _load_exceptions(db: Session, event_ids: List[int]) -> Dict[int, List[EventException]]:
+    exceptions: Dict[int, List[EventException]] = {}
+    for exception in db.query(EventException).filter(EventException.event_id.in_(event_ids)):
+        exceptions.setdefault(exception.event_id, []).append(exception)
+    return exceptions
+
+
+def _feed_response(db: Session, name: str, criteria: list, if_none_match: str = None) -> Response:
+    """
+    Answer from a single aggregate query when the client's copy is current,
+    otherwise stream the feed.
+
+    The ETag covers the number, ids and latest update of the events in the
+    feed, so it also changes when events are added, deleted or no longer
+    visible. Last-Modified is informational only: a deletion does not move
+    it, so revalidation relies on If-None-Match.
+    """
+    window_start = _window_start()
+    criteria = [*criteria, overlaps_window(window_start, None)]
+    count, last_modified, id_sum = db.query(
+        func.count(Event.id), func.max(Event.updated_at), func.coalesce(func.sum(Event.id), 0)
+    ).filter(*criteria).one()
+
+    digest = hashlib.sha1(
+        f"{FEED_VERSION}:{name}:{window_start.date()}:{count}:{id_sum}:{last_modified}".encode()
+    ).hexdigest()
+    headers = {"ETag": f'"{digest}"', "Cache-Control": "private, no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+
+    # Weak comparison: compressed feeds carry the ETag as W/"..."
+    client_tags = [tag.strip() for tag in if_none_match.split(",")] if if_none_match else []
+    if any(tag in (headers["ETag"], f"W/{headers['ETag']}") for tag in client_tags):
+        return Response(status_code=304, headers=headers)
+
+    events = (
+        db.query(Event)
+        .filter(*criteria)
+        .order_by(Event.start_time, Event.id)
+        .yield_per(500)
+    )
+    return StreamingResponse(
+        render_feed(name, events, lambda ids: _load_exceptions(db, ids)),
+        media_type=CALENDAR_MEDIA_TYPE,
+        headers=headers,
+    )
+
+
+@router.get("/token", response_model=FeedToken)
+def read_feed_token(
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Get the token to put in the current user's feed URLs. It expires after
+    FEED_TOKEN_EXPIRE_DAYS.
+    """
+    return {"feed_token": create_feed_token(current_user.id, current_user.feed_token_version)}
+
+
+@router.post("/token/rotate", response_model=FeedToken)
+def rotate_feed_token(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Revoke every feed token of the current user and return a new one.
+    """
+    version = db.execute(
+        update(User)
+        .where(User.id == current_user.id)
+        .values(feed_token_version=User.feed_token_version + 1)
+        .returning(User.feed_token_version)
+        .execution_options(synchronize_session="fetch")
+    ).scalar()
+    db.commit()
+    return {"feed_token": create_feed_token(current_user.id, version)}
+
+
+@router.get("/user.ics", response_class=StreamingResponse)
+def read_user_feed(
+    *,
+    db: Session = Depends(get_db),
+    if_none_match: str = Header(None),
+    feed_user: User = Depends(get_feed_user),
+) -> Any:
+    """
+    iCalendar feed of the events the user organizes or attends.
+    """
+    return _feed_response(
+        db, feed_user.full_name or feed_user.username, [visible_to(feed_user.id)], if_none_match
+    )
+
+
+@router.get("/teams/{team_id}.ics", response_class=StreamingResponse)
+def read_team_feed(
+    *,
+    db: Session = Depends(get_db),
+    team_id: int,
+    if_none_match: str = Header(None),
+    feed_user: User = Depends(get_feed_user),
+) -> Any:
+    """
+    iCalendar feed of a team's events, for members of the team.
+    """
+    row = (
+        db.query(Team.name, user_team.c.user_id)
+        .outerjoin(
+            user_team,
+            (user_team.c.team_id == Team.id) & (user_team.c.user_id == feed_user.id),
+        )
+        .filter(Team.id == team_id)
+        .first()
+    )
+    if row is None:
+        raise HTTPException(status_code=404, detail="Team not found")
+    if row.user_id is None:
+        raise HTTPException(status_code=403, detail="Not a member of this team")
+    return _feed_response(db, row.name, [Event.team_id == team_id], if_none_match)
@@ -1,36 +1,80 @@
-from typing import Any, List
-from datetime import datetime
+from typing import Any, List, Optional
+from datetime import date, datetime, time, timedelta, timezone
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import case, func, select, union_all
+from sqlalchemy.orm import Session, joinedload, selectinload
 
+from app.api.fieldsets import FIELDS_DESCRIPTION, INCLUDE_DESCRIPTION, FieldSet
+from app.core.config import settings
+from app.core.deadlines import DeadlineRoute
 from app.core.deps import get_current_active_user
 from app.db.session import get_db
+from app.db.writes import insert_returning, update_returning
 from app.models.user import User
-from app.models.goal import Goal, GoalProgress
+from app.models.goal import Goal, GoalProgress, GoalProgressDaily
 from app.schemas.goal import (
     Goal as GoalSchema, 
     GoalCreate, 
     GoalUpdate, 
+    GoalWithForecast,
     GoalWithProgress,
+    GoalForecast as GoalForecastSchema,
     GoalProgress as GoalProgressSchema,
-    GoalProgressCreate
+    GoalProgressCreate,
+    GoalProgressDay,
 )
+from app.schemas.deletion import DeletionJob as DeletionJobSchema
+from app.schemas.team import TeamBase
+from app.schemas.user import UserBase
+from app.services import dashboard, deletion, idempotency, leaderboard, outbox, reminders, team_stats
+from app.services.recurrence import as_utc
 
-router = APIRouter()
+router = APIRouter(route_class=DeadlineRoute)
 
+GOAL_FIELDS = FieldSet(
+    Goal,
+    GoalSchema,
+    relationships={
+        "progress_logs": GoalProgressSchema,
+        "team": TeamBase,
+        "user": UserBase,
+        "forecast": GoalForecastSchema,
+    },
+    # Like the full response, so only recent partitions of goal_progress are scanned
+    bounds={"progress_logs": lambda: GoalProgress.logged_at >= _default_since()},
+)
+
+
+def _default_since() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(days=settings.GOAL_PROGRESS_DEFAULT_DAYS)
+
+
+def _require_goal(db: Session, goal_id: int, user: User) -> None:
+    if db.query(Goal.id).filter(Goal.id == goal_id, Goal.user_id == user.id).first() is None:
+        raise HTTPException(status_code=404, detail="Goal not found")
 
-@router.get("/", response_model=List[GoalSchema])
+
+@router.get("/", response_model=List[GoalWithForecast])
 def read_goals(
     db: Session = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
-    Retrieve goals for the current user.
+    Retrieve goals for the current user, with the latest nightly forecast
+    of open goals.
     """
-    goals = db.query(Goal).filter(Goal.user_id == current_user.id).offset(skip).limit(limit).all()
+    query = db.query(Goal).filter(Goal.user_id == current_user.id).offset(skip).limit(limit)
+    selection = GOAL_FIELDS.select(fields, include)
+    if selection:
+        return JSONResponse(GOAL_FIELDS.all(query, selection))
+    goals = query.options(joinedload(Goal.forecast)).all()
     return goals
 
 
@@ -44,16 +88,28 @@ def create_goal(
     """
     Create new goal.
     """
-    goal = Goal(
-        **goal_in.dict(),
-        user_id=current_user.id
-    )
-    db.add(goal)
+    goal = insert_returning(db, Goal, {**goal_in.dict(), "user_id": current_user.id})
+    if goal.team_id is not None:
+        leaderboard.refresh_member(db, goal.team_id, current_user.id)
+    reminders.queue_goal(db, goal)
+    dashboard.invalidate(db, [current_user.id])
     db.commit()
-    db.refresh(goal)
+    team_stats.invalidate(goal.team_id)
     return goal
 
 
+def _notify_completed(db: Session, goal: Goal, user: User) -> None:
+    # Once per goal, however often it is reopened and completed again
+    outbox.add(
+        db,
+        outbox.GOAL_COMPLETED,
+        {"goal_id": goal.id, "title": goal.title, "user_id": user.id, "username": user.username},
+        team_id=goal.team_id,
+        actor_id=user.id,
+        dedup_key=f"{outbox.GOAL_COMPLETED}:{goal.id}",
+    )
+
+
 @router.put("/{goal_id}", response_model=GoalSchema)
 def update_goal(
     *,
@@ -65,22 +121,35 @@ def update_goal(
     """
     Update a goal.
     """
-    goal = db.query(Goal).filter(Goal.id == goal_id, Goal.user_id == current_user.id).first()
-    if not goal:
-        raise HTTPException(status_code=404, detail="Goal not found")
-    
     update_data = goal_in.dict(exclude_unset=True)
     
     # If marking as completed, set the completed_at timestamp
-    if update_data.get("is_completed", False) and not goal.is_completed:
-        update_data["completed_at"] = datetime.now()
-    
-    for field, value in update_data.items():
-        setattr(goal, field, value)
+    if update_data.get("is_completed", False):
+        update_data["completed_at"] = case(
+            (Goal.is_completed.is_(True), Goal.completed_at), else_=func.now()
+        )
     
-    db.add(goal)
+    previous_team_id, was_completed = None, False
+    if "team_id" in update_data or update_data.get("is_completed"):
+        previous_team_id, was_completed = (
+            db.query(Goal.team_id, Goal.is_completed)
+            .filter(Goal.id == goal_id, Goal.user_id == current_user.id)
+            .first()
+        ) or (None, False)
+    goal = update_returning(
+        db, Goal, [Goal.id == goal_id, Goal.user_id == current_user.id], update_data
+    )
+    if not goal:
+        raise HTTPException(status_code=404, detail="Goal not found")
+    for team_id in {previous_team_id, goal.team_id} - {None}:
+        leaderboard.refresh_member(db, team_id, current_user.id)
+    if goal.is_completed and not was_completed and goal.team_id is not None:
+        _notify_completed(db, goal, current_user)
+    if "target_date" in update_data or update_data.get("is_completed") is False:
+        reminders.queue_goal(db, goal)
+    dashboard.invalidate(db, [current_user.id])
     db.commit()
-    db.refresh(goal)
+    team_stats.invalidate(previous_team_id, goal.team_id)
     return goal
 
 
@@ -89,18 +158,34 @@ def read_goal(
     *,
     db: Session = Depends(get_db),
     goal_id: int,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
-    Get goal by ID.
+    Get goal by ID, with the progress logged in the last
+    GOAL_PROGRESS_DEFAULT_DAYS.
+
+    With fields/include only the requested columns and relationships
+    (progress_logs, team, user, forecast) are loaded and returned; included
+    progress_logs cover the same GOAL_PROGRESS_DEFAULT_DAYS.
     """
-    goal = db.query(Goal).filter(Goal.id == goal_id, Goal.user_id == current_user.id).first()
+    query = db.query(Goal).filter(Goal.id == goal_id, Goal.user_id == current_user.id)
+    selection = GOAL_FIELDS.select(fields, include)
+    if selection:
+        goal = GOAL_FIELDS.first(query, selection)
+        if goal is None:
+            raise HTTPException(status_code=404, detail="Goal not found")
+        return JSONResponse(goal)
+    # Bounded so only recent partitions of goal_progress are scanned
+    recent = Goal.progress_logs.and_(GoalProgress.logged_at >= _default_since())
+    goal = query.options(joinedload(Goal.forecast), selectinload(recent)).first()
     if not goal:
         raise HTTPException(status_code=404, detail="Goal not found")
     return goal
 
 
-@router.delete("/{goal_id}", response_model=GoalSchema)
+@router.delete("/{goal_id}", response_model=GoalSchema, responses={202: {"model": DeletionJobSchema}})
 def delete_goal(
     *,
     db: Session = Depends(get_db),
@@ -108,13 +193,30 @@ def delete_goal(
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
-    Delete a goal.
+    Delete a goal with its progress.
+
+    A goal with more than DELETE_INLINE_LIMIT progress entries is deleted in
+    the background: the response is 202 with a job to poll at
+    /deletions/{job_id}.
     """
     goal = db.query(Goal).filter(Goal.id == goal_id, Goal.user_id == current_user.id).first()
     if not goal:
         raise HTTPException(status_code=404, detail="Goal not found")
+    if deletion.needs_job(db, deletion.GOAL, goal.id):
+        job = deletion.start(db, deletion.GOAL, goal.id, current_user.id)
+        return JSONResponse(
+            jsonable_encoder(DeletionJobSchema.from_orm(job)),
+            status_code=202,
+            headers={"Location": f"{settings.API_V1_STR}/deletions/{job.id}"},
+        )
+    # Progress goes with the ON DELETE CASCADE, without being loaded
     db.delete(goal)
+    if goal.team_id is not None:
+        db.flush()
+        leaderboard.refresh_member(db, goal.team_id, current_user.id)
+    dashboard.invalidate(db, [current_user.id])
     db.commit()
+    team_stats.invalidate(goal.team_id)
     return goal
 
 
@@ -144,38 +246,60 @@ def log_goal_progress(
     goal_id: int,
     progress_in: GoalProgressCreate,
     current_user: User = Depends(get_current_active_user),
+    idempotent: Optional[idempotency.IdempotentRequest] = Depends(idempotency.idempotency_key),
 ) -> Any:
     """
     Log progress for a goal.
+
+    Send an Idempotency-Key header to make retries safe: a retry with the
+    same key returns the first response without logging the progress again.
     """
-    goal = db.query(Goal).filter(Goal.id == goal_id, Goal.user_id == current_user.id).first()
+    replay = idempotency.begin(db, current_user.id, idempotent)
+    if replay is not None:
+        return replay
+    
+    # Update the current value of the goal and complete it in the same statement
+    new_value = Goal.current_value + progress_in.value
+    completes = Goal.is_completed.isnot(True) & (new_value >= Goal.target_value)
+    goal = update_returning(
+        db,
+        Goal,
+        [Goal.id == goal_id, Goal.user_id == current_user.id],
+        {
+            "current_value": new_value,
+            "is_completed": case((completes, True), else_=Goal.is_completed),
+            "completed_at": case((completes, func.now()), else_=Goal.completed_at),
+        },
+    )
     if not goal:
         raise HTTPException(status_code=404, detail="Goal not found")
     
-    progress = GoalProgress(
-        goal_id=goal_id,
-        value=progress_in.value,
-        notes=progress_in.notes
+    progress = insert_returning(
+        db,
+        GoalProgress,
+        {"goal_id": goal_id, "value": progress_in.value, "notes": progress_in.notes},
     )
     
-    # Update the current value of the goal
-    goal.current_value += progress_in.value
-    
-    # Check if goal is completed
-    if goal.current_value >= goal.target_value and not goal.is_completed:
-        goal.is_completed = True
-        goal.completed_at = datetime.now()
-        
-        # Update the user's streak
-        current_user.current_streak += 1
-        if current_user.current_streak > current_user.longest_streak:
-            current_user.longest_streak = current_user.current_streak
+    # Update the user's streak. completed_at and logged_at are both now(), the
+    # transaction timestamp, so they only match if this request completed the goal
+    completed = goal.is_completed and goal.completed_at == progress.logged_at
+    streak = None
+    if completed:
+        incremented = User.current_streak + 1
+        streak = update_returning(
+            db,
+            User,
+            [User.id == current_user.id],
+            {"current_streak": incremented, "longest_streak": func.greatest(User.longest_streak, incremented)},
+        ).current_streak
+    leaderboard.apply_progress(db, goal, progress_in.value, progress.logged_at, streak)
+    if completed and goal.team_id is not None:
+        _notify_completed(db, goal, current_user)
     
-    db.add(progress)
-    db.add(goal)
-    db.add(current_user)
+    dashboard.invalidate(db, [current_user.id])
+    idempotency.save(db, current_user.id, idempotent, GoalProgressSchema, progress)
     db.commit()
-    db.refresh(progress)
+    team_stats.invalidate(goal.team_id)
     return progress
 
 
@@ -184,14 +308,65 @@ def get_goal_progress(
     *,
     db: Session = Depends(get_db),
     goal_id: int,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
-    Get progress logs for a goal.
+    Get progress logs for a goal, by default those of the last
+    GOAL_PROGRESS_DEFAULT_DAYS. Logs from archived months are only
+    available as daily totals, see /progress/daily.
     """
-    goal = db.query(Goal).filter(Goal.id == goal_id, Goal.user_id == current_user.id).first()
-    if not goal:
-        raise HTTPException(status_code=404, detail="Goal not found")
+    _require_goal(db, goal_id, current_user)
+    
+    criteria = [GoalProgress.goal_id == goal_id, GoalProgress.logged_at >= (since or _default_since())]
+    if until is not None:
+        criteria.append(GoalProgress.logged_at < until)
+    progress_logs = db.query(GoalProgress).filter(*criteria).order_by(GoalProgress.logged_at).all()
+    return progress_logs
+
+
+def _first_whole_day(since: datetime) -> date:
+    since = as_utc(since).astimezone(timezone.utc)
+    return since.date() if since.time() == time.min else since.date() + timedelta(days=1)
+
+
+@router.get("/{goal_id}/progress/daily", response_model=List[GoalProgressDay])
+def get_goal_progress_daily(
+    *,
+    db: Session = Depends(get_db),
+    goal_id: int,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Progress per UTC day, including days whose logs have been archived.
+    """
+    _require_goal(db, goal_id, current_user)
     
-    progress_logs = db.query(GoalProgress).filter(GoalProgress.goal_id == goal_id).all()
-    return progress_logs
\ No newline at end of file
+    day = func.date(func.timezone("UTC", GoalProgress.logged_at))
+    live = (
+        select(day.label("day"), func.sum(GoalProgress.value).label("total"), func.count().label("entries"))
+        .where(GoalProgress.goal_id == goal_id)
+        .group_by(day)
+    )
+    archived = select(GoalProgressDaily.day, GoalProgressDaily.total, GoalProgressDaily.entries).where(
+        GoalProgressDaily.goal_id == goal_id
+    )
+    # [since, until) for both: archived days only count when they lie wholly
+    # inside it, and a boundary day falling partly inside comes from live rows
+    if since is not None:
+        live = live.where(GoalProgress.logged_at >= since)
+        archived = archived.where(GoalProgressDaily.day >= _first_whole_day(since))
+    if until is not None:
+        live = live.where(GoalProgress.logged_at < until)
+        archived = archived.where(GoalProgressDaily.day < as_utc(until).astimezone(timezone.utc).date())
+    # A month is compacted in the same transaction that detaches it, but
+    # progress logged for it later waits in the default partition until
+    # maintenance folds it in, so a day can come from both sides
+    days = union_all(live, archived).subquery()
+    rows = db.execute(
+        select(days.c.day, func.sum(days.c.total), func.sum(days.c.entries)).group_by(days.c.day).order_by(days.c.day)
+    ).all()
+    return [{"day": d, "total": total, "entries": entries} for d, total, entries in rows]
\ No newline at end of file
@@ -0,0 +1,40 @@
+from typing import Any, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.core.deadlines import DeadlineRoute
+from app.core.deps import get_current_active_user
+from app.db.session import get_db
+from app.models.user import User
+from app.schemas.sync import SyncResponse
+from app.services.sync import PAGE_SIZE, changes_since, parse_cursor, purged_below
+
+router = APIRouter(route_class=DeadlineRoute)
+
+
+@router.get("/", response_model=SyncResponse)
+def read_changes(
+    db: Session = Depends(get_db),
+    since: Optional[str] = Query(None, description="Cursor from the previous sync; omit for a full snapshot"),
+    limit: int = Query(PAGE_SIZE, ge=1, le=5000),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Goals, progress, teams, events and memberships visible to the current
+    user that changed since ``since``, with the ids of deleted rows, and
+    the cursor to send next time. At most ``limit`` rows are returned; when
+    has_more is set, send the cursor straight back for the rest.
+
+    Returns 410 when the cursor is older than the tombstone retention; the
+    client should discard its copy and sync again without a cursor.
+    """
+    # Cursors are only comparable against the primary's transaction ids
+    db.use_primary = True
+    try:
+        version, resume = parse_cursor(since) if since is not None else (0, None)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid sync cursor")
+    if version and version < purged_below(db):
+        raise HTTPException(status_code=410, detail="Sync cursor expired; resync without since")
+    return changes_since(db, current_user.id, version, limit, resume)
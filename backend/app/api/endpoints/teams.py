@@ -1,23 +1,112 @@
-from typing import Any, List
+from typing import Any, Callable, List, Optional
+from datetime import datetime, timedelta, timezone
 
-from fastapi import APIRouter, Depends, HTTPException, Body
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Body, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import and_, func, insert, select
+from sqlalchemy.orm import Session, selectinload
 
+from app.api.fieldsets import FIELDS_DESCRIPTION, INCLUDE_DESCRIPTION, FieldSet
+from app.core.config import settings
+from app.core import deadlines
+from app.core.deadlines import DeadlineRoute
 from app.core.deps import get_current_active_user
+from app.core.singleflight import SingleFlight
 from app.db.session import get_db
-from app.models.user import User
+from app.db.writes import insert_returning, update_returning
+from app.models.user import User, user_team
 from app.models.team import Team
+from app.models.goal import Goal
+from app.models.event import Event, overlaps_window, user_event
 from app.schemas.team import (
     Team as TeamSchema,
+    TeamAvailability,
     TeamCreate,
+    TeamLeaderboardEntry,
+    TeamLeaderboardPage,
+    TeamStats,
     TeamUpdate,
     TeamWithMembers,
     TeamWithGoals,
     TeamWithEvents,
     TeamComplete
 )
+from app.schemas.deletion import DeletionJob as DeletionJobSchema
+from app.schemas.event import EventBase
+from app.schemas.goal import GoalBase
+from app.schemas.user import UserBase
+from app.services import dashboard, deletion, idempotency, leaderboard, team_stats
+from app.services.availability import free_slots, merge_intervals
+from app.services.recurrence import as_utc, expand_series
 
-router = APIRouter()
+router = APIRouter(route_class=DeadlineRoute)
+
+MAX_AVAILABILITY_WINDOW = timedelta(days=92)
+
+TEAM_FIELDS = FieldSet(
+    Team,
+    TeamSchema,
+    relationships={"members": UserBase, "goals": GoalBase, "events": EventBase},
+    computed={
+        "member_count": lambda: select(func.count())
+        .where(user_team.c.team_id == Team.id)
+        .correlate(Team)
+        .scalar_subquery(),
+        "goal_count": lambda: select(func.count(Goal.id))
+        .where(Goal.team_id == Team.id)
+        .correlate(Team)
+        .scalar_subquery(),
+    },
+)
+
+
+# Members of a team opening it together (e.g. when a team call starts) share
+# one run of the queries. A 404 is the same for everyone; anything else the
+# leader hit (its deadline, a lock timeout) waiters retry on their own.
+_team_reads = SingleFlight("team_reads", share_errors=(HTTPException,))
+
+
+def _shared_read(db: Session, key: tuple, render: Callable[[], Any]) -> Response:
+    """
+    Run ``render`` (returning a JSON-serializable result) once for concurrent
+    requests with the same key; callers check membership first. Requests
+    reading from the primary never share with ones reading from a replica.
+    Waiters stop waiting when their own deadline is near.
+    """
+    body = _team_reads.do(
+        (*key, db.use_primary),
+        lambda: JSONResponse(jsonable_encoder(render())).body,
+        timeout=min(settings.SINGLEFLIGHT_WAIT_SECONDS, deadlines.remaining(settings.SINGLEFLIGHT_WAIT_SECONDS)),
+    )
+    return Response(body, media_type="application/json")
+
+
+def _load_team(db: Session, team_id: int) -> Team:
+    team = db.query(Team).filter(Team.id == team_id).first()
+    if not team:
+        raise HTTPException(status_code=404, detail="Team not found")
+    return team
+
+
+def _require_member(db: Session, team_id: int, user: User) -> None:
+    """
+    404 if the team does not exist, 403 if the user is not a member, without
+    loading the member list.
+    """
+    row = (
+        db.query(Team.id, user_team.c.user_id)
+        .outerjoin(
+            user_team,
+            and_(user_team.c.team_id == Team.id, user_team.c.user_id == user.id),
+        )
+        .filter(Team.id == team_id)
+        .first()
+    )
+    if row is None:
+        raise HTTPException(status_code=404, detail="Team not found")
+    if row.user_id is None:
+        raise HTTPException(status_code=403, detail="Not a member of this team")
 
 
 @router.get("/", response_model=List[TeamSchema])
@@ -25,11 +114,24 @@ def read_teams(
     db: Session = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
     Retrieve teams.
     """
+    selection = TEAM_FIELDS.select(fields, include)
+    if selection:
+        query = (
+            db.query(Team)
+            .join(user_team, user_team.c.team_id == Team.id)
+            .filter(user_team.c.user_id == current_user.id)
+            .order_by(Team.id)
+            .offset(skip)
+            .limit(limit)
+        )
+        return JSONResponse(TEAM_FIELDS.all(query, selection))
     teams = current_user.teams
     return teams[skip : skip + limit]
 
@@ -40,18 +142,24 @@ def create_team(
     db: Session = Depends(get_db),
     team_in: TeamCreate,
     current_user: User = Depends(get_current_active_user),
+    idempotent: Optional[idempotency.IdempotentRequest] = Depends(idempotency.idempotency_key),
 ) -> Any:
     """
     Create new team.
+
+    A retry with the same Idempotency-Key header returns the first response
+    instead of creating another team.
     """
-    team = Team(
-        **team_in.dict(),
-        created_by_id=current_user.id
-    )
-    team.members.append(current_user)  # Add creator as a member
-    db.add(team)
+    replay = idempotency.begin(db, current_user.id, idempotent)
+    if replay is not None:
+        return replay
+    team = insert_returning(db, Team, {**team_in.dict(), "created_by_id": current_user.id})
+    # Add creator as a member
+    db.execute(insert(user_team).values(user_id=current_user.id, team_id=team.id))
+    leaderboard.refresh_member(db, team.id, current_user.id)
+    dashboard.invalidate(db, [current_user.id])
+    idempotency.save(db, current_user.id, idempotent, TeamSchema, team)
     db.commit()
-    db.refresh(team)
     return team
 
 
@@ -66,21 +174,22 @@ def update_team(
     """
     Update a team.
     """
-    team = db.query(Team).filter(Team.id == team_id).first()
-    if not team:
-        raise HTTPException(status_code=404, detail="Team not found")
+    update_data = team_in.dict(exclude_unset=True)
     
-    # Check if user is the creator of the team
-    if team.created_by_id != current_user.id:
+    # Only the creator of the team may update it
+    team = update_returning(
+        db, Team, [Team.id == team_id, Team.created_by_id == current_user.id], update_data
+    )
+    if not team:
+        if db.query(Team.id).filter(Team.id == team_id).first() is None:
+            raise HTTPException(status_code=404, detail="Team not found")
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    update_data = team_in.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(team, field, value)
-    
-    db.add(team)
+    # Progress totals only count the current cycle
+    if {"cycle_start_date", "cycle_end_date"} & update_data.keys():
+        leaderboard.rebuild(db, team_id)
+    dashboard.invalidate(db, dashboard.team_members(team_id))
     db.commit()
-    db.refresh(team)
     return team
 
 
@@ -89,23 +198,32 @@ def read_team(
     *,
     db: Session = Depends(get_db),
     team_id: int,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
     Get team by ID.
+
+    With fields/include only the requested columns, relationships (members,
+    goals, events) and counts (member_count, goal_count) are queried, e.g.
+    ?fields=name&include=member_count.
+
+    Concurrent requests for the same team and fields are answered from one
+    run of the queries.
     """
-    team = db.query(Team).filter(Team.id == team_id).first()
-    if not team:
-        raise HTTPException(status_code=404, detail="Team not found")
-    
-    # Check if user is a member of the team
-    if current_user not in team.members:
-        raise HTTPException(status_code=403, detail="Not a member of this team")
-    
-    return team
+    selection = TEAM_FIELDS.select(fields, include)
+    _require_member(db, team_id, current_user)
+    if selection:
+        return _shared_read(
+            db,
+            ("team", team_id, fields, include),
+            lambda: TEAM_FIELDS.first(db.query(Team).filter(Team.id == team_id), selection),
+        )
+    return _shared_read(db, ("team", team_id), lambda: TeamComplete.from_orm(_load_team(db, team_id)))
 
 
-@router.delete("/{team_id}", response_model=TeamSchema)
+@router.delete("/{team_id}", response_model=TeamSchema, responses={202: {"model": DeletionJobSchema}})
 def delete_team(
     *,
     db: Session = Depends(get_db),
@@ -113,7 +231,12 @@ def delete_team(
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
-    Delete a team.
+    Delete a team. Memberships are removed; the team's goals and events stay
+    with their owners, no longer attached to a team.
+
+    A team with more than DELETE_INLINE_LIMIT goals, events and members is
+    deleted in the background: the response is 202 with a job to poll at
+    /deletions/{job_id}.
     """
     team = db.query(Team).filter(Team.id == team_id).first()
     if not team:
@@ -123,8 +246,18 @@ def delete_team(
     if team.created_by_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
+    if deletion.needs_job(db, deletion.TEAM, team.id):
+        job = deletion.start(db, deletion.TEAM, team.id, current_user.id)
+        return JSONResponse(
+            jsonable_encoder(DeletionJobSchema.from_orm(job)),
+            status_code=202,
+            headers={"Location": f"{settings.API_V1_STR}/deletions/{job.id}"},
+        )
+    # Before the memberships go with the cascade
+    dashboard.invalidate(db, dashboard.team_members(team_id))
     db.delete(team)
     db.commit()
+    team_stats.invalidate(team_id)
     return team
 
 
@@ -156,7 +289,11 @@ def add_team_member(
     
     team.members.append(user)
     db.add(team)
+    db.flush()
+    leaderboard.refresh_member(db, team_id, user_id)
+    dashboard.invalidate(db, [user_id])
     db.commit()
+    team_stats.invalidate(team_id)
     db.refresh(team)
     return team
 
@@ -193,7 +330,10 @@ def remove_team_member(
     
     team.members.remove(user)
     db.add(team)
+    leaderboard.remove_member(db, team_id, user_id)
+    dashboard.invalidate(db, [user_id])
     db.commit()
+    team_stats.invalidate(team_id)
     db.refresh(team)
     return team
 
@@ -249,13 +389,117 @@ def get_team_events(
 ) -> Any:
     """
     Get team events.
+
+    Concurrent requests for the same team are answered from one run of the
+    queries.
     """
-    team = db.query(Team).filter(Team.id == team_id).first()
-    if not team:
-        raise HTTPException(status_code=404, detail="Team not found")
+    _require_member(db, team_id, current_user)
+    return _shared_read(db, ("events", team_id), lambda: TeamWithEvents.from_orm(_load_team(db, team_id)))
+
+
+@router.get("/{team_id}/availability", response_model=TeamAvailability)
+def get_team_availability(
+    *,
+    db: Session = Depends(get_db),
+    team_id: int,
+    start: datetime = Query(None),
+    end: datetime = Query(None),
+    duration_minutes: int = Query(30, ge=5, le=24 * 60),
+    top_k: int = Query(5, ge=1, le=100),
+    granularity_minutes: int = Query(15, ge=1, le=60),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Get merged busy intervals of all team members and the first free slots
+    that fit a call of the requested duration.
+    """
+    _require_member(db, team_id, current_user)
     
-    # Check if current user is a member of the team
-    if current_user not in team.members:
-        raise HTTPException(status_code=403, detail="Not a member of this team")
+    start = as_utc(start) if start else datetime.now(timezone.utc)
+    end = as_utc(end) if end else start + timedelta(days=7)
+    if end <= start or end - start > MAX_AVAILABILITY_WINDOW:
+        raise HTTPException(status_code=400, detail="end must be after start and within 92 days of it")
     
-    return team
\ No newline at end of file
+    # Every event any member attends (organizers are attendees too) that
+    # overlaps the window, in one range query
+    events = (
+        db.query(Event)
+        .join(user_event, user_event.c.event_id == Event.id)
+        .join(user_team, user_team.c.user_id == user_event.c.user_id)
+        .options(selectinload(Event.exceptions))
+        .filter(
+            user_team.c.team_id == team_id,
+            overlaps_window(start, end),
+        )
+        .distinct()
+        .all()
+    )
+    intervals = [(as_utc(e.start_time), as_utc(e.end_time)) for e in events if not e.recurrence_rule]
+    intervals += [
+        (as_utc(o["start_time"]), as_utc(o["end_time"]))
+        for o in expand_series([e for e in events if e.recurrence_rule], start, end, overlap=True)
+    ]
+    
+    busy = merge_intervals(intervals, start, end)
+    slots = free_slots(
+        busy,
+        start,
+        end,
+        timedelta(minutes=duration_minutes),
+        top_k,
+        timedelta(minutes=granularity_minutes),
+    )
+    return {
+        "team_id": team_id,
+        "start": start,
+        "end": end,
+        "duration_minutes": duration_minutes,
+        "busy": [{"start": s, "end": e} for s, e in busy],
+        "free_slots": [{"start": s, "end": e} for s, e in slots],
+    }
+
+
+@router.get("/{team_id}/leaderboard", response_model=TeamLeaderboardPage)
+def get_team_leaderboard(
+    *,
+    db: Session = Depends(get_db),
+    team_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Members ranked by completion of their team goals, then progress logged
+    in the current cycle, then streak. Pass the returned next_cursor to get
+    the next page.
+    """
+    _require_member(db, team_id, current_user)
+    try:
+        first_rank, rows, next_cursor = leaderboard.page(db, team_id, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    entries = [
+        TeamLeaderboardEntry(
+            rank=rank,
+            username=username,
+            full_name=full_name,
+            **{name: getattr(entry, name) for name in ("user_id", *leaderboard.STAT_COLUMNS)},
+        )
+        for rank, (entry, username, full_name) in enumerate(rows, start=first_rank)
+    ]
+    return {"entries": entries, "next_cursor": next_cursor}
+
+
+@router.get("/{team_id}/stats", response_model=TeamStats)
+def get_team_stats(
+    *,
+    db: Session = Depends(get_db),
+    team_id: int,
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Completion rate, active members this week, goals at risk and event
+    attendance for a team. Cached briefly; computed_at tells the age.
+    """
+    _require_member(db, team_id, current_user)
+    return team_stats.get(db, team_id)
\ No newline at end of file
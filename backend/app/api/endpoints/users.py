@@ -1,26 +1,45 @@
-from typing import Any, List
+from typing import Any, List, Optional
 
-from fastapi import APIRouter, Body, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
 from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
+from app.api.fieldsets import FIELDS_DESCRIPTION, INCLUDE_DESCRIPTION, FieldSet
+from app.core.deadlines import DeadlineRoute, deadline
 from app.core.deps import get_current_active_superuser, get_current_active_user
 from app.core.security import get_password_hash, verify_password
 from app.db.session import get_db
+from app.db.writes import insert_returning, update_returning
 from app.models.user import User
 from app.schemas.user import User as UserSchema
 from app.schemas.user import UserCreate, UserUpdate, UserWithTeams
+from app.schemas.team import TeamBase
 
-router = APIRouter()
+router = APIRouter(route_class=DeadlineRoute)
+
+USER_FIELDS = FieldSet(User, UserSchema, relationships={"teams": TeamBase})
 
 
 @router.get("/me", response_model=UserSchema)
 def read_user_me(
+    db: Session = Depends(get_db),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
     Get current user.
+
+    fields/include (teams) select what is returned; only include=teams
+    costs a query beyond authentication.
     """
+    selection = USER_FIELDS.select(fields, include)
+    if selection:
+        if not selection.relationships:
+            return JSONResponse(USER_FIELDS.serialize(current_user, selection))
+        return JSONResponse(USER_FIELDS.first(db.query(User).filter(User.id == current_user.id), selection))
     return current_user
 
 
@@ -52,23 +71,23 @@ def update_user_me(
     if avatar is not None:
         user_in.avatar = avatar
     
+    update_data = {}
     if user_in.password:
         hashed_password = get_password_hash(user_in.password)
-        current_user.hashed_password = hashed_password
+        update_data["hashed_password"] = hashed_password
         
     if user_in.email:
-        current_user.email = user_in.email
+        update_data["email"] = user_in.email
     if user_in.username:
-        current_user.username = user_in.username
+        update_data["username"] = user_in.username
     if user_in.full_name:
-        current_user.full_name = user_in.full_name
+        update_data["full_name"] = user_in.full_name
     if user_in.avatar:
-        current_user.avatar = user_in.avatar
+        update_data["avatar"] = user_in.avatar
         
-    db.add(current_user)
+    user = update_returning(db, User, [User.id == current_user.id], update_data)
     db.commit()
-    db.refresh(current_user)
-    return current_user
+    return user
 
 
 @router.get("/", response_model=List[UserSchema])
@@ -94,34 +113,40 @@ def create_user(
     """
     Create new user.
     """
-    user = db.query(User).filter(User.email == user_in.email).first()
-    if user:
+    existing = (
+        db.query(User.email, User.username)
+        .filter(or_(User.email == user_in.email, User.username == user_in.username))
+        .all()
+    )
+    if any(row.email == user_in.email for row in existing):
         raise HTTPException(
             status_code=400,
             detail="A user with this email already exists in the system.",
         )
     
-    user = db.query(User).filter(User.username == user_in.username).first()
-    if user:
+    if existing:
         raise HTTPException(
             status_code=400,
             detail="A user with this username already exists in the system.",
         )
     
-    user = User(
-        email=user_in.email,
-        username=user_in.username,
-        hashed_password=get_password_hash(user_in.password),
-        full_name=user_in.full_name,
-        is_active=True,
+    user = insert_returning(
+        db,
+        User,
+        {
+            "email": user_in.email,
+            "username": user_in.username,
+            "hashed_password": get_password_hash(user_in.password),
+            "full_name": user_in.full_name,
+            "is_active": True,
+        },
     )
-    db.add(user)
     db.commit()
-    db.refresh(user)
     return user
 
 
 @router.get("/with-teams", response_model=List[UserWithTeams])
+@deadline(5.0)
 def read_users_with_teams(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
@@ -136,16 +161,22 @@ def read_users_with_teams(
 @router.get("/{user_id}", response_model=UserSchema)
 def read_user_by_id(
     user_id: int,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db),
 ) -> Any:
     """
     Get a specific user by id.
     """
-    user = db.query(User).filter(User.id == user_id).first()
+    selection = USER_FIELDS.select(fields, include)
+    if selection:
+        user = USER_FIELDS.first(db.query(User).filter(User.id == user_id), selection)
+    else:
+        user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(
             status_code=404,
             detail="The user with this id does not exist in the system",
         )
-    return user
\ No newline at end of file
+    return JSONResponse(user) if selection else user
\ No newline at end of file
@@ -0,0 +1,118 @@
+"""
+Sparse fieldsets (``fields=``) and relationship expansion (``include=``) for
+read endpoints.
+
+A FieldSet lists what clients may ask for on one model. The selection drives
+the query as well as the JSON: only the requested columns are loaded, only
+the included relationships are fetched (one extra SELECT each) and computed
+values such as member counts are added to the same statement. Anything not
+requested never reaches SQL; touching it raises instead of lazy loading.
+"""
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.orm import Query, load_only, raiseload, selectinload
+
+FIELDS_DESCRIPTION = "Comma-separated fields to return; id is always included"
+INCLUDE_DESCRIPTION = "Comma-separated related objects or computed values to embed"
+
+
+@dataclass(frozen=True)
+class Selection:
+    fields: Tuple[str, ...]
+    relationships: Tuple[str, ...]
+    computed: Tuple[str, ...]
+
+
+def _split(value: Optional[str]) -> List[str]:
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+
+class FieldSet:
+    def __init__(
+        self,
+        model: Any,
+        schema: Type[BaseModel],
+        relationships: Dict[str, Type[BaseModel]],
+        computed: Optional[Dict[str, Callable[[], Any]]] = None,
+        bounds: Optional[Dict[str, Callable[[], Any]]] = None,
+    ) -> None:
+        """
+        ``schema`` defines the selectable fields, ``relationships`` maps each
+        includable relationship to the schema of its items and ``computed``
+        maps extra includable names to functions returning a SQL expression
+        correlated with ``model``. ``bounds`` maps relationships to functions
+        returning a condition the included items must meet, e.g. to keep an
+        unbounded collection to a recent window.
+        """
+        self.model = model
+        self.schema = schema
+        self.relationships = relationships
+        self.computed = computed or {}
+        self.bounds = bounds or {}
+        mapper = inspect(model)
+        self._columns = set(mapper.column_attrs.keys())
+        self._relationship_props = mapper.relationships
+
+    def select(self, fields: Optional[str], include: Optional[str]) -> Optional[Selection]:
+        """
+        Parse the query parameters; None when neither was given, in which
+        case the endpoint keeps its full response model.
+        """
+        if fields is None and include is None:
+            return None
+        requested = _split(fields) or list(self.schema.__fields__)
+        included = _split(include)
+        unknown = (set(requested) - set(self.schema.__fields__)) | (
+            set(included) - set(self.relationships) - set(self.computed)
+        )
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        return Selection(
+            fields=("id", *[f for f in dict.fromkeys(requested) if f != "id"]),
+            relationships=tuple(name for name in dict.fromkeys(included) if name in self.relationships),
+            computed=tuple(name for name in dict.fromkeys(included) if name in self.computed),
+        )
+
+    def _query(self, query: Query, selection: Selection) -> Query:
+        columns = {f for f in selection.fields if f in self._columns}
+        # Foreign keys needed to load the included many-to-one relationships
+        for name in selection.relationships:
+            columns.update(c.key for c in self._relationship_props[name].local_columns)
+        options = [load_only(*[getattr(self.model, c) for c in columns])]
+        for name in selection.relationships:
+            relationship = getattr(self.model, name)
+            if name in self.bounds:
+                relationship = relationship.and_(self.bounds[name]())
+            options.append(selectinload(relationship))
+        options.append(raiseload("*"))
+        query = query.options(*options)
+        if selection.computed:
+            query = query.add_columns(*[self.computed[name]().label(name) for name in selection.computed])
+        return query
+
+    def serialize(self, obj: Any, selection: Selection, computed: Tuple[Any, ...] = ()) -> Dict[str, Any]:
+        data = {field: getattr(obj, field, None) for field in selection.fields}
+        for name in selection.relationships:
+            schema = self.relationships[name]
+            value = getattr(obj, name)
+            if isinstance(value, list):
+                data[name] = [schema.from_orm(item) for item in value]
+            else:
+                data[name] = schema.from_orm(value) if value is not None else None
+        data.update(zip(selection.computed, computed))
+        return jsonable_encoder(data)
+
+    def all(self, query: Query, selection: Selection) -> List[Dict[str, Any]]:
+        rows = self._query(query, selection).all()
+        if selection.computed:
+            return [self.serialize(row[0], selection, tuple(row[1:])) for row in rows]
+        return [self.serialize(obj, selection, ()) for obj in rows]
+
+    def first(self, query: Query, selection: Selection) -> Optional[Dict[str, Any]]:
+        rows = self.all(query.limit(1), selection)
+        return rows[0] if rows else None
@@ -0,0 +1,214 @@
+"""
+Response compression.
+
+Negotiates brotli (``br``), zstd or gzip from ``Accept-Encoding``, honouring
+q-values and otherwise preferring the encodings in ``COMPRESSION_ENCODINGS``
+order. brotli and zstd need the optional ``brotli`` and ``zstandard``
+packages and are left out of the negotiation when those are not installed.
+
+Only textual media types are compressed, and only bodies of at least
+``COMPRESSION_MIN_BYTES``; smaller ones are cheaper to send as they are.
+Streaming responses are compressed chunk by chunk and flushed after each,
+so clients still receive data as it is produced. Compressing a body or chunk
+of ``COMPRESSION_OFFLOAD_BYTES`` or more runs on the threadpool to keep the
+event loop free. Strong ETags become weak, since the bytes differ by
+encoding.
+
+``python -m benchmarks.compression`` measures CPU cost against bytes saved
+on real API responses.
+"""
+import zlib
+from time import perf_counter
+from typing import Callable, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.core.config import settings
+from app.core.metrics import COMPRESSION_BYTES, COMPRESSION_SECONDS
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/xml", "application/javascript")
+
+
+class GzipEncoder:
+    def __init__(self, level: int) -> None:
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        body = self._compressor.compress(data)
+        return body + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class BrotliEncoder:
+    def __init__(self, level: int) -> None:
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        body = self._compressor.process(data)
+        return body + (self._compressor.finish() if final else self._compressor.flush())
+
+
+class ZstdEncoder:
+    def __init__(self, level: int) -> None:
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        body = self._compressor.compress(data)
+        if final:
+            return body + self._compressor.flush()
+        return body + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+
+def available_encoders() -> Dict[str, Callable[[int], object]]:
+    encoders: Dict[str, Callable[[int], object]] = {"gzip": GzipEncoder}
+    if brotli is not None:
+        encoders["br"] = BrotliEncoder
+    if zstandard is not None:
+        encoders["zstd"] = ZstdEncoder
+    return encoders
+
+
+def negotiate(accept_encoding: str, preference: List[str]) -> Optional[str]:
+    """
+    The encoding from ``preference`` the client accepts with the highest
+    q-value, earlier ones winning ties; None for the identity encoding.
+    """
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+    best, best_q = None, 0.0
+    for encoding in preference:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware compressing response bodies; see the module
+    docstring.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+        encoders = available_encoders()
+        self.encoders = encoders
+        self.preference = [e for e in settings.COMPRESSION_ENCODINGS if e in encoders]
+        self.levels = settings.COMPRESSION_LEVELS
+        self.min_bytes = settings.COMPRESSION_MIN_BYTES
+        self.offload_bytes = settings.COMPRESSION_OFFLOAD_BYTES
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = Headers(scope=scope).get("accept-encoding", "")
+        encoding = negotiate(accept, self.preference) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _Responder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    async def compress(self, encoding: str, encoder, data: bytes, final: bool) -> bytes:
+        start = perf_counter()
+        if len(data) >= self.offload_bytes:
+            body = await run_in_threadpool(encoder.compress, data, final)
+        else:
+            body = encoder.compress(data, final)
+        COMPRESSION_SECONDS.labels(encoding).observe(perf_counter() - start)
+        COMPRESSION_BYTES.labels(encoding, "in").inc(len(data))
+        COMPRESSION_BYTES.labels(encoding, "out").inc(len(body))
+        return body
+
+
+class _Responder:
+    """
+    Send wrapper for one response. Holds back the start message until the
+    first body chunk shows whether compressing is worth it.
+    """
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send) -> None:
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start: Optional[dict] = None
+        self.encoder = None
+        self.passthrough = False
+        self.buffer = b""
+
+    async def send(self, message) -> None:
+        kind = message["type"]
+        if kind == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            media_type = headers.get("content-type", "")
+            self.passthrough = (
+                "content-encoding" in headers
+                or message["status"] in (204, 304)
+                or not media_type.startswith(COMPRESSIBLE_TYPES)
+            )
+            if self.passthrough:
+                await self._send(message)
+            else:
+                self.start = message
+            return
+        if kind != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+        if self.encoder is None:
+            self.buffer += body
+            if len(self.buffer) < self.middleware.min_bytes:
+                if more:
+                    return
+                # Too small to be worth it
+                self.passthrough = True
+                await self._send(self.start)
+                await self._send({"type": "http.response.body", "body": self.buffer, "more_body": False})
+                return
+            body, self.buffer = self.buffer, b""
+            self.encoder = self.middleware.encoders[self.encoding](self.middleware.levels[self.encoding])
+            compressed = await self.middleware.compress(self.encoding, self.encoder, body, final=not more)
+            # The length is only known for whole bodies
+            await self._send_start(None if more else len(compressed))
+        else:
+            compressed = await self.middleware.compress(self.encoding, self.encoder, body, final=not more)
+        if compressed or not more:
+            await self._send({"type": "http.response.body", "body": compressed, "more_body": more})
+
+    async def _send_start(self, content_length: Optional[int]) -> None:
+        headers = MutableHeaders(raw=list(self.start["headers"]))
+        headers["content-encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag is not None and not etag.startswith("W/"):
+            headers["etag"] = f"W/{etag}"
+        if content_length is None:
+            del headers["content-length"]
+        else:
+            headers["content-length"] = str(content_length)
+        await self._send({**self.start, "headers": headers.raw})
@@ -9,6 +9,9 @@ class Settings(BaseSettings):
     SECRET_KEY: str = secrets.token_urlsafe(32)
     # 60 minutes * 24 hours * 8 days = 8 days
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+    # Calendar feed URLs stop working after this; fetch a new one from
+    # /feeds/token
+    FEED_TOKEN_EXPIRE_DAYS: int = 365
     # BACKEND_CORS_ORIGINS is a comma-separated list of origins
     # e.g: "http://localhost,http://localhost:4200,http://localhost:3000"
     BACKEND_CORS_ORIGINS: List[AnyHttpUrl] = ["http://localhost:3000"]
@@ -22,6 +25,136 @@ class Settings(BaseSettings):
         raise ValueError(v)
 
     PROJECT_NAME: str = "Accountability App"
+
+    # Maximum concurrent bcrypt hash/verify operations per worker
+    PASSWORD_HASH_CONCURRENCY: int = 4
+
+    # Requests each client (user, or IP address when not signed in) may make
+    # to a route, as "<count>/<second|minute|hour|day>"; see
+    # app.core.ratelimit. Routes are "METHOD /path" below API_V1_STR.
+    # RATE_LIMIT_DEFAULT, if set, covers all other routes together
+    RATE_LIMITS: Dict[str, str] = {
+        "POST /auth/login": "10/minute",
+        "GET /users/with-teams": "30/minute",
+    }
+    RATE_LIMIT_DEFAULT: Optional[str] = None
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    # Share buckets between workers and hosts through Redis
+    RATE_LIMIT_REDIS_URL: Optional[str] = None
+
+    # Time budget of a request unless its endpoint declares one; see
+    # app.core.deadlines. Lock waits give up sooner
+    REQUEST_DEADLINE_SECONDS: float = 10.0
+    REQUEST_LOCK_TIMEOUT_SECONDS: float = 3.0
+
+    # Response compression; see app.core.compression. Encodings in order of
+    # preference (br and zstd only if brotli/zstandard are installed), their
+    # levels, the smallest body worth compressing and the size from which
+    # compression moves off the event loop
+    COMPRESSION_ENCODINGS: List[str] = ["br", "zstd", "gzip"]
+    COMPRESSION_LEVELS: Dict[str, int] = {"br": 4, "zstd": 3, "gzip": 6}
+    COMPRESSION_MIN_BYTES: int = 1024
+    COMPRESSION_OFFLOAD_BYTES: int = 64 * 1024
+
+    # Cached (series, window) expansions of recurring events per worker
+    RECURRENCE_CACHE_SIZE: int = 10000
+
+    # iCalendar feeds leave out events that ended more than this many days
+    # ago; rendered events are cached per worker
+    ICAL_FEED_PAST_DAYS: int = 180
+    ICAL_SEGMENT_CACHE_SIZE: int = 50000
+
+    # Dashboard sections run concurrently on a shared pool per worker and are
+    # cached per user until a committed write bumps the user's
+    # dashboard_version, for at most the given number of seconds
+    DASHBOARD_WORKERS: int = 8
+    DASHBOARD_SECTION_TIMEOUT_SECONDS: float = 5.0
+    DASHBOARD_CACHE_SIZE: int = 10000
+    DASHBOARD_CACHE_SECONDS: Dict[str, float] = {
+        "goals": 30.0,
+        "teams": 300.0,
+        "events": 60.0,
+        "streak": 60.0,
+    }
+
+    # Team statistics are cached per team and worker, and dropped when the
+    # team's goals, events or members change
+    TEAM_STATS_CACHE_SIZE: int = 10000
+    TEAM_STATS_CACHE_SECONDS: float = 120.0
+    # Identical concurrent team reads share one query; the others wait this
+    # long for it before running their own
+    SINGLEFLIGHT_WAIT_SECONDS: float = 5.0
+
+    # Goal forecasts fit the progress logged over this many days and are
+    # computed this many goals at a time
+    FORECAST_HISTORY_DAYS: int = 90
+    FORECAST_BATCH_SIZE: int = 5000
+
+    # goal_progress is partitioned by month. Partitions are created this
+    # many months ahead; older than the retention they are compacted into
+    # goal_progress_daily and detached into the archive schema, optionally
+    # on a cheaper tablespace
+    GOAL_PROGRESS_PARTITIONS_AHEAD: int = 3
+    GOAL_PROGRESS_RETENTION_MONTHS: int = 12
+    GOAL_PROGRESS_ARCHIVE_SCHEMA: str = "archive"
+    GOAL_PROGRESS_ARCHIVE_TABLESPACE: Optional[str] = None
+    # Progress endpoints return this many days unless asked for more
+    GOAL_PROGRESS_DEFAULT_DAYS: int = 90
+
+    # Goals and teams with more dependent rows than this (progress logs;
+    # goals, events and memberships) are deleted by a background job,
+    # this many rows per transaction
+    DELETE_INLINE_LIMIT: int = 10000
+    DELETE_BATCH_SIZE: int = 5000
+
+    # Background jobs (worker.py). The pool runs jobs on threads or, for
+    # CPU-bound work and tasks that may hang, processes. Failed attempts are
+    # retried after JOB_RETRY_DELAY_SECONDS, doubling each time. Workers
+    # renew their jobs' leases every JOB_HEARTBEAT_SECONDS; a job whose lease
+    # lapses for JOB_LEASE_SECONDS is treated as lost with its worker
+    JOB_WORKER_POOL: str = "thread"
+    JOB_WORKER_CONCURRENCY: int = 4
+    JOB_POLL_INTERVAL_SECONDS: float = 1.0
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_DELAY_SECONDS: float = 30.0
+    JOB_TIMEOUT_SECONDS: float = 3600.0
+    JOB_HEARTBEAT_SECONDS: float = 15.0
+    JOB_LEASE_SECONDS: float = 60.0
+    # Finished jobs are kept this long for inspection
+    JOB_RETENTION_DAYS: int = 7
+    # Port for the worker's own /metrics; unset to not serve one
+    JOB_WORKER_METRICS_PORT: Optional[int] = None
+
+    # Notifications go out through NOTIFICATION_CHANNEL: "log", "file"
+    # (JSON lines appended to NOTIFICATION_FILE) or "smtp"
+    NOTIFICATION_CHANNEL: str = "log"
+    NOTIFICATION_FILE: str = "notifications.jsonl"
+    NOTIFICATION_SENDER: str = "Accountability App <noreply@accountability.local>"
+    SMTP_HOST: str = "localhost"
+    SMTP_PORT: int = 1025
+    SMTP_USER: Optional[str] = None
+    SMTP_PASSWORD: Optional[str] = None
+    SMTP_STARTTLS: bool = False
+    # The outbox dispatcher sends up to this many messages per batch and
+    # polls this often when idle; failing messages are retried with backoff.
+    # A claimed batch is due again if it is not marked within the claim time
+    OUTBOX_BATCH_SIZE: int = 500
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 1.0
+    OUTBOX_CLAIM_SECONDS: float = 300.0
+    OUTBOX_MAX_ATTEMPTS: int = 10
+    OUTBOX_RETRY_DELAY_SECONDS: float = 10.0
+    OUTBOX_RETENTION_DAYS: int = 7
+    # Reminders go out this long before a goal's target date and an event's
+    # start; the scanner queues them this many at a time
+    GOAL_REMINDER_LEAD_HOURS: float = 24.0
+    EVENT_REMINDER_LEAD_MINUTES: float = 15.0
+    REMINDER_BATCH_SIZE: int = 1000
+    # Responses to writes sent with an Idempotency-Key header are replayed
+    # for retries within this many hours; the most recently replayed are
+    # also kept in memory. Expired keys are deleted this many at a time
+    IDEMPOTENCY_KEY_TTL_HOURS: float = 24.0
+    IDEMPOTENCY_CACHE_SIZE: int = 10000
+    IDEMPOTENCY_PURGE_BATCH_SIZE: int = 10000
     
     POSTGRES_SERVER: str = "localhost"
     POSTGRES_USER: str = "postgres"
@@ -41,6 +174,27 @@ class Settings(BaseSettings):
             path=f"/{values.get('POSTGRES_DB') or ''}",
         )
 
+    # Deletions older than this are forgotten; clients with an older sync
+    # cursor get a 410 and resync from scratch
+    SYNC_TOMBSTONE_RETENTION_DAYS: int = 30
+
+    # SQLALCHEMY_REPLICA_URIS is a comma-separated list of read replica DSNs
+    SQLALCHEMY_REPLICA_URIS: List[str] = []
+    # Replicas further behind the primary than this are skipped
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_LAG_CHECK_INTERVAL_SECONDS: float = 2.0
+    # How long a client's reads stay on the primary after it writes, carried
+    # in a signed cookie
+    READ_YOUR_WRITES_SECONDS: float = 10.0
+
+    @validator("SQLALCHEMY_REPLICA_URIS", pre=True)
+    def assemble_replica_uris(cls, v: Union[str, List[str]]) -> Union[List[str], str]:
+        if isinstance(v, str) and not v.startswith("["):
+            return [i.strip() for i in v.split(",") if i.strip()]
+        elif isinstance(v, (list, str)):
+            return v
+        raise ValueError(v)
+
     class Config:
         case_sensitive = True
         env_file = ".env"
@@ -0,0 +1,184 @@
+"""
+Per-request time budgets.
+
+Every API route has a budget: ``REQUEST_DEADLINE_SECONDS``, or what its
+endpoint declares with ``@deadline(seconds)``. The routers use
+``DeadlineRoute``, which starts the clock once the route is matched, before
+its dependencies run, and keeps the deadline in a context variable that
+follows the request into threadpool workers.
+
+The budget is enforced where requests spend their time and hold pooled
+connections, in the database:
+
+- each transaction starts with ``SET LOCAL statement_timeout`` set to the
+  time left, and ``lock_timeout`` capped at ``REQUEST_LOCK_TIMEOUT_SECONDS``,
+  so Postgres cancels a query that would run past the deadline. Both are
+  lowered again before a statement once they exceed the time left by more
+  than a tenth of the budget;
+- no statement starts after the deadline; ``DeadlineExceeded`` is raised
+  instead.
+
+Either way the handler stops there, its transaction is rolled back with the
+session, and the route answers 504. Threads cannot be interrupted, so work
+between statements is not cut short, but it cannot reach the database
+again. The body of a streaming response is sent after the handler returns,
+under the statement timeout already set.
+
+Sessions opened outside a request (jobs, scripts) have no deadline unless
+the code runs under ``limit(seconds)``, which also tightens a request's
+budget for part of its work.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, Optional
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from starlette.requests import Request
+
+from app.core.config import settings
+from app.core.metrics import DEADLINES_EXCEEDED
+
+# SQLSTATEs of statements stopped by statement_timeout and lock_timeout
+QUERY_CANCELED = "57014"
+LOCK_NOT_AVAILABLE = "55P03"
+# Share of the budget the timeouts may run ahead of the time left
+TIGHTEN_AFTER = 0.1
+# Connection.info key: (deadline, statement timeout) set in this transaction
+_APPLIED = "deadline_timeout"
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+    __slots__ = ("seconds", "expires_at")
+
+    def __init__(self, seconds: float) -> None:
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+
+def remaining(default: float) -> float:
+    """
+    Seconds left for the current request, or ``default`` outside one.
+    """
+    current = _current.get()
+    return default if current is None else max(current.remaining(), 0.0)
+
+
+@contextmanager
+def limit(seconds: float) -> Iterator[None]:
+    """
+    Run the block under a budget of at most ``seconds``, or what is left of
+    the request's if that is less.
+    """
+    current = _current.get()
+    if current is not None and current.remaining() <= seconds:
+        yield
+        return
+    token = _current.set(Deadline(seconds))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def deadline(seconds: float) -> Callable:
+    """
+    Give an endpoint its own budget instead of ``REQUEST_DEADLINE_SECONDS``.
+    Goes below the route decorator.
+    """
+    def declare(endpoint: Callable) -> Callable:
+        endpoint.deadline_seconds = seconds
+        return endpoint
+    return declare
+
+
+def _timeout_reason(exc: OperationalError) -> Optional[str]:
+    code = getattr(exc.orig, "pgcode", None)
+    if code == QUERY_CANCELED:
+        return "statement_timeout"
+    if code == LOCK_NOT_AVAILABLE:
+        return "lock_timeout"
+    return None
+
+
+class DeadlineRoute(APIRoute):
+    """
+    Route running its handler, dependencies included, under the endpoint's
+    budget and answering 504 when the database work runs out of it.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        seconds = getattr(self.endpoint, "deadline_seconds", settings.REQUEST_DEADLINE_SECONDS)
+
+        async def run(request: Request):
+            token = _current.set(Deadline(seconds))
+            try:
+                return await handler(request)
+            except DeadlineExceeded:
+                reason = "deadline"
+            except OperationalError as exc:
+                reason = _timeout_reason(exc)
+                if reason is None:
+                    raise
+            finally:
+                _current.reset(token)
+            DEADLINES_EXCEEDED.labels(self.path, reason).inc()
+            return JSONResponse({"detail": "Request took too long"}, status_code=504)
+
+        return run
+
+
+def _ms(seconds: float) -> int:
+    # 0 would turn the timeout off
+    return max(int(seconds * 1000), 1)
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    current = _current.get()
+    if current is None:
+        return
+    left = current.remaining()
+    if left <= 0:
+        raise DeadlineExceeded(f"Request deadline of {current.seconds:g}s has passed")
+    applied = conn.info.get(_APPLIED)
+    if applied is not None and applied[0] is current and applied[1] - left < current.seconds * TIGHTEN_AFTER:
+        return
+    lock_timeout = min(left, settings.REQUEST_LOCK_TIMEOUT_SECONDS)
+    # A cursor of its own: the statement's may be a server-side one
+    set_cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        set_cursor.execute(
+            f"SET LOCAL statement_timeout = {_ms(left)}; SET LOCAL lock_timeout = {_ms(lock_timeout)}"
+        )
+    finally:
+        set_cursor.close()
+    conn.info[_APPLIED] = (current, left)
+
+
+def _end_transaction(conn) -> None:
+    conn.info.pop(_APPLIED, None)
+
+
+def enforce_deadlines(engine: Engine) -> None:
+    """
+    Apply the current request's deadline to the statements run on
+    ``engine``.
+    """
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "commit", _end_transaction)
+    event.listen(engine, "rollback", _end_transaction)
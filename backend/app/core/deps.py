@@ -1,13 +1,13 @@
 from typing import Generator, Optional
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from pydantic import ValidationError
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.core.security import ALGORITHM
+from app.core.security import ALGORITHM, FEED_SCOPE
 from app.db.session import get_db
 from app.models.user import User
 from app.schemas.user import TokenPayload
@@ -15,9 +15,11 @@ from app.schemas.user import TokenPayload
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
-) -> User:
+def decode_token(token: str, scope: Optional[str] = None) -> TokenPayload:
+    """
+    Verify a token issued by app.core.security and check that it carries
+    ``scope`` (None for API access tokens).
+    """
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[ALGORITHM]
@@ -28,6 +30,20 @@ def get_current_user(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
+    if token_data.scope != scope:
+        # Scoped tokens (calendar feeds) are not valid for the API, nor
+        # access tokens for feeds
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials",
+        )
+    return token_data
+
+
+def get_current_user(
+    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
+) -> User:
+    token_data = decode_token(token)
     user = db.query(User).filter(User.id == token_data.sub).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -51,4 +67,20 @@ def get_current_active_superuser(
         raise HTTPException(
             status_code=400, detail="The user doesn't have enough privileges"
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+
+def get_feed_user(
+    db: Session = Depends(get_db), token: str = Query(...)
+) -> User:
+    token_data = decode_token(token, FEED_SCOPE)
+    user = db.query(User).filter(User.id == token_data.sub).first()
+    if not user or not user.is_active:
+        raise HTTPException(status_code=404, detail="User not found")
+    # Tokens from before versioning count as version 0
+    if (token_data.ver or 0) != user.feed_token_version:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials",
+        )
+    return user
@@ -0,0 +1,373 @@
+"""
+Prometheus metrics for the API.
+
+When the ``PROMETHEUS_MULTIPROC_DIR`` environment variable points at a writable
+directory, prometheus_client stores samples in per-process mmap files and
+``/metrics`` aggregates them, so every uvicorn/gunicorn worker is included no
+matter which one answers the scrape. The directory must be emptied before the
+server starts.
+"""
+import gc
+import os
+import resource
+import time
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Dict, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.responses import Response
+
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+# ASGI scope of the request being served; copied into threadpool workers, so
+# code running inside a handler can find its route once routing has happened.
+current_scope: ContextVar[Optional[dict]] = ContextVar("current_scope", default=None)
+
+# Requests
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+REQUESTS_TOTAL = Counter(
+    "http_requests_total",
+    "Requests by route and status code",
+    ["method", "route", "status"],
+)
+RATE_LIMITED = Counter(
+    "http_requests_rate_limited_total",
+    "Requests refused with 429 by rate limit policy",
+    ["policy"],
+)
+COMPRESSION_BYTES = Counter(
+    "http_response_compression_bytes_total",
+    "Response bytes before (in) and after (out) compression by encoding",
+    ["encoding", "stage"],
+)
+COMPRESSION_SECONDS = Histogram(
+    "http_response_compression_seconds",
+    "Time spent compressing one response body or chunk",
+    ["encoding"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5),
+)
+DEADLINES_EXCEEDED = Counter(
+    "http_request_deadlines_exceeded_total",
+    "Requests answered 504 for running out of their time budget, by route and "
+    "what stopped them (deadline, statement_timeout, lock_timeout)",
+    ["route", "reason"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Requests currently being served",
+    multiprocess_mode="livesum",
+)
+
+# Database
+DB_POOL_SIZE = Gauge(
+    "db_pool_size",
+    "Configured pool size",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Open DBAPI connections",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Connections currently checked out of the pool",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+DB_QUERIES = Counter(
+    "db_queries_total",
+    "SQL statements executed, by the route that issued them",
+    ["engine", "route"],
+)
+
+# Caches
+CACHE_REQUESTS = Counter(
+    "app_cache_requests_total",
+    "Cache lookups by cache name and result (hit/miss)",
+    ["cache", "result"],
+)
+COALESCED_REQUESTS = Counter(
+    "coalesced_requests_total",
+    "Reads by outcome: ran the query (leader), shared its result "
+    "(coalesced), or ran their own after giving up waiting (timeout) or "
+    "after the leader failed (leader_failed)",
+    ["name", "outcome"],
+)
+
+# Dashboard
+DASHBOARD_SECTION_FAILURES = Counter(
+    "dashboard_section_failures_total",
+    "Dashboard sections left out of a response",
+    ["section", "reason"],
+)
+
+# Background jobs
+JOBS_ENQUEUED = Counter(
+    "jobs_enqueued_total",
+    "Jobs added to the queue by task",
+    ["task"],
+)
+JOBS_FINISHED = Counter(
+    "jobs_finished_total",
+    "Job attempts by task and outcome (done, retry, failed, lost)",
+    ["task", "outcome"],
+)
+JOB_DURATION = Histogram(
+    "job_duration_seconds",
+    "Time spent running one attempt of a job",
+    ["task"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0),
+)
+JOB_QUEUE_DELAY = Histogram(
+    "job_queue_delay_seconds",
+    "Time from a job becoming due to a worker starting it",
+    ["task"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+JOBS_QUEUED = Gauge(
+    "jobs_queued",
+    "Jobs waiting in the queue by task, as last sampled by a worker",
+    ["task"],
+    multiprocess_mode="livemax",
+)
+JOBS_RUNNING = Gauge(
+    "jobs_running",
+    "Jobs currently being run by workers",
+    multiprocess_mode="livesum",
+)
+
+# Notifications
+OUTBOX_MESSAGES = Counter(
+    "outbox_messages_total",
+    "Outbox messages processed by kind and outcome (sent, retry, failed)",
+    ["kind", "outcome"],
+)
+NOTIFICATIONS_SENT = Counter(
+    "notifications_sent_total",
+    "Notifications handed to a delivery channel",
+    ["channel", "kind"],
+)
+OUTBOX_BATCH_DURATION = Histogram(
+    "outbox_batch_duration_seconds",
+    "Time to deliver one batch of outbox messages",
+    ["channel"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0),
+)
+OUTBOX_DELIVERY_DELAY = Histogram(
+    "outbox_delivery_delay_seconds",
+    "Time from an outbox message being committed to it being sent",
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 3600.0),
+)
+
+# Reminders
+REMINDERS_QUEUED = Counter(
+    "reminders_queued_total",
+    "Reminder notifications written to the outbox by kind",
+    ["kind"],
+)
+REMINDER_SCAN_DURATION = Histogram(
+    "reminder_scan_duration_seconds",
+    "Time one reminder scan took by kind",
+    ["kind"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+
+# Idempotency keys
+IDEMPOTENT_REPLAYS = Counter(
+    "idempotent_replays_total",
+    "Retried writes answered with the stored response, by route",
+    ["route"],
+)
+
+# Password hashing
+PASSWORD_HASH_WAITING = Gauge(
+    "password_hash_queue_depth",
+    "Requests waiting for a password hashing slot",
+    multiprocess_mode="livesum",
+)
+PASSWORD_HASH_ACTIVE = Gauge(
+    "password_hash_active",
+    "Password hash/verify operations running",
+    multiprocess_mode="livesum",
+)
+
+# Process
+PROCESS_RSS = Gauge(
+    "app_process_resident_memory_bytes",
+    "Resident set size of the worker processes",
+    multiprocess_mode="livesum",
+)
+PROCESS_GC_COLLECTIONS = Gauge(
+    "app_process_gc_collections",
+    "Garbage collections since process start by generation",
+    ["generation"],
+    multiprocess_mode="livesum",
+)
+PROCESS_GC_OBJECTS = Gauge(
+    "app_process_gc_tracked_objects",
+    "Objects tracked by the garbage collector by generation",
+    ["generation"],
+    multiprocess_mode="livesum",
+)
+
+PROCESS_REFRESH_INTERVAL = 5.0
+_last_process_refresh = 0.0
+_page_size = resource.getpagesize()
+
+
+def refresh_process_metrics() -> None:
+    """
+    Update RSS and GC gauges for the current process.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * _page_size
+    except OSError:
+        # ru_maxrss is the peak, not the current value, but is all we get here
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    PROCESS_RSS.set(rss)
+    counts = gc.get_count()
+    for generation, stats in enumerate(gc.get_stats()):
+        PROCESS_GC_COLLECTIONS.labels(str(generation)).set(stats["collections"])
+        PROCESS_GC_OBJECTS.labels(str(generation)).set(counts[generation])
+
+
+def record_cache_access(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def current_route() -> str:
+    scope = current_scope.get()
+    if scope is None:
+        return "<background>"
+    route = scope.get("route")
+    return route.path if route is not None else "<unmatched>"
+
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """
+    Track pool size, open and checked-out connections for an engine, and
+    count the statements it executes per route.
+    """
+    pool = engine.pool
+    size = getattr(pool, "size", None)
+    if callable(size):
+        DB_POOL_SIZE.labels(name).set(size())
+
+    connections = DB_POOL_CONNECTIONS.labels(name)
+    checked_out = DB_POOL_CHECKED_OUT.labels(name)
+
+    event.listen(pool, "connect", lambda *args: connections.inc())
+    event.listen(pool, "close", lambda *args: connections.dec())
+    event.listen(pool, "close_detached", lambda *args: connections.dec())
+    event.listen(pool, "checkout", lambda *args: checked_out.inc())
+    event.listen(pool, "checkin", lambda *args: checked_out.dec())
+
+    query_counters: Dict[str, Counter] = {}
+
+    def count_query(*args) -> None:
+        route = current_route()
+        counter = query_counters.get(route)
+        if counter is None:
+            counter = query_counters[route] = DB_QUERIES.labels(name, route)
+        counter.inc()
+
+    event.listen(engine, "before_cursor_execute", count_query)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency, status and in-flight requests.
+
+    Requests are labelled with the route template (e.g.
+    ``/api/v1/teams/{team_id}``) that FastAPI stores in the scope once the
+    router has matched, so label cardinality is bounded by the number of
+    routes. Label children are cached to keep the per-request cost to a couple
+    of dictionary lookups and atomic increments.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+        self._children: Dict[Tuple[str, str, int], Tuple] = {}
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        token = current_scope.set(scope)
+        REQUESTS_IN_FLIGHT.inc()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = perf_counter() - start
+            REQUESTS_IN_FLIGHT.dec()
+            current_scope.reset(token)
+            route = scope.get("route")
+            key = (
+                scope["method"],
+                route.path if route is not None else "<unmatched>",
+                status_code,
+            )
+            children = self._children.get(key)
+            if children is None:
+                children = (
+                    REQUEST_LATENCY.labels(key[0], key[1]),
+                    REQUESTS_TOTAL.labels(key[0], key[1], str(key[2])),
+                )
+                self._children[key] = children
+            children[0].observe(elapsed)
+            children[1].inc()
+
+            global _last_process_refresh
+            now = time.monotonic()
+            if now - _last_process_refresh > PROCESS_REFRESH_INTERVAL:
+                _last_process_refresh = now
+                refresh_process_metrics()
+
+
+def metrics_response() -> Response:
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        refresh_process_metrics()
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def mark_process_dead() -> None:
+    """
+    Drop this worker's live gauges from the multiprocess aggregation.
+    """
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
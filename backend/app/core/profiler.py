@@ -0,0 +1,236 @@
+"""
+On-demand sampling profiler for a running worker.
+
+A session starts a daemon thread that reads ``sys._current_frames()`` every
+``interval`` seconds and counts collapsed stacks, the input format of
+flamegraph.pl and speedscope. Nothing is installed while no session is running:
+a session limited to a route or a header wraps ``app.middleware_stack`` for
+its duration only and puts the original back afterwards.
+
+The wrapper marks each matching request by setting a context variable for
+it, which follows the request into threadpool workers. A thread is sampled
+only while it runs code in a marked context, so other requests to the same
+endpoint are left out. The sampler finds the context a thread runs in from
+the frame that entered it: a step of an asyncio task on the event loop, or a
+job on one of anyio's worker threads (the threadpool Starlette uses).
+"""
+import asyncio
+import os
+import queue
+import sys
+import threading
+from collections import Counter
+from contextvars import Context, ContextVar
+from typing import Callable, Dict, Optional, Sequence, Set, Tuple
+
+from starlette.routing import Match
+
+_IDLE_MODULES = ("threading.py", "queue.py", "selectors.py")
+
+# The session profiling the current request, if any
+_profiled: ContextVar[Optional["ProfileSession"]] = ContextVar("profiled_request", default=None)
+
+
+def _handle_context(frame) -> Optional[Context]:
+    return getattr(frame.f_locals.get("self"), "_context", None)
+
+
+def _worker_context(frame) -> Optional[Context]:
+    return frame.f_locals.get("context")
+
+
+# Code of the frames that run a callback in a Context -> how to read it
+_CONTEXT_FRAMES: Dict = {asyncio.events.Handle._run.__code__: _handle_context}
+try:
+    from anyio._backends._asyncio import WorkerThread
+
+    _CONTEXT_FRAMES[WorkerThread.run.__code__] = _worker_context
+except ImportError:  # pragma: no cover - anyio moved it
+    pass
+# A worker thread waiting for its next job still holds the last job's context
+_WAITING = {queue.Queue.get.__code__}
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}.{code.co_name}:{frame.f_lineno}"
+
+
+def _stack(frame) -> list:
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+def _collapse(frames) -> str:
+    return ";".join(_frame_name(frame) for frame in frames)
+
+
+def running_context(frames) -> Optional[Context]:
+    """
+    Context of the task step or threadpool job a stack (outermost frame
+    first) is running, or None when it is not running one.
+    """
+    for i, frame in enumerate(frames):
+        read = _CONTEXT_FRAMES.get(frame.f_code)
+        if read is None:
+            continue
+        if i + 1 == len(frames) or frames[i + 1].f_code in _WAITING:
+            return None
+        return read(frame)
+    return None
+
+
+class _RequestTracker:
+    """
+    ASGI wrapper that marks in-flight requests the session profiles.
+    """
+
+    def __init__(self, app, session: "ProfileSession") -> None:
+        self.app = app
+        self.session = session
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not self.session.wants(scope):
+            await self.app(scope, receive, send)
+            return
+        token = _profiled.set(self.session)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _profiled.reset(token)
+
+
+class ProfileSession:
+    def __init__(
+        self,
+        interval: float,
+        route_matches: Optional[Callable] = None,
+        header: Optional[Tuple[bytes, Optional[bytes]]] = None,
+    ) -> None:
+        self.interval = interval
+        self.route_matches = route_matches
+        self.header = header
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+
+    @property
+    def filtered(self) -> bool:
+        return self.route_matches is not None or self.header is not None
+
+    def header_matches(self, scope) -> bool:
+        name, value = self.header
+        for key, header_value in scope["headers"]:
+            if key == name:
+                return value is None or header_value == value
+        return False
+
+    def wants(self, scope) -> bool:
+        if self.header is not None and not self.header_matches(scope):
+            return False
+        return self.route_matches is None or self.route_matches(scope)
+
+    def _sample(self, excluded: Set[int]) -> None:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id in excluded:
+                continue
+            if not self.filtered and frame.f_code.co_filename.endswith(_IDLE_MODULES):
+                continue
+            frames = _stack(frame)
+            if self.filtered:
+                context = running_context(frames)
+                if context is None or context.get(_profiled) is not self:
+                    continue
+            self.samples[_collapse(frames)] += 1
+            self.sample_count += 1
+
+    def run(self, seconds: float, excluded: Set[int]) -> None:
+        def loop() -> None:
+            excluded.add(threading.get_ident())
+            while not self._stop.wait(self.interval):
+                self._sample(excluded)
+
+        sampler = threading.Thread(target=loop, name="sampling-profiler", daemon=True)
+        sampler.start()
+        self._stop.wait(seconds)
+        self._stop.set()
+        sampler.join()
+
+    def collapsed(self) -> str:
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.samples.most_common()
+        )
+
+
+def route_matcher(router, routes: Sequence) -> Callable:
+    """
+    Whether a request goes to one of ``routes``: the first route of
+    ``router`` that fully matches it is among them.
+    """
+    # Routes compare by value and are not hashable
+    route_ids = {id(route) for route in routes}
+
+    def matches(scope) -> bool:
+        for route in router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return id(route) in route_ids
+        return False
+    return matches
+
+
+class SamplingProfiler:
+    """
+    One profiling session per worker process at a time.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+
+    def profile(
+        self,
+        app,
+        seconds: float,
+        interval: float,
+        routes: Optional[Sequence] = None,
+        header: Optional[Tuple[bytes, Optional[bytes]]] = None,
+    ) -> ProfileSession:
+        """
+        Sample this worker for ``seconds`` and return the finished session.
+        With ``routes`` or ``header``, only requests to those routes or
+        carrying that header are sampled.
+
+        Blocks the calling thread, which is excluded from the samples.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy(f"A profiling session is already running in worker {os.getpid()}")
+        try:
+            session = ProfileSession(
+                interval, route_matcher(app.router, routes) if routes is not None else None, header
+            )
+            original_stack = None
+            if session.filtered:
+                if app.middleware_stack is None:
+                    app.middleware_stack = app.build_middleware_stack()
+                original_stack = app.middleware_stack
+                app.middleware_stack = _RequestTracker(original_stack, session)
+            try:
+                session.run(seconds, {threading.get_ident()})
+            finally:
+                if original_stack is not None:
+                    app.middleware_stack = original_stack
+            return session
+        finally:
+            self._lock.release()
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,237 @@
+"""
+Per-client rate limiting.
+
+``RATE_LIMITS`` maps routes (``"METHOD /path"`` below ``API_V1_STR``, path
+parameters written as in the route) to a rate such as ``"10/minute"``; every
+client gets a token bucket per route that holds that many requests and
+refills at that rate. ``RATE_LIMIT_DEFAULT``, when set, gives each client
+one more bucket shared by all other routes. Clients are identified by the
+user id in their bearer token, or by IP address when it is missing or
+invalid. Requests over the limit get a 429 with ``Retry-After``.
+
+Buckets live in the worker process by default. The middleware only touches
+them from the event loop thread, so they need no locking; buckets that have
+refilled are dropped once there are more than ``RATE_LIMIT_MAX_KEYS``. With
+several workers each one enforces the limit separately, so divide the rates
+by the number of workers, or set ``RATE_LIMIT_REDIS_URL`` to share buckets
+through Redis (requires the ``redis`` package). If Redis cannot be reached,
+requests are let through.
+
+``python -m benchmarks.rate_limit_overhead`` measures the cost per request.
+"""
+import json
+import logging
+import math
+import re
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from jose import JWTError, jwt
+from starlette.routing import compile_path
+
+from app.core.config import settings
+from app.core.metrics import RATE_LIMITED
+from app.core.security import ALGORITHM
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"second": 1.0, "minute": 60.0, "hour": 3600.0, "day": 86400.0}
+_RATE = re.compile(r"^\s*(\d+)\s*/\s*(second|minute|hour|day)\s*$")
+# Verified bearer tokens are trusted this long without checking them again
+TOKEN_CACHE_SECONDS = 300.0
+
+# Atomically refill and take from a bucket stored as a hash; returns the
+# seconds to wait, 0 when the request is allowed
+_REDIS_TAKE = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'at')
+local tokens = tonumber(bucket[1]) or capacity
+local at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - at) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'at', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return tostring(wait)
+"""
+
+
+class Policy(NamedTuple):
+    name: str
+    rate: float  # tokens per second
+    capacity: float
+
+
+def parse_rate(name: str, value: str) -> Policy:
+    match = _RATE.match(value)
+    if match is None or int(match[1]) < 1:
+        raise ValueError(f"Rate limit for {name!r} must look like '10/minute', not {value!r}")
+    count = float(match[1])
+    return Policy(name, count / PERIODS[match[2]], count)
+
+
+class LocalBuckets:
+    """
+    Token buckets in this process. Not thread-safe: only use them from the
+    event loop.
+    """
+
+    def __init__(self, max_keys: int) -> None:
+        self.max_keys = max_keys
+        # (policy, client) -> [tokens, last refill, rate, capacity]
+        self._buckets: Dict[Tuple[str, str], List[float]] = {}
+
+    async def take(self, policy: Policy, client: str) -> float:
+        return self.take_now(policy, client, time.monotonic())
+
+    def take_now(self, policy: Policy, client: str, now: float) -> float:
+        key = (policy.name, client)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._sweep(now)
+            self._buckets[key] = [policy.capacity - 1, now, policy.rate, policy.capacity]
+            return 0.0
+        tokens = min(policy.capacity, bucket[0] + (now - bucket[1]) * policy.rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+        bucket[0] = tokens
+        return (1 - tokens) / policy.rate
+
+    def _sweep(self, now: float) -> None:
+        # A bucket that has refilled is the same as no bucket
+        self._buckets = {
+            key: bucket
+            for key, bucket in self._buckets.items()
+            if bucket[0] + (now - bucket[1]) * bucket[2] < bucket[3]
+        }
+        if len(self._buckets) >= self.max_keys:
+            logger.warning("More than %d clients are being rate limited; resetting all buckets", self.max_keys)
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RedisBuckets:
+    """
+    Token buckets shared by every worker through Redis.
+    """
+
+    def __init__(self, url: str) -> None:
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL is set but the redis package is not installed")
+        self._redis = redis.from_url(url)
+        self._script = self._redis.register_script(_REDIS_TAKE)
+
+    async def take(self, policy: Policy, client: str) -> float:
+        try:
+            wait = await self._script(keys=[f"ratelimit:{policy.name}:{client}"], args=[policy.rate, policy.capacity])
+        except Exception:
+            logger.exception("Rate limit backend failed; letting the request through")
+            return 0.0
+        return float(wait)
+
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI middleware applying the policies from the settings. Runs
+    before routing, so routes are matched on the raw path: an exact lookup
+    for static paths and a regex per templated one.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+        prefix = settings.API_V1_STR
+        self.exact: Dict[Tuple[str, str], Policy] = {}
+        self.templated: List[Tuple[str, "re.Pattern", Policy]] = []
+        for name, value in settings.RATE_LIMITS.items():
+            method, _, path = name.partition(" ")
+            policy = parse_rate(name, value)
+            if "{" in path:
+                self.templated.append((method.upper(), compile_path(prefix + path)[0], policy))
+            else:
+                self.exact[(method.upper(), prefix + path)] = policy
+        self.default = parse_rate("default", settings.RATE_LIMIT_DEFAULT) if settings.RATE_LIMIT_DEFAULT else None
+        if settings.RATE_LIMIT_REDIS_URL:
+            self.buckets = RedisBuckets(settings.RATE_LIMIT_REDIS_URL)
+        else:
+            self.buckets = LocalBuckets(settings.RATE_LIMIT_MAX_KEYS)
+        # token -> (user id, monotonic expiry)
+        self._users: Dict[str, Tuple[str, float]] = {}
+
+    def policy(self, method: str, path: str) -> Optional[Policy]:
+        policy = self.exact.get((method, path))
+        if policy is not None:
+            return policy
+        for route_method, pattern, policy in self.templated:
+            if route_method == method and pattern.match(path):
+                return policy
+        return self.default
+
+    def client(self, scope) -> str:
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    user_id = self._user_id(token)
+                    if user_id is not None:
+                        return f"user:{user_id}"
+                break
+        client = scope.get("client")
+        return f"ip:{client[0]}" if client else "ip:unknown"
+
+    def _user_id(self, token: str) -> Optional[str]:
+        # Verifying the signature costs far more than the rest of the
+        # middleware, so verified tokens are remembered for a while. A plain
+        # dict, like the buckets: an LRUCache's lock and metrics would
+        # double the cost of a request
+        now = time.monotonic()
+        entry = self._users.get(token)
+        if entry is not None and entry[1] > now:
+            return entry[0]
+        try:
+            user_id = str(jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])["sub"])
+        except (JWTError, KeyError):
+            return None
+        if len(self._users) >= settings.RATE_LIMIT_MAX_KEYS:
+            self._users.clear()
+        self._users[token] = (user_id, now + TOKEN_CACHE_SECONDS)
+        return user_id
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        policy = self.policy(scope["method"], scope["path"])
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+        wait = await self.buckets.take(policy, self.client(scope))
+        if not wait:
+            await self.app(scope, receive, send)
+            return
+
+        RATE_LIMITED.labels(policy.name).inc()
+        body = json.dumps({"detail": "Too many requests"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(math.ceil(wait)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
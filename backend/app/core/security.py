@@ -1,3 +1,4 @@
+import threading
 from datetime import datetime, timedelta
 from typing import Any, Union
 
@@ -5,10 +6,19 @@ from jose import jwt
 from passlib.context import CryptContext
 
 from app.core.config import settings
+from app.core.metrics import PASSWORD_HASH_ACTIVE, PASSWORD_HASH_WAITING
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt is CPU bound; cap how many threadpool workers can hash at once so
+# logins cannot starve every other request of threads.
+_hash_slots = threading.BoundedSemaphore(settings.PASSWORD_HASH_CONCURRENCY)
+
 ALGORITHM = "HS256"
+# Scope of the long-lived tokens embedded in calendar feed URLs; they only
+# grant read access to feeds, expire after FEED_TOKEN_EXPIRE_DAYS and are
+# revoked together by bumping the user's feed_token_version
+FEED_SCOPE = "feed"
 
 
 def create_access_token(
@@ -25,9 +35,27 @@ def create_access_token(
     return encoded_jwt
 
 
+def create_feed_token(subject: Union[str, Any], version: int) -> str:
+    expire = datetime.utcnow() + timedelta(days=settings.FEED_TOKEN_EXPIRE_DAYS)
+    to_encode = {"exp": expire, "sub": str(subject), "scope": FEED_SCOPE, "ver": version}
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
+
+
+def _run_hash(func, *args):
+    PASSWORD_HASH_WAITING.inc()
+    _hash_slots.acquire()
+    PASSWORD_HASH_WAITING.dec()
+    PASSWORD_HASH_ACTIVE.inc()
+    try:
+        return func(*args)
+    finally:
+        PASSWORD_HASH_ACTIVE.dec()
+        _hash_slots.release()
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return _run_hash(pwd_context.verify, plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
\ No newline at end of file
+    return _run_hash(pwd_context.hash, password)
@@ -0,0 +1,85 @@
+"""
+Coalescing of identical concurrent reads.
+
+``SingleFlight.do(key, fn)`` runs ``fn`` once for all threads that ask for
+the same key at the same time: the first becomes the leader and runs it,
+the others wait for its result. Nothing is kept once the leader finishes,
+so unlike a cache this never serves stale data; it only stops a burst of
+identical requests from running the same queries side by side. Waiters give
+up after ``timeout`` seconds and run ``fn`` themselves.
+
+Only errors of the ``share_errors`` types, which any run would raise too
+(e.g. a 404), are passed on to the waiters, each getting a copy of its own.
+When the leader failed otherwise, say on its own deadline or a lock
+timeout, every waiter runs ``fn`` itself under its own budget.
+
+Keys must cover everything the result depends on, including who may see it:
+check permissions before calling ``do`` and make the result the same for
+everyone who passes the check.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, Type
+
+from app.core.metrics import COALESCED_REQUESTS
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+def _copy(error: BaseException) -> BaseException:
+    # Raising one object in several threads at once would have them rewrite
+    # its __traceback__ together. Built without __init__, whose arguments
+    # are not always kept in ``args`` (HTTPException's are not).
+    clone = type(error).__new__(type(error))
+    clone.args = error.args
+    clone.__dict__.update(error.__dict__)
+    return clone
+
+
+class SingleFlight:
+    def __init__(self, name: str, share_errors: Tuple[Type[BaseException], ...] = ()) -> None:
+        self.name = name
+        self.share_errors = share_errors
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if leader:
+            COALESCED_REQUESTS.labels(self.name, "leader").inc()
+            try:
+                call.result = fn()
+            except BaseException as exc:
+                call.error = exc
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+            return call.result
+
+        if not call.done.wait(timeout):
+            COALESCED_REQUESTS.labels(self.name, "timeout").inc()
+            return fn()
+        if call.error is None:
+            COALESCED_REQUESTS.labels(self.name, "coalesced").inc()
+            return call.result
+        if isinstance(call.error, self.share_errors):
+            COALESCED_REQUESTS.labels(self.name, "coalesced").inc()
+            raise _copy(call.error)
+        COALESCED_REQUESTS.labels(self.name, "leader_failed").inc()
+        return fn()
+
+    def __len__(self) -> int:
+        return len(self._calls)
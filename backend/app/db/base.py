@@ -3,14 +3,49 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
+from app.core.deadlines import enforce_deadlines
+from app.core.metrics import instrument_engine
+from app.db.routing import ReplicaSet, RoutingSession
 
 engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+instrument_engine(engine, "primary")
+enforce_deadlines(engine)
+
+replica_engines = []
+for i, uri in enumerate(settings.SQLALCHEMY_REPLICA_URIS):
+    replica_engine = create_engine(uri, pool_pre_ping=True)
+    instrument_engine(replica_engine, f"replica{i}")
+    enforce_deadlines(replica_engine)
+    replica_engines.append(replica_engine)
+
+replicas = ReplicaSet(
+    replica_engines,
+    max_lag=settings.REPLICA_MAX_LAG_SECONDS,
+    check_interval=settings.REPLICA_LAG_CHECK_INTERVAL_SECONDS,
+    sticky_seconds=settings.READ_YOUR_WRITES_SECONDS,
+)
+SessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    # Handlers return objects after committing; see app.db.writes
+    expire_on_commit=False,
+    bind=engine,
+    class_=RoutingSession,
+    replicas=replicas,
+)
 
 Base = declarative_base()
 
 # Import all models for Alembic
 from app.models.user import User
 from app.models.team import Team
-from app.models.goal import Goal
-from app.models.event import Event
\ No newline at end of file
+from app.models.goal import Goal, GoalProgress, GoalProgressDaily
+from app.models.event import Event, EventException
+from app.models.sync import SyncTombstone
+from app.models.leaderboard import TeamLeaderboardEntry
+from app.models.forecast import GoalForecast
+from app.models.deletion import DeletionJob
+from app.models.job import Job, JobSchedule
+from app.models.outbox import OutboxMessage
+from app.models.reminder import reminder_marks, series_reminders
+from app.models.idempotency import IdempotencyKey
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""
+Read-replica routing for ORM sessions.
+
+``RoutingSession`` sends everything that writes or locks (flushes,
+INSERT/UPDATE/DELETE, SELECT ... FOR UPDATE, or any statement once
+``use_primary`` is set) to the primary, and reads to a healthy replica. The
+replica is chosen at the session's first read and kept until it closes, so
+a request never mixes two replicas that are at different points in time.
+
+Statements written with ``text()`` are not recognised as writes: call
+``mark_write()`` before running one that writes, so the session and the
+client move to the primary afterwards.
+
+A background thread measures each replica's replay lag every
+``REPLICA_LAG_CHECK_INTERVAL_SECONDS``, so requests never wait for the
+probe. Replicas further behind than ``REPLICA_MAX_LAG_SECONDS`` are skipped,
+and so are all of them while the measurements are out of date.
+
+A request whose session commits a write records until when its client
+should read from the primary (``READ_YOUR_WRITES_SECONDS``);
+app.db.session hands that to the client in a signed cookie, so it holds
+whichever worker or host serves the next request.
+"""
+import itertools
+import math
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+# Measurements older than this many check intervals are not trusted
+STALE_CHECKS = 3
+
+
+class ReplicaSet:
+    def __init__(
+        self,
+        engines: List[Engine],
+        max_lag: float,
+        check_interval: float,
+        sticky_seconds: float,
+    ) -> None:
+        self.engines = engines
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.sticky_seconds = sticky_seconds
+        # Unknown until measured
+        self._lag: Dict[Engine, float] = {e: math.inf for e in engines}
+        self._checked_at = -math.inf
+        self._round_robin = itertools.cycle(engines) if engines else None
+        self._round_robin_lock = threading.Lock()
+        self._monitor: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _measure_lag(self, engine: Engine) -> float:
+        try:
+            with engine.connect() as conn:
+                return float(conn.execute(LAG_QUERY).scalar() or 0.0)
+        except Exception:
+            return math.inf
+
+    def refresh(self) -> None:
+        for engine in self.engines:
+            self._lag[engine] = self._measure_lag(engine)
+        self._checked_at = time.monotonic()
+
+    def _run_monitor(self) -> None:
+        while True:
+            self.refresh()
+            if self._stop.wait(self.check_interval):
+                return
+
+    def start(self) -> None:
+        """
+        Start measuring lag in a daemon thread; until then no replica is used.
+        """
+        if not self.engines or self._monitor is not None:
+            return
+        self._stop.clear()
+        self._monitor = threading.Thread(target=self._run_monitor, name="replica-lag", daemon=True)
+        self._monitor.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._monitor = None
+
+    def choose(self) -> Optional[Engine]:
+        """
+        Next replica within the lag threshold, or None to use the primary.
+        """
+        if not self.engines:
+            return None
+        if time.monotonic() - self._checked_at > STALE_CHECKS * self.check_interval:
+            return None
+        for _ in range(len(self.engines)):
+            with self._round_robin_lock:
+                engine = next(self._round_robin)
+            if self._lag[engine] <= self.max_lag:
+                return engine
+        return None
+
+
+class RoutingSession(Session):
+    def __init__(self, *args, replicas: Optional[ReplicaSet] = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+        # Sessions opened outside a request (scripts, jobs) always use the primary
+        self.use_primary = True
+        # Replica serving this session's reads, chosen at the first one
+        self.replica: Optional[Engine] = None
+
+    def get_bind(self, mapper=None, *, clause=None, **kwargs):
+        if self._flushing or isinstance(clause, UpdateBase) or getattr(clause, "_for_update_arg", None) is not None:
+            self.mark_write()
+        elif not self.use_primary and self.replicas is not None:
+            if self.replica is None:
+                self.replica = self.replicas.choose()
+            if self.replica is not None:
+                return self.replica
+            # No healthy replica: read everything from the primary rather
+            # than switch between the two
+            self.use_primary = True
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+    def mark_write(self) -> None:
+        """
+        Move the session to the primary for good, so later reads in the same
+        request see the write, and keep the client there after the commit.
+        """
+        self.info["wrote"] = True
+        self.use_primary = True
+
+    def close(self) -> None:
+        super().close()
+        self.replica = None
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _stick_after_write(session) -> None:
+    # request.state of the request the session serves, set by get_db
+    state = session.info.get("request_state")
+    if session.info.pop("wrote", False) and state is not None and session.replicas is not None:
+        state.primary_until = time.time() + session.replicas.sticky_seconds
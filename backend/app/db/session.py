@@ -1,14 +1,87 @@
-from typing import Generator
+import hashlib
+import hmac
+import time
+from typing import Generator, Optional
 
+from fastapi import Request
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+
+from app.core.config import settings
 from app.db.base import SessionLocal
 
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+# Cookie holding "<epoch seconds>.<signature>": until then the client's
+# reads go to the primary
+PRIMARY_COOKIE = "primary_until"
+
+
+def _sign(until: str) -> str:
+    return hmac.new(settings.SECRET_KEY.encode(), f"{PRIMARY_COOKIE}:{until}".encode(), hashlib.sha256).hexdigest()
+
+
+def primary_cookie(until: float) -> str:
+    value = str(int(until) + 1)
+    return f"{value}.{_sign(value)}"
+
 
-def get_db() -> Generator:
+def primary_until(cookie: Optional[str]) -> float:
+    """
+    Time carried by a ``primary_until`` cookie, or 0 when it is missing or
+    its signature does not match.
+    """
+    if not cookie:
+        return 0.0
+    value, _, signature = cookie.partition(".")
+    if not value.isdigit() or not hmac.compare_digest(signature, _sign(value)):
+        return 0.0
+    return float(value)
+
+
+def reads_from_primary(request: HTTPConnection) -> bool:
+    return primary_until(request.cookies.get(PRIMARY_COOKIE)) > time.time()
+
+
+def get_db(request: Request) -> Generator:
     """
     Dependency for getting DB session
+
+    Read-only requests may be served from a replica, unless the client wrote
+    in the last READ_YOUR_WRITES_SECONDS; see app.db.routing.
     """
     try:
         db = SessionLocal()
+        db.use_primary = request.method not in READ_METHODS or reads_from_primary(request)
+        db.info["request_state"] = request.state
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+class ReadYourWritesMiddleware:
+    """
+    Pure ASGI middleware setting the ``primary_until`` cookie on responses
+    to requests that committed a write.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message) -> None:
+            if message["type"] == "http.response.start":
+                until = scope.get("state", {}).get("primary_until")
+                if until is not None:
+                    headers = MutableHeaders(scope=message)
+                    headers.append(
+                        "set-cookie",
+                        f"{PRIMARY_COOKIE}={primary_cookie(until)}; Max-Age={int(until - time.time()) + 1}; "
+                        "Path=/; HttpOnly; SameSite=Lax",
+                    )
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
@@ -0,0 +1,55 @@
+"""
+Single-statement write helpers.
+
+``INSERT/UPDATE ... RETURNING`` hands back the written row, server defaults
+included, so handlers no longer need ``db.refresh()`` after committing.
+SessionLocal uses ``expire_on_commit=False``, so the returned objects stay
+loaded and serialising the response does not hit the database again.
+"""
+from typing import Any, Dict, Iterable, Optional, Type, TypeVar
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+ModelType = TypeVar("ModelType")
+
+
+def insert_returning(db: Session, model: Type[ModelType], values: Dict[str, Any]) -> ModelType:
+    """
+    INSERT one row and return it as a mapped object.
+    """
+    return db.scalars(insert(model).values(**values).returning(model)).one()
+
+
+def update_returning(
+    db: Session,
+    model: Type[ModelType],
+    criteria: Iterable,
+    values: Dict[str, Any],
+) -> Optional[ModelType]:
+    """
+    UPDATE the row matching ``criteria`` and return it, or None if no row
+    matched. Any copy already in the identity map is overwritten with the
+    returned values.
+    """
+    criteria = list(criteria)
+    if not values:
+        return db.scalars(select(model).where(*criteria)).first()
+    stmt = (
+        update(model)
+        .where(*criteria)
+        .values(**values)
+        .returning(model)
+        .execution_options(synchronize_session="fetch")
+    )
+    return db.scalars(stmt).first()
+
+
+def set_loaded(obj, **relationships) -> None:
+    """
+    Attach already-known related objects without marking them as changes or
+    triggering a lazy load when the response is serialised.
+    """
+    for name, value in relationships.items():
+        set_committed_value(obj, name, value)
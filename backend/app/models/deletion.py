@@ -0,0 +1,23 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class DeletionJob(Base):
+    """
+    A goal or team being deleted in batches by app.services.deletion.
+    """
+    __tablename__ = "deletion_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # "goal" or "team"
+    # Not a foreign key: the row is gone once the job is done
+    target_id = Column(Integer, nullable=False, index=True)
+    requested_by_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    status = Column(String, nullable=False, default="pending")  # "pending", "running", "done" or "failed"
+    # Dependent rows deleted or detached so far
+    processed = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,4 +1,8 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, Table
+from sqlalchemy import (
+    BigInteger, Boolean, CheckConstraint, Column, Computed, Integer, String, ForeignKey, Text, DateTime, Index, Table,
+    UniqueConstraint, text
+)
+from sqlalchemy.dialects.postgresql import TSTZRANGE
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -8,13 +12,22 @@ from app.db.base import Base
 user_event = Table(
     "user_event",
     Base.metadata,
-    Column("user_id", Integer, ForeignKey("users.id"), primary_key=True),
-    Column("event_id", Integer, ForeignKey("events.id"), primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+    Column("event_id", Integer, ForeignKey("events.id", ondelete="CASCADE"), primary_key=True, index=True),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now()),
+    Column("sync_version", BigInteger, index=True),
 )
 
 
 class Event(Base):
     __tablename__ = "events"
+    __table_args__ = (
+        CheckConstraint("end_time >= start_time", name="ck_events_end_after_start"),
+        Index("ix_events_time_range", "time_range", postgresql_using="gist"),
+        # For the reminder scanner: one-off events by start; recurring series
+        # are found through series_reminders
+        Index("ix_events_upcoming", "start_time", "id", postgresql_where=text("recurrence_rule IS NULL")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True, nullable=False)
@@ -22,10 +35,14 @@ class Event(Base):
     start_time = Column(DateTime(timezone=True), nullable=False)
     end_time = Column(DateTime(timezone=True), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Bumped on every change to the event or its exceptions
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Maintained by the sync_touch trigger; see app.models.sync
+    sync_version = Column(BigInteger, index=True)
     
     # Foreign keys
     organizer_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    team_id = Column(Integer, ForeignKey("teams.id"), nullable=True)  # Optional team association
+    team_id = Column(Integer, ForeignKey("teams.id", ondelete="SET NULL"), nullable=True, index=True)  # Optional team association
     
     # Event type (e.g., "call", "personal")
     event_type = Column(String, nullable=False, default="personal")
@@ -34,7 +51,61 @@ class Event(Base):
     location = Column(String, nullable=True)
     meeting_link = Column(String, nullable=True)
     
+    # Recurring events: start_time/end_time are the first occurrence and
+    # recurrence_rule an RRULE such as "FREQ=WEEKLY;BYDAY=MO"
+    recurrence_rule = Column(String, nullable=True)
+    # End of the last occurrence, NULL when the series never ends
+    recurrence_end = Column(DateTime(timezone=True), nullable=True)
+    
+    # Time the event occupies, or the whole lifetime of a recurring series
+    # (unbounded when it never ends). Maintained by Postgres and GiST-indexed
+    # so window and conflict queries are a single && lookup. Zero-length
+    # events get a closed range so they are not empty.
+    time_range = Column(
+        TSTZRANGE,
+        Computed(
+            "tstzrange(start_time, CASE WHEN recurrence_rule IS NULL THEN end_time "
+            "ELSE recurrence_end END, CASE WHEN recurrence_rule IS NULL AND end_time = start_time "
+            "THEN '[]' ELSE '[)' END)",
+            persisted=True,
+        ),
+    )
+    
     # Relationships
     organizer = relationship("User", back_populates="events")
     team = relationship("Team", back_populates="events")
-    attendees = relationship("User", secondary=user_event)
\ No newline at end of file
+    attendees = relationship("User", secondary=user_event, passive_deletes=True)
+    exceptions = relationship(
+        "EventException", back_populates="event", cascade="all, delete-orphan", passive_deletes=True
+    )
+
+
+class EventException(Base):
+    """
+    A cancelled or modified occurrence of a recurring event.
+    """
+    __tablename__ = "event_exceptions"
+    __table_args__ = (UniqueConstraint("event_id", "original_start"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Start time the occurrence would have had according to the rule
+    original_start = Column(DateTime(timezone=True), nullable=False)
+    is_cancelled = Column(Boolean, default=False, nullable=False)
+    
+    # Overrides; NULL keeps the value from the series
+    title = Column(String, nullable=True)
+    description = Column(Text, nullable=True)
+    start_time = Column(DateTime(timezone=True), nullable=True)
+    end_time = Column(DateTime(timezone=True), nullable=True)
+    location = Column(String, nullable=True)
+    meeting_link = Column(String, nullable=True)
+    
+    event = relationship("Event", back_populates="exceptions")
+
+def overlaps_window(start, end):
+    """
+    Filter for events (or recurring series) whose time range overlaps
+    [start, end); served by the GiST index on time_range.
+    """
+    return Event.time_range.overlaps(func.tstzrange(start, end, "[)"))
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class GoalForecast(Base):
+    """
+    Projected completion of an open goal, written by the nightly batch in
+    app.services.forecast.
+    """
+    __tablename__ = "goal_forecasts"
+
+    goal_id = Column(Integer, ForeignKey("goals.id", ondelete="CASCADE"), primary_key=True)
+    # Fitted progress per day over the recent history; NULL without history
+    rate_per_day = Column(Float, nullable=True)
+    projected_completion = Column(DateTime(timezone=True), nullable=True)
+    status = Column(String, nullable=False)  # "on_track", "at_risk" or "no_data"
+    sample_count = Column(Integer, nullable=False, default=0)
+    computed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    goal = relationship("Goal", back_populates="forecast")
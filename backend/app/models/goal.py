@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, Float, Boolean
+from sqlalchemy import DDL, BigInteger, Column, Date, Integer, String, ForeignKey, Text, DateTime, Float, Boolean, Index, event, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -7,12 +7,21 @@ from app.db.base import Base
 
 class Goal(Base):
     __tablename__ = "goals"
+    __table_args__ = (
+        # Open goals by due date, for the reminder scanner
+        Index(
+            "ix_goals_due",
+            "target_date",
+            "id",
+            postgresql_where=text("is_completed IS NOT TRUE AND target_date IS NOT NULL"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True, nullable=False)
     description = Column(Text, nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    team_id = Column(Integer, ForeignKey("teams.id"), nullable=True)  # Optional team association
+    team_id = Column(Integer, ForeignKey("teams.id", ondelete="SET NULL"), nullable=True, index=True)  # Optional team association
     
     # Goal metrics
     target_value = Column(Float, nullable=False)
@@ -24,6 +33,9 @@ class Goal(Base):
     target_date = Column(DateTime(timezone=True), nullable=True)
     completed_at = Column(DateTime(timezone=True), nullable=True)
     is_completed = Column(Boolean, default=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Maintained by the sync_touch trigger; see app.models.sync
+    sync_version = Column(BigInteger, index=True)
     
     # For recurring goals
     is_recurring = Column(Boolean, default=False)
@@ -32,17 +44,57 @@ class Goal(Base):
     # Relationships
     user = relationship("User", back_populates="goals")
     team = relationship("Team", back_populates="goals")
-    progress_logs = relationship("GoalProgress", back_populates="goal", cascade="all, delete-orphan")
+    # Progress rows are removed by ON DELETE CASCADE rather than loaded and
+    # deleted one by one
+    progress_logs = relationship(
+        "GoalProgress", back_populates="goal", cascade="all, delete-orphan", passive_deletes=True
+    )
+    forecast = relationship("GoalForecast", back_populates="goal", uselist=False, passive_deletes=True)
 
 
 class GoalProgress(Base):
+    """
+    Partitioned by month on logged_at; app.services.partitions creates
+    upcoming partitions and compacts old ones into GoalProgressDaily.
+    """
     __tablename__ = "goal_progress"
+    __table_args__ = (
+        Index("ix_goal_progress_goal_id_logged_at", "goal_id", "logged_at"),
+        {"postgresql_partition_by": "RANGE (logged_at)"},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    goal_id = Column(Integer, ForeignKey("goals.id"), nullable=False)
+    # The partition key has to be part of the primary key
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    goal_id = Column(Integer, ForeignKey("goals.id", ondelete="CASCADE"), nullable=False)
     value = Column(Float, nullable=False)
     notes = Column(Text, nullable=True)
-    logged_at = Column(DateTime(timezone=True), server_default=func.now())
+    logged_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Maintained by the sync_touch trigger; see app.models.sync
+    sync_version = Column(BigInteger, index=True)
     
     # Relationship
-    goal = relationship("Goal", back_populates="progress_logs")
\ No newline at end of file
+    goal = relationship("Goal", back_populates="progress_logs")
+
+
+# Tables created through metadata.create_all() accept rows right away;
+# monthly partitions come from app.services.partitions
+event.listen(
+    GoalProgress.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS goal_progress_default PARTITION OF goal_progress DEFAULT").execute_if(
+        dialect="postgresql"
+    ),
+)
+
+
+class GoalProgressDaily(Base):
+    """
+    Per-goal daily totals (UTC days) of progress from archived partitions.
+    """
+    __tablename__ = "goal_progress_daily"
+
+    goal_id = Column(Integer, ForeignKey("goals.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    total = Column(Float, nullable=False)
+    entries = Column(Integer, nullable=False)
\ No newline at end of file
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, LargeBinary, String
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class IdempotencyKey(Base):
+    """
+    The response to a write made with an Idempotency-Key header, replayed
+    when the client retries with the same key; see app.services.idempotency.
+    """
+    __tablename__ = "idempotency_keys"
+
+    # Keys are chosen by clients, so they are only unique per user
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    key = Column(String, primary_key=True)
+    # SHA-256 of the method, path and body, to refuse a key reused for
+    # a different request
+    request_hash = Column(LargeBinary, nullable=False)
+    # NULL until the handler's transaction commits
+    status_code = Column(Integer, nullable=True)
+    response = Column(JSONB, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,63 @@
+from sqlalchemy import BigInteger, Column, DateTime, Float, Index, Integer, String, Text, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class Job(Base):
+    """
+    A unit of background work run by worker.py; see app.services.jobs.
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # What workers dequeue from: queued jobs in priority order
+        Index(
+            "ix_jobs_ready",
+            text("priority DESC"),
+            "run_at",
+            "id",
+            postgresql_where=text("status = 'queued'"),
+        ),
+        # At most one queued job per dedup key
+        Index(
+            "ix_jobs_dedup_key",
+            "dedup_key",
+            unique=True,
+            postgresql_where=text("status = 'queued'"),
+        ),
+        Index("ix_jobs_running", "timeout_at", postgresql_where=text("status = 'running'")),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    name = Column(String, nullable=False)  # registered task name
+    payload = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
+    priority = Column(Integer, nullable=False, default=0)  # higher runs first
+    status = Column(String, nullable=False, default="queued")  # "queued", "running", "done" or "failed"
+    dedup_key = Column(String, nullable=True)
+    # Not run before this time; pushed back after each failed attempt
+    run_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    locked_by = Column(String, nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    # Longest a single attempt may run; enforced by the worker
+    timeout_seconds = Column(Float, nullable=False)
+    # End of the running attempt's lease, extended by its worker's
+    # heartbeats; past it the job is assumed lost with its worker
+    timeout_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True, index=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class JobSchedule(Base):
+    """
+    Next run of each scheduled task; the worker that locks a due row
+    enqueues the job and moves the row on.
+    """
+    __tablename__ = "job_schedules"
+
+    name = Column(String, primary_key=True)
+    rule = Column(String, nullable=False)
+    next_run_at = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,38 @@
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class TeamLeaderboardEntry(Base):
+    """
+    One member's standing in their team's current cycle. Kept up to date by
+    app.services.leaderboard as progress is logged and members change, and
+    read straight off ix_team_leaderboard_rank.
+    """
+    __tablename__ = "team_leaderboard"
+
+    team_id = Column(Integer, ForeignKey("teams.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+
+    # Over the member's goals in this team
+    goal_count = Column(Integer, nullable=False, default=0)
+    completed_goals = Column(Integer, nullable=False, default=0)
+    # Sum of each goal's share of its target, capped at 1
+    ratio_sum = Column(Float, nullable=False, default=0.0)
+    completion = Column(Float, nullable=False, default=0.0)  # percent
+    # Progress logged between cycle_start_date and cycle_end_date
+    progress_total = Column(Float, nullable=False, default=0.0)
+    streak = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index(
+            "ix_team_leaderboard_rank",
+            "team_id",
+            completion.desc(),
+            progress_total.desc(),
+            streak.desc(),
+            user_id.desc(),
+        ),
+    )
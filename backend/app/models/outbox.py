@@ -0,0 +1,33 @@
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Index, Integer, String, Text, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class OutboxMessage(Base):
+    """
+    A notification written in the same transaction as the change it is
+    about, delivered later by app.services.outbox.
+    """
+    __tablename__ = "outbox"
+    __table_args__ = (
+        # What the dispatcher polls
+        Index("ix_outbox_pending", "next_attempt_at", "id", postgresql_where=text("status = 'pending'")),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    kind = Column(String, nullable=False)  # e.g. "goal_completed"; see app.services.notifications
+    # Recipients: the user, or else the members of the team other than the actor
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    team_id = Column(Integer, nullable=True)
+    actor_id = Column(Integer, nullable=True)
+    payload = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
+    # At most one message per key, e.g. one completion notice per goal
+    dedup_key = Column(String, nullable=True, unique=True)
+    status = Column(String, nullable=False, default="pending")  # "pending", "sent" or "failed"
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    sent_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Table
+
+from app.db.base import Base
+
+# Per reminder kind, the time up to which targets (goal due dates, event
+# starts) have been scanned; see app.services.reminders
+reminder_marks = Table(
+    "reminder_marks",
+    Base.metadata,
+    Column("name", String, primary_key=True),
+    Column("mark", DateTime(timezone=True), nullable=False),
+)
+
+# Per recurring event with occurrences left, the start of the first one the
+# scanner has not covered (or an earlier time, which only costs an extra
+# expansion); the scanner expands just the series due in its window
+series_reminders = Table(
+    "series_reminders",
+    Base.metadata,
+    Column("event_id", Integer, ForeignKey("events.id", ondelete="CASCADE"), primary_key=True),
+    Column("next_start", DateTime(timezone=True), nullable=False),
+    Index("ix_series_reminders_next_start", "next_start", "event_id"),
+)
@@ -0,0 +1,168 @@
+"""
+Change tracking for delta sync.
+
+Every synced table has a ``sync_version`` column that a BEFORE INSERT/UPDATE
+trigger sets to the id of the writing transaction, and an AFTER DELETE
+trigger that records a row in ``sync_tombstones``, addressed to the row's
+owner and/or team. Tombstones never fan out per member: a user leaving a
+team, or a goal or event moving out of one, records a single tombstone, and
+app.services.sync works out at sync time what that user can no longer see.
+Triggers rather than ORM hooks, so bulk statements, association-table writes
+and FK cascades are tracked too. A sync cursor is the xmin of the snapshot taken before reading:
+every transaction below it has finished, so rows written by anything still
+in flight carry a version at or above the cursor and are picked up by the
+next sync.
+"""
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String, Table, DDL, event
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+SYNCED_TABLES = ("goals", "goal_progress", "teams", "user_team", "events", "user_event")
+
+CURRENT_VERSION = "pg_current_xact_id()::text::bigint"
+SNAPSHOT_XMIN = "pg_snapshot_xmin(pg_current_snapshot())::text::bigint"
+
+
+class SyncTombstone(Base):
+    __tablename__ = "sync_tombstones"
+
+    id = Column(BigInteger, primary_key=True)
+    table_name = Column(String, nullable=False)
+    row_id = Column(Integer, nullable=False)
+    # goal_progress: the goal; membership tables: the user
+    parent_id = Column(Integer, nullable=True)
+    # Who should hear about the deletion: the owner, and members of the
+    # team. Team-scoped goal and event tombstones are skipped for members
+    # who can still see the row another way
+    user_id = Column(Integer, nullable=True, index=True)
+    team_id = Column(Integer, nullable=True, index=True)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    sync_version = Column(BigInteger, nullable=False, index=True)
+
+
+# Single "purged_below" row: cursors under it may have missed purged
+# tombstones and must resync from scratch
+sync_state = Table(
+    "sync_state",
+    Base.metadata,
+    Column("key", String, primary_key=True),
+    Column("value", BigInteger, nullable=False),
+)
+
+
+def _tombstone(values: str, indent: int = 8) -> str:
+    return (
+        "INSERT INTO sync_tombstones (table_name, row_id, parent_id, user_id, team_id, sync_version)\n"
+        f"{' ' * indent}{values};"
+    )
+
+
+# A user can see an event they organize, attend, or that belongs to one of
+# their teams
+_SEES_EVENT = """(
+            e.organizer_id = {user}
+            OR EXISTS (SELECT 1 FROM user_event a WHERE a.event_id = e.id AND a.user_id = {user})
+            OR EXISTS (SELECT 1 FROM user_team t WHERE t.team_id = e.team_id AND t.user_id = {user})
+        )"""
+
+SYNC_DDL = [
+    f"""
+CREATE OR REPLACE FUNCTION sync_touch() RETURNS trigger AS $$
+BEGIN
+    NEW.sync_version := {CURRENT_VERSION};
+    IF TG_OP = 'UPDATE' THEN
+        NEW.updated_at := now();
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+""",
+    # One tombstone per deleted row, addressed to its owner and team. A
+    # goal's tombstone also stands for its progress rows, and a member's
+    # user_team tombstone for everything they saw through the team
+    f"""
+CREATE OR REPLACE FUNCTION sync_tombstone() RETURNS trigger AS $$
+DECLARE
+    version bigint := {CURRENT_VERSION};
+BEGIN
+    IF TG_TABLE_NAME = 'goals' THEN
+        {_tombstone("VALUES ('goals', OLD.id, NULL, OLD.user_id, OLD.team_id, version)")}
+    ELSIF TG_TABLE_NAME = 'goal_progress' THEN
+        -- Progress deleted along with its goal was recorded by sync_goal_deleting()
+        {_tombstone("SELECT 'goal_progress', OLD.id, OLD.goal_id, g.user_id, g.team_id, version FROM goals g WHERE g.id = OLD.goal_id")}
+    ELSIF TG_TABLE_NAME = 'teams' THEN
+        {_tombstone("VALUES ('teams', OLD.id, NULL, NULL, OLD.id, version)")}
+    ELSIF TG_TABLE_NAME = 'user_team' THEN
+        {_tombstone("VALUES ('user_team', OLD.team_id, OLD.user_id, OLD.user_id, OLD.team_id, version)")}
+    ELSIF TG_TABLE_NAME = 'events' THEN
+        -- Attendees hear through their user_event rows, deleted first
+        {_tombstone("VALUES ('events', OLD.id, NULL, OLD.organizer_id, OLD.team_id, version)")}
+    ELSIF TG_TABLE_NAME = 'user_event' THEN
+        {_tombstone("VALUES ('user_event', OLD.event_id, OLD.user_id, OLD.user_id, NULL, version)")}
+        IF NOT EXISTS (SELECT 1 FROM events e WHERE e.id = OLD.event_id AND {_SEES_EVENT.format(user="OLD.user_id")}) THEN
+            {_tombstone("VALUES ('events', OLD.event_id, NULL, OLD.user_id, NULL, version)", indent=12)}
+        END IF;
+    END IF;
+    RETURN OLD;
+END
+$$ LANGUAGE plpgsql
+""",
+    # FK cascades run before the goal's own AFTER triggers, so by the time
+    # its progress is deleted the goal and its owner are gone
+    f"""
+CREATE OR REPLACE FUNCTION sync_goal_deleting() RETURNS trigger AS $$
+BEGIN
+    {_tombstone(f"SELECT 'goal_progress', p.id, p.goal_id, OLD.user_id, OLD.team_id, {CURRENT_VERSION} FROM goal_progress p WHERE p.goal_id = OLD.id", indent=4)}
+    RETURN OLD;
+END
+$$ LANGUAGE plpgsql
+""",
+    # Goals and events moved out of a team, or detached when it is deleted,
+    # get one tombstone for the team they left; members who can still see
+    # them are left out at sync time
+    f"""
+CREATE OR REPLACE FUNCTION sync_team_unlinked() RETURNS trigger AS $$
+BEGIN
+    {_tombstone(f"VALUES (TG_TABLE_NAME, OLD.id, NULL, NULL, OLD.team_id, {CURRENT_VERSION})", indent=4)}
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+""",
+]
+for _table in SYNCED_TABLES:
+    SYNC_DDL += [
+        f"DROP TRIGGER IF EXISTS sync_touch ON {_table}",
+        f"CREATE TRIGGER sync_touch BEFORE INSERT OR UPDATE ON {_table} "
+        f"FOR EACH ROW EXECUTE FUNCTION sync_touch()",
+        f"DROP TRIGGER IF EXISTS sync_tombstone ON {_table}",
+        f"CREATE TRIGGER sync_tombstone AFTER DELETE ON {_table} "
+        f"FOR EACH ROW EXECUTE FUNCTION sync_tombstone()",
+    ]
+SYNC_DDL += [
+    "DROP TRIGGER IF EXISTS sync_goal_deleting ON goals",
+    "CREATE TRIGGER sync_goal_deleting BEFORE DELETE ON goals "
+    "FOR EACH ROW EXECUTE FUNCTION sync_goal_deleting()",
+]
+for _table in ("goals", "events"):
+    SYNC_DDL += [
+        f"DROP TRIGGER IF EXISTS sync_team_unlinked ON {_table}",
+        f"CREATE TRIGGER sync_team_unlinked AFTER UPDATE OF team_id ON {_table} FOR EACH ROW "
+        f"WHEN (OLD.team_id IS NOT NULL AND OLD.team_id IS DISTINCT FROM NEW.team_id) "
+        f"EXECUTE FUNCTION sync_team_unlinked()",
+    ]
+
+
+def install_sync_triggers(connection) -> None:
+    """
+    Create or replace the trigger functions and triggers; safe to rerun.
+    """
+    for statement in SYNC_DDL:
+        connection.execute(DDL(statement))
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _install_after_create(target, connection, **kw) -> None:
+    # Tables created through metadata.create_all() get their triggers right away
+    if connection.dialect.name == "postgresql":
+        install_sync_triggers(connection)
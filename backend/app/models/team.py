@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime
+from sqlalchemy import BigInteger, Column, Integer, String, ForeignKey, Text, DateTime
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -13,12 +13,17 @@ class Team(Base):
     name = Column(String, index=True, nullable=False)
     description = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Maintained by the sync_touch trigger; see app.models.sync
+    sync_version = Column(BigInteger, index=True)
     created_by_id = Column(Integer, ForeignKey("users.id"))
     
     # Relationships
-    members = relationship("User", secondary=user_team, back_populates="teams")
-    goals = relationship("Goal", back_populates="team")
-    events = relationship("Event", back_populates="team")
+    # Memberships are deleted and goals/events detached (team_id set to
+    # NULL) by the foreign keys, without loading them
+    members = relationship("User", secondary=user_team, back_populates="teams", passive_deletes=True)
+    goals = relationship("Goal", back_populates="team", passive_deletes=True)
+    events = relationship("Event", back_populates="team", passive_deletes=True)
     
     # Team cycle information (optional)
     cycle_name = Column(String, nullable=True)
@@ -1,5 +1,6 @@
-from sqlalchemy import Boolean, Column, Integer, String, Table, ForeignKey
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, Integer, String, Table, ForeignKey
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
 
 from app.db.base import Base
 
@@ -7,8 +8,10 @@ from app.db.base import Base
 user_team = Table(
     "user_team",
     Base.metadata,
-    Column("user_id", Integer, ForeignKey("users.id"), primary_key=True),
-    Column("team_id", Integer, ForeignKey("teams.id"), primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+    Column("team_id", Integer, ForeignKey("teams.id", ondelete="CASCADE"), primary_key=True, index=True),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now()),
+    Column("sync_version", BigInteger, index=True),
 )
 
 
@@ -31,4 +34,11 @@ class User(Base):
     
     # User streak information
     current_streak = Column(Integer, default=0)
-    longest_streak = Column(Integer, default=0)
\ No newline at end of file
+    longest_streak = Column(Integer, default=0)
+
+    # Bumped after every commit that changes what the user's dashboard shows;
+    # part of the key of the cached sections, see app.services.dashboard
+    dashboard_version = Column(BigInteger, nullable=False, server_default="0")
+    # Feed tokens issued under an older version are rejected; bumped to
+    # revoke every feed URL the user has shared
+    feed_token_version = Column(Integer, nullable=False, server_default="0")
\ No newline at end of file
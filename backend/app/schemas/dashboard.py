@@ -0,0 +1,32 @@
+from typing import Dict, List, Optional
+from datetime import datetime
+from pydantic import BaseModel
+
+from .event import Event
+from .goal import Goal
+from .team import Team
+from .user import User
+
+
+# Active goal with the progress logged since the start of the week
+class DashboardGoal(Goal):
+    week_progress: float = 0.0
+
+
+class Streak(BaseModel):
+    current_streak: int = 0
+    longest_streak: int = 0
+    last_logged_at: Optional[datetime] = None
+    logged_today: bool = False
+
+
+# Sections that failed or timed out are null and listed in errors
+class Dashboard(BaseModel):
+    user: User
+    goals: Optional[List[DashboardGoal]] = None
+    completed_goals: Optional[int] = None
+    teams: Optional[List[Team]] = None
+    today_events: Optional[List[Event]] = None
+    upcoming_events: Optional[List[Event]] = None
+    streak: Optional[Streak] = None
+    errors: Dict[str, str] = {}
@@ -0,0 +1,18 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class DeletionJob(BaseModel):
+    id: int
+    kind: str
+    target_id: int
+    status: str
+    processed: int
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
@@ -1,6 +1,8 @@
 from typing import List, Optional
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
+
+from app.services.recurrence import as_utc
 
 
 # Shared properties
@@ -12,6 +14,7 @@ class EventBase(BaseModel):
     event_type: str = "personal"  # "call", "personal", etc.
     location: Optional[str] = None
     meeting_link: Optional[str] = None
+    recurrence_rule: Optional[str] = None  # RRULE, e.g. "FREQ=WEEKLY;BYDAY=MO"
 
 
 # Properties to receive via API on creation
@@ -19,6 +22,15 @@ class EventCreate(EventBase):
     team_id: Optional[int] = None
     attendee_ids: Optional[List[int]] = None
 
+    @validator("end_time")
+    def end_after_start(cls, v: datetime, values: dict) -> datetime:
+        start_time = values.get("start_time")
+        # Naive times are UTC, as in the database; comparing them with aware
+        # ones as they are would raise TypeError
+        if start_time is not None and as_utc(v) < as_utc(start_time):
+            raise ValueError("end_time must not be before start_time")
+        return v
+
 
 # Properties to receive via API on update
 class EventUpdate(BaseModel):
@@ -29,6 +41,7 @@ class EventUpdate(BaseModel):
     event_type: Optional[str] = None
     location: Optional[str] = None
     meeting_link: Optional[str] = None
+    recurrence_rule: Optional[str] = None
     team_id: Optional[int] = None
     attendee_ids: Optional[List[int]] = None
 
@@ -38,6 +51,10 @@ class EventInDBBase(EventBase):
     organizer_id: int
     team_id: Optional[int] = None
     created_at: datetime
+    updated_at: Optional[datetime] = None
+    # Set on expanded occurrences of a recurring event: the start time the
+    # occurrence has according to the rule
+    recurrence_id: Optional[datetime] = None
 
     class Config:
         orm_mode = True
@@ -48,6 +65,39 @@ class Event(EventInDBBase):
     pass
 
 
+# Cancelled or modified occurrence of a recurring event
+class EventExceptionBase(BaseModel):
+    original_start: datetime
+    is_cancelled: bool = False
+    title: Optional[str] = None
+    description: Optional[str] = None
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    location: Optional[str] = None
+    meeting_link: Optional[str] = None
+
+
+class EventExceptionCreate(EventExceptionBase):
+    pass
+
+
+class EventException(EventExceptionBase):
+    id: int
+    event_id: int
+
+    class Config:
+        orm_mode = True
+
+
+# An existing event occupying a slot one of the attendees asked for
+class EventConflict(BaseModel):
+    event_id: int
+    user_id: int
+    title: str
+    start_time: datetime
+    end_time: datetime
+
+
 # Event with organizer information
 class EventWithOrganizer(Event):
     organizer: "UserBase"
@@ -1,5 +1,5 @@
 from typing import List, Optional
-from datetime import datetime
+from datetime import date, datetime
 from pydantic import BaseModel
 
 
@@ -21,6 +21,7 @@ class GoalProgressInDBBase(GoalProgressBase):
     id: int
     goal_id: int
     logged_at: datetime
+    updated_at: Optional[datetime] = None
 
     class Config:
         orm_mode = True
@@ -30,6 +31,13 @@ class GoalProgress(GoalProgressInDBBase):
     pass
 
 
+# Progress summed per UTC day
+class GoalProgressDay(BaseModel):
+    day: date
+    total: float
+    entries: int
+
+
 # Shared properties for Goal
 class GoalBase(BaseModel):
     title: str
@@ -67,6 +75,7 @@ class GoalInDBBase(GoalBase):
     user_id: int
     team_id: Optional[int] = None
     created_at: datetime
+    updated_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
 
     class Config:
@@ -78,8 +87,23 @@ class Goal(GoalInDBBase):
     pass
 
 
+# Projected completion from the nightly forecast
+class GoalForecast(BaseModel):
+    rate_per_day: Optional[float] = None
+    projected_completion: Optional[datetime] = None
+    status: str
+    computed_at: datetime
+
+    class Config:
+        orm_mode = True
+
+
+class GoalWithForecast(Goal):
+    forecast: Optional[GoalForecast] = None
+
+
 # Goal with progress information
-class GoalWithProgress(Goal):
+class GoalWithProgress(GoalWithForecast):
     progress_logs: List[GoalProgress] = []
 
 
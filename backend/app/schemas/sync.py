@@ -0,0 +1,38 @@
+from typing import List, Optional
+from pydantic import BaseModel
+
+from .event import Event, EventException
+from .goal import Goal, GoalProgress
+from .team import Team
+
+
+class TeamMembership(BaseModel):
+    team_id: int
+    user_id: int
+
+
+class EventAttendance(BaseModel):
+    event_id: int
+    user_id: int
+
+
+# A deleted row. For team_members/event_attendance id is the team/event
+# and parent_id the user; for goal_progress parent_id is the goal.
+class Deletion(BaseModel):
+    table: str
+    id: int
+    parent_id: Optional[int] = None
+
+
+class SyncResponse(BaseModel):
+    # Send back as since. While has_more is set it continues this sync
+    cursor: str
+    has_more: bool = False
+    goals: List[Goal] = []
+    goal_progress: List[GoalProgress] = []
+    teams: List[Team] = []
+    team_members: List[TeamMembership] = []
+    events: List[Event] = []
+    event_exceptions: List[EventException] = []
+    event_attendance: List[EventAttendance] = []
+    deleted: List[Deletion] = []
@@ -25,6 +25,7 @@ class TeamUpdate(TeamBase):
 class TeamInDBBase(TeamBase):
     id: int
     created_at: datetime
+    updated_at: Optional[datetime] = None
     created_by_id: int
 
     class Config:
@@ -58,6 +59,56 @@ class TeamComplete(Team):
     events: List["EventBase"] = []
 
 
+# Team availability
+class TimeSlot(BaseModel):
+    start: datetime
+    end: datetime
+
+
+class TeamAvailability(BaseModel):
+    team_id: int
+    start: datetime
+    end: datetime
+    duration_minutes: int
+    busy: List[TimeSlot] = []
+    free_slots: List[TimeSlot] = []
+
+
+# Team leaderboard
+class TeamLeaderboardEntry(BaseModel):
+    rank: int
+    user_id: int
+    username: str
+    full_name: Optional[str] = None
+    goal_count: int
+    completed_goals: int
+    completion: float
+    progress_total: float
+    streak: int
+
+
+class TeamLeaderboardPage(BaseModel):
+    entries: List[TeamLeaderboardEntry] = []
+    # Pass back as ?cursor= for the next page; None on the last one
+    next_cursor: Optional[str] = None
+
+
+# Team statistics
+class TeamStats(BaseModel):
+    team_id: int
+    member_count: int
+    active_members_this_week: int
+    goal_count: int
+    completed_goals: int
+    completion_rate: float  # percent of goals completed
+    average_progress: float  # mean percent of target reached
+    goals_at_risk: int
+    past_events: int
+    events_attended: int
+    attendance_rate: float  # percent of possible member attendances
+    computed_at: datetime
+
+
 from .user import UserBase
 from .goal import GoalBase
 from .event import EventBase
@@ -65,4 +116,4 @@ from .event import EventBase
 TeamWithMembers.update_forward_refs()
 TeamWithGoals.update_forward_refs()
 TeamWithEvents.update_forward_refs()
-TeamComplete.update_forward_refs()
\ No newline at end of file
+TeamComplete.update_forward_refs()
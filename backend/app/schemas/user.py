@@ -55,6 +55,13 @@ class Token(BaseModel):
 
 class TokenPayload(BaseModel):
     sub: Optional[int] = None
+    scope: Optional[str] = None
+    # Feed tokens: the user's feed_token_version when it was issued
+    ver: Optional[int] = None
+
+
+class FeedToken(BaseModel):
+    feed_token: str
 
 
 from .team import TeamBase
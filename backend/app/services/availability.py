@@ -0,0 +1,59 @@
+"""
+Busy/free computation for scheduling team calls.
+"""
+from datetime import datetime, timedelta
+from typing import Iterable, List, Tuple
+
+Interval = Tuple[datetime, datetime]
+
+
+def merge_intervals(intervals: Iterable[Interval], start: datetime, end: datetime) -> List[Interval]:
+    """
+    Clip intervals to [start, end) and merge overlapping or touching ones.
+
+    Sweeps the intervals in start order, extending the current busy block
+    while the next interval begins before it ends: O(n log n) for the sort,
+    O(n) for the merge.
+    """
+    clipped = sorted(
+        (max(s, start), min(e, end)) for s, e in intervals if s < end and e > start
+    )
+    merged: List[Interval] = []
+    for s, e in clipped:
+        if merged and s <= merged[-1][1]:
+            if e > merged[-1][1]:
+                merged[-1] = (merged[-1][0], e)
+        else:
+            merged.append((s, e))
+    return merged
+
+
+def _align(value: datetime, granularity: timedelta) -> datetime:
+    epoch = datetime(1970, 1, 1, tzinfo=value.tzinfo)
+    remainder = (value - epoch) % granularity
+    return value if not remainder else value + (granularity - remainder)
+
+
+def free_slots(
+    busy: List[Interval],
+    start: datetime,
+    end: datetime,
+    duration: timedelta,
+    top_k: int,
+    granularity: timedelta,
+) -> List[Interval]:
+    """
+    The first ``top_k`` gaps between merged busy blocks that fit ``duration``,
+    each returned as the whole free gap with its start aligned to
+    ``granularity``.
+    """
+    slots: List[Interval] = []
+    cursor = start
+    for busy_start, busy_end in busy + [(end, end)]:
+        gap_start = _align(cursor, granularity)
+        if busy_start - gap_start >= duration:
+            slots.append((gap_start, busy_start))
+            if len(slots) == top_k:
+                break
+        cursor = max(cursor, busy_end)
+    return slots
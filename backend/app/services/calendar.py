@@ -0,0 +1,44 @@
+"""
+Event queries shared by the calendar, dashboard and feed endpoints.
+"""
+from datetime import datetime
+from typing import Any, List
+
+from sqlalchemy.orm import Session
+
+from app.db.writes import set_loaded
+from app.models.event import Event, EventException, overlaps_window
+from app.services.recurrence import as_utc, expand_series
+
+
+def visible_to(user_id: int):
+    """
+    Filter for events the user organizes or attends.
+    """
+    return (Event.organizer_id == user_id) | Event.attendees.any(id=user_id)
+
+
+def attach_exceptions(db: Session, series: List[Event]) -> None:
+    """
+    Load the exceptions of the given recurring events in one query.
+    """
+    by_event = {event.id: [] for event in series}
+    if by_event:
+        for exception in db.query(EventException).filter(EventException.event_id.in_(by_event)):
+            by_event[exception.event_id].append(exception)
+    for event in series:
+        set_loaded(event, exceptions=by_event[event.id])
+
+
+def events_in_window(db: Session, user_id: int, start: datetime, end: datetime) -> List[Any]:
+    """
+    Single events and occurrences of recurring series overlapping
+    [start, end), ordered by start time.
+    """
+    rows = db.query(Event).filter(visible_to(user_id), overlaps_window(start, end)).all()
+    singles = [e for e in rows if not e.recurrence_rule]
+    series = [e for e in rows if e.recurrence_rule]
+    attach_exceptions(db, series)
+    events = singles + expand_series(series, start, end, overlap=True)
+    events.sort(key=lambda e: as_utc(e["start_time"] if isinstance(e, dict) else e.start_time))
+    return events
@@ -0,0 +1,69 @@
+"""
+Invalidation of the dashboard's cached sections.
+
+Sections are cached per worker under the user's ``dashboard_version``, which
+is loaded with the user on every request anyway. Writes that change what a
+user's dashboard shows call ``invalidate`` in their transaction. It only
+notes who is affected; the versions are bumped once the transaction commits,
+in a short transaction of their own, so writes never hold locks on users
+rows and a rolled-back write bumps nothing. Every worker then misses on
+those users' next load. The per-section TTLs only bound what this cannot
+see, such as a read from a lagging replica or a bump that failed.
+"""
+import logging
+
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from app.db.routing import RoutingSession
+from app.models.event import user_event
+from app.models.user import User, user_team
+
+logger = logging.getLogger(__name__)
+
+_PENDING = "dashboard_invalidated"
+
+
+def team_members(team_id: int):
+    return select(user_team.c.user_id).where(user_team.c.team_id == team_id)
+
+
+def event_attendees(event_id: int):
+    return select(user_event.c.user_id).where(user_event.c.event_id == event_id)
+
+
+def invalidate(db: Session, user_ids) -> None:
+    """
+    Drop the cached dashboards of the given users once the transaction
+    commits. user_ids may be a collection or a SELECT of ids; a SELECT is
+    run now, so it sees the rows as the transaction left them so far.
+    """
+    if not isinstance(user_ids, (list, tuple, set, frozenset)):
+        user_ids = db.scalars(user_ids).all()
+    db.info.setdefault(_PENDING, set()).update(user_ids)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _bump_after_commit(session) -> None:
+    user_ids = session.info.pop(_PENDING, None)
+    if not user_ids:
+        return
+    try:
+        # The committed session cannot run statements; in tests its bind is a
+        # connection inside the test's transaction, hence the savepoint mode
+        with Session(bind=session.bind, join_transaction_mode="create_savepoint") as bump, bump.begin():
+            bump.execute(
+                update(User)
+                .where(User.id.in_(sorted(user_ids)))
+                .values(dashboard_version=User.dashboard_version + 1)
+                .execution_options(synchronize_session=False)
+            )
+    except Exception:
+        # The write itself has committed; stale sections expire with their TTL
+        logger.exception("Could not invalidate the dashboards of %d users", len(user_ids))
+
+
+@event.listens_for(RoutingSession, "after_soft_rollback")
+def _forget_after_rollback(session, previous_transaction) -> None:
+    if previous_transaction.parent is None:
+        session.info.pop(_PENDING, None)
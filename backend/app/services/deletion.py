@@ -0,0 +1,236 @@
+"""
+Deleting goals and teams in batches.
+
+Foreign keys cascade, so deleting a goal removes its progress and deleting a
+team removes its memberships and detaches its goals and events (team_id set
+to NULL) in one statement. For a goal or team with more than
+``DELETE_INLINE_LIMIT`` dependent rows that one statement would lock and
+write all of them in a single transaction, so the endpoints record a
+DeletionJob and answer 202 instead. A background job (see
+app.services.jobs) works through the dependents ``DELETE_BATCH_SIZE`` rows
+per transaction and deletes the goal or team last; rows added meanwhile go
+with that final cascade. Every step is safe to repeat, so an interrupted
+job is simply run again.
+
+    python -m app.services.deletion resume     # rerun jobs that ran out of attempts
+
+``resume`` skips deletions that still have an attempt queued or running in
+the job queue, so it never runs one twice at the same time.
+"""
+import argparse
+import logging
+from datetime import datetime, timezone
+from typing import Callable, List
+
+from sqlalchemy import delete, func, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.base import SessionLocal
+from app.models.deletion import DeletionJob
+from app.models.event import Event
+from app.models.goal import Goal, GoalProgress
+from app.models.job import Job
+from app.models.team import Team
+from app.models.user import user_team
+from app.services import dashboard, jobs, leaderboard, team_stats
+
+logger = logging.getLogger(__name__)
+
+GOAL = "goal"
+TEAM = "team"
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def _goal_steps(goal_id: int, batch: int) -> List:
+    keys = (GoalProgress.id, GoalProgress.logged_at)
+    return [
+        delete(GoalProgress).where(
+            tuple_(*keys).in_(select(*keys).where(GoalProgress.goal_id == goal_id).limit(batch))
+        ),
+    ]
+
+
+def _team_steps(team_id: int, batch: int) -> List:
+    return [
+        update(Goal).where(Goal.id.in_(select(Goal.id).where(Goal.team_id == team_id).limit(batch)))
+        .values(team_id=None),
+        update(Event).where(Event.id.in_(select(Event.id).where(Event.team_id == team_id).limit(batch)))
+        .values(team_id=None),
+        delete(user_team).where(
+            tuple_(user_team.c.user_id, user_team.c.team_id).in_(
+                select(user_team.c.user_id, user_team.c.team_id).where(user_team.c.team_id == team_id).limit(batch)
+            )
+        ),
+    ]
+
+
+STEPS = {GOAL: _goal_steps, TEAM: _team_steps}
+
+
+def _count(db: Session, query, limit: int) -> int:
+    return db.execute(select(func.count()).select_from(query.limit(limit).subquery())).scalar()
+
+
+def dependent_rows(db: Session, kind: str, target_id: int, limit: int) -> int:
+    """
+    Rows the cascade would touch, counted up to ``limit`` so huge goals and
+    teams cost no more to check than small ones.
+    """
+    if kind == GOAL:
+        return _count(db, select(GoalProgress.id).where(GoalProgress.goal_id == target_id), limit)
+    total = 0
+    for query in (
+        select(Goal.id).where(Goal.team_id == target_id),
+        select(Event.id).where(Event.team_id == target_id),
+        select(user_team.c.user_id).where(user_team.c.team_id == target_id),
+    ):
+        total += _count(db, query, limit - total)
+        if total >= limit:
+            break
+    return total
+
+
+def needs_job(db: Session, kind: str, target_id: int) -> bool:
+    limit = settings.DELETE_INLINE_LIMIT
+    return dependent_rows(db, kind, target_id, limit + 1) > limit
+
+
+def start(db: Session, kind: str, target_id: int, user_id: int) -> DeletionJob:
+    """
+    Record a job for the goal or team, or return the one already under way.
+    """
+    job = (
+        db.query(DeletionJob)
+        .filter(DeletionJob.kind == kind, DeletionJob.target_id == target_id, DeletionJob.status.in_((PENDING, RUNNING)))
+        .first()
+    )
+    if job is None:
+        job = DeletionJob(kind=kind, target_id=target_id, requested_by_id=user_id, status=PENDING, processed=0)
+        db.add(job)
+        db.flush()
+        jobs.enqueue(db, "deletion", {"job_id": job.id})
+        db.commit()
+        db.refresh(job)
+    return job
+
+
+def _finish_goal(db: Session, goal_id: int) -> None:
+    goal = db.query(Goal).filter(Goal.id == goal_id).first()
+    if goal is None:
+        return
+    team_id, user_id = goal.team_id, goal.user_id
+    db.delete(goal)
+    if team_id is not None:
+        db.flush()
+        leaderboard.refresh_member(db, team_id, user_id)
+    db.commit()
+    team_stats.invalidate(team_id)
+
+
+def _finish_team(db: Session, team_id: int) -> None:
+    db.execute(delete(Team).where(Team.id == team_id))
+    db.commit()
+    team_stats.invalidate(team_id)
+
+
+FINISH = {GOAL: _finish_goal, TEAM: _finish_team}
+
+
+def _affected_users(db: Session, kind: str, target_id: int) -> List[int]:
+    if kind == GOAL:
+        query = select(Goal.user_id).where(Goal.id == target_id)
+    else:
+        query = dashboard.team_members(target_id)
+    return db.execute(query).scalars().all()
+
+
+@jobs.task("deletion", priority=5)
+def run_job(job_id: int, session_factory: Callable[[], Session] = SessionLocal) -> None:
+    """
+    Work through one job, committing after every batch. Failures are
+    recorded on the DeletionJob and raised for the job queue to retry.
+    """
+    with session_factory() as db:
+        job = db.get(DeletionJob, job_id)
+        if job is None or job.status == DONE:
+            return
+        job.status = RUNNING
+        job.error = None
+        db.commit()
+        # Read before the memberships go, to refresh their dashboards at the end
+        affected = _affected_users(db, job.kind, job.target_id)
+        try:
+            for statement in STEPS[job.kind](job.target_id, settings.DELETE_BATCH_SIZE):
+                while True:
+                    count = db.execute(statement.execution_options(synchronize_session=False)).rowcount
+                    job.processed += count
+                    db.commit()
+                    if count < settings.DELETE_BATCH_SIZE:
+                        break
+            FINISH[job.kind](db, job.target_id)
+        except Exception as exc:
+            db.rollback()
+            job.status = FAILED
+            job.error = str(exc)
+            job.finished_at = datetime.now(timezone.utc)
+            db.commit()
+            raise
+        dashboard.invalidate(db, affected)
+        job.status = DONE
+        job.finished_at = datetime.now(timezone.utc)
+        db.commit()
+
+
+def failed(db: Session) -> List[int]:
+    return db.execute(
+        select(DeletionJob.id).where(DeletionJob.status == FAILED).order_by(DeletionJob.id)
+    ).scalars().all()
+
+
+def in_queue(db: Session, job_id: int) -> bool:
+    """
+    Whether the job queue still has an attempt at the deletion waiting or
+    running.
+    """
+    return db.execute(
+        select(
+            select(Job.id)
+            .where(
+                Job.name == "deletion",
+                Job.status.in_((jobs.QUEUED, jobs.RUNNING)),
+                Job.payload["job_id"].as_integer() == job_id,
+            )
+            .exists()
+        )
+    ).scalar()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("resume",))
+    parser.add_argument("--job", type=int, default=None, help="Only this job")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        job_ids = [args.job] if args.job else failed(db)
+    for job_id in job_ids:
+        with SessionLocal() as db:
+            if in_queue(db, job_id):
+                print(f"Job {job_id}: skipped, another attempt is queued or running")
+                continue
+        try:
+            run_job(job_id)
+        except Exception:
+            logger.exception("Deletion job %s failed again", job_id)
+        with SessionLocal() as db:
+            job = db.get(DeletionJob, job_id)
+            print(f"Job {job_id} ({job.kind} {job.target_id}): {job.status}, {job.processed} rows")
+
+
+if __name__ == "__main__":
+    main()
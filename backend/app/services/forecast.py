@@ -0,0 +1,207 @@
+"""
+Goal completion forecasts.
+
+The nightly batch walks open goals in id order, ``FORECAST_BATCH_SIZE`` at a
+time. Each batch takes one query for the goals and one for their recent
+progress, fits every goal's pace at once with NumPy and upserts the results
+into ``goal_forecasts``, which the goal endpoints read.
+
+The pace is the least-squares slope of cumulative progress against time over
+the last ``FORECAST_HISTORY_DAYS``; a goal with a single log in that window
+uses its average since that log instead.
+
+    python -m app.services.forecast            # run the batch now; the job worker runs it nightly
+"""
+import argparse
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+from typing import Iterator, List, NamedTuple, Optional
+
+import numpy as np
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.base import SessionLocal
+from app.models.forecast import GoalForecast
+from app.models.goal import Goal, GoalProgress
+from app.services import jobs
+
+SECONDS_PER_DAY = 86400.0
+
+ON_TRACK = "on_track"
+AT_RISK = "at_risk"
+NO_DATA = "no_data"
+
+
+class Forecast(NamedTuple):
+    rate: np.ndarray  # progress per day, NaN without history
+    days_left: np.ndarray  # days from now until the target is reached, NaN if never
+    status: np.ndarray  # ON_TRACK / AT_RISK / NO_DATA
+    samples: np.ndarray
+
+
+def fit_rates(group: np.ndarray, days: np.ndarray, values: np.ndarray, count: int):
+    """
+    Progress per day for ``count`` goals from their logs.
+
+    ``group`` holds each log's goal index and must be sorted, with ``days``
+    (relative to now, so negative) ascending within each goal. Returns the
+    rates and the number of logs per goal.
+    """
+    samples = np.bincount(group, minlength=count)
+    ends = np.cumsum(samples)
+    starts = ends - samples
+
+    # Cumulative progress within each goal
+    cumulative = np.cumsum(values)
+    before = np.concatenate(([0.0], cumulative))[starts]
+    y = cumulative - before[group]
+
+    n = samples.astype(float)
+    sx = np.bincount(group, days, count)
+    sy = np.bincount(group, y, count)
+    sxx = np.bincount(group, days * days, count)
+    sxy = np.bincount(group, days * y, count)
+    denominator = n * sxx - sx * sx
+
+    # Fallback: total logged divided by the days since the first log
+    has_logs = samples > 0
+    first = np.zeros(count)
+    first[has_logs] = days[starts[has_logs]]
+    average = np.bincount(group, values, count) / np.maximum(-first, 1.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = (n * sxy - sx * sy) / denominator
+    # Logs all at the same moment leave no time span to fit over
+    fitted = (samples >= 2) & (np.abs(denominator) > 1e-9)
+    rate = np.where(fitted, slope, average)
+    return np.where(has_logs, rate, np.nan), samples
+
+
+def project(
+    rate: np.ndarray,
+    samples: np.ndarray,
+    current: np.ndarray,
+    target: np.ndarray,
+    target_days: np.ndarray,
+) -> Forecast:
+    """
+    Days until each goal reaches its target at its current pace, and whether
+    that is before its target date (``target_days`` from now, NaN if none).
+    """
+    remaining = target - current
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days_left = np.where(remaining <= 0, 0.0, np.where(rate > 0, remaining / rate, np.nan))
+    on_time = np.isnan(target_days) | (days_left <= target_days)
+    status = np.where(
+        samples == 0,
+        NO_DATA,
+        np.where(~np.isnan(days_left) & on_time, ON_TRACK, AT_RISK),
+    )
+    return Forecast(rate, days_left, status, samples)
+
+
+def _epoch_days(column, now: datetime):
+    return (func.extract("epoch", column) - now.timestamp()) / SECONDS_PER_DAY
+
+
+def _goal_batches(db: Session, batch_size: int) -> Iterator[List[tuple]]:
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(Goal.id, Goal.current_value, Goal.target_value, Goal.target_date)
+            .where(Goal.id > last_id, Goal.is_completed.isnot(True))
+            .order_by(Goal.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def forecast_batch(db: Session, goals: List[tuple], now: datetime) -> int:
+    """
+    Fit and store forecasts for one batch of (id, current, target,
+    target_date) rows.
+    """
+    ids = np.fromiter((row[0] for row in goals), dtype=np.int64, count=len(goals))
+    current = np.fromiter((row[1] or 0.0 for row in goals), dtype=float, count=len(goals))
+    target = np.fromiter((row[2] for row in goals), dtype=float, count=len(goals))
+    target_days = np.fromiter(
+        ((row[3] - now).total_seconds() / SECONDS_PER_DAY if row[3] else np.nan for row in goals),
+        dtype=float,
+        count=len(goals),
+    )
+
+    history_start = now - timedelta(days=settings.FORECAST_HISTORY_DAYS)
+    logs = db.execute(
+        select(GoalProgress.goal_id, _epoch_days(GoalProgress.logged_at, now), GoalProgress.value)
+        .where(GoalProgress.goal_id.in_(ids.tolist()), GoalProgress.logged_at >= history_start)
+        .order_by(GoalProgress.goal_id, GoalProgress.logged_at)
+    ).all()
+    history = np.array(logs, dtype=float).reshape(-1, 3)
+    group = np.searchsorted(ids, history[:, 0].astype(np.int64))
+
+    rate, samples = fit_rates(group, history[:, 1], history[:, 2], len(ids))
+    forecast = project(rate, samples, current, target, target_days)
+
+    rows = []
+    for i, goal_id in enumerate(ids.tolist()):
+        days_left = forecast.days_left[i]
+        rows.append({
+            "goal_id": goal_id,
+            "rate_per_day": None if np.isnan(forecast.rate[i]) else float(forecast.rate[i]),
+            "projected_completion": None if np.isnan(days_left) else now + timedelta(days=float(days_left)),
+            "status": str(forecast.status[i]),
+            "sample_count": int(forecast.samples[i]),
+            "computed_at": now,
+        })
+    stmt = pg_insert(GoalForecast)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[GoalForecast.goal_id],
+        set_={name: stmt.excluded[name] for name in rows[0] if name != "goal_id"},
+    ), rows)
+    db.commit()
+    return len(rows)
+
+
+def run(db: Session, batch_size: Optional[int] = None, now: Optional[datetime] = None) -> int:
+    """
+    Forecast every open goal and drop forecasts of goals completed since the
+    last run. Returns the number of goals forecast.
+    """
+    now = now or datetime.now(timezone.utc)
+    total = 0
+    for goals in _goal_batches(db, batch_size or settings.FORECAST_BATCH_SIZE):
+        total += forecast_batch(db, goals, now)
+    db.execute(
+        delete(GoalForecast).where(
+            GoalForecast.goal_id == Goal.id, Goal.is_completed.is_(True)
+        ).execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return total
+
+
+@jobs.task("forecast", timeout=4 * 3600, schedule="FREQ=DAILY;BYHOUR=2;BYMINUTE=0;BYSECOND=0")
+def forecast_job() -> None:
+    with SessionLocal() as db:
+        run(db)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    start = perf_counter()
+    with SessionLocal() as db:
+        total = run(db, args.batch_size)
+    print(f"Forecast {total} goals in {perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+iCalendar (RFC 5545) rendering for calendar feeds.
+
+Every event renders to a self-contained segment: its VEVENT, and for a
+recurring event the RRULE, EXDATEs for cancelled occurrences and one VEVENT
+per modified occurrence. Segments are cached by (event id, updated_at).
+Any write to an event or its exceptions bumps updated_at, so a feed request
+only renders the events that changed since it was last served and streams
+the rest from the cache.
+"""
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.services.recurrence import as_utc
+
+PRODID = "-//Accountability App//Calendar Feed//EN"
+UID_DOMAIN = "accountability-app"
+BATCH_SIZE = 500
+
+_segments = LRUCache("ical_segments", settings.ICAL_SEGMENT_CACHE_SIZE)
+
+
+def _escape(text: str) -> str:
+    return (
+        text.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line: str) -> bytes:
+    # Content lines are limited to 75 octets; continuation lines start with
+    # a space. Never split inside a UTF-8 sequence.
+    data = line.encode()
+    parts = []
+    limit = 75
+    while len(data) > limit:
+        cut = limit
+        while (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut])
+        data = data[cut:]
+        limit = 74
+    parts.append(data)
+    return b"\r\n ".join(parts) + b"\r\n"
+
+
+def _format_dt(value: datetime) -> str:
+    return as_utc(value).astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+TEXT_FIELDS = ("title", "description", "location", "meeting_link")
+
+
+def _text_properties(values: Dict[str, str]) -> List[str]:
+    lines = [f"SUMMARY:{_escape(values['title'])}"]
+    if values["description"]:
+        lines.append(f"DESCRIPTION:{_escape(values['description'])}")
+    if values["location"]:
+        lines.append(f"LOCATION:{_escape(values['location'])}")
+    if values["meeting_link"]:
+        lines.append(f"URL:{values['meeting_link']}")
+    return lines
+
+
+def render_event(event, exceptions: Iterable = ()) -> bytes:
+    values = {field: getattr(event, field) for field in TEXT_FIELDS}
+    uid = f"UID:event-{event.id}@{UID_DOMAIN}"
+    stamp = f"DTSTAMP:{_format_dt(event.updated_at or event.created_at)}"
+    lines = [
+        "BEGIN:VEVENT",
+        uid,
+        stamp,
+        f"DTSTART:{_format_dt(event.start_time)}",
+        f"DTEND:{_format_dt(event.end_time)}",
+        *_text_properties(values),
+        f"CATEGORIES:{_escape(event.event_type)}",
+    ]
+    overrides = []
+    if event.recurrence_rule:
+        rule = event.recurrence_rule.strip()
+        lines.append(rule if rule.upper().startswith("RRULE:") else f"RRULE:{rule}")
+        duration = event.end_time - event.start_time
+        for exception in sorted(exceptions, key=lambda e: as_utc(e.original_start)):
+            if exception.is_cancelled:
+                lines.append(f"EXDATE:{_format_dt(exception.original_start)}")
+                continue
+            start = exception.start_time or exception.original_start
+            end = exception.end_time or as_utc(start) + duration
+            override = {
+                field: values[field] if getattr(exception, field) is None else getattr(exception, field)
+                for field in TEXT_FIELDS
+            }
+            overrides += [
+                "BEGIN:VEVENT",
+                uid,
+                stamp,
+                f"RECURRENCE-ID:{_format_dt(exception.original_start)}",
+                f"DTSTART:{_format_dt(start)}",
+                f"DTEND:{_format_dt(end)}",
+                *_text_properties(override),
+                "END:VEVENT",
+            ]
+    lines.append("END:VEVENT")
+    return b"".join(_fold(line) for line in lines + overrides)
+
+
+def calendar_header(name: str) -> bytes:
+    return b"".join(_fold(line) for line in (
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(name)}",
+    ))
+
+
+CALENDAR_FOOTER = _fold("END:VCALENDAR")
+
+
+def render_feed(
+    name: str,
+    events: Iterable,
+    load_exceptions: Callable[[List[int]], Dict[int, List]],
+) -> Iterator[bytes]:
+    """
+    Yield the feed in chunks of up to BATCH_SIZE events. Events missing from
+    the segment cache are rendered per batch, with the exceptions of the
+    recurring ones fetched through one ``load_exceptions(ids)`` call.
+    """
+    yield calendar_header(name)
+    events = iter(events)
+    while True:
+        batch = list(islice(events, BATCH_SIZE))
+        if not batch:
+            break
+        segments = {}
+        missing = []
+        for event in batch:
+            segment = _segments.get((event.id, event.updated_at))
+            if segment is None:
+                missing.append(event)
+            else:
+                segments[event.id] = segment
+        series_ids = [e.id for e in missing if e.recurrence_rule]
+        exceptions = load_exceptions(series_ids) if series_ids else {}
+        for event in missing:
+            segment = render_event(event, exceptions.get(event.id, ()))
+            _segments.set((event.id, event.updated_at), segment)
+            segments[event.id] = segment
+        yield b"".join(segments[event.id] for event in batch)
+    yield CALENDAR_FOOTER
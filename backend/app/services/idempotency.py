@@ -0,0 +1,193 @@
+"""
+Idempotency-Key support for write endpoints.
+
+A client that sends ``Idempotency-Key: <key>`` can retry the request
+safely: the first attempt stores its response in ``idempotency_keys``, in
+the same transaction as the write, and later attempts with the same key get
+that response back (with ``Idempotent-Replayed: true``) without running the
+handler again. A retry that arrives while the first attempt is still
+running waits for it on the key's row. Attempts that fail leave nothing
+behind and can be retried as new. Reusing a key for a different request
+is refused with 422.
+
+Keys are scoped per user and kept ``IDEMPOTENCY_KEY_TTL_HOURS``; stored
+responses that were replayed are also held in an in-memory LRU, so repeated
+retries do not reach the database. A job deletes expired keys in batches.
+
+Handlers opt in with the ``idempotency_key`` dependency::
+
+    idempotent: Optional[IdempotentRequest] = Depends(idempotency.idempotency_key)
+    ...
+    replay = idempotency.begin(db, current_user.id, idempotent)
+    if replay is not None:
+        return replay
+    ...
+    idempotency.save(db, current_user.id, idempotent, Schema, result)
+    db.commit()
+"""
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, NamedTuple, Optional, Type
+
+from fastapi import Header, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import delete, func, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.metrics import IDEMPOTENT_REPLAYS, current_route
+from app.db.base import SessionLocal
+from app.models.idempotency import IdempotencyKey
+from app.services import jobs
+
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 255
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+class IdempotentRequest(NamedTuple):
+    key: str
+    request_hash: bytes
+
+
+class StoredResponse(NamedTuple):
+    request_hash: bytes
+    status_code: int
+    body: Any
+    expires_at: datetime
+
+
+_responses = LRUCache("idempotency_keys", settings.IDEMPOTENCY_CACHE_SIZE)
+
+
+async def idempotency_key(
+    request: Request,
+    idempotency_key: Optional[str] = Header(
+        None, description="Retries with the same key get the first response back instead of writing again"
+    ),
+) -> Optional[IdempotentRequest]:
+    if idempotency_key is None:
+        return None
+    if not 0 < len(idempotency_key) <= MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(b" ")
+    digest.update(request.url.path.encode())
+    digest.update(b"\n")
+    # Already read and cached by FastAPI to parse the body parameter
+    digest.update(await request.body())
+    return IdempotentRequest(idempotency_key, digest.digest())
+
+
+def _replay(request: IdempotentRequest, stored: StoredResponse) -> JSONResponse:
+    if stored.request_hash != request.request_hash:
+        raise HTTPException(
+            status_code=422, detail="This Idempotency-Key was already used for a different request"
+        )
+    IDEMPOTENT_REPLAYS.labels(current_route()).inc()
+    return JSONResponse(stored.body, status_code=stored.status_code, headers={REPLAYED_HEADER: "true"})
+
+
+def begin(db: Session, user_id: int, request: Optional[IdempotentRequest]) -> Optional[JSONResponse]:
+    """
+    Claim the key for the current transaction, or return the stored
+    response of the request that already used it. Call before any writes.
+    """
+    if request is None:
+        return None
+    now = datetime.now(timezone.utc)
+    stored = _responses.get((user_id, request.key))
+    if stored is not None and stored.expires_at > now:
+        return _replay(request, stored)
+
+    stmt = pg_insert(IdempotencyKey).values(
+        user_id=user_id,
+        key=request.key,
+        request_hash=request.request_hash,
+        expires_at=now + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS),
+    )
+    # Blocks while another transaction holds the key; an expired key is
+    # taken over as if new
+    claimed = db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[IdempotencyKey.user_id, IdempotencyKey.key],
+            set_={
+                "request_hash": stmt.excluded.request_hash,
+                "status_code": None,
+                "response": None,
+                "created_at": func.now(),
+                "expires_at": stmt.excluded.expires_at,
+            },
+            where=IdempotencyKey.expires_at <= func.now(),
+        ).returning(IdempotencyKey.user_id)
+    ).first()
+    if claimed is not None:
+        return None
+
+    row = db.execute(
+        select(
+            IdempotencyKey.request_hash,
+            IdempotencyKey.status_code,
+            IdempotencyKey.response,
+            IdempotencyKey.expires_at,
+        ).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == request.key)
+    ).first()
+    db.rollback()
+    if row is None or row.status_code is None:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+    stored = StoredResponse(bytes(row.request_hash), row.status_code, row.response, row.expires_at)
+    _responses.set((user_id, request.key), stored)
+    return _replay(request, stored)
+
+
+def save(
+    db: Session,
+    user_id: int,
+    request: Optional[IdempotentRequest],
+    schema: Type[BaseModel],
+    result: Any,
+    status_code: int = 200,
+) -> None:
+    """
+    Store the response for the key claimed by ``begin``, serialized as
+    ``schema``, in the current transaction; the caller commits.
+    """
+    if request is None:
+        return
+    body = jsonable_encoder(schema.from_orm(result))
+    db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == request.key)
+        .values(status_code=status_code, response=body)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def purge(db: Session, batch_size: Optional[int] = None) -> int:
+    """
+    Delete expired keys, one batch per transaction.
+    """
+    batch_size = batch_size or settings.IDEMPOTENCY_PURGE_BATCH_SIZE
+    keys = (IdempotencyKey.user_id, IdempotencyKey.key)
+    total = 0
+    while True:
+        expired = select(*keys).where(IdempotencyKey.expires_at < func.now()).limit(batch_size)
+        deleted = db.execute(delete(IdempotencyKey).where(tuple_(*keys).in_(expired))).rowcount
+        db.commit()
+        total += deleted
+        if deleted < batch_size:
+            return total
+
+
+@jobs.task("idempotency.purge", schedule="FREQ=HOURLY;BYMINUTE=15;BYSECOND=0")
+def purge_job() -> None:
+    with SessionLocal() as db:
+        count = purge(db)
+    logger.info("Purged %d expired idempotency keys", count)
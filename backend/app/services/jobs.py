@@ -0,0 +1,334 @@
+"""
+Background jobs stored in Postgres.
+
+Code enqueues a job by task name with a JSON payload, in the caller's
+transaction, so the job exists exactly when the change that asked for it is
+committed. ``worker.py`` claims due jobs in priority order with ``FOR UPDATE
+SKIP LOCKED``, so any number of workers share the queue without handing the
+same job out twice, and runs them on a thread or process pool.
+
+A failed attempt is retried with exponential backoff until the task's
+``max_attempts``; after that the job stays ``failed`` for inspection.
+
+A claimed job is leased to its worker for ``JOB_LEASE_SECONDS``, and the
+worker extends the lease every ``JOB_HEARTBEAT_SECONDS`` for as long as the
+job runs. Only jobs whose lease ran out, because their worker died or lost
+the database, are reaped as lost and retried the same way; a job is never
+handed out again while its worker is still running it. Tasks must still be
+safe to run more than once. The task's ``timeout`` is enforced by the
+worker (see worker.py).
+
+Tasks are registered with the ``task`` decorator in the modules listed in
+``TASK_MODULES``. A task with a ``schedule`` (an RRULE such as
+``FREQ=DAILY;BYHOUR=3;BYMINUTE=0``, evaluated in UTC from midnight) is also
+enqueued by whichever worker first sees it due.
+"""
+import importlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from dateutil.rrule import rrulestr
+from sqlalchemy import case, delete, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import JOBS_ENQUEUED, JOBS_FINISHED
+from app.db.base import SessionLocal
+from app.models.job import Job, JobSchedule
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Modules whose tasks the worker loads
+TASK_MODULES = (
+    "app.services.deletion",
+    "app.services.forecast",
+    "app.services.idempotency",
+    "app.services.jobs",
+    "app.services.leaderboard",
+    "app.services.outbox",
+    "app.services.partitions",
+    "app.services.reminders",
+    "app.services.sync",
+)
+
+
+class Task(NamedTuple):
+    name: str
+    func: Callable[..., Any]
+    priority: int
+    max_attempts: int
+    timeout: float
+    schedule: Optional[str]
+
+
+class ClaimedJob(NamedTuple):
+    id: int
+    name: str
+    payload: Dict[str, Any]
+    attempts: int
+    max_attempts: int
+    run_at: datetime
+    timeout: float
+
+
+TASKS: Dict[str, Task] = {}
+
+
+def next_run(rule: str, after: datetime) -> Optional[datetime]:
+    """
+    First time the schedule ``rule`` fires after ``after``.
+    """
+    midnight = after.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return rrulestr(rule, dtstart=midnight).after(after)
+
+
+def task(
+    name: str,
+    *,
+    priority: int = 0,
+    max_attempts: Optional[int] = None,
+    timeout: Optional[float] = None,
+    schedule: Optional[str] = None,
+) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Register a function as the task ``name``. It is called with the job's
+    payload as keyword arguments and opens its own session.
+    """
+    if schedule is not None:
+        # Fail at import rather than in the worker
+        next_run(schedule, datetime.now(timezone.utc))
+
+    def register(func: Callable[..., Any]) -> Callable[..., Any]:
+        TASKS[name] = Task(
+            name,
+            func,
+            priority,
+            max_attempts or settings.JOB_MAX_ATTEMPTS,
+            timeout or settings.JOB_TIMEOUT_SECONDS,
+            schedule,
+        )
+        return func
+
+    return register
+
+
+def load_tasks() -> Dict[str, Task]:
+    for module in TASK_MODULES:
+        importlib.import_module(module)
+    return TASKS
+
+
+def enqueue(
+    db: Session,
+    name: str,
+    payload: Optional[Dict[str, Any]] = None,
+    *,
+    priority: Optional[int] = None,
+    delay: Optional[timedelta] = None,
+    dedup_key: Optional[str] = None,
+) -> Optional[int]:
+    """
+    Add a job in the current transaction; the caller commits. With
+    ``dedup_key`` nothing is added while a job with the same key is still
+    queued, and None is returned.
+    """
+    registered = TASKS.get(name)
+    values = {
+        "name": name,
+        "payload": payload or {},
+        "priority": priority if priority is not None else (registered.priority if registered else 0),
+        "status": QUEUED,
+        "dedup_key": dedup_key,
+        "attempts": 0,
+        "max_attempts": registered.max_attempts if registered else settings.JOB_MAX_ATTEMPTS,
+        "timeout_seconds": registered.timeout if registered else settings.JOB_TIMEOUT_SECONDS,
+    }
+    if delay is not None:
+        values["run_at"] = func.now() + delay
+    stmt = pg_insert(Job).values(**values)
+    if dedup_key is not None:
+        stmt = stmt.on_conflict_do_nothing(
+            index_elements=[Job.dedup_key], index_where=text(f"status = '{QUEUED}'")
+        )
+    job_id = db.execute(stmt.returning(Job.id)).scalar()
+    if job_id is not None:
+        JOBS_ENQUEUED.labels(name).inc()
+    return job_id
+
+
+def claim(db: Session, worker: str, limit: int) -> List[ClaimedJob]:
+    """
+    Mark the ``limit`` most urgent due jobs as running by ``worker`` and
+    return them. Rows other workers are claiming are skipped rather than
+    waited for. Claimed jobs give up their dedup key, so changes made while
+    they run can queue a fresh job.
+    """
+    ready = (
+        select(Job.id)
+        .where(Job.status == QUEUED, Job.run_at <= func.now())
+        .order_by(Job.priority.desc(), Job.run_at, Job.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    rows = db.execute(
+        update(Job)
+        .where(Job.id.in_(ready.scalar_subquery()))
+        .values(
+            status=RUNNING,
+            locked_by=worker,
+            dedup_key=None,
+            attempts=Job.attempts + 1,
+            started_at=func.now(),
+            timeout_at=func.now() + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+        )
+        .returning(Job.id, Job.name, Job.payload, Job.attempts, Job.max_attempts, Job.run_at, Job.timeout_seconds)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return [ClaimedJob(*row) for row in rows]
+
+
+def _owned(job_id: int, worker: str):
+    # A job reaped as lost and claimed again belongs to the new worker
+    return update(Job).where(Job.id == job_id, Job.status == RUNNING, Job.locked_by == worker)
+
+
+def heartbeat(db: Session, worker: str, job_ids: List[int]) -> None:
+    """
+    Extend the lease of the jobs ``worker`` is still running.
+    """
+    if not job_ids:
+        return
+    db.execute(
+        update(Job)
+        .where(Job.id.in_(job_ids), Job.status == RUNNING, Job.locked_by == worker)
+        .values(timeout_at=func.now() + timedelta(seconds=settings.JOB_LEASE_SECONDS))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def complete(db: Session, job: ClaimedJob, worker: str) -> None:
+    db.execute(_owned(job.id, worker).values(status=DONE, finished_at=func.now(), last_error=None))
+    db.commit()
+    JOBS_FINISHED.labels(job.name, DONE).inc()
+
+
+def retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=settings.JOB_RETRY_DELAY_SECONDS * 2 ** max(attempts - 1, 0))
+
+
+def fail(db: Session, job: ClaimedJob, worker: str, error: str) -> None:
+    """
+    Schedule another attempt, or give up once ``max_attempts`` is reached.
+    """
+    if job.attempts < job.max_attempts:
+        values = {"status": QUEUED, "run_at": func.now() + retry_delay(job.attempts), "locked_by": None}
+        outcome = "retry"
+    else:
+        values = {"status": FAILED, "finished_at": func.now()}
+        outcome = FAILED
+    db.execute(_owned(job.id, worker).values(last_error=error, **values))
+    db.commit()
+    JOBS_FINISHED.labels(job.name, outcome).inc()
+
+
+def reap_lost(db: Session) -> int:
+    """
+    Requeue (or fail, when out of attempts) running jobs whose lease ran
+    out without a heartbeat. Returns how many were found.
+    """
+    out_of_attempts = Job.attempts >= Job.max_attempts
+    rows = db.execute(
+        update(Job)
+        .where(Job.status == RUNNING, Job.timeout_at < func.now())
+        .values(
+            status=case((out_of_attempts, FAILED), else_=QUEUED),
+            locked_by=None,
+            run_at=func.now(),
+            finished_at=case((out_of_attempts, func.now())),
+            last_error="Lost; the worker running it stopped sending heartbeats",
+        )
+        .returning(Job.name)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.commit()
+    for name in rows:
+        JOBS_FINISHED.labels(name, "lost").inc()
+    return len(rows)
+
+
+def queue_depth(db: Session) -> Dict[str, int]:
+    return dict(
+        db.execute(select(Job.name, func.count()).where(Job.status == QUEUED).group_by(Job.name)).all()
+    )
+
+
+def sync_schedules(db: Session, now: Optional[datetime] = None) -> None:
+    """
+    Store the schedules of the registered tasks: new ones and ones whose
+    rule changed start from ``now``, unscheduled ones are dropped.
+    """
+    now = now or datetime.now(timezone.utc)
+    scheduled = {t.name: t.schedule for t in TASKS.values() if t.schedule}
+    db.execute(delete(JobSchedule).where(JobSchedule.name.notin_(list(scheduled))))
+    for name, rule in scheduled.items():
+        stmt = pg_insert(JobSchedule).values(name=name, rule=rule, next_run_at=next_run(rule, now))
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[JobSchedule.name],
+            set_={"rule": stmt.excluded.rule, "next_run_at": stmt.excluded.next_run_at},
+            where=JobSchedule.rule != stmt.excluded.rule,
+        ))
+    db.commit()
+
+
+def enqueue_due(db: Session, now: Optional[datetime] = None) -> List[str]:
+    """
+    Enqueue every scheduled task that is due and move its schedule on. Runs
+    missed while no worker was up are collapsed into one.
+    """
+    now = now or datetime.now(timezone.utc)
+    due = db.execute(
+        select(JobSchedule).where(JobSchedule.next_run_at <= now).with_for_update(skip_locked=True)
+    ).scalars().all()
+    for schedule in due:
+        enqueue(db, schedule.name, dedup_key=f"schedule:{schedule.name}")
+        following = next_run(schedule.rule, now)
+        if following is None:
+            db.delete(schedule)
+        else:
+            schedule.next_run_at = following
+    db.commit()
+    return [schedule.name for schedule in due]
+
+
+def run_task(name: str, payload: Dict[str, Any]) -> None:
+    """
+    Run one job's task; called on the worker's pool threads or processes.
+    """
+    if name not in TASKS:
+        # Process pools that spawn rather than fork start with an empty registry
+        load_tasks()
+    TASKS[name].func(**payload)
+
+
+def purge(db: Session, retention: timedelta) -> int:
+    result = db.execute(
+        delete(Job).where(Job.status.in_((DONE, FAILED)), Job.finished_at < func.now() - retention)
+    )
+    db.commit()
+    return result.rowcount
+
+
+@task("jobs.purge", schedule="FREQ=DAILY;BYHOUR=4;BYMINUTE=0;BYSECOND=0")
+def purge_job() -> None:
+    with SessionLocal() as db:
+        count = purge(db, timedelta(days=settings.JOB_RETENTION_DAYS))
+    logger.info("Purged %d finished jobs", count)
@@ -0,0 +1,244 @@
+"""
+Team leaderboards, kept up to date as goals, progress and memberships change.
+
+Each member of a team has a row in ``team_leaderboard``. Membership, goal
+and cycle changes recompute the affected rows from goals and progress in
+the same transaction; logging progress adds its change to the stored rows
+instead of aggregating the cycle again. Pages are read by keyset from
+``ix_team_leaderboard_rank``, so a page costs the same however large the
+team is and however deep into it the client has paged.
+
+    python -m app.services.leaderboard rebuild [--team TEAM_ID]
+"""
+import argparse
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, case, delete, func, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.db.base import SessionLocal
+from app.models.goal import Goal, GoalProgress
+from app.models.leaderboard import TeamLeaderboardEntry
+from app.models.team import Team
+from app.models.user import User, user_team
+from app.services import jobs
+
+STAT_COLUMNS = ("goal_count", "completed_goals", "ratio_sum", "completion", "progress_total", "streak")
+
+# All descending, like ix_team_leaderboard_rank, so a page can start at a
+# single row comparison
+RANK_KEY = (
+    TeamLeaderboardEntry.completion,
+    TeamLeaderboardEntry.progress_total,
+    TeamLeaderboardEntry.streak,
+    TeamLeaderboardEntry.user_id,
+)
+RANK_ORDER = tuple(column.desc() for column in RANK_KEY)
+
+
+def _ratio(current_value: float, target_value: float) -> float:
+    return min(current_value / target_value, 1.0) if target_value > 0 else 0.0
+
+
+def _ratio_expr():
+    # Share of the target reached, capped at 1
+    return case(
+        (Goal.target_value > 0, func.least(Goal.current_value / Goal.target_value, 1.0)),
+        else_=0.0,
+    )
+
+
+def _in_cycle(moment) -> object:
+    return and_(
+        or_(Team.cycle_start_date.is_(None), moment >= Team.cycle_start_date),
+        or_(Team.cycle_end_date.is_(None), moment <= Team.cycle_end_date),
+    )
+
+
+def _completion(ratio_sum, goal_count):
+    return func.coalesce(100.0 * ratio_sum / func.nullif(goal_count, 0), 0.0)
+
+
+def _stats(team_id: Optional[int] = None, user_id: Optional[int] = None):
+    """
+    SELECT of leaderboard rows for the memberships of a team and/or user,
+    or all of them.
+    """
+    criteria, goal_criteria = [], []
+    if team_id is not None:
+        criteria.append(user_team.c.team_id == team_id)
+        goal_criteria.append(Goal.team_id == team_id)
+    if user_id is not None:
+        criteria.append(user_team.c.user_id == user_id)
+        goal_criteria.append(Goal.user_id == user_id)
+    cycle_progress = (
+        select(GoalProgress.goal_id, func.sum(GoalProgress.value).label("total"))
+        .join(Goal, Goal.id == GoalProgress.goal_id)
+        .join(Team, Team.id == Goal.team_id)
+        .where(_in_cycle(GoalProgress.logged_at), *goal_criteria)
+        .group_by(GoalProgress.goal_id)
+        .subquery()
+    )
+    ratio_sum = func.coalesce(func.sum(_ratio_expr()), 0.0)
+    goal_count = func.count(Goal.id)
+    return (
+        select(
+            user_team.c.team_id,
+            user_team.c.user_id,
+            goal_count.label("goal_count"),
+            func.count(Goal.id).filter(Goal.is_completed.is_(True)).label("completed_goals"),
+            ratio_sum.label("ratio_sum"),
+            _completion(ratio_sum, goal_count).label("completion"),
+            func.coalesce(func.sum(cycle_progress.c.total), 0.0).label("progress_total"),
+            func.coalesce(User.current_streak, 0).label("streak"),
+        )
+        .select_from(user_team)
+        .join(User, User.id == user_team.c.user_id)
+        .outerjoin(Goal, and_(Goal.team_id == user_team.c.team_id, Goal.user_id == user_team.c.user_id))
+        .outerjoin(cycle_progress, cycle_progress.c.goal_id == Goal.id)
+        .where(*criteria)
+        .group_by(user_team.c.team_id, user_team.c.user_id, User.current_streak)
+    )
+
+
+def _upsert(db: Session, team_id: Optional[int] = None, user_id: Optional[int] = None) -> None:
+    stmt = pg_insert(TeamLeaderboardEntry).from_select(
+        ["team_id", "user_id", *STAT_COLUMNS], _stats(team_id, user_id)
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["team_id", "user_id"],
+        set_={**{name: stmt.excluded[name] for name in STAT_COLUMNS}, "updated_at": func.now()},
+    ))
+
+
+def refresh_member(db: Session, team_id: int, user_id: int) -> None:
+    """
+    Recompute one member's row, e.g. after joining or after one of their
+    team goals was created, edited or deleted. No-op for non-members.
+    """
+    _upsert(db, team_id, user_id)
+
+
+def remove_member(db: Session, team_id: int, user_id: int) -> None:
+    db.execute(
+        delete(TeamLeaderboardEntry).where(
+            TeamLeaderboardEntry.team_id == team_id, TeamLeaderboardEntry.user_id == user_id
+        )
+    )
+
+
+def rebuild(db: Session, team_id: Optional[int] = None) -> None:
+    """
+    Recompute every row of one team, or of all teams for backfills. Rows of
+    former members are dropped.
+    """
+    stale = delete(TeamLeaderboardEntry)
+    if team_id is not None:
+        stale = stale.where(TeamLeaderboardEntry.team_id == team_id)
+    db.execute(stale)
+    _upsert(db, team_id)
+
+
+def apply_progress(
+    db: Session, goal: Goal, value: float, logged_at: datetime, streak: Optional[int] = None
+) -> None:
+    """
+    Add one progress log to the rows it changes without aggregating the
+    cycle again. ``goal`` is the goal as the log left it; ``streak`` is the
+    user's new streak if the log completed the goal, which shows on all
+    their teams. No-op for non-members.
+    """
+    entry = TeamLeaderboardEntry
+    if goal.team_id is not None:
+        ratio_sum = entry.ratio_sum + (
+            _ratio(goal.current_value, goal.target_value) - _ratio(goal.current_value - value, goal.target_value)
+        )
+        in_cycle = select(Team.id).where(Team.id == goal.team_id, _in_cycle(logged_at)).exists()
+        db.execute(
+            update(entry)
+            .where(entry.team_id == goal.team_id, entry.user_id == goal.user_id)
+            .values(
+                ratio_sum=ratio_sum,
+                completion=_completion(ratio_sum, entry.goal_count),
+                completed_goals=entry.completed_goals + (0 if streak is None else 1),
+                progress_total=entry.progress_total + case((in_cycle, value), else_=0.0),
+                updated_at=func.now(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+    if streak is not None:
+        db.execute(
+            update(entry)
+            .where(entry.user_id == goal.user_id)
+            .values(streak=streak, updated_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+
+
+def _encode_cursor(rank: int, entry: TeamLeaderboardEntry) -> str:
+    key = [rank, *(getattr(entry, column.key) for column in RANK_KEY)]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[int, list]:
+    try:
+        rank, *key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if not isinstance(rank, int) or len(key) != len(RANK_KEY):
+        raise ValueError("Invalid cursor")
+    return rank, key
+
+
+def page(
+    db: Session, team_id: int, limit: int, cursor: Optional[str] = None
+) -> Tuple[int, List[tuple], Optional[str]]:
+    """
+    Up to ``limit`` (entry, username, full_name) rows in rank order, from
+    the top or after ``cursor``: the rank of the first of them, the rows and
+    the cursor of the next page, None after the last. Raises ValueError for
+    a malformed cursor.
+    """
+    query = (
+        db.query(TeamLeaderboardEntry, User.username, User.full_name)
+        .join(User, User.id == TeamLeaderboardEntry.user_id)
+        .filter(TeamLeaderboardEntry.team_id == team_id)
+    )
+    rank = 0
+    if cursor is not None:
+        rank, key = _decode_cursor(cursor)
+        query = query.filter(tuple_(*RANK_KEY) < tuple_(*key))
+    rows = query.order_by(*RANK_ORDER).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rank + limit, rows[-1][0])
+    return rank + 1, rows, next_cursor
+
+
+@jobs.task("leaderboard.rebuild")
+def rebuild_job(team_id: Optional[int] = None) -> None:
+    with SessionLocal() as db:
+        rebuild(db, team_id)
+        db.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("rebuild",))
+    parser.add_argument("--team", type=int, default=None, help="Only rebuild this team")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        rebuild(db, args.team)
+        db.commit()
+    print("Leaderboards rebuilt" if args.team is None else f"Leaderboard of team {args.team} rebuilt")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Rendering and delivery of notifications.
+
+A channel delivers a batch of notifications and returns the ones it could
+not deliver, as ``{message_id: error}``; it raises if it could deliver none.
+``NOTIFICATION_CHANNEL`` selects one:
+
+- ``log``: write them to the application log
+- ``file``: append them as JSON lines to ``NOTIFICATION_FILE``, e.g. for tests
+- ``smtp``: email them through ``SMTP_HOST``:``SMTP_PORT`` over one
+  connection per batch. In development, point it at a local stand-in such
+  as ``python -m aiosmtpd -n -l localhost:1025``
+
+A notification keeps its ``message_id`` across redeliveries, so receivers
+can drop duplicates. SMTP sends it as the Message-ID header.
+"""
+import json
+import logging
+import smtplib
+from collections import defaultdict
+from email.message import EmailMessage
+from email.utils import parseaddr
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# kind -> (subject, body), formatted with the message payload
+TEMPLATES: Dict[str, Tuple[str, str]] = {
+    "goal_completed": (
+        "{username} completed a goal",
+        '{username} just completed "{title}". Cheer them on!',
+    ),
+    "event_created": (
+        "New team event: {title}",
+        '{organizer} scheduled "{title}" for {start_time}.',
+    ),
+    "goal_due": (
+        "Goal due soon: {title}",
+        '"{title}" is due {target_date}. You are at {current_value} of {target_value} {unit}.',
+    ),
+    "event_starting": (
+        "Starting soon: {title}",
+        '"{title}" starts at {start_time}. {meeting_link}',
+    ),
+}
+
+
+class Notification(NamedTuple):
+    message_id: str
+    kind: str
+    user_id: int
+    email: str
+    subject: str
+    body: str
+    payload: Dict[str, Any]
+
+
+def render(kind: str, payload: Dict[str, Any]) -> Tuple[str, str]:
+    subject, body = TEMPLATES.get(kind, (kind, ""))
+    # Missing values render empty rather than failing the whole batch
+    values = defaultdict(str, payload)
+    return subject.format_map(values), body.format_map(values)
+
+
+class LogChannel:
+    name = "log"
+
+    def send(self, notifications: List[Notification]) -> Dict[str, str]:
+        for n in notifications:
+            logger.info("Notify user %s (%s): %s", n.user_id, n.message_id, n.subject)
+        return {}
+
+
+class FileChannel:
+    name = "file"
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path or settings.NOTIFICATION_FILE
+
+    def send(self, notifications: List[Notification]) -> Dict[str, str]:
+        lines = "".join(json.dumps(n._asdict(), default=str) + "\n" for n in notifications)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+        return {}
+
+
+class SmtpChannel:
+    name = "smtp"
+
+    def send(self, notifications: List[Notification]) -> Dict[str, str]:
+        domain = parseaddr(settings.NOTIFICATION_SENDER)[1].rpartition("@")[2] or "localhost"
+        undelivered: Dict[str, str] = {}
+        with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=30) as smtp:
+            if settings.SMTP_STARTTLS:
+                smtp.starttls()
+            if settings.SMTP_USER:
+                smtp.login(settings.SMTP_USER, settings.SMTP_PASSWORD or "")
+            for i, n in enumerate(notifications):
+                message = EmailMessage()
+                message["From"] = settings.NOTIFICATION_SENDER
+                message["To"] = n.email
+                message["Subject"] = n.subject
+                message["Message-ID"] = f"<{n.message_id}@{domain}>"
+                message.set_content(n.body)
+                try:
+                    smtp.send_message(message)
+                except smtplib.SMTPServerDisconnected as exc:
+                    # The rest cannot go out over this connection either
+                    for rest in notifications[i:]:
+                        undelivered[rest.message_id] = f"{type(exc).__name__}: {exc}"
+                    return undelivered
+                except smtplib.SMTPException as exc:
+                    undelivered[n.message_id] = f"{type(exc).__name__}: {exc}"
+        return undelivered
+
+
+CHANNELS = {"log": LogChannel, "file": FileChannel, "smtp": SmtpChannel}
+
+
+def get_channel(name: Optional[str] = None):
+    name = name or settings.NOTIFICATION_CHANNEL
+    if name not in CHANNELS:
+        raise ValueError(f"Unknown notification channel {name!r}; expected one of {', '.join(CHANNELS)}")
+    return CHANNELS[name]()
@@ -0,0 +1,269 @@
+"""
+Transactional outbox for notifications.
+
+Write paths call ``add`` before committing, so a notification exists exactly
+when the change it announces was committed. The request pays for one INSERT
+however many people end up notified. The dispatcher, run by worker.py,
+claims a batch of due messages with ``FOR UPDATE SKIP LOCKED`` and commits
+the claim: each claimed message counts an attempt and is not due again for
+``OUTBOX_CLAIM_SECONDS``. Only then does it hand them to the channel, so no
+row lock or connection is held while the channel talks to a mail server.
+Afterwards each message is marked on its own: sent if the channel delivered
+it to every recipient, otherwise retried with backoff, up to
+``OUTBOX_MAX_ATTEMPTS`` attempts. A dispatcher that dies mid-batch leaves its
+claim to expire. Nothing is marked sent before the channel accepted it, so
+delivery is at least once.
+
+Completion notices are deduplicated for the lifetime of their goal, so the
+purge keeps those rows; other sent and failed messages go after
+``OUTBOX_RETENTION_DAYS``.
+
+    python -m app.services.outbox dispatch [--once]    # without a worker, e.g. in tests
+"""
+import argparse
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Integer, and_, delete, exists, func, or_, select, union_all, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import NOTIFICATIONS_SENT, OUTBOX_BATCH_DURATION, OUTBOX_DELIVERY_DELAY, OUTBOX_MESSAGES
+from app.db.base import SessionLocal
+from app.models.goal import Goal
+from app.models.outbox import OutboxMessage
+from app.models.user import User, user_team
+from app.services import jobs
+from app.services.notifications import Notification, get_channel, render
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+GOAL_COMPLETED = "goal_completed"
+
+
+def add(
+    db: Session,
+    kind: str,
+    payload: Dict[str, Any],
+    *,
+    user_id: Optional[int] = None,
+    team_id: Optional[int] = None,
+    actor_id: Optional[int] = None,
+    dedup_key: Optional[str] = None,
+) -> None:
+    """
+    Queue a notification for ``user_id``, or else for the members of
+    ``team_id`` other than ``actor_id``, in the current transaction. Nothing
+    is queued if a message with the same ``dedup_key`` exists.
+    """
+    stmt = pg_insert(OutboxMessage).values(
+        kind=kind,
+        payload=payload,
+        user_id=user_id,
+        team_id=team_id,
+        actor_id=actor_id,
+        dedup_key=dedup_key,
+        status=PENDING,
+        attempts=0,
+    )
+    if dedup_key is not None:
+        stmt = stmt.on_conflict_do_nothing(index_elements=[OutboxMessage.dedup_key])
+    db.execute(stmt)
+
+
+def _recipients(db: Session, ids: List[int]) -> List[tuple]:
+    """
+    (message id, user id, email) for every recipient of the messages.
+    """
+    active = User.is_active.isnot(False)
+    direct = (
+        select(OutboxMessage.id, User.id, User.email)
+        .join(User, User.id == OutboxMessage.user_id)
+        .where(OutboxMessage.id.in_(ids), active)
+    )
+    members = (
+        select(OutboxMessage.id, User.id, User.email)
+        .join(user_team, and_(OutboxMessage.user_id.is_(None), user_team.c.team_id == OutboxMessage.team_id))
+        .join(User, User.id == user_team.c.user_id)
+        .where(OutboxMessage.id.in_(ids), User.id.is_distinct_from(OutboxMessage.actor_id), active)
+    )
+    return db.execute(union_all(direct, members)).all()
+
+
+def _claim(db: Session, batch_size: int) -> List[Any]:
+    due = (
+        select(OutboxMessage.id)
+        .where(OutboxMessage.status == PENDING, OutboxMessage.next_attempt_at <= func.now())
+        .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    messages = db.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.id.in_(due))
+        .values(
+            attempts=OutboxMessage.attempts + 1,
+            next_attempt_at=func.now() + timedelta(seconds=settings.OUTBOX_CLAIM_SECONDS),
+        )
+        .returning(
+            OutboxMessage.id, OutboxMessage.kind, OutboxMessage.payload, OutboxMessage.attempts, OutboxMessage.created_at
+        )
+        .execution_options(synchronize_session=False)
+    ).all()
+    return sorted(messages, key=lambda m: m.id)
+
+
+def dispatch_batch(db: Session, channel, batch_size: Optional[int] = None) -> int:
+    """
+    Deliver one batch of due messages. Returns how many were claimed.
+    """
+    messages = _claim(db, batch_size or settings.OUTBOX_BATCH_SIZE)
+    if not messages:
+        db.rollback()
+        return 0
+
+    by_id = {m.id: m for m in messages}
+    notifications = []
+    for message_id, user_id, email in _recipients(db, list(by_id)):
+        message = by_id[message_id]
+        subject, body = render(message.kind, message.payload)
+        notifications.append(
+            Notification(f"{message_id}.{user_id}", message.kind, user_id, email, subject, body, message.payload)
+        )
+    db.commit()
+
+    start = perf_counter()
+    try:
+        undelivered = channel.send(notifications) if notifications else {}
+    except Exception as exc:
+        logger.exception("Delivering %d notifications through %s failed", len(notifications), channel.name)
+        error = f"{type(exc).__name__}: {exc}"
+        undelivered = {n.message_id: error for n in notifications}
+    OUTBOX_BATCH_DURATION.labels(channel.name).observe(perf_counter() - start)
+
+    errors: Dict[int, str] = {}
+    for n in notifications:
+        if n.message_id in undelivered:
+            errors.setdefault(int(n.message_id.partition(".")[0]), undelivered[n.message_id])
+        else:
+            NOTIFICATIONS_SENT.labels(channel.name, n.kind).inc()
+    sent = [m for m in messages if m.id not in errors]
+    _mark_sent(db, sent)
+    for message in messages:
+        if message.id in errors:
+            _retry_later(db, message, errors[message.id])
+    return len(messages)
+
+
+def _mark_sent(db: Session, messages: List[Any]) -> None:
+    if not messages:
+        return
+    db.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.id.in_([m.id for m in messages]))
+        .values(status=SENT, sent_at=func.now(), last_error=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    now = datetime.now(timezone.utc)
+    for message in messages:
+        OUTBOX_MESSAGES.labels(message.kind, SENT).inc()
+        OUTBOX_DELIVERY_DELAY.observe(max((now - message.created_at).total_seconds(), 0.0))
+
+
+def _retry_later(db: Session, message: Any, error: str) -> None:
+    # The claim counted this attempt already; 10s, 20s, 40s, ... capped at an hour
+    backoff = min(settings.OUTBOX_RETRY_DELAY_SECONDS * 2 ** (message.attempts - 1), 3600)
+    gave_up = message.attempts >= settings.OUTBOX_MAX_ATTEMPTS
+    db.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.id == message.id)
+        .values(
+            status=FAILED if gave_up else PENDING,
+            next_attempt_at=func.now() + timedelta(seconds=backoff),
+            last_error=error,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    OUTBOX_MESSAGES.labels(message.kind, FAILED if gave_up else "retry").inc()
+
+
+def run_dispatcher(stopping: threading.Event, channel=None) -> None:
+    """
+    Dispatch until ``stopping`` is set, sleeping only while the outbox has
+    nothing due.
+    """
+    channel = channel or get_channel()
+    logger.info("Dispatching notifications through %s", channel.name)
+    while not stopping.is_set():
+        try:
+            with SessionLocal() as db:
+                sent = dispatch_batch(db, channel)
+        except Exception:
+            logger.exception("Outbox dispatch failed")
+            sent = 0
+        if sent < settings.OUTBOX_BATCH_SIZE:
+            stopping.wait(settings.OUTBOX_POLL_INTERVAL_SECONDS)
+
+
+def purge(db: Session, before: datetime) -> int:
+    """
+    Delete sent and failed messages created before ``before``, except
+    completion notices whose goal still exists: their dedup key is what
+    keeps a reopened goal from notifying again.
+    """
+    goal_exists = exists().where(Goal.id == OutboxMessage.payload["goal_id"].astext.cast(Integer))
+    return db.execute(
+        delete(OutboxMessage).where(
+            OutboxMessage.status != PENDING,
+            OutboxMessage.created_at < before,
+            or_(OutboxMessage.kind != GOAL_COMPLETED, ~goal_exists),
+        )
+    ).rowcount
+
+
+@jobs.task("outbox.purge", schedule="FREQ=DAILY;BYHOUR=4;BYMINUTE=30;BYSECOND=0")
+def purge_job() -> None:
+    cutoff = datetime.now(timezone.utc) - timedelta(days=settings.OUTBOX_RETENTION_DAYS)
+    with SessionLocal() as db:
+        purge(db, cutoff)
+        db.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("dispatch",))
+    parser.add_argument("--once", action="store_true", help="Send what is due now, then exit")
+    parser.add_argument("--channel", choices=("log", "file", "smtp"), default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    channel = get_channel(args.channel)
+    if args.once:
+        total = 0
+        while True:
+            with SessionLocal() as db:
+                sent = dispatch_batch(db, channel)
+            total += sent
+            if sent < settings.OUTBOX_BATCH_SIZE:
+                break
+        print(f"Sent {total} messages")
+        return
+    stopping = threading.Event()
+    try:
+        run_dispatcher(stopping, channel)
+    except KeyboardInterrupt:
+        stopping.set()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Monthly partitions of goal_progress.
+
+Partitions cover whole UTC months and are named ``goal_progress_yYYYYmMM``;
+``goal_progress_default`` only catches rows outside every partition and
+should stay empty. Maintenance creates partitions ahead of time, and once a
+month falls out of ``GOAL_PROGRESS_RETENTION_MONTHS`` compacts it into
+``goal_progress_daily`` and detaches it into the archive schema, so queries
+and vacuum only touch recent months.
+
+Progress logged late for a month already archived (backfills, imports) has
+no partition left and lands in the default one. Maintenance folds it into
+``goal_progress_daily``; until then /progress/daily adds it to the archived
+totals of its day.
+
+    python -m app.services.partitions maintain      # run now; the job worker runs it daily
+"""
+import argparse
+import logging
+import re
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.config import settings
+from app.db.base import engine as default_engine
+from app.services import jobs
+
+logger = logging.getLogger(__name__)
+
+PARENT = "goal_progress"
+DEFAULT_PARTITION = "goal_progress_default"
+_NAME = re.compile(r"^goal_progress_y(\d{4})m(\d{2})$")
+
+
+def month_start(moment: datetime) -> datetime:
+    moment = moment.astimezone(timezone.utc) if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"goal_progress_y{month.year:04d}m{month.month:02d}"
+
+
+def create_partition(connection: Connection, month: datetime) -> bool:
+    """
+    Create the partition for the month starting at ``month`` unless it
+    exists. Returns whether it was created.
+    """
+    name = partition_name(month)
+    if connection.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None:
+        return False
+    connection.execute(text(
+        f"CREATE TABLE {name} PARTITION OF {PARENT} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    ))
+    return True
+
+
+def create_default_partition(connection: Connection) -> None:
+    connection.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT} DEFAULT"))
+
+
+def ensure_partitions(connection: Connection, start: datetime, end: datetime) -> List[str]:
+    """
+    Create any missing partitions for the months from ``start`` to ``end``
+    inclusive.
+    """
+    created = []
+    month = month_start(start)
+    while month <= end:
+        if create_partition(connection, month):
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+    return created
+
+
+def attached_partitions(connection: Connection) -> List[Tuple[str, datetime]]:
+    """
+    (name, month) of the monthly partitions currently attached, oldest first.
+    """
+    names = connection.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "WHERE parent.relname = :parent"
+    ), {"parent": PARENT}).scalars()
+    partitions = []
+    for name in names:
+        match = _NAME.match(name)
+        if match:
+            partitions.append((name, datetime(int(match[1]), int(match[2]), 1, tzinfo=timezone.utc)))
+    return sorted(partitions, key=lambda item: item[1])
+
+
+def compact_partition(connection: Connection, name: str) -> int:
+    """
+    Write per-goal daily totals of one partition into goal_progress_daily.
+    Partitions hold whole UTC days, so rerunning replaces the same rows.
+    """
+    result = connection.execute(text(
+        f"INSERT INTO goal_progress_daily (goal_id, day, total, entries) "
+        f"SELECT goal_id, (logged_at AT TIME ZONE 'UTC')::date, sum(value), count(*) "
+        f"FROM {name} GROUP BY 1, 2 "
+        f"ON CONFLICT (goal_id, day) DO UPDATE SET total = EXCLUDED.total, entries = EXCLUDED.entries"
+    ))
+    return result.rowcount
+
+
+def fold_stray(connection: Connection, before: datetime) -> int:
+    """
+    Move rows logged before ``before`` out of the default partition, adding
+    them to the daily totals of their goal and day. Returns how many daily
+    totals changed.
+    """
+    result = connection.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE logged_at < :before "
+        f"RETURNING goal_id, logged_at, value) "
+        f"INSERT INTO goal_progress_daily (goal_id, day, total, entries) "
+        f"SELECT goal_id, (logged_at AT TIME ZONE 'UTC')::date, sum(value), count(*) FROM moved GROUP BY 1, 2 "
+        f"ON CONFLICT (goal_id, day) DO UPDATE SET "
+        f"total = goal_progress_daily.total + EXCLUDED.total, "
+        f"entries = goal_progress_daily.entries + EXCLUDED.entries "
+        f"RETURNING entries"
+    ), {"before": before})
+    return len(result.all())
+
+
+def archive_partition(connection: Connection, name: str) -> None:
+    """
+    Compact a partition, detach it and move it to the archive schema (and
+    tablespace, if configured). Archived tables keep their raw rows but no
+    longer reference goals, so goals can still be deleted.
+    """
+    schema = settings.GOAL_PROGRESS_ARCHIVE_SCHEMA
+    compact_partition(connection, name)
+    # Give up rather than wait behind long queries while inserts queue up
+    # behind the detach
+    connection.execute(text("SET LOCAL lock_timeout = '5s'"))
+    connection.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+    foreign_keys = connection.execute(text(
+        "SELECT conname FROM pg_constraint WHERE conrelid = CAST(:name AS regclass) AND contype = 'f'"
+    ), {"name": name}).scalars().all()
+    for constraint in foreign_keys:
+        connection.execute(text(f'ALTER TABLE {name} DROP CONSTRAINT "{constraint}"'))
+    connection.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+    connection.execute(text(f"ALTER TABLE {name} SET SCHEMA {schema}"))
+    if settings.GOAL_PROGRESS_ARCHIVE_TABLESPACE:
+        connection.execute(text(
+            f"ALTER TABLE {schema}.{name} SET TABLESPACE {settings.GOAL_PROGRESS_ARCHIVE_TABLESPACE}"
+        ))
+
+
+def maintain(engine: Engine = default_engine, now: Optional[datetime] = None) -> Dict[str, List[str]]:
+    """
+    Create the partitions for this month and the next
+    ``GOAL_PROGRESS_PARTITIONS_AHEAD``, then archive partitions older than
+    the retention, each in its own transaction, and fold stray rows of
+    archived months into their daily totals.
+    """
+    current = month_start(now or datetime.now(timezone.utc))
+    with engine.begin() as connection:
+        created = ensure_partitions(
+            connection, current, add_months(current, settings.GOAL_PROGRESS_PARTITIONS_AHEAD)
+        )
+        stray = connection.execute(text(f"SELECT count(*) FROM {DEFAULT_PARTITION}")).scalar()
+        partitions = attached_partitions(connection)
+    if stray:
+        logger.warning("%s holds %d rows outside every monthly partition", DEFAULT_PARTITION, stray)
+
+    cutoff = add_months(current, -settings.GOAL_PROGRESS_RETENTION_MONTHS)
+    archived = []
+    for name, month in partitions:
+        if month >= cutoff:
+            break
+        with engine.begin() as connection:
+            archive_partition(connection, name)
+        archived.append(name)
+    if stray:
+        with engine.begin() as connection:
+            folded = fold_stray(connection, cutoff)
+        if folded:
+            logger.info("Folded late progress for archived months into %d daily totals", folded)
+    return {"created": created, "archived": archived}
+
+
+@jobs.task("partitions.maintain", schedule="FREQ=DAILY;BYHOUR=1;BYMINUTE=0;BYSECOND=0")
+def maintain_job() -> None:
+    result = maintain()
+    logger.info("Created partitions %s, archived %s", result["created"], result["archived"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("maintain",))
+    parser.parse_args()
+
+    result = maintain()
+    print(f"Created {len(result['created'])} partitions: {', '.join(result['created']) or '-'}")
+    print(f"Archived {len(result['archived'])} partitions: {', '.join(result['archived']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
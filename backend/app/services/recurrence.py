@@ -0,0 +1,182 @@
+"""
+Lazy expansion of recurring events.
+
+A recurring event is stored once: its ``start_time``/``end_time`` describe
+the first occurrence, ``recurrence_rule`` holds an RFC 5545 RRULE and
+``event_exceptions`` rows cancel or override single occurrences. Occurrences
+are only generated for the window a caller asks for, and the generated start
+times are cached per (series, rule, first start, window) in a bounded LRU, so
+an edit to the series simply stops hitting its old entries.
+"""
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from dateutil.rrule import rrule, rrulestr
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+
+ALLOWED_FREQUENCIES = {"DAILY", "WEEKLY", "MONTHLY", "YEARLY"}
+
+OCCURRENCE_FIELDS = (
+    "id",
+    "title",
+    "description",
+    "event_type",
+    "location",
+    "meeting_link",
+    "organizer_id",
+    "team_id",
+    "created_at",
+    "recurrence_rule",
+)
+OVERRIDE_FIELDS = ("title", "description", "location", "meeting_link")
+
+_expansions = LRUCache("recurrence_expansions", settings.RECURRENCE_CACHE_SIZE)
+
+
+def as_utc(value: datetime) -> datetime:
+    """
+    Treat naive datetimes as UTC, matching how the database stores them.
+    """
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _rule_params(rule: str) -> Dict[str, str]:
+    body = rule.strip()
+    if body.upper().startswith("RRULE:"):
+        body = body[6:]
+    params = {}
+    for part in body.split(";"):
+        key, _, value = part.partition("=")
+        params[key.strip().upper()] = value.strip()
+    return params
+
+
+def parse_rule(rule: str, dtstart: datetime) -> rrule:
+    """
+    Parse an RRULE, raising ValueError for anything we do not support.
+    """
+    params = _rule_params(rule)
+    if params.get("FREQ", "").upper() not in ALLOWED_FREQUENCIES:
+        raise ValueError(f"FREQ must be one of {', '.join(sorted(ALLOWED_FREQUENCIES))}")
+    try:
+        parsed = rrulestr(rule.strip(), dtstart=as_utc(dtstart))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid recurrence rule: {e}")
+    if not isinstance(parsed, rrule):
+        raise ValueError("Only a single RRULE is supported")
+    return parsed
+
+
+def series_end(rule: str, start_time: datetime, end_time: datetime) -> Optional[datetime]:
+    """
+    End of the last occurrence, or None for a series without COUNT/UNTIL.
+    """
+    parsed = parse_rule(rule, start_time)
+    params = _rule_params(rule)
+    if "COUNT" not in params and "UNTIL" not in params:
+        return None
+    last = deque(parsed, maxlen=1)
+    if not last:
+        return as_utc(end_time)
+    return last[0] + (end_time - start_time)
+
+
+def is_occurrence(event, original_start: datetime) -> bool:
+    original_start = as_utc(original_start)
+    parsed = parse_rule(event.recurrence_rule, event.start_time)
+    return parsed.after(original_start, inc=True) == original_start
+
+
+def _occurrence_starts(event, window_start: datetime, window_end: datetime) -> Iterable[datetime]:
+    key = (event.id, event.recurrence_rule, event.start_time, window_start, window_end)
+    starts = _expansions.get(key)
+    if starts is None:
+        parsed = parse_rule(event.recurrence_rule, event.start_time)
+        starts = tuple(s for s in parsed.between(window_start, window_end, inc=True) if s < window_end)
+        _expansions.set(key, starts)
+    return starts
+
+
+def _occurrence(event, original_start: datetime, exception=None) -> dict:
+    duration = event.end_time - event.start_time
+    data = {field: getattr(event, field) for field in OCCURRENCE_FIELDS}
+    data["start_time"] = original_start
+    data["end_time"] = original_start + duration
+    data["recurrence_id"] = original_start
+    if exception is not None:
+        for field in OVERRIDE_FIELDS:
+            value = getattr(exception, field)
+            if value is not None:
+                data[field] = value
+        if exception.start_time is not None:
+            data["start_time"] = exception.start_time
+        if exception.end_time is not None:
+            data["end_time"] = exception.end_time
+    return data
+
+
+def expand_series(
+    events, window_start: datetime, window_end: datetime, overlap: bool = False
+) -> List[dict]:
+    """
+    Occurrences of the given recurring events starting inside the window (or
+    overlapping it, with ``overlap``), with exceptions applied. Expects
+    ``event.exceptions`` to be loaded.
+    """
+    window_start = as_utc(window_start)
+    window_end = as_utc(window_end)
+
+    def in_window(occurrence: dict) -> bool:
+        if overlap:
+            return as_utc(occurrence["start_time"]) < window_end and as_utc(occurrence["end_time"]) > window_start
+        return window_start <= as_utc(occurrence["start_time"]) < window_end
+
+    occurrences = []
+    for event in events:
+        exceptions = {as_utc(e.original_start): e for e in event.exceptions}
+        expand_from = window_start - (event.end_time - event.start_time) if overlap else window_start
+        seen = set()
+        for start in _occurrence_starts(event, expand_from, window_end):
+            seen.add(start)
+            exception = exceptions.get(start)
+            if exception is not None and exception.is_cancelled:
+                continue
+            occurrence = _occurrence(event, start, exception)
+            if in_window(occurrence):
+                occurrences.append(occurrence)
+        # Occurrences moved into the window from outside it
+        for original_start, exception in exceptions.items():
+            if original_start in seen or exception.is_cancelled or exception.start_time is None:
+                continue
+            occurrence = _occurrence(event, original_start, exception)
+            if in_window(occurrence):
+                occurrences.append(occurrence)
+    return occurrences
+
+
+def next_start(event, after: datetime) -> Optional[datetime]:
+    """
+    Start of the series' first occurrence starting at or after ``after``,
+    with exceptions applied, or None when no occurrence is left. Expects
+    ``event.exceptions`` to be loaded.
+    """
+    after = as_utc(after)
+    exceptions = {as_utc(e.original_start): e for e in event.exceptions}
+    starts = [
+        as_utc(e.start_time)
+        for e in exceptions.values()
+        if not e.is_cancelled and e.start_time is not None and as_utc(e.start_time) >= after
+    ]
+    parsed = parse_rule(event.recurrence_rule, event.start_time)
+    start = parsed.after(after, inc=True)
+    # Cancelled and moved occurrences do not start where the rule says
+    while start is not None and start in exceptions and (
+        exceptions[start].is_cancelled or exceptions[start].start_time is not None
+    ):
+        start = parsed.after(start)
+    if start is not None:
+        starts.append(start)
+    return min(starts, default=None)
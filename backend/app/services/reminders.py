@@ -0,0 +1,315 @@
+"""
+"Due soon" and "starting soon" reminders.
+
+Every minute the job worker scans for goals whose ``target_date`` falls
+within ``GOAL_REMINDER_LEAD_HOURS`` and events starting within
+``EVENT_REMINDER_LEAD_MINUTES``, and writes one outbox message per
+recipient. Each kind keeps a high-water mark in ``reminder_marks``: the end
+of the window the last scan covered. A scan only looks at
+[max(mark, now), now + lead), so it touches the rows that became eligible
+since the previous tick, read in keyset batches of ``REMINDER_BATCH_SIZE``
+from the partial indexes ``ix_goals_due`` and ``ix_events_upcoming``. The
+reminders and the new mark are committed together; a scan that finds the
+mark locked by another one skips its turn.
+
+Recurring series cannot be indexed by occurrence, so ``series_reminders``
+keeps the start of each series' next occurrence. A scan expands only the
+series whose next occurrence starts before the end of its window, then moves
+it to the first occurrence after the window, or drops it when none is left.
+
+Rows created or moved into a window already scanned are picked up by
+``queue_goal`` and ``queue_event``, which the write endpoints call;
+``queue_event`` also reschedules a series whose rule, start or exceptions
+changed. Dedup
+keys include the target time, so a reminder goes out once per recipient and
+date, and again if the date moves.
+
+    python -m app.services.reminders scan      # run now; the job worker runs it every minute
+"""
+import argparse
+import logging
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import BigInteger, Integer, String, delete, func, literal, select, true, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import REMINDER_SCAN_DURATION, REMINDERS_QUEUED
+from app.db.base import SessionLocal
+from app.models.event import Event, user_event
+from app.models.goal import Goal
+from app.models.outbox import OutboxMessage
+from app.models.reminder import reminder_marks, series_reminders
+from app.services import jobs
+from app.services.calendar import attach_exceptions
+from app.services.recurrence import expand_series, next_start
+
+logger = logging.getLogger(__name__)
+
+GOAL_DUE = "goal_due"
+EVENT_STARTING = "event_starting"
+
+_OUTBOX_COLUMNS = ["kind", "user_id", "payload", "dedup_key", "status", "attempts"]
+
+
+def _epoch(column):
+    return func.floor(func.extract("epoch", column)).cast(BigInteger)
+
+
+def _insert(select_stmt):
+    return (
+        pg_insert(OutboxMessage)
+        .from_select(_OUTBOX_COLUMNS, select_stmt)
+        .on_conflict_do_nothing(index_elements=[OutboxMessage.dedup_key])
+    )
+
+
+def _goal_reminders(db: Session, ids: List[int]) -> int:
+    # One message to each goal's owner
+    rows = select(
+        literal(GOAL_DUE, String),
+        Goal.user_id,
+        func.jsonb_build_object(
+            "goal_id", Goal.id,
+            "title", Goal.title,
+            "target_date", Goal.target_date,
+            "current_value", Goal.current_value,
+            "target_value", Goal.target_value,
+            "unit", Goal.unit,
+        ),
+        func.concat(f"{GOAL_DUE}:", Goal.id, ":", _epoch(Goal.target_date)),
+        literal("pending", String),
+        literal(0, Integer),
+    ).where(Goal.id.in_(ids))
+    return db.execute(_insert(rows)).rowcount
+
+
+def _event_reminders(db: Session, ids: List[int]) -> int:
+    # One message to each attendee, the organizer included
+    rows = (
+        select(
+            literal(EVENT_STARTING, String),
+            user_event.c.user_id,
+            func.jsonb_build_object(
+                "event_id", Event.id,
+                "title", Event.title,
+                "start_time", Event.start_time,
+                "meeting_link", func.coalesce(Event.meeting_link, Event.location, ""),
+            ),
+            func.concat(f"{EVENT_STARTING}:", Event.id, ":", user_event.c.user_id, ":", _epoch(Event.start_time)),
+            literal("pending", String),
+            literal(0, Integer),
+        )
+        .join(user_event, user_event.c.event_id == Event.id)
+        .where(Event.id.in_(ids))
+    )
+    return db.execute(_insert(rows)).rowcount
+
+
+def _series_reminders(db: Session, series: List[Event], start: datetime, end: datetime) -> int:
+    attach_exceptions(db, series)
+    occurrences = expand_series(series, start, end)
+    if not occurrences:
+        return 0
+    attendees: Dict[int, List[int]] = {event.id: [] for event in series}
+    for user_id, event_id in db.execute(
+        select(user_event.c.user_id, user_event.c.event_id).where(user_event.c.event_id.in_(list(attendees)))
+    ):
+        attendees[event_id].append(user_id)
+    values = [
+        {
+            "kind": EVENT_STARTING,
+            "user_id": user_id,
+            "payload": {
+                "event_id": o["id"],
+                "title": o["title"],
+                "start_time": o["start_time"].isoformat(),
+                "recurrence_id": o["recurrence_id"].isoformat(),
+                "meeting_link": o["meeting_link"] or o["location"] or "",
+            },
+            # Keyed by the occurrence's place in the series, so moving it
+            # within the window does not remind twice
+            "dedup_key": f"{EVENT_STARTING}:{o['id']}:{user_id}:{int(o['recurrence_id'].timestamp())}",
+            "status": "pending",
+            "attempts": 0,
+        }
+        for o in occurrences
+        for user_id in attendees[o["id"]]
+    ]
+    if not values:
+        return 0
+    stmt = pg_insert(OutboxMessage).values(values)
+    return db.execute(stmt.on_conflict_do_nothing(index_elements=[OutboxMessage.dedup_key])).rowcount
+
+
+def _batches(db: Session, column, id_column, condition, start: Optional[datetime], end: datetime):
+    """
+    Ids of the rows with ``start <= column < end`` (no lower bound without
+    ``start``) in (column, id) order, a batch at a time.
+    """
+    after: Optional[Tuple[datetime, int]] = None
+    while True:
+        query = select(column, id_column).where(condition, column < end)
+        if start is not None:
+            query = query.where(column >= start)
+        if after is not None:
+            query = query.where(tuple_(column, id_column) > tuple_(*after))
+        rows = db.execute(query.order_by(column, id_column).limit(settings.REMINDER_BATCH_SIZE)).all()
+        if not rows:
+            return
+        yield [row[1] for row in rows]
+        if len(rows) < settings.REMINDER_BATCH_SIZE:
+            return
+        after = tuple(rows[-1])
+
+
+def _schedule(db: Session, events: List[Event], after: datetime) -> None:
+    """
+    Record where each series' next occurrence at or after ``after`` starts,
+    and forget events that are no longer series or have none left. Expects
+    ``event.exceptions`` of series to be loaded.
+    """
+    values, ended = [], []
+    for event in events:
+        start = next_start(event, after) if event.recurrence_rule else None
+        if start is None:
+            ended.append(event.id)
+        else:
+            values.append({"event_id": event.id, "next_start": start})
+    if ended:
+        db.execute(delete(series_reminders).where(series_reminders.c.event_id.in_(ended)))
+    if values:
+        stmt = pg_insert(series_reminders).values(values)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[series_reminders.c.event_id], set_={"next_start": stmt.excluded.next_start}
+            )
+        )
+
+
+def _open_goals():
+    return Goal.is_completed.isnot(True)
+
+
+def _one_off_events():
+    return Event.recurrence_rule.is_(None)
+
+
+def _lock_mark(db: Session, name: str, now: datetime) -> Optional[datetime]:
+    """
+    Lock the kind's mark for this transaction and return it, or None if
+    another scan holds it.
+    """
+    db.execute(pg_insert(reminder_marks).values(name=name, mark=now).on_conflict_do_nothing())
+    db.commit()
+    row = db.execute(
+        select(reminder_marks.c.mark).where(reminder_marks.c.name == name).with_for_update(skip_locked=True)
+    ).first()
+    return None if row is None else row.mark
+
+
+def scan(db: Session, name: str, lead: timedelta, now: Optional[datetime] = None) -> int:
+    """
+    Queue the reminders of kind ``name`` that became due since the last scan.
+    Returns how many messages were written.
+    """
+    now = now or datetime.now(timezone.utc)
+    start_time = perf_counter()
+    mark = _lock_mark(db, name, now)
+    if mark is None:
+        db.rollback()
+        return 0
+    start, end = max(mark, now), now + lead
+    queued = 0
+    if start < end:
+        if name == GOAL_DUE:
+            for ids in _batches(db, Goal.target_date, Goal.id, _open_goals(), start, end):
+                queued += _goal_reminders(db, ids)
+        else:
+            for ids in _batches(db, Event.start_time, Event.id, _one_off_events(), start, end):
+                queued += _event_reminders(db, ids)
+            # Series behind schedule (e.g. edited since) are caught up too
+            next_starts = series_reminders.c.next_start
+            for ids in _batches(db, next_starts, series_reminders.c.event_id, true(), None, end):
+                series = db.execute(select(Event).where(Event.id.in_(ids))).scalars().all()
+                queued += _series_reminders(db, series, start, end)
+                _schedule(db, series, end)
+        db.execute(reminder_marks.update().where(reminder_marks.c.name == name).values(mark=end))
+    db.commit()
+    REMINDER_SCAN_DURATION.labels(name).observe(perf_counter() - start_time)
+    REMINDERS_QUEUED.labels(name).inc(queued)
+    return queued
+
+
+def _goal_lead() -> timedelta:
+    return timedelta(hours=settings.GOAL_REMINDER_LEAD_HOURS)
+
+
+def _event_lead() -> timedelta:
+    return timedelta(minutes=settings.EVENT_REMINDER_LEAD_MINUTES)
+
+
+def queue_goal(db: Session, goal: Goal) -> None:
+    """
+    Queue the goal's reminder in the current transaction if it is already
+    due within the lead time; the scan may have passed its target date.
+    """
+    if goal.is_completed or goal.target_date is None:
+        return
+    now = datetime.now(timezone.utc)
+    if now <= goal.target_date < now + _goal_lead():
+        REMINDERS_QUEUED.labels(GOAL_DUE).inc(_goal_reminders(db, [goal.id]))
+
+
+def queue_event(db: Session, event: Event) -> None:
+    """
+    Queue reminders for the event's attendees in the current transaction if
+    it (or an occurrence of the series) starts within the lead time, and
+    reschedule a series for the scanner.
+    """
+    now = datetime.now(timezone.utc)
+    end = now + _event_lead()
+    if event.recurrence_rule:
+        queued = _series_reminders(db, [event], now, end)
+        _schedule(db, [event], now)
+    else:
+        # Drops the schedule of what used to be a series
+        _schedule(db, [event], now)
+        if not now <= event.start_time < end:
+            return
+        queued = _event_reminders(db, [event.id])
+    REMINDERS_QUEUED.labels(EVENT_STARTING).inc(queued)
+
+
+def scan_all(db: Session) -> Dict[str, int]:
+    return {
+        GOAL_DUE: scan(db, GOAL_DUE, _goal_lead()),
+        EVENT_STARTING: scan(db, EVENT_STARTING, _event_lead()),
+    }
+
+
+@jobs.task("reminders.scan", priority=5, timeout=300, schedule="FREQ=MINUTELY;BYSECOND=0")
+def scan_job() -> None:
+    with SessionLocal() as db:
+        queued = scan_all(db)
+    if any(queued.values()):
+        logger.info("Queued reminders: %s", queued)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("scan",))
+    parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as db:
+        queued = scan_all(db)
+    for name, count in queued.items():
+        print(f"{name}: queued {count} reminders")
+
+
+if __name__ == "__main__":
+    main()
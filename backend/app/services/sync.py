@@ -0,0 +1,295 @@
+"""
+Delta sync queries; see app.models.sync for how changes are tracked.
+
+    python -m app.services.sync install-triggers
+    python -m app.services.sync purge             # run now; the job worker runs it daily
+"""
+import argparse
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, or_, select, text, true, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.base import SessionLocal, engine
+from app.models.event import Event, EventException, user_event
+from app.models.goal import Goal, GoalProgress
+from app.models.sync import SNAPSHOT_XMIN, SyncTombstone, install_sync_triggers, sync_state
+from app.models.team import Team
+from app.models.user import user_team
+from app.services import jobs
+from app.services.calendar import visible_to
+
+# Client-facing names of the membership tables
+TABLE_NAMES = {"user_team": "team_members", "user_event": "event_attendance"}
+PURGED_BELOW = "purged_below"
+
+PAGE_SIZE = 1000
+# A sync walks these in order, each by its key, so a cursor that continues
+# it is the section and the last key sent
+SECTION_KEYS = {
+    "goals": (Goal.id,),
+    "goal_progress": (GoalProgress.id,),
+    "teams": (Team.id,),
+    "team_members": (user_team.c.team_id, user_team.c.user_id),
+    "events": (Event.id,),
+    "event_attendance": (user_event.c.event_id,),
+}
+SECTIONS = (*SECTION_KEYS, "deleted")
+# Deletions are keyed by (table, row_id, parent_id), the table by its index here
+DELETED_TABLES = ("goals", "goal_progress", "teams", "user_team", "events", "user_event")
+KEY_LENGTHS = {**{name: len(key) for name, key in SECTION_KEYS.items()}, "deleted": 3}
+
+
+def _changed(since: int, version, *also):
+    # Rows written since the cursor, or that became visible through one of
+    # the extra conditions; everything on a first sync
+    if not since:
+        return true()
+    return or_(version >= since, *also)
+
+
+def purged_below(db: Session) -> int:
+    value = db.execute(select(sync_state.c.value).where(sync_state.c.key == PURGED_BELOW)).scalar()
+    return value or 0
+
+
+def parse_cursor(value: str) -> Tuple[int, Optional[tuple]]:
+    """
+    The version a cursor syncs from and, for a cursor that continues a sync
+    cut short by its page size, where to resume. Raises ValueError for a
+    malformed cursor.
+    """
+    since, *resume = (int(part) for part in value.split(":"))
+    if since < 0:
+        raise ValueError("Invalid sync cursor")
+    if not resume:
+        return since, None
+    if len(resume) < 2 or not 0 <= resume[1] < len(SECTIONS):
+        raise ValueError("Invalid sync cursor")
+    final, section, *after = resume
+    if after and len(after) != KEY_LENGTHS[SECTIONS[section]]:
+        raise ValueError("Invalid sync cursor")
+    return since, (final, section, tuple(after))
+
+
+def changes_since(
+    db: Session, user_id: int, since: int, limit: int = PAGE_SIZE, resume: Optional[tuple] = None
+) -> Dict[str, Any]:
+    """
+    Up to ``limit`` rows visible to the user that changed since the cursor,
+    plus the next cursor. While has_more is set the next cursor continues
+    this sync where the page stopped; the last page returns the cursor for
+    the next sync. Rows may occasionally be sent twice; clients upsert.
+    """
+    if resume is None:
+        # Taken before reading anything, so no write can fall between
+        # cursors; carried through the pages of this sync
+        final = db.execute(text(f"SELECT {SNAPSHOT_XMIN}")).scalar()
+        section, after = 0, ()
+    else:
+        final, section, after = resume
+
+    my_teams = select(user_team.c.team_id).where(user_team.c.user_id == user_id)
+    # Teams joined and events attended since the cursor bring their older
+    # rows along
+    new_teams = select(user_team.c.team_id).where(
+        user_team.c.user_id == user_id, user_team.c.sync_version >= since
+    )
+    new_events = select(user_event.c.event_id).where(
+        user_event.c.user_id == user_id, user_event.c.sync_version >= since
+    )
+    visible_goal = or_(Goal.user_id == user_id, Goal.team_id.in_(my_teams))
+
+    queries = {
+        "goals": db.query(Goal).filter(
+            visible_goal, _changed(since, Goal.sync_version, Goal.team_id.in_(new_teams))
+        ),
+        "goal_progress": (
+            db.query(GoalProgress)
+            .join(Goal, Goal.id == GoalProgress.goal_id)
+            .filter(visible_goal, _changed(since, GoalProgress.sync_version, Goal.team_id.in_(new_teams)))
+        ),
+        "teams": db.query(Team).filter(
+            Team.id.in_(my_teams), _changed(since, Team.sync_version, Team.id.in_(new_teams))
+        ),
+        "team_members": db.query(user_team.c.team_id, user_team.c.user_id).filter(
+            user_team.c.team_id.in_(my_teams),
+            _changed(since, user_team.c.sync_version, user_team.c.team_id.in_(new_teams)),
+        ),
+        "events": db.query(Event).filter(
+            or_(visible_to(user_id), Event.team_id.in_(my_teams)),
+            _changed(since, Event.sync_version, Event.id.in_(new_events), Event.team_id.in_(new_teams)),
+        ),
+        "event_attendance": db.query(user_event.c.event_id, user_event.c.user_id).filter(
+            user_event.c.user_id == user_id, _changed(since, user_event.c.sync_version)
+        ),
+    }
+
+    page = {name: [] for name in SECTIONS}
+    left, cursor, has_more = limit, str(final), False
+    for index in range(section, len(SECTIONS)):
+        name = SECTIONS[index]
+        start = after if index == section else ()
+        if name == "deleted":
+            rows = _deleted_since(db, user_id, since, my_teams, visible_goal) if since else []
+            rows = [row for row in rows if _deleted_key(row) > start][:left + 1]
+        else:
+            query = queries[name]
+            if start:
+                query = query.filter(tuple_(*SECTION_KEYS[name]) > tuple_(*start))
+            rows = query.order_by(*SECTION_KEYS[name]).limit(left + 1).all()
+        if len(rows) > left:
+            rows = rows[:left]
+            page[name] = rows
+            resume_at = _key(name, rows[-1]) if rows else start
+            cursor = ":".join(str(part) for part in (since, final, index, *resume_at))
+            has_more = True
+            break
+        page[name] = rows
+        left -= len(rows)
+
+    # Exception writes bump their event, so send a changed series whole
+    series_ids = [e.id for e in page["events"] if e.recurrence_rule]
+    exceptions = (
+        db.query(EventException).filter(EventException.event_id.in_(series_ids)).all() if series_ids else []
+    )
+    return {
+        "cursor": cursor,
+        "has_more": has_more,
+        "goals": page["goals"],
+        "goal_progress": page["goal_progress"],
+        "teams": page["teams"],
+        "team_members": [{"team_id": team_id, "user_id": member_id} for team_id, member_id in page["team_members"]],
+        "events": page["events"],
+        "event_exceptions": exceptions,
+        "event_attendance": [{"event_id": event_id, "user_id": uid} for event_id, uid in page["event_attendance"]],
+        "deleted": [
+            {"table": TABLE_NAMES.get(table, table), "id": row_id, "parent_id": parent_id}
+            for table, row_id, parent_id in page["deleted"]
+        ],
+    }
+
+
+def _deleted_key(row: tuple) -> tuple:
+    table, row_id, parent_id = row
+    return (DELETED_TABLES.index(table), row_id, parent_id or 0)
+
+
+def _key(section: str, row: Any) -> tuple:
+    if section == "deleted":
+        return _deleted_key(row)
+    return tuple(getattr(row, column.key) for column in SECTION_KEYS[section])
+
+
+def _deleted_since(db: Session, user_id: int, since: int, my_teams, visible_goal) -> List[tuple]:
+    """
+    (table, row_id, parent_id) of the rows deleted since the cursor, or
+    that the user can no longer see, in cursor order.
+    """
+    # Teams the user left or that were deleted since the cursor. Their own
+    # membership tombstone is the only record of it; what they saw through
+    # the team is worked out below
+    lost_teams = set(db.execute(
+        select(SyncTombstone.row_id).where(
+            SyncTombstone.table_name == "user_team",
+            SyncTombstone.user_id == user_id,
+            SyncTombstone.sync_version >= since,
+            SyncTombstone.row_id.not_in(my_teams),
+        )
+    ).scalars())
+    tombstones = db.query(
+        SyncTombstone.table_name, SyncTombstone.row_id, SyncTombstone.parent_id
+    ).filter(
+        SyncTombstone.sync_version >= since,
+        or_(
+            SyncTombstone.user_id == user_id,
+            SyncTombstone.team_id.in_(my_teams),
+            SyncTombstone.team_id.in_(lost_teams),
+        ),
+    ).all()
+    rows = {(table, row_id, parent_id) for table, row_id, parent_id in tombstones}
+    if lost_teams:
+        rows.update(("teams", team_id, None) for team_id in lost_teams)
+        rows.update(
+            ("user_team", team_id, member_id)
+            for team_id, member_id in db.query(user_team.c.team_id, user_team.c.user_id).filter(
+                user_team.c.team_id.in_(lost_teams)
+            )
+        )
+        rows.update(
+            ("goals", goal_id, None)
+            for goal_id, in db.query(Goal.id).filter(Goal.team_id.in_(lost_teams), Goal.user_id != user_id)
+        )
+        rows.update(
+            ("events", event_id, None)
+            for event_id, in db.query(Event.id).filter(Event.team_id.in_(lost_teams), ~visible_to(user_id))
+        )
+
+    # A goal or event that left a team may still be visible to the user
+    # another way
+    goal_ids = [row_id for table, row_id, _ in rows if table == "goals"]
+    event_ids = [row_id for table, row_id, _ in rows if table == "events"]
+    still_visible = set()
+    if goal_ids:
+        still_visible.update(
+            ("goals", goal_id) for goal_id, in db.query(Goal.id).filter(Goal.id.in_(goal_ids), visible_goal)
+        )
+    if event_ids:
+        still_visible.update(
+            ("events", event_id)
+            for event_id, in db.query(Event.id).filter(
+                Event.id.in_(event_ids), or_(visible_to(user_id), Event.team_id.in_(my_teams))
+            )
+        )
+    return sorted((row for row in rows if row[:2] not in still_visible), key=_deleted_key)
+
+
+def purge_tombstones(db: Session, retention: timedelta) -> int:
+    """
+    Delete tombstones older than ``retention`` and remember the highest
+    purged version, below which cursors are no longer accepted.
+    """
+    cutoff = datetime.now(timezone.utc) - retention
+    purged = (
+        delete(SyncTombstone)
+        .where(SyncTombstone.deleted_at < cutoff)
+        .returning(SyncTombstone.sync_version)
+        .cte("purged")
+    )
+    count, highest = db.execute(select(func.count(), func.max(purged.c.sync_version))).one()
+    if highest is not None:
+        stmt = pg_insert(sync_state).values(key=PURGED_BELOW, value=highest + 1)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[sync_state.c.key],
+            set_={"value": func.greatest(sync_state.c.value, stmt.excluded.value)},
+        ))
+    db.commit()
+    return count
+
+
+@jobs.task("sync.purge", schedule="FREQ=DAILY;BYHOUR=3;BYMINUTE=0;BYSECOND=0")
+def purge_job() -> None:
+    with SessionLocal() as db:
+        purge_tombstones(db, timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("install-triggers", "purge"))
+    args = parser.parse_args()
+
+    if args.command == "install-triggers":
+        with engine.begin() as connection:
+            install_sync_triggers(connection)
+        print("Sync triggers installed")
+    else:
+        with SessionLocal() as db:
+            count = purge_tombstones(db, timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS))
+        print(f"Purged {count} tombstones")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Team statistics computed with a few aggregate queries and cached per team.
+
+Write paths that change a team's goals, progress, events, attendance or
+members call ``invalidate``; the TTL bounds staleness across workers, since
+each worker has its own cache.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import and_, case, distinct, func, select
+from sqlalchemy.orm import Session
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.models.event import Event, user_event
+from app.models.goal import Goal, GoalProgress
+from app.models.user import user_team
+
+_cache = LRUCache("team_stats", settings.TEAM_STATS_CACHE_SIZE, ttl=settings.TEAM_STATS_CACHE_SECONDS)
+
+
+def _epoch(interval):
+    return func.extract("epoch", interval)
+
+
+def _at_risk(now: datetime):
+    # Open goals whose share of the target trails the share of time elapsed
+    # between creation and the target date; overdue goals always qualify
+    progress_share = case(
+        (Goal.target_value > 0, Goal.current_value / Goal.target_value), else_=1.0
+    )
+    time_share = _epoch(now - Goal.created_at) / func.nullif(_epoch(Goal.target_date - Goal.created_at), 0)
+    return and_(
+        Goal.is_completed.isnot(True),
+        Goal.target_date.isnot(None),
+        progress_share < func.coalesce(time_share, 1.0),
+    )
+
+
+def _percent(part: float, whole: float) -> float:
+    return round(100.0 * part / whole, 1) if whole else 0.0
+
+
+def compute(db: Session, team_id: int, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Aggregate a team's statistics; weeks start on Monday, UTC.
+    """
+    now = now or datetime.now(timezone.utc)
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    week_start = today - timedelta(days=today.weekday())
+    members = select(user_team.c.user_id).where(user_team.c.team_id == team_id)
+
+    goal_count, completed_goals, at_risk, ratio_sum = db.execute(
+        select(
+            func.count(Goal.id),
+            func.count(Goal.id).filter(Goal.is_completed.is_(True)),
+            func.count(Goal.id).filter(_at_risk(now)),
+            func.coalesce(func.sum(case(
+                (Goal.target_value > 0, func.least(Goal.current_value / Goal.target_value, 1.0)),
+                else_=0.0,
+            )), 0.0),
+        ).where(Goal.team_id == team_id)
+    ).one()
+
+    active = (
+        select(Goal.user_id)
+        .join(GoalProgress, GoalProgress.goal_id == Goal.id)
+        .where(Goal.user_id.in_(members), GoalProgress.logged_at >= week_start)
+        .group_by(Goal.user_id)
+        .subquery()
+    )
+    member_count, active_members = db.execute(
+        select(func.count(user_team.c.user_id), func.count(active.c.user_id))
+        .select_from(user_team)
+        .outerjoin(active, active.c.user_id == user_team.c.user_id)
+        .where(user_team.c.team_id == team_id)
+    ).one()
+
+    # Recurring events count once, as stored
+    past_events, events_attended = db.execute(
+        select(
+            func.count(distinct(Event.id)),
+            func.count(user_event.c.user_id).filter(user_event.c.user_id.in_(members)),
+        )
+        .select_from(Event)
+        .outerjoin(user_event, user_event.c.event_id == Event.id)
+        .where(Event.team_id == team_id, Event.start_time < now)
+    ).one()
+
+    return {
+        "team_id": team_id,
+        "member_count": member_count,
+        "active_members_this_week": active_members,
+        "goal_count": goal_count,
+        "completed_goals": completed_goals,
+        "completion_rate": _percent(completed_goals, goal_count),
+        "average_progress": _percent(ratio_sum, goal_count),
+        "goals_at_risk": at_risk,
+        "past_events": past_events,
+        "events_attended": events_attended,
+        "attendance_rate": _percent(events_attended, past_events * member_count),
+        "computed_at": now,
+    }
+
+
+def get(db: Session, team_id: int) -> Dict[str, Any]:
+    stats = _cache.get(team_id)
+    if stats is None:
+        stats = compute(db, team_id)
+        _cache.set(team_id, stats)
+    return stats
+
+
+def invalidate(*team_ids: Optional[int]) -> None:
+    """
+    Drop the cached statistics of the given teams; with no ids, of all teams.
+    """
+    if not team_ids:
+        _cache.clear()
+    for team_id in team_ids:
+        if team_id is not None:
+            _cache.pop(team_id)
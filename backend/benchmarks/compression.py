@@ -0,0 +1,115 @@
+"""
+Measure compression CPU cost against bytes saved on real API responses.
+
+Fetches uncompressed responses from a running API as a seeded user (their
+first team, the current month's calendar and their first goal with its
+progress), then compresses each with every available encoding at a few
+levels, both whole and as a stream of 16 KB chunks flushed after each, the
+way the middleware handles streaming responses:
+
+    python -m benchmarks.compression --user 1 --repeat 20
+
+A larger team gives more telling numbers, e.g. one built by
+``python -m benchmarks.team_stats --members 10000``; pass ``--team``.
+"""
+import argparse
+import json
+from statistics import median
+from time import process_time
+from typing import Dict, List, Optional, Tuple
+
+from app.core.compression import available_encoders
+from benchmarks.loadgen import Client
+from benchmarks.seed import PASSWORD
+
+LEVELS = {"gzip": (1, 6, 9), "br": (1, 4, 6), "zstd": (1, 3, 9)}
+CHUNK = 16 * 1024
+
+
+def _payloads(client: Client, team_id: Optional[int]) -> Dict[str, bytes]:
+    headers = {"Accept-Encoding": "identity"}
+    if team_id is None:
+        teams = client.json("GET", "/teams/")
+        team_id = teams[0]["id"] if teams else None
+    goals = client.json("GET", "/goals/?limit=1")
+    paths = {"calendar_month": "/events/calendar/month"}
+    if team_id is not None:
+        paths["team"] = f"/teams/{team_id}"
+    if goals:
+        paths["goal"] = f"/goals/{goals[0]['id']}"
+    payloads = {}
+    for name, path in paths.items():
+        status, body = client.request("GET", path, headers=headers)
+        if status != 200:
+            raise RuntimeError(f"GET {path} -> {status}")
+        payloads[name] = body
+    return payloads
+
+
+def _measure(factory, level: int, body: bytes, chunked: bool, repeat: int) -> Tuple[float, int]:
+    """
+    Median CPU seconds and compressed size.
+    """
+    times: List[float] = []
+    size = 0
+    for _ in range(repeat):
+        encoder = factory(level)
+        start = process_time()
+        if chunked:
+            parts = [
+                encoder.compress(body[i:i + CHUNK], final=i + CHUNK >= len(body))
+                for i in range(0, len(body), CHUNK)
+            ]
+            size = sum(len(part) for part in parts)
+        else:
+            size = len(encoder.compress(body, final=True))
+        times.append(process_time() - start)
+    return median(times), size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000/api/v1")
+    parser.add_argument("--user", type=int, default=1, help="Seeded user id")
+    parser.add_argument("--team", type=int, default=None, help="Team to fetch; the user's first by default")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    client = Client(args.base_url)
+    try:
+        client.login(f"user{args.user}@bench.local", PASSWORD)
+        payloads = _payloads(client, args.team)
+    finally:
+        client.close()
+
+    results = []
+    for payload, body in payloads.items():
+        for encoding, factory in available_encoders().items():
+            for level in LEVELS[encoding]:
+                for chunked in (False, True):
+                    seconds, size = _measure(factory, level, body, chunked, args.repeat)
+                    results.append({
+                        "payload": payload,
+                        "bytes": len(body),
+                        "encoding": encoding,
+                        "level": level,
+                        "streamed": chunked,
+                        "compressed_bytes": size,
+                        "ratio": round(len(body) / size, 2) if size else None,
+                        "cpu_ms": round(seconds * 1000, 3),
+                        # Bytes saved per millisecond of CPU
+                        "saved_per_ms": round((len(body) - size) / (seconds * 1000)) if seconds else None,
+                    })
+
+    for r in results:
+        mode = "stream" if r["streamed"] else "whole"
+        print(
+            f"{r['payload']:<15} {r['bytes']:>10,}B  {r['encoding']:<4} {r['level']:>2} {mode:<6} "
+            f"-> {r['compressed_bytes']:>9,}B  x{r['ratio']:<6} {r['cpu_ms']:>8.3f}ms cpu  "
+            f"{r['saved_per_ms'] or 0:>10,} B saved/ms"
+        )
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Measure iCalendar feed cost for a user with thousands of events.
+
+Inserts ``--events`` events (every 20th one weekly recurring) for one seeded
+user, then times the feed against a running API:
+
+* cold: first request, every event rendered
+* warm: every segment cached, still one query plus streaming
+* revalidate: ``If-None-Match`` with the current ETag, answered with 304
+* after edit: one event changed, only its segment re-rendered
+
+    python -m benchmarks.feed --user 1 --events 5000 --repeat 20 --cleanup
+"""
+import argparse
+import json
+from statistics import median
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from sqlalchemy import text
+
+from app.db.base import engine
+from benchmarks.loadgen import Client
+from benchmarks.seed import PASSWORD
+
+TITLE_PREFIX = "Feed bench "
+
+INSERT_EVENTS = text(
+    """
+    WITH new AS (
+        INSERT INTO events (
+            title, description, start_time, end_time, organizer_id, event_type,
+            location, recurrence_rule, recurrence_end
+        )
+        SELECT
+            :prefix || g, 'Benchmark event ' || g,
+            now() + g * interval '3 hours',
+            now() + g * interval '3 hours' + interval '1 hour',
+            :user_id, 'personal', 'Room ' || (g % 10),
+            CASE WHEN g % 20 = 0 THEN 'FREQ=WEEKLY;COUNT=10' END,
+            CASE WHEN g % 20 = 0 THEN now() + g * interval '3 hours' + interval '9 weeks 1 hour' END
+        FROM generate_series(1, :count) AS g
+        RETURNING id
+    )
+    INSERT INTO user_event (user_id, event_id) SELECT :user_id, id FROM new
+    """
+)
+TOUCH_ONE = text(
+    "UPDATE events SET title = title || '*', updated_at = now() "
+    "WHERE id = (SELECT min(id) FROM events WHERE title LIKE :prefix || '%')"
+)
+CLEANUP = (
+    text(
+        "DELETE FROM user_event WHERE event_id IN "
+        "(SELECT id FROM events WHERE title LIKE :prefix || '%')"
+    ),
+    text("DELETE FROM events WHERE title LIKE :prefix || '%'"),
+)
+
+
+def _fetch(client: Client, path: str, etag: Optional[str] = None) -> Tuple[float, int, int, Optional[str]]:
+    headers = {"If-None-Match": etag} if etag else {}
+    start = perf_counter()
+    status, body = client.request("GET", path, headers=headers)
+    # Header names are case-insensitive; servers and proxies differ
+    return perf_counter() - start, status, len(body), httpx.Headers(client.last_headers).get("etag")
+
+
+def _timed(client: Client, path: str, repeat: int, etag: Optional[str] = None) -> Dict[str, float]:
+    samples: List[float] = []
+    size = 0
+    # Revalidating with the current ETag must not send the feed again
+    expected = 304 if etag else 200
+    for _ in range(repeat):
+        elapsed, status, size, _ = _fetch(client, path, etag)
+        if status != expected:
+            raise RuntimeError(f"GET {path} -> {status}, expected {expected}")
+        samples.append(elapsed)
+    return {"median_ms": round(median(samples) * 1000, 2), "max_ms": round(max(samples) * 1000, 2), "bytes": size}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000/api/v1")
+    parser.add_argument("--user", type=int, default=1, help="Seeded user id")
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--cleanup", action="store_true", help="Delete the inserted events afterwards")
+    args = parser.parse_args()
+
+    with engine.begin() as conn:
+        conn.execute(INSERT_EVENTS, {"prefix": TITLE_PREFIX, "user_id": args.user, "count": args.events})
+
+    client = Client(args.base_url)
+    try:
+        client.login(f"user{args.user}@bench.local", PASSWORD)
+        token = client.json("GET", "/feeds/token")["feed_token"]
+        client.token = None
+        path = f"/feeds/user.ics?token={token}"
+
+        elapsed, _, size, etag = _fetch(client, path)
+        if etag is None:
+            raise RuntimeError(f"GET {path} returned no ETag")
+        results = {"cold": {"median_ms": round(elapsed * 1000, 2), "max_ms": round(elapsed * 1000, 2), "bytes": size}}
+        results["warm"] = _timed(client, path, args.repeat)
+        results["revalidate"] = _timed(client, path, args.repeat, etag)
+
+        with engine.begin() as conn:
+            conn.execute(TOUCH_ONE, {"prefix": TITLE_PREFIX})
+        elapsed, _, size, _ = _fetch(client, path)
+        results["after_edit"] = {"median_ms": round(elapsed * 1000, 2), "max_ms": round(elapsed * 1000, 2), "bytes": size}
+    finally:
+        client.close()
+        if args.cleanup:
+            with engine.begin() as conn:
+                for statement in CLEANUP:
+                    conn.execute(statement, {"prefix": TITLE_PREFIX})
+
+    for name, result in results.items():
+        print(f"{name:<11} median {result['median_ms']:>8.1f}ms  max {result['max_ms']:>8.1f}ms  {result['bytes']:>10,} bytes")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
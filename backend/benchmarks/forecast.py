@@ -0,0 +1,72 @@
+"""
+Measure goal forecasting throughput.
+
+By default fits synthetic histories in memory, ``--batch-size`` goals at a
+time, to isolate the NumPy cost from the database:
+
+    python -m benchmarks.forecast --goals 1000000 --logs-per-goal 20
+
+With ``--database`` it runs the real nightly batch against the seeded
+database instead (``python -m benchmarks.seed`` first).
+"""
+import argparse
+import json
+from time import perf_counter
+
+import numpy as np
+
+from app.db.base import SessionLocal
+from app.services.forecast import fit_rates, project, run
+
+
+def synthetic(goals: int, logs_per_goal: int, batch_size: int, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    fitted = 0
+    fit_seconds = 0.0
+    while fitted < goals:
+        count = min(batch_size, goals - fitted)
+        samples = rng.poisson(logs_per_goal, count)
+        group = np.repeat(np.arange(count), samples)
+        days = -rng.uniform(0, 90, len(group))
+        # Ascending days within each goal, as the query returns them
+        order = np.lexsort((days, group))
+        days = days[order]
+        values = rng.exponential(1.0, len(group))
+        target = rng.uniform(10, 100, count)
+        current = target * rng.uniform(0, 1, count)
+        target_days = np.where(rng.uniform(0, 1, count) < 0.8, rng.uniform(-10, 120, count), np.nan)
+
+        start = perf_counter()
+        rate, counts = fit_rates(group, days, values, count)
+        project(rate, counts, current, target, target_days)
+        fit_seconds += perf_counter() - start
+        fitted += count
+    return {"goals": goals, "fit_seconds": round(fit_seconds, 2), "goals_per_second": round(goals / fit_seconds)}
+
+
+def database(batch_size: int) -> dict:
+    start = perf_counter()
+    with SessionLocal() as db:
+        total = run(db, batch_size)
+    elapsed = perf_counter() - start
+    return {"goals": total, "seconds": round(elapsed, 2), "goals_per_second": round(total / elapsed) if elapsed else 0}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--goals", type=int, default=1_000_000)
+    parser.add_argument("--logs-per-goal", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database", action="store_true", help="Run the nightly batch against the database")
+    args = parser.parse_args()
+
+    if args.database:
+        result = database(args.batch_size)
+    else:
+        result = synthetic(args.goals, args.logs_per_goal, args.batch_size, args.seed)
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
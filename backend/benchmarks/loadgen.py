@@ -0,0 +1,135 @@
+"""
+Minimal concurrent HTTP load generator.
+
+Each virtual user is a thread with its own keep-alive connection, so the
+numbers reflect server latency rather than connection setup.
+"""
+import http.client
+import json
+import random
+import threading
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+Request = Tuple[str, str, Optional[bytes], Dict[str, str]]
+
+
+class Client:
+    def __init__(self, base_url: str, timeout: float = 30.0) -> None:
+        parts = urlsplit(base_url)
+        self.prefix = parts.path.rstrip("/")
+        self._connect = lambda: http.client.HTTPConnection(
+            parts.hostname, parts.port or 80, timeout=timeout
+        )
+        self._conn = self._connect()
+        self.token: Optional[str] = None
+        self.last_headers: Dict[str, str] = {}
+        # Per virtual user state filled in by the scenario setup
+        self.username: Optional[str] = None
+        self.goal_ids: List[int] = []
+        self.team_ids: List[int] = []
+
+    def request(
+        self, method: str, path: str, body: Optional[bytes] = None, headers: Optional[Dict[str, str]] = None
+    ) -> Tuple[int, bytes]:
+        headers = dict(headers or {})
+        if self.token and "Authorization" not in headers:
+            headers["Authorization"] = f"Bearer {self.token}"
+        try:
+            self._conn.request(method, self.prefix + path, body=body, headers=headers)
+            response = self._conn.getresponse()
+            self.last_headers = dict(response.getheaders())
+            return response.status, response.read()
+        except (http.client.HTTPException, OSError):
+            self._conn.close()
+            self._conn = self._connect()
+            raise
+
+    def json(self, method: str, path: str, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else None
+        status, data = self.request(method, path, body, {"Content-Type": "application/json"})
+        if status >= 400:
+            raise RuntimeError(f"{method} {path} -> {status}: {data[:200]!r}")
+        return json.loads(data) if data else None
+
+    def login(self, username: str, password: str) -> None:
+        body = urlencode({"username": username, "password": password}).encode()
+        status, data = self.request(
+            "POST", "/auth/login", body, {"Content-Type": "application/x-www-form-urlencoded"}
+        )
+        if status != 200:
+            raise RuntimeError(f"Login failed for {username}: {status}")
+        self.token = json.loads(data)["access_token"]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+@dataclass
+class Result:
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies) + self.errors
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    @property
+    def throughput(self) -> float:
+        return len(self.latencies) / self.elapsed if self.elapsed else 0.0
+
+
+def run_load(
+    clients: List[Client],
+    make_request: Callable[[Client, random.Random], Request],
+    duration: float,
+    seed: int = 0,
+) -> Result:
+    """
+    Drive every client in its own thread for ``duration`` seconds.
+    """
+    result = Result()
+    lock = threading.Lock()
+    deadline = perf_counter() + duration
+
+    def worker(index: int, client: Client) -> None:
+        rng = random.Random(seed + index)
+        latencies = []
+        errors = 0
+        while perf_counter() < deadline:
+            method, path, body, headers = make_request(client, rng)
+            start = perf_counter()
+            try:
+                status, _ = client.request(method, path, body, headers)
+            except (http.client.HTTPException, OSError):
+                errors += 1
+                continue
+            if status >= 400:
+                errors += 1
+            else:
+                latencies.append(perf_counter() - start)
+        with lock:
+            result.latencies.extend(latencies)
+            result.errors += errors
+
+    threads = [
+        threading.Thread(target=worker, args=(i, client), daemon=True)
+        for i, client in enumerate(clients)
+    ]
+    start = perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result.elapsed = perf_counter() - start
+    return result
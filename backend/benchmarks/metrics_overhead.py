@@ -0,0 +1,61 @@
+"""
+Measure the per-request cost of MetricsMiddleware.
+
+Runs a no-op ASGI app with and without the middleware and prints the
+difference in microseconds per request.
+
+    python -m benchmarks.metrics_overhead --requests 200000
+"""
+import argparse
+import asyncio
+from time import perf_counter
+
+from app.core.metrics import MetricsMiddleware
+
+
+class _Route:
+    path = "/api/v1/teams/{team_id}"
+
+
+async def _endpoint(scope, receive, send):
+    scope["route"] = _Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def _send(message):
+    pass
+
+
+async def _drive(app, requests: int) -> float:
+    start = perf_counter()
+    for _ in range(requests):
+        scope = {"type": "http", "method": "GET", "path": "/api/v1/teams/1"}
+        await app(scope, _receive, _send)
+    return perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200_000)
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    wrapped = MetricsMiddleware(_endpoint)
+    # Warm up label children and code paths
+    loop.run_until_complete(_drive(wrapped, 1000))
+
+    bare = loop.run_until_complete(_drive(_endpoint, args.requests))
+    instrumented = loop.run_until_complete(_drive(wrapped, args.requests))
+    overhead_us = (instrumented - bare) / args.requests * 1e6
+    print(f"bare:         {bare / args.requests * 1e6:.2f} us/request")
+    print(f"instrumented: {instrumented / args.requests * 1e6:.2f} us/request")
+    print(f"overhead:     {overhead_us:.2f} us/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Measure the per-request cost of RateLimitMiddleware.
+
+Runs a no-op ASGI app with and without the middleware and prints the
+difference in microseconds per request, for a route with a policy and a
+signed-in client spread over many users, so every request refills and takes
+from a bucket.
+
+    python -m benchmarks.rate_limit_overhead --requests 200000 --users 1000
+"""
+import argparse
+import asyncio
+from time import perf_counter
+
+from app.core.config import settings
+from app.core.ratelimit import RateLimitMiddleware
+from app.core.security import create_access_token
+
+PATH = f"{settings.API_V1_STR}/users/with-teams"
+
+
+async def _endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def _send(message):
+    pass
+
+
+async def _drive(app, requests: int, headers) -> float:
+    start = perf_counter()
+    for i in range(requests):
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": PATH,
+            "headers": headers[i % len(headers)],
+            "client": ("10.0.0.1", 50000),
+        }
+        await app(scope, _receive, _send)
+    return perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+
+    # High enough that nothing is refused, so both runs do the same work
+    settings.RATE_LIMITS = {"GET /users/with-teams": "1000000000/second"}
+    headers = [
+        [(b"authorization", f"Bearer {create_access_token(user_id)}".encode()), (b"accept", b"*/*")]
+        for user_id in range(1, args.users + 1)
+    ]
+    loop = asyncio.new_event_loop()
+    wrapped = RateLimitMiddleware(_endpoint)
+    # Verify every token and create every bucket before timing
+    loop.run_until_complete(_drive(wrapped, args.users, headers))
+
+    bare = loop.run_until_complete(_drive(_endpoint, args.requests, headers))
+    limited = loop.run_until_complete(_drive(wrapped, args.requests, headers))
+    overhead_us = (limited - bare) / args.requests * 1e6
+    print(f"bare:     {bare / args.requests * 1e6:.2f} us/request")
+    print(f"limited:  {limited / args.requests * 1e6:.2f} us/request")
+    print(f"overhead: {overhead_us:.2f} us/request")
+
+
+if __name__ == "__main__":
+    main()
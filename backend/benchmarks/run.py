@@ -0,0 +1,192 @@
+"""
+Run load scenarios against a running API and compare them with baselines.
+
+Seed the database first (``python -m benchmarks.seed``), start the API, then:
+
+    python -m benchmarks.run --concurrency 32 --duration 30
+    python -m benchmarks.run --scenario calendar --scenario team --save-baseline
+
+Query counts come from the ``db_queries_total`` counter on ``/metrics``;
+with several workers, run the API with ``PROMETHEUS_MULTIPROC_DIR`` set so
+the counter covers all of them. The command exits with status 1 when any
+scenario regresses beyond ``--threshold`` relative to the stored baseline.
+"""
+import argparse
+import json
+import random
+import sys
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlencode, urlsplit
+from urllib.request import urlopen
+
+from benchmarks.loadgen import Client, Request, Result, run_load
+from benchmarks.seed import PASSWORD
+
+BASELINE_PATH = Path(__file__).with_name("baselines.json")
+
+
+def _login(client: Client, rng: random.Random) -> Request:
+    body = urlencode({"username": client.username, "password": PASSWORD}).encode()
+    return "POST", "/auth/login", body, {"Content-Type": "application/x-www-form-urlencoded"}
+
+
+def _dashboard(client: Client, rng: random.Random) -> Request:
+    path = rng.choice(("/users/me", "/goals/", "/teams/", "/events/calendar/day"))
+    return "GET", path, None, {}
+
+
+def _dashboard_aggregate(client: Client, rng: random.Random) -> Request:
+    return "GET", "/dashboard/", None, {}
+
+
+def _progress(client: Client, rng: random.Random) -> Request:
+    goal_id = rng.choice(client.goal_ids)
+    body = json.dumps({"goal_id": goal_id, "value": 1.0}).encode()
+    return "POST", f"/goals/{goal_id}/progress", body, {"Content-Type": "application/json"}
+
+
+def _calendar(client: Client, rng: random.Random) -> Request:
+    if rng.random() < 0.5:
+        return "GET", "/events/calendar/week", None, {}
+    month = rng.randint(1, 12)
+    return "GET", f"/events/calendar/month?year={date.today().year}&month={month}", None, {}
+
+
+def _team(client: Client, rng: random.Random) -> Request:
+    team_id = rng.choice(client.team_ids)
+    path = rng.choice((f"/teams/{team_id}", f"/teams/{team_id}/events"))
+    return "GET", path, None, {}
+
+
+SCENARIOS: Dict[str, Callable[[Client, random.Random], Request]] = {
+    "login": _login,
+    "dashboard": _dashboard,
+    "dashboard_aggregate": _dashboard_aggregate,
+    "progress": _progress,
+    "calendar": _calendar,
+    "team": _team,
+}
+
+
+def _metrics_url(base_url: str) -> str:
+    parts = urlsplit(base_url)
+    return f"{parts.scheme}://{parts.netloc}/metrics"
+
+
+def scrape_query_count(metrics_url: str) -> Optional[float]:
+    try:
+        with urlopen(metrics_url, timeout=10) as response:
+            text = response.read().decode()
+    except OSError:
+        return None
+    return sum(
+        float(line.rsplit(" ", 1)[1])
+        for line in text.splitlines()
+        if line.startswith("db_queries_total{")
+    )
+
+
+def prepare_clients(base_url: str, concurrency: int, users: int, seed: int) -> List[Client]:
+    rng = random.Random(seed)
+    clients = []
+    for user_id in rng.sample(range(1, users + 1), min(concurrency, users)):
+        client = Client(base_url)
+        client.username = f"user{user_id}@bench.local"
+        client.login(client.username, PASSWORD)
+        client.goal_ids = [g["id"] for g in client.json("GET", "/goals/?limit=100")] or [0]
+        client.team_ids = [t["id"] for t in client.json("GET", "/teams/")] or [0]
+        clients.append(client)
+    return clients
+
+
+def summarize(result: Result, queries: Optional[float]) -> Dict[str, Optional[float]]:
+    completed = len(result.latencies)
+    return {
+        "requests": result.requests,
+        "errors": result.errors,
+        "throughput": round(result.throughput, 2),
+        "p50_ms": round(result.percentile(50) * 1000, 2),
+        "p95_ms": round(result.percentile(95) * 1000, 2),
+        "p99_ms": round(result.percentile(99) * 1000, 2),
+        "queries_per_request": round(queries / completed, 2) if queries is not None and completed else None,
+    }
+
+
+def regressions(name: str, current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    found = []
+    if current["throughput"] < baseline["throughput"] * (1 - threshold):
+        found.append(f"{name}: throughput {current['throughput']} < baseline {baseline['throughput']}")
+    for key in ("p50_ms", "p95_ms", "p99_ms"):
+        if current[key] > baseline[key] * (1 + threshold):
+            found.append(f"{name}: {key} {current[key]} > baseline {baseline[key]}")
+    if (
+        current["queries_per_request"] is not None
+        and baseline.get("queries_per_request") is not None
+        and current["queries_per_request"] > baseline["queries_per_request"] + 0.5
+    ):
+        found.append(
+            f"{name}: queries/request {current['queries_per_request']} "
+            f"> baseline {baseline['queries_per_request']}"
+        )
+    return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000/api/v1")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per scenario")
+    parser.add_argument("--users", type=int, default=1000, help="Seeded users to log in as")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative regression")
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    args = parser.parse_args()
+
+    metrics_url = _metrics_url(args.base_url)
+    clients = prepare_clients(args.base_url, args.concurrency, args.users, args.seed)
+    results = {}
+    try:
+        for name in args.scenario or list(SCENARIOS):
+            before = scrape_query_count(metrics_url)
+            result = run_load(clients, SCENARIOS[name], args.duration, args.seed)
+            after = scrape_query_count(metrics_url)
+            queries = after - before if before is not None and after is not None else None
+            results[name] = summarize(result, queries)
+            summary = results[name]
+            print(
+                f"{name:<10} {summary['throughput']:>9.1f} req/s  "
+                f"p50 {summary['p50_ms']:>7.1f}ms  p95 {summary['p95_ms']:>7.1f}ms  "
+                f"p99 {summary['p99_ms']:>7.1f}ms  queries/req {summary['queries_per_request']}  "
+                f"errors {summary['errors']}"
+            )
+    finally:
+        for client in clients:
+            client.close()
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+    baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    if args.save_baseline:
+        baselines.update(results)
+        args.baseline.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"Saved baselines to {args.baseline}")
+        return
+
+    failures = []
+    for name, summary in results.items():
+        if name in baselines:
+            failures.extend(regressions(name, summary, baselines[name], args.threshold))
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Seed Postgres with a deterministic data set for benchmarks.
+
+Rows are generated lazily and streamed into ``COPY ... FROM STDIN``, so
+millions of goal_progress rows never sit in memory at once.
+
+    python -m benchmarks.seed --scale medium --reset
+    python -m benchmarks.seed --users 50000 --progress-rows 5000000 --reset
+
+Every seeded user can log in as ``user<N>@bench.local`` with the password
+``benchmark``; user 1 is a superuser.
+"""
+import argparse
+import io
+import random
+from array import array
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+from typing import Dict, Iterable, Iterator, List, Sequence
+
+from app.core.security import get_password_hash
+from app.db.base import engine
+from app.services.partitions import ensure_partitions
+
+PASSWORD = "benchmark"
+
+
+@dataclass
+class Scale:
+    users: int
+    teams: int
+    members_per_team: int
+    goals_per_user: int
+    progress_rows: int
+    events: int
+    attendees_per_event: int
+    large_events: int
+    large_event_attendees: int
+
+
+SCALES: Dict[str, Scale] = {
+    "small": Scale(
+        users=1_000, teams=50, members_per_team=20, goals_per_user=5,
+        progress_rows=100_000, events=5_000, attendees_per_event=5,
+        large_events=10, large_event_attendees=200,
+    ),
+    "medium": Scale(
+        users=20_000, teams=1_000, members_per_team=25, goals_per_user=8,
+        progress_rows=2_000_000, events=100_000, attendees_per_event=6,
+        large_events=100, large_event_attendees=2_000,
+    ),
+    "large": Scale(
+        users=100_000, teams=5_000, members_per_team=30, goals_per_user=10,
+        progress_rows=20_000_000, events=1_000_000, attendees_per_event=8,
+        large_events=500, large_event_attendees=10_000,
+    ),
+}
+
+
+class _CopyStream(io.RawIOBase):
+    """
+    File-like object that renders rows into COPY text format on demand.
+    """
+
+    def __init__(self, rows: Iterable[Sequence]) -> None:
+        self._rows = iter(rows)
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        chunks = [self._buffer]
+        length = len(self._buffer)
+        for row in self._rows:
+            line = "\t".join(_copy_value(v) for v in row) + "\n"
+            encoded = line.encode()
+            chunks.append(encoded)
+            length += len(encoded)
+            if 0 <= size <= length:
+                break
+        data = b"".join(chunks)
+        if size < 0:
+            self._buffer = b""
+            return data
+        self._buffer = data[size:]
+        return data[:size]
+
+
+def _copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value).replace("\\", "\\\\").replace("\t", " ").replace("\n", " ")
+
+
+def _copy(cursor, table: str, columns: Sequence[str], rows: Iterable[Sequence]) -> None:
+    start = perf_counter()
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN", _CopyStream(rows), size=1 << 20
+    )
+    print(f"  {table:<14} {cursor.rowcount:>12,} rows  {perf_counter() - start:6.1f}s")
+
+
+def seed(scale: Scale, reset: bool = False, seed_value: int = 42) -> None:
+    rng = random.Random(seed_value)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    cycle_start = now.replace(day=1, hour=0, minute=0, second=0)
+    hashed_password = get_password_hash(PASSWORD)
+
+    # Team membership drives goal and event team assignment, so build it first
+    memberships: List[List[int]] = [[] for _ in range(scale.users + 1)]
+    team_members: Dict[int, List[int]] = {}
+    members_per_team = min(scale.members_per_team, scale.users)
+    for team_id in range(1, scale.teams + 1):
+        members = rng.sample(range(1, scale.users + 1), members_per_team)
+        team_members[team_id] = members
+        for user_id in members:
+            memberships[user_id].append(team_id)
+
+    total_goals = scale.users * scale.goals_per_user
+
+    def users() -> Iterator[Sequence]:
+        for i in range(1, scale.users + 1):
+            streak = rng.randint(0, 30)
+            yield (
+                i, f"user{i}@bench.local", f"user{i}", f"Bench User {i}",
+                hashed_password, True, i == 1, streak, streak + rng.randint(0, 30),
+            )
+
+    def teams() -> Iterator[Sequence]:
+        for team_id, members in team_members.items():
+            yield (
+                team_id, f"Team {team_id}", "Benchmark team", members[0],
+                f"Cycle {now:%Y-%m}", cycle_start, cycle_start + timedelta(days=84),
+            )
+
+    def user_team() -> Iterator[Sequence]:
+        for team_id, members in team_members.items():
+            for user_id in members:
+                yield user_id, team_id
+
+    def goals() -> Iterator[Sequence]:
+        goal_id = 0
+        for user_id in range(1, scale.users + 1):
+            teams_of_user = memberships[user_id]
+            for _ in range(scale.goals_per_user):
+                goal_id += 1
+                team_id = rng.choice(teams_of_user) if teams_of_user and rng.random() < 0.5 else None
+                target_date = now + timedelta(days=rng.randint(-30, 120))
+                yield (
+                    goal_id, f"Goal {goal_id}", None, user_id, team_id,
+                    float(rng.randint(10, 500)), 0.0, rng.choice(("miles", "pages", "hours")),
+                    now - timedelta(days=rng.randint(0, 365)), target_date, False,
+                    False, None,
+                )
+
+    def goal_progress() -> Iterator[Sequence]:
+        for i in range(1, scale.progress_rows + 1):
+            yield (
+                i, rng.randint(1, total_goals), float(rng.randint(1, 5)), None,
+                now - timedelta(seconds=rng.randint(0, 365 * 86400)),
+            )
+
+    # Attendee sets are regenerated per event from its own seed rather than
+    # kept around, since the large preset has tens of millions of them.
+    event_organizers = array("i", [0]) * (scale.events + 1)
+    event_teams = array("i", [0]) * (scale.events + 1)
+
+    def events() -> Iterator[Sequence]:
+        for event_id in range(1, scale.events + 1):
+            organizer_id = rng.randint(1, scale.users)
+            teams_of_organizer = memberships[organizer_id]
+            team_id = rng.choice(teams_of_organizer) if teams_of_organizer and rng.random() < 0.6 else None
+            start = now + timedelta(minutes=15 * rng.randint(-90 * 96, 90 * 96))
+            event_type = "call" if team_id else "personal"
+            event_organizers[event_id] = organizer_id
+            event_teams[event_id] = team_id or 0
+            yield (
+                event_id, f"Event {event_id}", None, start,
+                start + timedelta(minutes=rng.choice((30, 45, 60, 90, 120))),
+                organizer_id, team_id, event_type, None, None,
+            )
+
+    def user_event() -> Iterator[Sequence]:
+        for event_id in range(1, scale.events + 1):
+            event_rng = random.Random(seed_value * 10_000_019 + event_id)
+            organizer_id = event_organizers[event_id]
+            count = scale.large_event_attendees if event_id <= scale.large_events else scale.attendees_per_event
+            pool = team_members.get(event_teams[event_id])
+            if pool and count <= len(pool):
+                attendees = event_rng.sample(pool, count)
+            else:
+                attendees = event_rng.sample(range(1, scale.users + 1), min(count, scale.users))
+            if organizer_id not in attendees:
+                attendees.append(organizer_id)
+            for user_id in attendees:
+                yield user_id, event_id
+
+    # goal_progress spans the past year; give every month its partition
+    # instead of filling the default one
+    with engine.begin() as conn:
+        ensure_partitions(conn, now - timedelta(days=366), now)
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        if reset:
+            cursor.execute(
+                "TRUNCATE user_event, user_team, goal_progress, goals, events, teams, users "
+                "RESTART IDENTITY CASCADE"
+            )
+        print(f"Seeding {asdict(scale)}")
+        _copy(cursor, "users", (
+            "id", "email", "username", "full_name", "hashed_password", "is_active",
+            "is_superuser", "current_streak", "longest_streak",
+        ), users())
+        _copy(cursor, "teams", (
+            "id", "name", "description", "created_by_id", "cycle_name",
+            "cycle_start_date", "cycle_end_date",
+        ), teams())
+        _copy(cursor, "user_team", ("user_id", "team_id"), user_team())
+        _copy(cursor, "goals", (
+            "id", "title", "description", "user_id", "team_id", "target_value",
+            "current_value", "unit", "created_at", "target_date", "is_completed",
+            "is_recurring", "frequency",
+        ), goals())
+        _copy(cursor, "goal_progress", ("id", "goal_id", "value", "notes", "logged_at"), goal_progress())
+        _copy(cursor, "events", (
+            "id", "title", "description", "start_time", "end_time", "organizer_id",
+            "team_id", "event_type", "location", "meeting_link",
+        ), events())
+        _copy(cursor, "user_event", ("user_id", "event_id"), user_event())
+
+        # Keep goal totals consistent with the generated progress rows
+        cursor.execute(
+            "UPDATE goals SET current_value = p.total, "
+            "is_completed = p.total >= goals.target_value "
+            "FROM (SELECT goal_id, sum(value) AS total FROM goal_progress GROUP BY goal_id) p "
+            "WHERE goals.id = p.goal_id"
+        )
+        for table in ("users", "teams", "goals", "goal_progress", "events"):
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"(SELECT COALESCE(max(id), 1) FROM {table}))"
+            )
+        raw.commit()
+        cursor.execute("ANALYZE")
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--reset", action="store_true", help="Truncate all tables first")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    for field in fields(Scale):
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=int, help="Override the preset")
+    args = parser.parse_args()
+
+    scale = SCALES[args.scale]
+    overrides = {
+        field.name: getattr(args, field.name)
+        for field in fields(Scale)
+        if getattr(args, field.name) is not None
+    }
+    scale = Scale(**{**asdict(scale), **overrides})
+
+    start = perf_counter()
+    seed(scale, reset=args.reset, seed_value=args.seed)
+    print(f"Done in {perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
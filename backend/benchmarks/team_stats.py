@@ -0,0 +1,138 @@
+"""
+Measure team statistics at large-team scale.
+
+Creates a team of ``--members`` seeded users (seed at least that many with
+``python -m benchmarks.seed``), gives each member team goals with progress
+this week, adds team events with attendees, then times:
+
+* compute: the aggregate queries run in-process, uncached
+* endpoint: ``GET /teams/{id}/stats`` against a running API, cached after
+  the first request
+
+    python -m benchmarks.team_stats --members 10000 --repeat 20 --cleanup
+"""
+import argparse
+import json
+from statistics import median
+from time import perf_counter
+from typing import Callable, Dict, List
+
+from sqlalchemy import text
+
+from app.db.base import SessionLocal, engine
+from app.services import team_stats
+from benchmarks.loadgen import Client
+from benchmarks.seed import PASSWORD
+
+TEAM_NAME = "Stats bench"
+
+SETUP = (
+    text(
+        "INSERT INTO teams (name, created_by_id) VALUES (:name, 1) RETURNING id"
+    ),
+    text(
+        "INSERT INTO user_team (user_id, team_id) "
+        "SELECT id, :team_id FROM users ORDER BY id LIMIT :members"
+    ),
+    text(
+        """
+        INSERT INTO goals (title, user_id, team_id, target_value, current_value, unit,
+                           target_date, is_completed, created_at)
+        SELECT 'Stats bench goal', ut.user_id, :team_id, 100, (ut.user_id * g) % 120, 'points',
+               now() + ((ut.user_id + g) % 60 - 20) * interval '1 day',
+               (ut.user_id * g) % 120 >= 100, now() - interval '30 days'
+        FROM user_team ut, generate_series(1, :goals) AS g
+        WHERE ut.team_id = :team_id
+        """
+    ),
+    text(
+        """
+        INSERT INTO goal_progress (goal_id, value, logged_at)
+        SELECT id, 1, now() - (id % 10) * interval '1 day'
+        FROM goals WHERE team_id = :team_id
+        """
+    ),
+    text(
+        """
+        WITH new AS (
+            INSERT INTO events (title, start_time, end_time, organizer_id, event_type, team_id)
+            SELECT 'Stats bench event', now() - g * interval '1 day',
+                   now() - g * interval '1 day' + interval '1 hour', 1, 'team', :team_id
+            FROM generate_series(1, :events) AS g
+            RETURNING id
+        )
+        INSERT INTO user_event (user_id, event_id)
+        SELECT ut.user_id, new.id FROM new JOIN user_team ut
+          ON ut.team_id = :team_id AND (ut.user_id + new.id) % 3 = 0
+        """
+    ),
+)
+CLEANUP = (
+    text("DELETE FROM user_event WHERE event_id IN (SELECT id FROM events WHERE team_id = :team_id)"),
+    text("DELETE FROM events WHERE team_id = :team_id"),
+    text("DELETE FROM goal_progress WHERE goal_id IN (SELECT id FROM goals WHERE team_id = :team_id)"),
+    text("DELETE FROM goals WHERE team_id = :team_id"),
+    text("DELETE FROM team_leaderboard WHERE team_id = :team_id"),
+    text("DELETE FROM user_team WHERE team_id = :team_id"),
+    text("DELETE FROM teams WHERE id = :team_id"),
+)
+
+
+def _timed(func: Callable[[], None], repeat: int) -> Dict[str, float]:
+    samples: List[float] = []
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        samples.append(perf_counter() - start)
+    return {"median_ms": round(median(samples) * 1000, 2), "max_ms": round(max(samples) * 1000, 2)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000/api/v1")
+    parser.add_argument("--members", type=int, default=10_000)
+    parser.add_argument("--goals", type=int, default=3, help="Team goals per member")
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--cleanup", action="store_true", help="Delete the team and its data afterwards")
+    args = parser.parse_args()
+
+    params = {"name": TEAM_NAME, "members": args.members, "goals": args.goals, "events": args.events}
+    with engine.begin() as conn:
+        params["team_id"] = conn.execute(SETUP[0], params).scalar()
+        for statement in SETUP[1:]:
+            conn.execute(statement, params)
+        conn.execute(text("ANALYZE goals, goal_progress, user_team, events, user_event"))
+    team_id = params["team_id"]
+
+    client = Client(args.base_url)
+    try:
+        with SessionLocal() as db:
+            stats = team_stats.compute(db, team_id)
+            results = {"compute": _timed(lambda: team_stats.compute(db, team_id), args.repeat)}
+
+        client.login("user1@bench.local", PASSWORD)
+        path = f"/teams/{team_id}/stats"
+
+        def fetch() -> None:
+            status, _ = client.request("GET", path)
+            if status != 200:
+                raise RuntimeError(f"GET {path} -> {status}")
+
+        results["endpoint_first"] = _timed(fetch, 1)
+        results["endpoint_cached"] = _timed(fetch, args.repeat)
+    finally:
+        client.close()
+        if args.cleanup:
+            with engine.begin() as conn:
+                for statement in CLEANUP:
+                    conn.execute(statement, {"team_id": team_id})
+
+    print(f"team {team_id}: {stats['member_count']:,} members, {stats['goal_count']:,} goals")
+    for name, result in results.items():
+        print(f"{name:<16} median {result['median_ms']:>8.1f}ms  max {result['max_ms']:>8.1f}ms")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
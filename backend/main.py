@@ -3,13 +3,23 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
 from app.api.api import api_router
+from app.core.compression import CompressionMiddleware
 from app.core.config import settings
+from app.core.metrics import MetricsMiddleware, mark_process_dead, metrics_response
+from app.core.ratelimit import RateLimitMiddleware
+from app.db.base import replicas
+from app.db.session import ReadYourWritesMiddleware
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json"
 )
 
+app.add_middleware(ReadYourWritesMiddleware)
+
+# Inside CORS, so refused requests still get CORS headers and are counted
+app.add_middleware(RateLimitMiddleware)
+
 # Set up CORS
 app.add_middleware(
     CORSMiddleware,
@@ -19,12 +29,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Inside metrics, so request latency includes compressing the response
+app.add_middleware(CompressionMiddleware)
+
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 @app.get("/health")
 def health_check():
     return JSONResponse(content={"status": "healthy"})
 
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return metrics_response()
+
+
+@app.on_event("startup")
+def startup():
+    replicas.start()
+
+
+@app.on_event("shutdown")
+def shutdown():
+    replicas.stop()
+    mark_process_dead()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta, timezone
+
+from app.services.availability import free_slots, merge_intervals
+
+DAY = datetime(2026, 3, 2, tzinfo=timezone.utc)
+
+
+def at(hour: float) -> datetime:
+    return DAY + timedelta(hours=hour)
+
+
+def test_merges_overlapping_and_touching_intervals():
+    busy = [(at(13), at(14)), (at(9), at(10)), (at(9.5), at(11)), (at(11), at(12)), (at(10), at(10.5))]
+
+    assert merge_intervals(busy, at(0), at(24)) == [(at(9), at(12)), (at(13), at(14))]
+
+
+def test_clips_to_the_window_and_drops_what_is_outside():
+    busy = [(at(7), at(9)), (at(17), at(19)), (at(20), at(21)), (at(5), at(6))]
+
+    assert merge_intervals(busy, at(8), at(18)) == [(at(8), at(9)), (at(17), at(18))]
+
+
+def test_free_slots_are_aligned_gaps_that_fit():
+    busy = [(at(9), at(9.75)), (at(10), at(12)), (at(12.5), at(16))]
+
+    slots = free_slots(busy, at(8), at(18), timedelta(minutes=30), 5, timedelta(minutes=30))
+
+    # The gap from 9:45 to 10:00 is too short once aligned
+    assert slots == [(at(8), at(9)), (at(12), at(12.5)), (at(16), at(18))]
+    assert free_slots(busy, at(8), at(18), timedelta(minutes=30), 1, timedelta(minutes=30)) == [(at(8), at(9))]
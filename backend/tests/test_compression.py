@@ -0,0 +1,25 @@
+from app.core.compression import negotiate
+
+PREFERENCE = ["zstd", "br", "gzip"]
+
+
+def test_prefers_the_servers_order_on_equal_q():
+    assert negotiate("gzip, br", PREFERENCE) == "br"
+    assert negotiate("gzip", PREFERENCE) == "gzip"
+
+
+def test_q_values_outrank_the_servers_order():
+    assert negotiate("br;q=0.5, gzip;q=0.9", PREFERENCE) == "gzip"
+    assert negotiate("BR; q=1, gzip;q=0.2", PREFERENCE) == "br"
+
+
+def test_refused_and_unknown_encodings_fall_back_to_identity():
+    assert negotiate("gzip;q=0", PREFERENCE) is None
+    assert negotiate("identity", PREFERENCE) is None
+    assert negotiate("", PREFERENCE) is None
+    assert negotiate("gzip;q=oops", PREFERENCE) is None
+
+
+def test_wildcard_covers_what_is_not_listed():
+    assert negotiate("*", PREFERENCE) == "zstd"
+    assert negotiate("zstd;q=0, *;q=0.5", PREFERENCE) == "br"
@@ -0,0 +1,141 @@
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from conftest import auth
+from app.api.endpoints import dashboard as endpoint
+from app.core import deadlines
+from app.core.config import settings
+from app.models.event import Event, user_event
+from app.models.team import Team
+from app.models.user import User, user_team
+from app.services import dashboard
+
+API = settings.API_V1_STR
+TODAY = datetime(2026, 3, 2, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def section(monkeypatch):
+    calls = []
+
+    def fake(db, user_id, today):
+        calls.append((user_id, today))
+        return len(calls)
+
+    monkeypatch.setitem(endpoint.SECTIONS, "fake", fake)
+    monkeypatch.setitem(endpoint._caches, "fake", endpoint.LRUCache("dashboard_fake", 100, ttl=300))
+    return calls
+
+
+def test_section_is_cached_until_the_version_changes(section):
+    expires_at = time.monotonic() + 5
+
+    assert endpoint._load_section("fake", 1, 0, TODAY, expires_at, None) == 1
+    assert endpoint._load_section("fake", 1, 0, TODAY, expires_at, None) == 1
+    assert endpoint._load_section("fake", 1, 1, TODAY, expires_at, None) == 2
+    assert endpoint._load_section("fake", 2, 1, TODAY, expires_at, None) == 3
+    assert len(section) == 3
+
+
+def test_section_runs_under_the_time_left_to_wait_for_it(monkeypatch):
+    seen = []
+    monkeypatch.setitem(endpoint.SECTIONS, "fake", lambda db, user_id, today: seen.append(deadlines.remaining(-1)))
+    monkeypatch.setitem(endpoint._caches, "fake", endpoint.LRUCache("dashboard_fake", 100))
+
+    endpoint._load_section("fake", 1, 0, TODAY, time.monotonic() + 0.5, None)
+
+    assert 0 < seen[0] <= 0.5
+
+
+def _version(db, user) -> int:
+    db.expire(user)
+    return user.dashboard_version
+
+
+def test_creating_a_goal_invalidates_the_owner(db, client, make_user):
+    user = make_user("owner")
+    before = _version(db, user)
+
+    response = client.post(
+        f"{API}/goals/", json={"title": "Run", "target_value": 10, "unit": "km"}, headers=auth(user)
+    )
+
+    assert response.status_code == 200
+    assert _version(db, user) == before + 1
+
+
+def test_logging_progress_invalidates_the_owner(db, client, make_user):
+    user = make_user("owner")
+    goal = client.post(
+        f"{API}/goals/", json={"title": "Run", "target_value": 10, "unit": "km"}, headers=auth(user)
+    ).json()
+    before = _version(db, user)
+
+    response = client.post(f"{API}/goals/{goal['id']}/progress", json={"value": 2}, headers=auth(user))
+
+    assert response.status_code == 200
+    assert _version(db, user) == before + 1
+
+
+def test_renaming_a_team_invalidates_every_member(db, client, make_user):
+    creator, member, outsider = make_user("creator"), make_user("member"), make_user("outsider")
+    team = Team(name="Runners", created_by_id=creator.id)
+    db.add(team)
+    db.flush()
+    db.execute(user_team.insert(), [{"user_id": creator.id, "team_id": team.id}, {"user_id": member.id, "team_id": team.id}])
+    before = {u.id: _version(db, u) for u in (creator, member, outsider)}
+
+    response = client.put(f"{API}/teams/{team.id}", json={"name": "Walkers"}, headers=auth(creator))
+
+    assert response.status_code == 200
+    assert _version(db, creator) == before[creator.id] + 1
+    assert _version(db, member) == before[member.id] + 1
+    assert _version(db, outsider) == before[outsider.id]
+
+
+def test_moving_an_event_invalidates_its_attendees(db, client, make_user):
+    organizer, attendee = make_user("organizer"), make_user("attendee")
+    event = Event(
+        title="Sync",
+        start_time=datetime(2026, 3, 2, 10, tzinfo=timezone.utc),
+        end_time=datetime(2026, 3, 2, 11, tzinfo=timezone.utc),
+        event_type="call",
+        organizer_id=organizer.id,
+    )
+    db.add(event)
+    db.flush()
+    db.execute(user_event.insert(), [{"user_id": organizer.id, "event_id": event.id}, {"user_id": attendee.id, "event_id": event.id}])
+    before = _version(db, attendee)
+
+    response = client.put(
+        f"{API}/events/{event.id}", json={"start_time": "2026-03-02T09:00:00Z"}, headers=auth(organizer)
+    )
+
+    assert response.status_code == 200
+    assert _version(db, attendee) == before + 1
+
+
+def test_invalidation_waits_for_the_commit(db, make_user):
+    user = make_user("owner")
+    db.commit()
+    before = _version(db, user)
+
+    dashboard.invalidate(db, [user.id])
+    assert _version(db, user) == before
+    db.commit()
+
+    assert _version(db, user) == before + 1
+
+
+def test_rolled_back_invalidation_bumps_nothing(db, make_user):
+    user = make_user("owner")
+    db.commit()
+    before = _version(db, user)
+
+    dashboard.invalidate(db, [user.id])
+    db.rollback()
+    db.commit()
+
+    assert _version(db, user) == before
@@ -0,0 +1,76 @@
+from datetime import datetime, timezone
+
+import pytest
+from pydantic import ValidationError
+
+from conftest import auth
+from app.core.config import settings
+from app.models.event import Event
+from app.schemas.event import EventCreate
+
+API = settings.API_V1_STR
+
+
+def _event(db, organizer, start, end) -> Event:
+    event = Event(title="Sync", start_time=start, end_time=end, event_type="call", organizer_id=organizer.id)
+    db.add(event)
+    db.flush()
+    return event
+
+
+def test_create_compares_naive_times_as_utc():
+    event = EventCreate(title="Sync", start_time="2026-01-01T10:00:00", end_time="2026-01-01T11:00:00Z")
+
+    assert event.end_time > event.start_time.replace(tzinfo=timezone.utc)
+    with pytest.raises(ValidationError):
+        EventCreate(title="Sync", start_time="2026-01-01T10:00:00", end_time="2026-01-01T09:00:00Z")
+
+
+def test_update_with_only_end_time_before_stored_start_is_rejected(db, client, make_user):
+    user = make_user("organizer")
+    event = _event(db, user, datetime(2026, 3, 2, 10, tzinfo=timezone.utc), datetime(2026, 3, 2, 11, tzinfo=timezone.utc))
+
+    response = client.put(
+        f"{API}/events/{event.id}", json={"end_time": "2026-03-02T09:00:00Z"}, headers=auth(user)
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "end_time must not be before start_time"
+    db.expire_all()
+    assert db.get(Event, event.id).end_time == datetime(2026, 3, 2, 11, tzinfo=timezone.utc)
+
+
+def test_update_with_only_start_time_after_stored_end_is_rejected(db, client, make_user):
+    user = make_user("organizer")
+    event = _event(db, user, datetime(2026, 3, 2, 10, tzinfo=timezone.utc), datetime(2026, 3, 2, 11, tzinfo=timezone.utc))
+
+    response = client.put(
+        f"{API}/events/{event.id}", json={"start_time": "2026-03-02T12:00:00Z"}, headers=auth(user)
+    )
+
+    assert response.status_code == 400
+
+
+def test_update_moving_both_times_is_checked_together(db, client, make_user):
+    user = make_user("organizer")
+    event = _event(db, user, datetime(2026, 3, 2, 10, tzinfo=timezone.utc), datetime(2026, 3, 2, 11, tzinfo=timezone.utc))
+
+    response = client.put(
+        f"{API}/events/{event.id}",
+        json={"start_time": "2026-03-03T12:00:00Z", "end_time": "2026-03-03T13:00:00Z"},
+        headers=auth(user),
+    )
+
+    assert response.status_code == 200
+    assert response.json()["end_time"].startswith("2026-03-03T13:00:00")
+
+
+def test_update_by_someone_else_is_forbidden_before_validation(db, client, make_user):
+    organizer, other = make_user("organizer"), make_user("other")
+    event = _event(db, organizer, datetime(2026, 3, 2, 10, tzinfo=timezone.utc), datetime(2026, 3, 2, 11, tzinfo=timezone.utc))
+
+    response = client.put(
+        f"{API}/events/{event.id}", json={"end_time": "2026-03-02T09:00:00Z"}, headers=auth(other)
+    )
+
+    assert response.status_code == 403
@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from conftest import auth
+from app.core.config import settings
+from app.core.deps import decode_token
+from app.core.security import FEED_SCOPE, create_access_token, create_feed_token
+
+API = settings.API_V1_STR
+
+
+def test_feed_token_is_only_accepted_for_feeds():
+    token = create_feed_token(7, 3)
+
+    payload = decode_token(token, FEED_SCOPE)
+
+    assert (payload.sub, payload.ver) == (7, 3)
+    with pytest.raises(HTTPException):
+        decode_token(token)
+
+
+def test_access_token_is_not_accepted_for_feeds():
+    with pytest.raises(HTTPException):
+        decode_token(create_access_token(7), FEED_SCOPE)
+
+
+def test_expired_token_is_rejected():
+    with pytest.raises(HTTPException):
+        decode_token(create_access_token(7, expires_delta=timedelta(seconds=-1)))
+
+
+def test_rotating_revokes_earlier_feed_tokens(db, client, make_user):
+    user = make_user("subscriber")
+    old = client.get(f"{API}/feeds/token", headers=auth(user)).json()["feed_token"]
+    assert client.get(f"{API}/feeds/user.ics", params={"token": old}).status_code == 200
+
+    response = client.post(f"{API}/feeds/token/rotate", headers=auth(user))
+
+    assert response.status_code == 200
+    new = response.json()["feed_token"]
+    assert client.get(f"{API}/feeds/user.ics", params={"token": old}).status_code == 403
+    assert client.get(f"{API}/feeds/user.ics", params={"token": new}).status_code == 200
@@ -0,0 +1,25 @@
+from datetime import datetime, timedelta, timezone
+
+from conftest import auth
+from app.core.config import settings
+from app.models.goal import Goal, GoalProgress
+
+API = settings.API_V1_STR
+
+
+def test_included_progress_logs_keep_to_the_recent_window(db, client, make_user):
+    user = make_user("runner")
+    goal = Goal(title="Run", target_value=100, unit="km", user_id=user.id)
+    db.add(goal)
+    db.flush()
+    now = datetime.now(timezone.utc)
+    old = now - timedelta(days=settings.GOAL_PROGRESS_DEFAULT_DAYS + 1)
+    db.add_all([GoalProgress(goal_id=goal.id, value=1, logged_at=old), GoalProgress(goal_id=goal.id, value=2, logged_at=now)])
+    db.flush()
+
+    response = client.get(
+        f"{API}/goals/{goal.id}", params={"fields": "title", "include": "progress_logs"}, headers=auth(user)
+    )
+
+    assert response.status_code == 200
+    assert [log["value"] for log in response.json()["progress_logs"]] == [2.0]
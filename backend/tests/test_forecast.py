@@ -0,0 +1,37 @@
+import numpy as np
+
+from app.services.forecast import AT_RISK, NO_DATA, ON_TRACK, fit_rates, project
+
+
+def test_fits_the_slope_of_cumulative_progress():
+    # Goal 0: 2 per day for four days; goal 1: one log; goal 2: nothing
+    group = np.array([0, 0, 0, 0, 1])
+    days = np.array([-4.0, -3.0, -2.0, -1.0, -5.0])
+    values = np.array([2.0, 2.0, 2.0, 2.0, 10.0])
+
+    rate, samples = fit_rates(group, days, values, 3)
+
+    assert np.allclose(rate[:2], [2.0, 2.0])
+    assert np.isnan(rate[2])
+    assert samples.tolist() == [4, 1, 0]
+
+
+def test_logs_at_one_moment_fall_back_to_the_average():
+    rate, _ = fit_rates(np.array([0, 0]), np.array([-2.0, -2.0]), np.array([3.0, 1.0]), 1)
+
+    assert np.allclose(rate, [2.0])
+
+
+def test_projection_compares_the_finish_with_the_target_date():
+    rate = np.array([2.0, 1.0, 0.0, 1.0, np.nan])
+    samples = np.array([3, 3, 3, 3, 0])
+    current = np.array([0.0, 0.0, 0.0, 10.0, 0.0])
+    target = np.array([10.0, 10.0, 10.0, 10.0, 10.0])
+    target_days = np.array([7.0, 7.0, np.nan, 1.0, 7.0])
+
+    forecast = project(rate, samples, current, target, target_days)
+
+    assert forecast.days_left[:2].tolist() == [5.0, 10.0]
+    assert np.isnan(forecast.days_left[2])
+    assert forecast.days_left[3] == 0.0
+    assert forecast.status.tolist() == [ON_TRACK, AT_RISK, AT_RISK, ON_TRACK, NO_DATA]
@@ -0,0 +1,45 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.services.idempotency import MAX_KEY_LENGTH, REPLAYED_HEADER, StoredResponse, _replay, idempotency_key
+
+
+def _request(method: str, path: str, body: bytes) -> Request:
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return Request({"type": "http", "method": method, "path": path, "headers": [], "query_string": b""}, receive)
+
+
+def _hash(method: str = "POST", path: str = "/api/v1/events/", body: bytes = b'{"title": "Sync"}') -> bytes:
+    return asyncio.run(idempotency_key(_request(method, path, body), "key-1")).request_hash
+
+
+def test_hash_covers_method_path_and_body():
+    assert _hash() == _hash()
+    assert _hash() != _hash(method="PUT")
+    assert _hash() != _hash(path="/api/v1/goals/")
+    assert _hash() != _hash(body=b'{"title": "Retro"}')
+
+
+def test_key_length_is_checked():
+    assert asyncio.run(idempotency_key(_request("POST", "/", b""), None)) is None
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(idempotency_key(_request("POST", "/", b""), "k" * (MAX_KEY_LENGTH + 1)))
+    assert error.value.status_code == 400
+
+
+def test_replay_refuses_a_different_request_with_the_same_key():
+    request = asyncio.run(idempotency_key(_request("POST", "/", b"{}"), "key-1"))
+    stored = StoredResponse(request.request_hash, 201, {"id": 1}, datetime.now(timezone.utc))
+
+    response = _replay(request, stored)
+
+    assert (response.status_code, response.headers[REPLAYED_HEADER]) == (201, "true")
+    with pytest.raises(HTTPException) as error:
+        _replay(request._replace(request_hash=b"other"), stored)
+    assert error.value.status_code == 422
@@ -0,0 +1,116 @@
+import time
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import func, update
+
+import worker
+from app.models.deletion import DeletionJob
+from app.models.job import Job
+from app.services import deletion, jobs
+
+
+@pytest.fixture
+def sleeper(monkeypatch):
+    def sleep(seconds: float, fail: bool = False) -> None:
+        time.sleep(seconds)
+        if fail:
+            raise ValueError("broken")
+
+    monkeypatch.setitem(jobs.TASKS, "test.sleep", jobs.Task("test.sleep", sleep, 0, 3, 60, None))
+
+
+def test_process_runner_reports_success_and_failure(sleeper):
+    runner = worker.ProcessRunner()
+
+    ok = runner.submit("test.sleep", {"seconds": 0})
+    failed = runner.submit("test.sleep", {"seconds": 0, "fail": True})
+
+    assert ok.result(timeout=30) is None
+    assert "ValueError: broken" in str(failed.exception(timeout=30))
+
+
+def test_process_runner_kills_an_overrunning_job(sleeper):
+    runner = worker.ProcessRunner()
+    future = runner.submit("test.sleep", {"seconds": 60})
+
+    assert runner.kill(future, "Killed after its timeout")
+
+    assert str(future.exception(timeout=30)) == "Killed after its timeout"
+    assert not runner.processes
+
+
+def test_worker_kills_jobs_past_their_timeout(sleeper):
+    runner = worker.ProcessRunner()
+    future = runner.submit("test.sleep", {"seconds": 60})
+    job = jobs.ClaimedJob(1, "test.sleep", {}, 1, 3, None, 0.1)
+    w = worker.Worker.__new__(worker.Worker)
+    w.runner = runner
+    w.running = {future: (job, time.perf_counter() - 1)}
+    w.overrunning = set()
+
+    w._enforce_timeouts()
+
+    assert "timeout" in str(future.exception(timeout=30))
+
+
+def _claim(db, name: str = "test.sleep") -> jobs.ClaimedJob:
+    jobs.enqueue(db, name, {"seconds": 0})
+    db.commit()
+    (claimed,) = jobs.claim(db, "worker-a", 1)
+    return claimed
+
+
+def _expire_lease(db, job_id: int) -> None:
+    db.execute(update(Job).where(Job.id == job_id).values(timeout_at=func.now() - timedelta(seconds=1)))
+    db.commit()
+
+
+def test_running_job_is_not_reaped_while_its_lease_is_renewed(db, sleeper):
+    job = _claim(db)
+    _expire_lease(db, job.id)
+
+    jobs.heartbeat(db, "worker-a", [job.id])
+
+    assert jobs.reap_lost(db) == 0
+    assert db.get(Job, job.id).status == jobs.RUNNING
+
+
+def test_heartbeat_from_another_worker_does_not_renew(db, sleeper):
+    job = _claim(db)
+    _expire_lease(db, job.id)
+
+    jobs.heartbeat(db, "worker-b", [job.id])
+
+    assert jobs.reap_lost(db) == 1
+    row = db.get(Job, job.id)
+    db.refresh(row)
+    assert row.status == jobs.QUEUED
+    assert row.locked_by is None
+
+
+def test_reaped_job_cannot_be_completed_by_its_old_worker(db, sleeper):
+    job = _claim(db)
+    _expire_lease(db, job.id)
+    jobs.reap_lost(db)
+
+    jobs.complete(db, job, "worker-a")
+
+    row = db.get(Job, job.id)
+    db.refresh(row)
+    assert row.status == jobs.QUEUED
+
+
+def test_resume_skips_deletions_with_an_attempt_in_the_queue(db, make_user):
+    user = make_user("deleter")
+    job = DeletionJob(kind=deletion.GOAL, target_id=1, requested_by_id=user.id, status=deletion.FAILED, processed=0)
+    db.add(job)
+    db.flush()
+    jobs.enqueue(db, "deletion", {"job_id": job.id})
+    db.commit()
+
+    assert deletion.in_queue(db, job.id)
+    assert not deletion.in_queue(db, job.id + 1)
+
+    db.execute(update(Job).where(Job.name == "deletion").values(status=jobs.FAILED))
+    assert not deletion.in_queue(db, job.id)
@@ -0,0 +1,83 @@
+import pytest
+from sqlalchemy import select
+
+from conftest import auth
+from app.core.config import settings
+from app.models.goal import Goal
+from app.models.leaderboard import TeamLeaderboardEntry
+from app.models.team import Team
+from app.models.user import user_team
+from app.services import leaderboard
+
+API = settings.API_V1_STR
+
+
+@pytest.mark.parametrize("cursor", ["", "not base64!", "bnVsbA==", "WzEsIDJd"])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        leaderboard._decode_cursor(cursor)
+
+
+@pytest.fixture
+def team(db, make_user):
+    members = [make_user(f"member{i}") for i in range(5)]
+    team = Team(name="Runners", created_by_id=members[0].id)
+    db.add(team)
+    db.flush()
+    db.execute(user_team.insert(), [{"user_id": m.id, "team_id": team.id} for m in members])
+    # Two pairs tie on every stat, so only user_id orders them
+    for member, target in zip(members, (10, 10, 20, 20, 40)):
+        db.add(Goal(title="Run", target_value=target, current_value=5, unit="km", user_id=member.id, team_id=team.id))
+    db.flush()
+    leaderboard.rebuild(db, team.id)
+    return team, members
+
+
+def _stats(db, team_id: int) -> dict:
+    rows = db.execute(
+        select(TeamLeaderboardEntry.user_id, *(getattr(TeamLeaderboardEntry, c) for c in leaderboard.STAT_COLUMNS))
+        .where(TeamLeaderboardEntry.team_id == team_id)
+    ).all()
+    return {row[0]: tuple(row[1:]) for row in rows}
+
+
+def test_pages_continue_after_the_cursor(db, client, team):
+    team, members = team
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get(f"{API}/teams/{team.id}/leaderboard", params=params, headers=auth(members[0]))
+        assert response.status_code == 200
+        page = response.json()
+        seen.extend((e["rank"], e["user_id"]) for e in page["entries"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    first_rank, rows, _ = leaderboard.page(db, team.id, 10)
+    assert seen == [(rank, entry.user_id) for rank, (entry, _, _) in enumerate(rows, start=first_rank)]
+    assert [rank for rank, _ in seen] == [1, 2, 3, 4, 5]
+
+
+def test_invalid_cursor_is_a_bad_request(client, team):
+    team, members = team
+
+    response = client.get(f"{API}/teams/{team.id}/leaderboard", params={"cursor": "x"}, headers=auth(members[0]))
+
+    assert response.status_code == 400
+
+
+def test_logged_progress_matches_a_rebuild(db, client, team):
+    team, members = team
+    goal = db.scalars(select(Goal).where(Goal.user_id == members[0].id)).one()
+
+    for value in (2, 4):
+        response = client.post(f"{API}/goals/{goal.id}/progress", json={"value": value}, headers=auth(members[0]))
+        assert response.status_code == 200
+    applied = _stats(db, team.id)
+    leaderboard.rebuild(db, team.id)
+    rebuilt = _stats(db, team.id)
+
+    assert applied.keys() == rebuilt.keys()
+    for user_id, stats in rebuilt.items():
+        assert applied[user_id] == pytest.approx(stats)
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select, update
+
+from app.models.goal import Goal
+from app.models.outbox import OutboxMessage
+from app.services import outbox
+
+
+class FlakyChannel:
+    """
+    Delivers everything except the notifications for ``failing`` users, and
+    records what was due while it was sending.
+    """
+    name = "test"
+
+    def __init__(self, db, failing=()):
+        self.db = db
+        self.failing = set(failing)
+        self.due_while_sending = None
+
+    def send(self, notifications):
+        self.due_while_sending = self.db.execute(
+            select(func.count()).select_from(OutboxMessage).where(
+                OutboxMessage.status == outbox.PENDING, OutboxMessage.next_attempt_at <= func.now()
+            )
+        ).scalar()
+        return {n.message_id: "SMTPRecipientsRefused" for n in notifications if n.user_id in self.failing}
+
+
+def _message(db, user_id: int) -> int:
+    outbox.add(db, "goal_due", {"title": "Read"}, user_id=user_id)
+    return db.execute(select(func.max(OutboxMessage.id))).scalar()
+
+
+def test_claimed_messages_are_not_due_while_sending(db, make_user):
+    user = make_user("reader")
+    _message(db, user.id)
+    channel = FlakyChannel(db)
+
+    assert outbox.dispatch_batch(db, channel) == 1
+
+    assert channel.due_while_sending == 0
+
+
+def test_one_failed_message_does_not_resend_the_others(db, make_user):
+    ok, refused = make_user("ok"), make_user("refused")
+    sent_id, failed_id = _message(db, ok.id), _message(db, refused.id)
+
+    outbox.dispatch_batch(db, FlakyChannel(db, failing=[refused.id]))
+
+    sent, failed = db.get(OutboxMessage, sent_id), db.get(OutboxMessage, failed_id)
+    db.refresh(sent)
+    db.refresh(failed)
+    assert (sent.status, sent.attempts) == (outbox.SENT, 1)
+    assert (failed.status, failed.attempts, failed.last_error) == (outbox.PENDING, 1, "SMTPRecipientsRefused")
+    assert failed.sent_at is None
+
+
+def test_purge_keeps_completion_keys_while_the_goal_exists(db, make_user):
+    user = make_user("finisher")
+    goal = Goal(title="Run", target_value=10, unit="km", user_id=user.id)
+    db.add(goal)
+    db.flush()
+    key = f"{outbox.GOAL_COMPLETED}:{goal.id}"
+    outbox.add(db, outbox.GOAL_COMPLETED, {"goal_id": goal.id}, user_id=user.id, dedup_key=key)
+    _message(db, user.id)
+    db.execute(update(OutboxMessage).values(status=outbox.SENT, created_at=func.now() - timedelta(days=30)))
+
+    outbox.purge(db, datetime.now(timezone.utc) - timedelta(days=7))
+
+    assert db.execute(select(OutboxMessage.dedup_key)).scalars().all() == [key]
+    db.delete(goal)
+    db.flush()
+    outbox.purge(db, datetime.now(timezone.utc) - timedelta(days=7))
+    assert db.execute(select(func.count()).select_from(OutboxMessage)).scalar() == 0
@@ -0,0 +1,75 @@
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+
+from conftest import auth
+from app.api.endpoints.goals import _first_whole_day
+from app.core.config import settings
+from app.models.goal import Goal, GoalProgress, GoalProgressDaily
+from app.services import partitions
+
+API = settings.API_V1_STR
+# Long before any partition the test database has
+ARCHIVED_DAY = datetime(2001, 5, 17, 9, tzinfo=timezone.utc)
+
+
+def test_add_months_crosses_years():
+    month = datetime(2026, 11, 1, tzinfo=timezone.utc)
+
+    assert partitions.add_months(month, 2) == datetime(2027, 1, 1, tzinfo=timezone.utc)
+    assert partitions.add_months(month, -11) == datetime(2025, 12, 1, tzinfo=timezone.utc)
+    assert partitions.partition_name(month) == "goal_progress_y2026m11"
+
+
+def test_only_whole_days_after_since_come_from_the_archive():
+    assert _first_whole_day(datetime(2026, 3, 2, tzinfo=timezone.utc)) == date(2026, 3, 2)
+    assert _first_whole_day(datetime(2026, 3, 2, 0, 1, tzinfo=timezone.utc)) == date(2026, 3, 3)
+    # Midnight in UTC, not in the caller's zone
+    assert _first_whole_day(datetime(2026, 3, 2, 1, tzinfo=timezone(timedelta(hours=1)))) == date(2026, 3, 2)
+
+
+def _archived_goal(db, make_user):
+    user = make_user("archivist")
+    goal = Goal(title="Read", target_value=100, unit="pages", user_id=user.id)
+    db.add(goal)
+    db.flush()
+    db.add(GoalProgressDaily(goal_id=goal.id, day=ARCHIVED_DAY.date(), total=10, entries=2))
+    # Logged after the month was archived: lands in the default partition
+    db.add(GoalProgress(goal_id=goal.id, value=5, logged_at=ARCHIVED_DAY))
+    db.flush()
+    return user, goal
+
+
+def test_late_progress_for_an_archived_day_is_counted_once(db, client, make_user):
+    user, goal = _archived_goal(db, make_user)
+
+    response = client.get(f"{API}/goals/{goal.id}/progress/daily", headers=auth(user))
+
+    assert response.status_code == 200
+    assert response.json() == [{"day": "2001-05-17", "total": 15.0, "entries": 3}]
+
+
+def test_maintenance_folds_late_progress_into_the_archive(db, make_user):
+    user, goal = _archived_goal(db, make_user)
+
+    partitions.fold_stray(db.connection(), datetime(2002, 1, 1, tzinfo=timezone.utc))
+
+    daily = db.execute(
+        select(GoalProgressDaily.total, GoalProgressDaily.entries).where(GoalProgressDaily.goal_id == goal.id)
+    ).one()
+    assert tuple(daily) == (15.0, 3)
+    assert db.execute(select(func.count()).select_from(GoalProgress).where(GoalProgress.goal_id == goal.id)).scalar() == 0
+
+
+def test_a_day_cut_by_until_comes_only_from_live_rows(db, client, make_user):
+    user, goal = _archived_goal(db, make_user)
+    until = ARCHIVED_DAY + timedelta(hours=1)
+
+    response = client.get(
+        f"{API}/goals/{goal.id}/progress/daily",
+        params={"since": "2001-05-01T00:00:00Z", "until": until.isoformat()},
+        headers=auth(user),
+    )
+
+    # The late log at 09:00 is inside; the archived total covers the whole day
+    assert response.json() == [{"day": "2001-05-17", "total": 5.0, "entries": 1}]
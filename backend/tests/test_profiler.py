@@ -0,0 +1,82 @@
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+
+from app.core.profiler import ProfileSession, SamplingProfiler, _RequestTracker, _profiled, route_matcher
+
+
+def _spin() -> None:
+    deadline = time.monotonic() + 0.3
+    while time.monotonic() < deadline:
+        pass
+
+
+def profiled_work() -> None:
+    _spin()
+
+
+def other_work() -> None:
+    _spin()
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/slow")
+    def slow(marked: bool = False):
+        (profiled_work if marked else other_work)()
+        return {}
+
+    @app.get("/other")
+    def other():
+        return {}
+
+    return app
+
+
+def test_route_matcher_picks_the_first_matching_route():
+    app = _app()
+    slow = next(r for r in app.routes if getattr(r, "path", None) == "/slow")
+    matches = route_matcher(app.router, [slow])
+
+    assert matches({"type": "http", "path": "/slow", "method": "GET"})
+    assert not matches({"type": "http", "path": "/other", "method": "GET"})
+
+
+def test_tracker_marks_only_requests_with_the_header():
+    session = ProfileSession(0.01, header=(b"x-profile", None))
+    seen = []
+
+    async def endpoint(scope, receive, send):
+        seen.append(_profiled.get())
+        await PlainTextResponse("")(scope, receive, send)
+
+    client = TestClient(_RequestTracker(endpoint, session))
+    client.get("/", headers={"X-Profile": "1"})
+    client.get("/")
+
+    assert seen == [session, None]
+
+
+def test_only_the_marked_request_is_sampled():
+    app = _app()
+    client = TestClient(app)
+    result = {}
+
+    def profile():
+        result["session"] = SamplingProfiler().profile(app, 1.0, 0.005, header=(b"x-profile", None))
+
+    profiler_thread = threading.Thread(target=profile)
+    profiler_thread.start()
+    time.sleep(0.1)
+    # Another request to the same endpoint, running in the same threadpool
+    client.get("/slow")
+    client.get("/slow", params={"marked": True}, headers={"X-Profile": "1"})
+    profiler_thread.join()
+
+    stacks = result["session"].samples
+    assert any("profiled_work" in stack for stack in stacks)
+    assert not any("other_work" in stack for stack in stacks)
@@ -0,0 +1,37 @@
+import pytest
+
+from app.core.ratelimit import LocalBuckets, parse_rate
+
+
+def test_parse_rate():
+    policy = parse_rate("POST /auth/login", "10/minute")
+
+    assert (policy.rate, policy.capacity) == (10 / 60, 10)
+    with pytest.raises(ValueError):
+        parse_rate("POST /auth/login", "0/minute")
+    with pytest.raises(ValueError):
+        parse_rate("POST /auth/login", "ten per minute")
+
+
+def test_bucket_allows_a_burst_then_refills_at_the_rate():
+    buckets = LocalBuckets(max_keys=10)
+    policy = parse_rate("login", "3/second")
+
+    assert [buckets.take_now(policy, "a", 100.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert buckets.take_now(policy, "a", 100.0) == pytest.approx(1 / 3)
+    # Another client has its own bucket
+    assert buckets.take_now(policy, "b", 100.0) == 0.0
+    assert buckets.take_now(policy, "a", 100.5) == 0.0
+
+
+def test_refilled_buckets_are_swept_when_full():
+    buckets = LocalBuckets(max_keys=2)
+    policy = parse_rate("login", "1/second")
+    buckets.take_now(policy, "a", 0.0)
+    buckets.take_now(policy, "b", 0.5)
+
+    buckets.take_now(policy, "c", 1.2)
+
+    # "a" has refilled and is dropped; "b" is still draining
+    assert len(buckets) == 2
+    assert buckets.take_now(policy, "b", 1.2) > 0
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.recurrence import expand_series, is_occurrence, parse_rule, series_end
+
+MONDAY = datetime(2026, 3, 2, 9, tzinfo=timezone.utc)
+HOUR = timedelta(hours=1)
+WEEK = timedelta(days=7)
+
+
+def _series(*exceptions, rule="FREQ=WEEKLY;COUNT=4", id=1):
+    return SimpleNamespace(
+        id=id,
+        title="Sync",
+        description=None,
+        event_type="call",
+        location="Room 1",
+        meeting_link=None,
+        organizer_id=1,
+        team_id=None,
+        created_at=MONDAY,
+        recurrence_rule=rule,
+        start_time=MONDAY,
+        end_time=MONDAY + HOUR,
+        exceptions=list(exceptions),
+    )
+
+
+def _exception(original_start, is_cancelled=False, start_time=None, end_time=None, title=None):
+    return SimpleNamespace(
+        original_start=original_start,
+        is_cancelled=is_cancelled,
+        start_time=start_time,
+        end_time=end_time,
+        title=title,
+        description=None,
+        location=None,
+        meeting_link=None,
+    )
+
+
+def _starts(occurrences):
+    return [o["start_time"] for o in occurrences]
+
+
+def test_unsupported_rules_are_rejected():
+    with pytest.raises(ValueError):
+        parse_rule("FREQ=HOURLY", MONDAY)
+    with pytest.raises(ValueError):
+        parse_rule("FREQ=WEEKLY;BYDAY=XX", MONDAY)
+
+
+def test_series_end_is_the_end_of_the_last_occurrence():
+    assert series_end("FREQ=WEEKLY;COUNT=4", MONDAY, MONDAY + HOUR) == MONDAY + 3 * WEEK + HOUR
+    assert series_end("FREQ=WEEKLY", MONDAY, MONDAY + HOUR) is None
+    assert is_occurrence(_series(), MONDAY + WEEK)
+    assert not is_occurrence(_series(), MONDAY + WEEK + HOUR)
+
+
+def test_expands_only_the_window():
+    occurrences = expand_series([_series()], MONDAY + WEEK, MONDAY + 3 * WEEK)
+
+    assert _starts(occurrences) == [MONDAY + WEEK, MONDAY + 2 * WEEK]
+    assert occurrences[0]["end_time"] == MONDAY + WEEK + HOUR
+    assert occurrences[0]["recurrence_id"] == MONDAY + WEEK
+
+
+def test_overlap_includes_an_occurrence_already_running():
+    window_start = MONDAY + WEEK + HOUR / 2
+
+    assert _starts(expand_series([_series()], window_start, MONDAY + 2 * WEEK)) == []
+    assert _starts(expand_series([_series()], window_start, MONDAY + 2 * WEEK, overlap=True)) == [MONDAY + WEEK]
+
+
+def test_exceptions_cancel_override_and_move_occurrences():
+    series = _series(
+        _exception(MONDAY + WEEK, is_cancelled=True),
+        _exception(MONDAY + 2 * WEEK, title="Retro"),
+        # Moved from outside the window into it
+        _exception(MONDAY + 3 * WEEK, start_time=MONDAY + 2 * WEEK + 2 * HOUR, end_time=MONDAY + 2 * WEEK + 3 * HOUR),
+    )
+
+    occurrences = expand_series([series], MONDAY + HOUR, MONDAY + 2 * WEEK + 6 * HOUR)
+
+    assert [(o["start_time"], o["title"]) for o in occurrences] == [
+        (MONDAY + 2 * WEEK, "Retro"),
+        (MONDAY + 2 * WEEK + 2 * HOUR, "Sync"),
+    ]
+    assert occurrences[1]["recurrence_id"] == MONDAY + 3 * WEEK
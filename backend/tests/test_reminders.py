@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from sqlalchemy import select
+
+from app.models.event import Event, EventException, user_event
+from app.models.outbox import OutboxMessage
+from app.models.reminder import series_reminders
+from app.services import reminders
+from app.services.recurrence import next_start
+
+MONDAY = datetime(2026, 3, 2, 9, tzinfo=timezone.utc)
+WEEK = timedelta(days=7)
+
+
+def _series(*exceptions, rule="FREQ=WEEKLY;COUNT=3"):
+    return SimpleNamespace(
+        recurrence_rule=rule, start_time=MONDAY, end_time=MONDAY + timedelta(hours=1), exceptions=list(exceptions)
+    )
+
+
+def _exception(original_start, is_cancelled=False, start_time=None):
+    return SimpleNamespace(original_start=original_start, is_cancelled=is_cancelled, start_time=start_time)
+
+
+def test_next_start_follows_the_rule():
+    assert next_start(_series(), MONDAY) == MONDAY
+    assert next_start(_series(), MONDAY + timedelta(minutes=1)) == MONDAY + WEEK
+    assert next_start(_series(), MONDAY + 3 * WEEK) is None
+
+
+def test_next_start_skips_cancelled_and_follows_moved_occurrences():
+    cancelled = _exception(MONDAY + WEEK, is_cancelled=True)
+    assert next_start(_series(cancelled), MONDAY + timedelta(minutes=1)) == MONDAY + 2 * WEEK
+
+    moved_later = _exception(MONDAY + WEEK, start_time=MONDAY + 3 * WEEK)
+    assert next_start(_series(moved_later), MONDAY + timedelta(minutes=1)) == MONDAY + 2 * WEEK
+
+    moved_earlier = _exception(MONDAY + 2 * WEEK, start_time=MONDAY + timedelta(days=1))
+    assert next_start(_series(moved_earlier), MONDAY + timedelta(minutes=1)) == MONDAY + timedelta(days=1)
+
+
+def _create_series(db, user, start):
+    event = Event(
+        title="Standup",
+        start_time=start,
+        end_time=start + timedelta(minutes=15),
+        event_type="call",
+        organizer_id=user.id,
+        recurrence_rule="FREQ=DAILY",
+    )
+    db.add(event)
+    db.flush()
+    db.execute(user_event.insert().values(user_id=user.id, event_id=event.id))
+    return event
+
+
+def _next_start(db, event):
+    return db.execute(
+        select(series_reminders.c.next_start).where(series_reminders.c.event_id == event.id)
+    ).scalar()
+
+
+def test_scan_expands_only_series_due_in_the_window(db, make_user):
+    user = make_user("attendee")
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    soon = _create_series(db, user, now + timedelta(minutes=5))
+    later = _create_series(db, user, now + timedelta(hours=5))
+    for event in (soon, later):
+        reminders.queue_event(db, event)
+    assert _next_start(db, later) == later.start_time
+    db.execute(series_reminders.update().where(series_reminders.c.event_id == soon.id).values(next_start=now))
+
+    reminders.scan(db, reminders.EVENT_STARTING, timedelta(minutes=15), now=now)
+
+    keys = db.execute(select(OutboxMessage.payload["event_id"].astext)).scalars().all()
+    assert keys == [str(soon.id)]
+    assert _next_start(db, soon) == soon.start_time + timedelta(days=1)
+    assert _next_start(db, later) == later.start_time
+
+
+def test_cancelling_the_next_occurrence_reschedules_the_series(db, make_user):
+    user = make_user("organizer")
+    start = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(hours=2)
+    event = _create_series(db, user, start)
+    reminders.queue_event(db, event)
+
+    db.add(EventException(event_id=event.id, original_start=start, is_cancelled=True))
+    db.flush()
+    reminders.queue_event(db, event)
+
+    assert _next_start(db, event) == start + timedelta(days=1)
@@ -0,0 +1,108 @@
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from sqlalchemy import column, create_engine, select, table, update
+
+from app.db.routing import ReplicaSet, RoutingSession
+from app.db.session import PRIMARY_COOKIE, ReadYourWritesMiddleware, primary_cookie, primary_until
+
+primary = create_engine("sqlite://")
+replica_a = create_engine("sqlite://")
+replica_b = create_engine("sqlite://")
+items = table("items", column("id"))
+
+
+def _replicas(lag=0.0, refreshed=True) -> ReplicaSet:
+    replicas = ReplicaSet([replica_a, replica_b], max_lag=5, check_interval=2, sticky_seconds=10)
+    replicas._measure_lag = lambda engine: lag
+    if refreshed:
+        replicas.refresh()
+    return replicas
+
+
+def _session(replicas: ReplicaSet) -> RoutingSession:
+    session = RoutingSession(bind=primary, replicas=replicas)
+    session.use_primary = False
+    return session
+
+
+def test_no_replica_is_used_until_lag_is_measured():
+    assert _replicas(refreshed=False).choose() is None
+
+
+def test_no_replica_is_used_when_measurements_are_stale():
+    replicas = _replicas()
+    replicas._checked_at -= 10
+
+    assert replicas.choose() is None
+
+
+def test_lagging_replicas_are_skipped():
+    assert _replicas(lag=6).choose() is None
+    assert _replicas(lag=1).choose() in (replica_a, replica_b)
+
+
+def test_session_keeps_the_replica_of_its_first_read():
+    session = _session(_replicas())
+
+    first = session.get_bind(clause=select(items))
+
+    assert first in (replica_a, replica_b)
+    assert all(session.get_bind(clause=select(items)) is first for _ in range(4))
+
+
+def test_session_reads_from_the_primary_after_a_write():
+    session = _session(_replicas())
+    session.get_bind(clause=select(items))
+
+    assert session.get_bind(clause=update(items).values(id=1)) is primary
+    assert session.get_bind(clause=select(items)) is primary
+    assert session.info["wrote"]
+
+
+def test_locking_reads_go_to_the_primary():
+    session = _session(_replicas())
+
+    assert session.get_bind(clause=select(items).with_for_update()) is primary
+    assert session.use_primary
+
+
+def test_session_without_healthy_replicas_stays_on_the_primary():
+    replicas = _replicas(lag=6)
+    session = _session(replicas)
+
+    assert session.get_bind(clause=select(items)) is primary
+    replicas._measure_lag = lambda engine: 0.0
+    replicas.refresh()
+    assert session.get_bind(clause=select(items)) is primary
+
+
+def test_cookie_round_trips_only_with_its_signature():
+    until = time.time() + 10
+    cookie = primary_cookie(until)
+
+    assert primary_until(cookie) >= until
+    assert primary_until(cookie.replace(".", "0.", 1)) == 0
+    assert primary_until(f"{int(until) + 100}.{cookie.partition('.')[2]}") == 0
+    assert primary_until("garbage") == 0
+    assert primary_until(None) == 0
+
+
+def test_cookie_is_set_after_a_write():
+    app = FastAPI()
+    app.add_middleware(ReadYourWritesMiddleware)
+
+    @app.post("/write")
+    def write(request: Request):
+        request.state.primary_until = time.time() + 10
+        return {}
+
+    @app.get("/read")
+    def read():
+        return {}
+
+    client = TestClient(app)
+    assert PRIMARY_COOKIE not in client.get("/read").cookies
+    response = client.post("/write")
+    assert primary_until(response.cookies[PRIMARY_COOKIE]) > time.time()
@@ -0,0 +1,77 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.deadlines import DeadlineExceeded
+from app.core.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_run():
+    flight = SingleFlight("test")
+    started, release = threading.Event(), threading.Event()
+    runs = []
+
+    def load():
+        runs.append(1)
+        started.set()
+        release.wait(5)
+        return "team"
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(flight.do, ("team", 1), load, 5)]
+        started.wait(5)
+        futures += [pool.submit(flight.do, ("team", 1), load, 5) for _ in range(3)]
+        # Let the followers reach the wait
+        time.sleep(0.1)
+        release.set()
+        results = [f.result(5) for f in futures]
+
+    assert results == ["team"] * 4
+    assert len(runs) == 1
+    assert len(flight) == 0
+
+
+def _lead_and_follow(flight, error, follower):
+    started, release = threading.Event(), threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise error
+
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(flight.do, "k", fail, 5)
+        started.wait(5)
+        waiter = pool.submit(flight.do, "k", follower, 5)
+        # Let the follower reach the wait
+        time.sleep(0.1)
+        release.set()
+        with pytest.raises(type(error)):
+            leader.result(5)
+        return waiter.exception(5) or waiter.result(5)
+
+
+def test_waiters_get_a_copy_of_a_shared_error():
+    flight = SingleFlight("test", share_errors=(HTTPException,))
+    error = HTTPException(status_code=404, detail="Team not found")
+
+    raised = _lead_and_follow(flight, error, lambda: "not run")
+
+    assert isinstance(raised, HTTPException) and raised is not error
+    assert (raised.status_code, raised.detail) == (404, "Team not found")
+
+
+def test_waiters_run_their_own_after_the_leader_timed_out():
+    flight = SingleFlight("test", share_errors=(HTTPException,))
+
+    assert _lead_and_follow(flight, DeadlineExceeded("Request deadline of 5s has passed"), lambda: "own") == "own"
+
+
+def test_nothing_is_kept_after_the_call():
+    flight = SingleFlight("test")
+
+    assert flight.do("k", lambda: 1) == 1
+    assert flight.do("k", lambda: 2) == 2
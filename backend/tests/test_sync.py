@@ -0,0 +1,147 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import delete, update
+
+from app.models.event import Event, user_event
+from app.models.goal import Goal, GoalProgress
+from app.models.sync import SyncTombstone
+from app.models.team import Team
+from app.models.user import user_team
+from app.services.sync import SECTIONS, changes_since, parse_cursor
+
+# Everything written in the test's transaction is at or above this
+SINCE = 1
+
+
+@pytest.fixture
+def team(db, make_user):
+    owner, member = make_user("owner"), make_user("member")
+    team = Team(name="Runners", created_by_id=owner.id)
+    db.add(team)
+    db.flush()
+    db.execute(user_team.insert(), [{"user_id": u.id, "team_id": team.id} for u in (owner, member)])
+    goal = Goal(title="Run", target_value=10, unit="km", user_id=owner.id, team_id=team.id)
+    event = Event(
+        title="Sync",
+        start_time=datetime(2026, 3, 2, 10, tzinfo=timezone.utc),
+        end_time=datetime(2026, 3, 2, 11, tzinfo=timezone.utc),
+        event_type="call",
+        organizer_id=owner.id,
+        team_id=team.id,
+    )
+    db.add_all([goal, event])
+    db.flush()
+    return {"team": team, "owner": owner, "member": member, "goal": goal, "event": event}
+
+
+def _deleted(db, user_id: int) -> set:
+    return {(d["table"], d["id"]) for d in changes_since(db, user_id, SINCE)["deleted"]}
+
+
+def test_removed_member_loses_the_team_and_what_it_shared(db, team):
+    db.execute(delete(user_team).where(user_team.c.user_id == team["member"].id))
+
+    deleted = _deleted(db, team["member"].id)
+
+    assert ("teams", team["team"].id) in deleted
+    assert ("goals", team["goal"].id) in deleted
+    assert ("events", team["event"].id) in deleted
+    assert ("team_members", team["team"].id) in deleted
+
+
+def test_leaving_a_team_records_one_tombstone(db, team):
+    db.execute(delete(user_team).where(user_team.c.user_id == team["member"].id))
+
+    assert db.query(SyncTombstone).count() == 1
+
+
+def test_deleting_a_team_reaches_its_former_members(db, team):
+    db.execute(delete(Team).where(Team.id == team["team"].id))
+
+    deleted = _deleted(db, team["member"].id)
+
+    assert {("teams", team["team"].id), ("goals", team["goal"].id), ("events", team["event"].id)} <= deleted
+    # The owner still sees their own goal and event
+    owner_deleted = _deleted(db, team["owner"].id)
+    assert ("goals", team["goal"].id) not in owner_deleted
+    assert ("events", team["event"].id) not in owner_deleted
+
+
+def test_goal_moved_out_of_the_team_disappears_for_members(db, team):
+    db.execute(update(Goal).where(Goal.id == team["goal"].id).values(team_id=None))
+
+    assert ("goals", team["goal"].id) in _deleted(db, team["member"].id)
+    assert ("goals", team["goal"].id) not in _deleted(db, team["owner"].id)
+
+
+def test_goal_moved_to_a_shared_team_stays_visible(db, team):
+    other = Team(name="Walkers", created_by_id=team["owner"].id)
+    db.add(other)
+    db.flush()
+    db.execute(user_team.insert(), [{"user_id": u.id, "team_id": other.id} for u in (team["owner"], team["member"])])
+
+    db.execute(update(Goal).where(Goal.id == team["goal"].id).values(team_id=other.id))
+
+    assert db.query(SyncTombstone).filter(SyncTombstone.table_name == "goals").count() == 1
+    assert ("goals", team["goal"].id) not in _deleted(db, team["member"].id)
+
+
+def test_attended_event_stays_visible_after_leaving_its_team(db, team):
+    db.execute(user_event.insert().values(user_id=team["member"].id, event_id=team["event"].id))
+    db.execute(delete(user_team).where(user_team.c.user_id == team["member"].id))
+
+    assert ("events", team["event"].id) not in _deleted(db, team["member"].id)
+
+    db.execute(delete(user_event).where(user_event.c.user_id == team["member"].id))
+    assert ("events", team["event"].id) in _deleted(db, team["member"].id)
+
+
+def test_progress_deleted_with_its_goal_keeps_the_owner(db, team):
+    progress = GoalProgress(goal_id=team["goal"].id, value=2, logged_at=datetime.now(timezone.utc))
+    db.add(progress)
+    db.flush()
+
+    db.execute(delete(Goal).where(Goal.id == team["goal"].id))
+
+    tombstones = db.query(SyncTombstone).filter(
+        SyncTombstone.table_name == "goal_progress", SyncTombstone.row_id == progress.id
+    ).all()
+    assert [(t.user_id, t.team_id) for t in tombstones] == [(team["owner"].id, team["team"].id)]
+
+
+def test_cursors_resume_where_the_page_stopped():
+    assert parse_cursor("42") == (42, None)
+    assert parse_cursor("42:50:3:7:9") == (42, (50, 3, (7, 9)))
+    assert parse_cursor("0:50:0") == (0, (50, 0, ()))
+
+
+@pytest.mark.parametrize("cursor", ["", "x", "-1", "1:2", "1:2:99", "1:2:3:4"])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        parse_cursor(cursor)
+
+
+def _contents(page) -> dict:
+    return {
+        name: [row if isinstance(row, dict) else row.id for row in page[name]]
+        for name in (*SECTIONS, "event_exceptions")
+    }
+
+
+@pytest.mark.parametrize("since", [0, SINCE])
+def test_small_pages_add_up_to_the_whole_sync(db, team, since):
+    db.execute(delete(user_team).where(user_team.c.user_id == team["member"].id))
+    user_id = team["member"].id if since else team["owner"].id
+    whole = changes_since(db, user_id, since)
+    assert not whole["has_more"]
+
+    pages, cursor = [], None
+    while cursor is None or pages[-1]["has_more"]:
+        version, resume = parse_cursor(cursor) if cursor else (since, None)
+        pages.append(changes_since(db, user_id, version, limit=1, resume=resume))
+        cursor = pages[-1]["cursor"]
+
+    assert all(sum(len(page[name]) for name in SECTIONS) <= 1 for page in pages)
+    combined = {name: sum((_contents(page)[name] for page in pages), []) for name in _contents(whole)}
+    assert combined == _contents(whole)
@@ -0,0 +1,286 @@
+"""
+Background job worker; see app.services.jobs.
+
+    python worker.py [--pool thread|process] [--concurrency N] [--no-outbox]
+
+Run as many workers as needed, on any hosts: they share the queue in
+Postgres. Each also dispatches the notification outbox on a thread (see
+app.services.outbox) unless started with --no-outbox. SIGTERM or SIGINT
+stops claiming jobs and waits for running ones.
+
+The worker renews the lease of every job it runs, so other workers leave
+them alone however long they take. With ``--pool process`` each job runs in
+a process of its own, which is killed once the job passes its task's
+timeout; the attempt then fails and is retried like any other. Threads
+cannot be stopped, so with ``--pool thread`` an overrunning job is only
+logged and keeps its slot until it returns: use the process pool for tasks
+that may hang.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import traceback
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from time import monotonic, perf_counter
+from typing import Any, Dict, Optional, Set, Tuple
+
+from prometheus_client import start_http_server
+
+from app.core.config import settings
+from app.core.metrics import JOB_DURATION, JOB_QUEUE_DELAY, JOBS_QUEUED, JOBS_RUNNING, mark_process_dead
+from app.db.base import SessionLocal, engine, replica_engines
+from app.services import jobs, outbox
+
+logger = logging.getLogger("worker")
+
+# Seconds between checks for due schedules, and between reaping lost jobs
+# and sampling the queue depth
+SCHEDULE_INTERVAL = 5.0
+MAINTENANCE_INTERVAL = 30.0
+# Stored tracebacks are cut to this many characters
+ERROR_LIMIT = 4000
+
+
+def _reset_engines() -> None:
+    # Job processes must open their own connections rather than share the
+    # parent's sockets
+    for pooled in (engine, *replica_engines):
+        pooled.dispose(close=False)
+
+
+class JobError(Exception):
+    """
+    A job that failed in its own process, with the traceback from there.
+    """
+
+
+def _run_in_process(result, name: str, payload: Dict[str, Any]) -> None:
+    _reset_engines()
+    try:
+        jobs.run_task(name, payload)
+    except BaseException as exc:
+        result.send("".join(traceback.format_exception(type(exc), exc, exc.__traceback__)))
+    else:
+        result.send(None)
+
+
+class ProcessRunner:
+    """
+    Runs each job in a process of its own, so one that overruns can be
+    killed without touching the others.
+    """
+
+    def __init__(self) -> None:
+        self.context = multiprocessing.get_context()
+        self.processes: Dict[Future, multiprocessing.Process] = {}
+        self.killed: Dict[Future, str] = {}
+
+    def submit(self, name: str, payload: Dict[str, Any]) -> Future:
+        future = Future()
+        future.set_running_or_notify_cancel()
+        receiver, sender = self.context.Pipe(duplex=False)
+        process = self.context.Process(target=_run_in_process, args=(sender, name, payload), daemon=True)
+        process.start()
+        sender.close()
+        self.processes[future] = process
+        threading.Thread(target=self._wait, args=(future, process, receiver), daemon=True).start()
+        return future
+
+    def _wait(self, future: Future, process, receiver) -> None:
+        try:
+            error = receiver.recv()
+        except EOFError:
+            # Died without reporting back: killed, or crashed
+            process.join()
+            error = self.killed.get(future, f"Exited with code {process.exitcode}")
+        process.join()
+        self.killed.pop(future, None)
+        receiver.close()
+        self.processes.pop(future, None)
+        if error is None:
+            future.set_result(None)
+        else:
+            future.set_exception(JobError(error))
+
+    def kill(self, future: Future, reason: str) -> bool:
+        process = self.processes.get(future)
+        if process is None:
+            return False
+        self.killed[future] = reason
+        process.kill()
+        return True
+
+    def shutdown(self) -> None:
+        pass
+
+
+class ThreadRunner:
+    def __init__(self, concurrency: int) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="job")
+
+    def submit(self, name: str, payload: Dict[str, Any]) -> Future:
+        return self.executor.submit(jobs.run_task, name, payload)
+
+    def kill(self, future: Future, reason: str) -> bool:
+        return False
+
+    def shutdown(self) -> None:
+        self.executor.shutdown()
+
+
+class Worker:
+    def __init__(self, pool: str, concurrency: int) -> None:
+        self.id = f"{socket.gethostname()}:{os.getpid()}"
+        self.concurrency = concurrency
+        self.runner = ProcessRunner() if pool == "process" else ThreadRunner(concurrency)
+        self.running: Dict[Future, Tuple[jobs.ClaimedJob, float]] = {}
+        # Jobs past their timeout that could not be stopped, logged once
+        self.overrunning: Set[Future] = set()
+        self.stopping = threading.Event()
+        self._next_schedule = 0.0
+        self._next_heartbeat = 0.0
+        self._next_maintenance = 0.0
+        self._sampled: Set[str] = set()
+
+    def stop(self, *args) -> None:
+        logger.info("Stopping; waiting for %d running jobs", len(self.running))
+        self.stopping.set()
+
+    def run(self) -> None:
+        with SessionLocal() as db:
+            jobs.sync_schedules(db)
+        logger.info("Worker %s running %d tasks", self.id, len(jobs.TASKS))
+        while not self.stopping.is_set():
+            try:
+                self._housekeeping()
+                self._claim()
+            except Exception:
+                # Typically the database going away; keep the running jobs
+                # and try again after a pause
+                logger.exception("Worker loop failed")
+                self.stopping.wait(settings.JOB_POLL_INTERVAL_SECONDS)
+            self._collect(settings.JOB_POLL_INTERVAL_SECONDS)
+        while self.running:
+            try:
+                self._heartbeat()
+            except Exception:
+                logger.exception("Could not renew job leases")
+            self._enforce_timeouts()
+            self._collect(settings.JOB_POLL_INTERVAL_SECONDS)
+        self.runner.shutdown()
+
+    def _heartbeat(self) -> None:
+        now = monotonic()
+        if now < self._next_heartbeat:
+            return
+        with SessionLocal() as db:
+            jobs.heartbeat(db, self.id, [job.id for job, _ in self.running.values()])
+        self._next_heartbeat = now + settings.JOB_HEARTBEAT_SECONDS
+
+    def _enforce_timeouts(self) -> None:
+        now = perf_counter()
+        for future, (job, started) in list(self.running.items()):
+            if now - started <= job.timeout or future in self.overrunning:
+                continue
+            reason = f"Killed after running longer than its {job.timeout:g}s timeout"
+            if self.runner.kill(future, reason):
+                logger.error("Job %s (%s) timed out; killed it", job.id, job.name)
+            else:
+                logger.error("Job %s (%s) is past its %gs timeout and cannot be stopped", job.id, job.name, job.timeout)
+            self.overrunning.add(future)
+
+    def _housekeeping(self) -> None:
+        self._heartbeat()
+        self._enforce_timeouts()
+        now = monotonic()
+        if now >= self._next_schedule:
+            self._next_schedule = now + SCHEDULE_INTERVAL
+            with SessionLocal() as db:
+                for name in jobs.enqueue_due(db):
+                    logger.info("Scheduled %s", name)
+        if now >= self._next_maintenance:
+            self._next_maintenance = now + MAINTENANCE_INTERVAL
+            with SessionLocal() as db:
+                lost = jobs.reap_lost(db)
+                depth = jobs.queue_depth(db)
+            if lost:
+                logger.warning("Requeued %d jobs whose worker stopped renewing them", lost)
+            for name in self._sampled - set(depth):
+                JOBS_QUEUED.labels(name).set(0)
+            for name, count in depth.items():
+                JOBS_QUEUED.labels(name).set(count)
+            self._sampled = set(depth)
+
+    def _claim(self) -> None:
+        free = self.concurrency - len(self.running)
+        if free <= 0:
+            return
+        with SessionLocal() as db:
+            claimed = jobs.claim(db, self.id, free)
+        now = datetime.now(timezone.utc)
+        for job in claimed:
+            JOB_QUEUE_DELAY.labels(job.name).observe(max((now - job.run_at).total_seconds(), 0.0))
+            future = self.runner.submit(job.name, job.payload)
+            self.running[future] = (job, perf_counter())
+            JOBS_RUNNING.inc()
+
+    def _collect(self, timeout) -> None:
+        if not self.running:
+            self.stopping.wait(timeout)
+            return
+        done, _ = wait(self.running, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            job, started = self.running.pop(future)
+            self.overrunning.discard(future)
+            JOBS_RUNNING.dec()
+            JOB_DURATION.labels(job.name).observe(perf_counter() - started)
+            error = future.exception()
+            try:
+                with SessionLocal() as db:
+                    if error is None:
+                        jobs.complete(db, job, self.id)
+                    else:
+                        logger.error("Job %s (%s) failed: %r", job.id, job.name, error)
+                        text = "".join(traceback.format_exception(type(error), error, error.__traceback__))
+                        jobs.fail(db, job, self.id, text[-ERROR_LIMIT:])
+            except Exception:
+                # The job stays running until reaped as lost and retried
+                logger.exception("Could not record the outcome of job %s", job.id)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pool", choices=("thread", "process"), default=settings.JOB_WORKER_POOL)
+    parser.add_argument("--concurrency", type=int, default=settings.JOB_WORKER_CONCURRENCY)
+    parser.add_argument("--no-outbox", action="store_true", help="Do not dispatch notifications")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    jobs.load_tasks()
+    if settings.JOB_WORKER_METRICS_PORT:
+        start_http_server(settings.JOB_WORKER_METRICS_PORT)
+
+    worker = Worker(args.pool, args.concurrency)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    dispatcher = None
+    if not args.no_outbox:
+        dispatcher = threading.Thread(
+            target=outbox.run_dispatcher, args=(worker.stopping,), name="outbox", daemon=True
+        )
+        dispatcher.start()
+    try:
+        worker.run()
+        if dispatcher is not None:
+            dispatcher.join()
+    finally:
+        mark_process_dead()
+
+
+if __name__ == "__main__":
+    main()
@@ -14,8 +14,8 @@ import { Card, CardHeader, CardTitle, CardContent, CardDescription, CardFooter }
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs"
 import { Progress } from "@/components/ui/progress"
 import { Button } from "@/components/ui/button"
-import { goalsApi, teamsApi, eventsApi } from "@/lib/api"
-import { Goal, Event, Team } from "@/lib/types"
+import { dashboardApi } from "@/lib/api"
+import { DashboardGoal, Event, Team, Streak } from "@/lib/types"
 import { DailyCheckIn } from "@/components/daily-check-in"
 import { TeamActivity } from "@/components/team-activity"
 import { WeeklyProgress } from "@/components/weekly-progress"
@@ -24,9 +24,11 @@ import { UpcomingCalls } from "@/components/upcoming-calls"
 export default function DashboardPage() {
   const { user, token } = useAuth()
   const [activeTab, setActiveTab] = useState("overview")
-  const [goals, setGoals] = useState<Goal[]>([])
+  const [goals, setGoals] = useState<DashboardGoal[]>([])
+  const [completedGoals, setCompletedGoals] = useState(0)
   const [events, setEvents] = useState<Event[]>([])
   const [teams, setTeams] = useState<Team[]>([])
+  const [streak, setStreak] = useState<Streak | null>(null)
   const [isLoading, setIsLoading] = useState(true)
 
   useEffect(() => {
@@ -35,16 +37,14 @@ export default function DashboardPage() {
       
       setIsLoading(true)
       try {
-        // Fetch goals, upcoming events, and teams
-        const [goalsData, eventsData, teamsData] = await Promise.all([
-          goalsApi.getGoals(token),
-          eventsApi.getEvents(token),
-          teamsApi.getTeams(token)
-        ])
+        // Goals, today's and upcoming events, teams and streak in one request
+        const dashboard = await dashboardApi.getDashboard(token)
         
-        setGoals(goalsData)
-        setEvents(eventsData)
-        setTeams(teamsData)
+        setGoals(dashboard.goals ?? [])
+        setCompletedGoals(dashboard.completed_goals ?? 0)
+        setEvents([...(dashboard.today_events ?? []), ...(dashboard.upcoming_events ?? [])])
+        setTeams(dashboard.teams ?? [])
+        setStreak(dashboard.streak)
       } catch (error) {
         console.error("Failed to fetch dashboard data:", error)
       } finally {
@@ -55,10 +55,9 @@ export default function DashboardPage() {
     fetchData()
   }, [token])
 
-  // Calculate stats
-  const totalGoals = goals.length
-  const completedGoals = goals.filter(goal => goal.is_completed).length
-  const activeGoals = totalGoals - completedGoals
+  // Calculate stats (the dashboard only returns active goals)
+  const activeGoals = goals.length
+  const totalGoals = activeGoals + completedGoals
   
   // Find the next upcoming event (if any)
   const upcomingEvent = events.sort((a, b) => 
@@ -120,8 +119,8 @@ export default function DashboardPage() {
                   </div>
                 </CardHeader>
                 <CardContent>
-                  <div className="text-2xl font-bold">{user?.current_streak || 0} days</div>
-                  <p className="text-xs text-muted-foreground">Your longest streak is {user?.longest_streak || 0} days</p>
+                  <div className="text-2xl font-bold">{streak?.current_streak ?? user?.current_streak ?? 0} days</div>
+                  <p className="text-xs text-muted-foreground">Your longest streak is {streak?.longest_streak ?? user?.longest_streak ?? 0} days</p>
                 </CardContent>
               </Card>
               
@@ -151,7 +150,7 @@ export default function DashboardPage() {
                       <div className="animate-spin rounded-full border-4 border-primary border-t-transparent h-8 w-8"></div>
                     </div>
                   ) : (
-                    <DailyCheckIn goals={goals.filter(goal => !goal.is_completed)} />
+                    <DailyCheckIn goals={goals} />
                   )}
                 </CardContent>
               </Card>
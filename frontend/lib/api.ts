@@ -1,7 +1,13 @@
-import { User, Goal, Team, Event } from './types';
+import { User, Goal, Team, Event, Dashboard } from './types';
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000/api/v1';
 
+// Sends the API's cookies, which keep reads on the primary database for a
+// few seconds after a write so the app sees its own changes
+function apiFetch(input: string, init: RequestInit = {}) {
+  return fetch(input, { ...init, credentials: 'include' });
+}
+
 // Helper function to handle API responses
 async function handleResponse(response: Response) {
   if (!response.ok) {
@@ -23,7 +29,7 @@ export const authApi = {
     formData.append('username', email);
     formData.append('password', password);
 
-    const response = await fetch(`${API_URL}/auth/login`, {
+    const response = await apiFetch(`${API_URL}/auth/login`, {
       method: 'POST',
       body: formData,
     });
@@ -31,7 +37,7 @@ export const authApi = {
   },
 
   register: async (userData: any) => {
-    const response = await fetch(`${API_URL}/users`, {
+    const response = await apiFetch(`${API_URL}/users`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
@@ -42,7 +48,7 @@ export const authApi = {
   },
 
   getCurrentUser: async (token: string) => {
-    const response = await fetch(`${API_URL}/users/me`, {
+    const response = await apiFetch(`${API_URL}/users/me`, {
       method: 'GET',
       headers: {
         'Authorization': `Bearer ${token}`,
@@ -55,7 +61,7 @@ export const authApi = {
 // Users API
 export const usersApi = {
   updateProfile: async (token: string, userData: Partial<User>) => {
-    const response = await fetch(`${API_URL}/users/me`, {
+    const response = await apiFetch(`${API_URL}/users/me`, {
       method: 'PUT',
       headers: {
         'Authorization': `Bearer ${token}`,
@@ -67,7 +73,7 @@ export const usersApi = {
   },
   
   getUserWithTeams: async (token: string) => {
-    const response = await fetch(`${API_URL}/users/with-teams`, {
+    const response = await apiFetch(`${API_URL}/users/with-teams`, {
       headers: {
         'Authorization': `Bearer ${token}`,
       },
@@ -79,7 +85,7 @@ export const usersApi = {
 // Goals API
 export const goalsApi = {
   getGoals: async (token: string) => {
-    const response = await fetch(`${API_URL}/goals`, {
+    const response = await apiFetch(`${API_URL}/goals`, {
       headers: {
         'Authorization': `Bearer ${token}`,
       },
@@ -88,7 +94,7 @@ export const goalsApi = {
   },
 
   getGoal: async (token: string, goalId: number) => {
-    const response = await fetch(`${API_URL}/goals/${goalId}`, {
+    const response = await apiFetch(`${API_URL}/goals/${goalId}`, {
       headers: {
         'Authorization': `Bearer ${token}`,
       },
@@ -97,7 +103,7 @@ export const goalsApi = {
   },
 
   createGoal: async (token: string, goalData: Partial<Goal>) => {
-    const response = await fetch(`${API_URL}/goals`, {
+    const response = await apiFetch(`${API_URL}/goals`, {
       method: 'POST',
       headers: {
         'Authorization': `Bearer ${token}`,
@@ -109,7 +115,7 @@ export const goalsApi = {
   },
 
   updateGoal: async (token: string, goalId: number, goalData: Partial<Goal>) => {
-    const response = await fetch(`${API_URL}/goals/${goalId}`, {
+    const response = await apiFetch(`${API_URL}/goals/${goalId}`, {
       method: 'PUT',
       headers: {
         'Authorization': `Bearer ${token}`,
@@ -121,7 +127,7 @@ export const goalsApi = {
   },
 
   deleteGoal: async (token: string, goalId: number) => {
-    const response = await fetch(`${API_URL}/goals/${goalId}`, {
+    const response = await apiFetch(`${API_URL}/goals/${goalId}`, {
       method: 'DELETE',
       headers: {
         'Authorization': `Bearer ${token}`,
@@ -131,7 +137,7 @@ export const goalsApi = {
   },
 
   logProgress: async (token: string, goalId: number, progressData: any) => {
-    const response = await fetch(`${API_URL}/goals/${goalId}/progress`, {
+    const response = await apiFetch(`${API_URL}/goals/${goalId}/progress`, {
       method: 'POST',
       headers: {
         'Authorization': `Bearer ${token}`,
@@ -143,7 +149,7 @@ export const goalsApi = {
   },
 
   getGoalProgress: async (token: string, goalId: number) => {
-    const response = await fetch(`${API_URL}/goals/${goalId}/progress`, {
+    const response = await apiFetch(`${API_URL}/goals/${goalId}/progress`, {
       headers: {
         'Authorization': `Bearer ${token}`,
       },
@@ -155,7 +161,7 @@ export const goalsApi = {
 // Teams API
 export const teamsApi = {
   getTeams: async (token: string) => {
-    const response = await fetch(`${API_URL}/teams`, {
+    const response = await apiFetch(`${API_URL}/teams`, {
       headers: {
         'Authorization': `Bearer ${token}`,
       },
@@ -164,7 +170,7 @@ export const teamsApi = {
   },
 
   getTeam: async (token: string, teamId: number) => {
-    const response = await fetch(`${API_URL}/teams/${teamId}`, {
+    const response = await apiFetch(`${API_URL}/teams/${teamId}`, {
       headers: {
         'Authorization': `Bearer ${token}`,
       },
@@ -173,7 +179,7 @@ export const teamsApi = {
   },
 
   createTeam: async (token: string, teamData: Partial<Team>) => {
-    const response = await fetch(`${API_URL}/teams`, {
+    const response = await apiFetch(`${API_URL}/teams`, {
       method: 'POST',
       headers: {
         'Authorization': `Bearer ${token}`,
@@ -185,7 +191,7 @@ export const teamsApi = {
   },
 
   updateTeam: async (token: string, teamId: number, teamData: Partial<Team>) => {
-    const response = await fetch(`${API_URL}/teams/${teamId}`, {
+    const response = await apiFetch(`${API_URL}/teams/${teamId}`, {
       method: 'PUT',
       headers: {
         'Authorization': `Bearer ${token}`,
@@ -197,7 +203,7 @@ export const teamsApi = {
   },
 
   deleteTeam: async (token: string, teamId: number) => {
-    const response = await fetch(`${API_URL}/teams/${teamId}`, {
+    const response = await apiFetch(`${API_URL}/teams/${teamId}`, {
       method: 'DELETE',
       headers: {
         'Authorization': `Bearer ${token}`,
@@ -207,7 +213,7 @@ export const teamsApi = {
   },
 
   getTeamMembers: async (token: string, teamId: number) => {
-    const response = await fetch(`${API_URL}/teams/${teamId}/members`, {
+    const response = await apiFetch(`${API_URL}/teams/${teamId}/members`, {
       headers: {
         'Authorization': `Bearer ${token}`,
       },
@@ -216,7 +222,7 @@ export const teamsApi = {
   },
 
   addTeamMember: async (token: string, teamId: number, userId: number) => {
-    const response = await fetch(`${API_URL}/teams/${teamId}/members`, {
+    const response = await apiFetch(`${API_URL}/teams/${teamId}/members`, {
       method: 'POST',
       headers: {
         'Authorization': `Bearer ${token}`,
@@ -228,7 +234,7 @@ export const teamsApi = {
   },
 
   removeTeamMember: async (token: string, teamId: number, userId: number) => {
-    const response = await fetch(`${API_URL}/teams/${teamId}/members/${userId}`, {
+    const response = await apiFetch(`${API_URL}/teams/${teamId}/members/${userId}`, {
       method: 'DELETE',
       headers: {
         'Authorization': `Bearer ${token}`,
@@ -238,7 +244,7 @@ export const teamsApi = {
   },
 
   getTeamGoals: async (token: string, teamId: number) => {
-    const response = await fetch(`${API_URL}/teams/${teamId}/goals`, {
+    const response = await apiFetch(`${API_URL}/teams/${teamId}/goals`, {
       headers: {
         'Authorization': `Bearer ${token}`,
       },
@@ -247,7 +253,7 @@ export const teamsApi = {
   },
 
   getTeamEvents: async (token: string, teamId: number) => {
-    const response = await fetch(`${API_URL}/teams/${teamId}/events`, {
+    const response = await apiFetch(`${API_URL}/teams/${teamId}/events`, {
       headers: {
         'Authorization': `Bearer ${token}`,
       },
@@ -259,7 +265,7 @@ export const teamsApi = {
 // Events API
 export const eventsApi = {
   getEvents: async (token: string) => {
-    const response = await fetch(`${API_URL}/events`, {
+    const response = await apiFetch(`${API_URL}/events`, {
       headers: {
         'Authorization': `Bearer ${token}`,
       },
@@ -268,7 +274,7 @@ export const eventsApi = {
   },
 
   getEvent: async (token: string, eventId: number) => {
-    const response = await fetch(`${API_URL}/events/${eventId}`, {
+    const response = await apiFetch(`${API_URL}/events/${eventId}`, {
       headers: {
         'Authorization': `Bearer ${token}`,
       },
@@ -277,7 +283,7 @@ export const eventsApi = {
   },
 
   createEvent: async (token: string, eventData: Partial<Event>) => {
-    const response = await fetch(`${API_URL}/events`, {
+    const response = await apiFetch(`${API_URL}/events`, {
       method: 'POST',
       headers: {
         'Authorization': `Bearer ${token}`,
@@ -289,7 +295,7 @@ export const eventsApi = {
   },
 
   updateEvent: async (token: string, eventId: number, eventData: Partial<Event>) => {
-    const response = await fetch(`${API_URL}/events/${eventId}`, {
+    const response = await apiFetch(`${API_URL}/events/${eventId}`, {
       method: 'PUT',
       headers: {
         'Authorization': `Bearer ${token}`,
@@ -301,7 +307,7 @@ export const eventsApi = {
   },
 
   deleteEvent: async (token: string, eventId: number) => {
-    const response = await fetch(`${API_URL}/events/${eventId}`, {
+    const response = await apiFetch(`${API_URL}/events/${eventId}`, {
       method: 'DELETE',
       headers: {
         'Authorization': `Bearer ${token}`,
@@ -311,7 +317,7 @@ export const eventsApi = {
   },
 
   attendEvent: async (token: string, eventId: number) => {
-    const response = await fetch(`${API_URL}/events/${eventId}/attend`, {
+    const response = await apiFetch(`${API_URL}/events/${eventId}/attend`, {
       method: 'POST',
       headers: {
         'Authorization': `Bearer ${token}`,
@@ -321,7 +327,7 @@ export const eventsApi = {
   },
 
   cancelAttendance: async (token: string, eventId: number) => {
-    const response = await fetch(`${API_URL}/events/${eventId}/cancel-attendance`, {
+    const response = await apiFetch(`${API_URL}/events/${eventId}/cancel-attendance`, {
       method: 'POST',
       headers: {
         'Authorization': `Bearer ${token}`,
@@ -332,7 +338,7 @@ export const eventsApi = {
 
   getEventsForWeek: async (token: string, date?: string) => {
     const url = date ? `${API_URL}/events/calendar/week?date=${date}` : `${API_URL}/events/calendar/week`;
-    const response = await fetch(url, {
+    const response = await apiFetch(url, {
       headers: {
         'Authorization': `Bearer ${token}`,
       },
@@ -345,7 +351,7 @@ export const eventsApi = {
     if (year && month) {
       url += `?year=${year}&month=${month}`;
     }
-    const response = await fetch(url, {
+    const response = await apiFetch(url, {
       headers: {
         'Authorization': `Bearer ${token}`,
       },
@@ -355,11 +361,23 @@ export const eventsApi = {
 
   getEventsForDay: async (token: string, date?: string) => {
     const url = date ? `${API_URL}/events/calendar/day?date=${date}` : `${API_URL}/events/calendar/day`;
-    const response = await fetch(url, {
+    const response = await apiFetch(url, {
       headers: {
         'Authorization': `Bearer ${token}`,
       },
     });
     return handleResponse(response);
   },
-};
\ No newline at end of file
+};
+
+// Dashboard API
+export const dashboardApi = {
+  getDashboard: async (token: string): Promise<Dashboard> => {
+    const response = await apiFetch(`${API_URL}/dashboard`, {
+      headers: {
+        'Authorization': `Bearer ${token}`,
+      },
+    });
+    return handleResponse(response);
+  },
+};
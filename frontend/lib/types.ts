@@ -60,6 +60,14 @@ export interface User {
     is_completed: boolean;
     is_recurring: boolean;
     frequency?: string;
+    forecast?: GoalForecast | null;
+  }
+  
+  export interface GoalForecast {
+    rate_per_day?: number;
+    projected_completion?: string;
+    status: 'on_track' | 'at_risk' | 'no_data';
+    computed_at: string;
   }
   
   export interface GoalProgress {
@@ -99,6 +107,30 @@ export interface User {
     attendees: User[];
   }
   
+  // Dashboard related types
+  export interface DashboardGoal extends Goal {
+    week_progress: number;
+  }
+  
+  export interface Streak {
+    current_streak: number;
+    longest_streak: number;
+    last_logged_at?: string;
+    logged_today: boolean;
+  }
+  
+  // Sections that failed to load are null and listed in errors
+  export interface Dashboard {
+    user: User;
+    goals: DashboardGoal[] | null;
+    completed_goals: number | null;
+    teams: Team[] | null;
+    today_events: Event[] | null;
+    upcoming_events: Event[] | null;
+    streak: Streak | null;
+    errors: Record<string, string>;
+  }
+  
   // Authentication related types
   export interface AuthToken {
     access_token: string;